@@ -78,7 +78,8 @@ def main():
                 "fuente": "Procuraduría General de la Nación",
                 "texto_contenido": "",  # Vacío por ahora (evita cuelgues)
                 "archivo_existe": True,
-                "estado": "disponible"
+                "estado": "disponible",
+                "actualizado_en": datetime.now()
             }
             
             # Insertar
@@ -92,6 +93,9 @@ def main():
             print(f"  ✗ Error con {archivo.name}: {e}")
             continue
     
+    if agregados:
+        mongo.incrementar_version_corpus()
+
     # Verificar resultado
     total_final = collection.count_documents({})
     
@@ -1,15 +1,26 @@
 import logging
 import math
 import os
+import re
+import threading
+import time
 from datetime import datetime
 from functools import wraps
+from urllib.parse import quote
 
 from dotenv import load_dotenv
-from flask import (Flask, jsonify, redirect, render_template, request, session,
-                   url_for)
+from flask import (Flask, Response, g, jsonify, redirect, render_template,
+                   request, session, stream_with_context, url_for)
 
 # Importación de las clases auxiliares definidas en helpers/__init__.py
-from helpers import ElasticSearch, Funciones, Mongo_DB
+from helpers import Funciones, Mongo_DB
+from helpers import cache_http, exportacion, metricas
+from helpers.almacen_archivos import clave_documento, crear_almacen_archivos
+from helpers.coalescencia import Coalescedor, clave_peticion
+from helpers.indices import asegurar_indices_proyecto
+from helpers.llm_service import llm_service
+from helpers.respuestas_http import ProveedorJSONRapido, comprimir_respuesta
+from helpers.servicios import RegistroServicios
 from helpers.user_manager import UserManager
 from models.user import User
 
@@ -23,6 +34,9 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 # Se obtiene la llave secreta del archivo .env para manejar sesiones
 app.secret_key = os.getenv('SECRET_KEY', 'default_key_if_not_found') 
+# JSON rápido (orjson) con soporte de ObjectId/fechas y compresión br/gzip negociada
+app.json = ProveedorJSONRapido(app)
+app.after_request(comprimir_respuesta)
 
 # Variables de la aplicación (para pasar a los templates)
 version_app = "1.2" # Versión del proyecto
@@ -45,13 +59,127 @@ if not MONGO_URI or not MONGO_DB_NAME or not MONGO_COLLECTION:
 if not ELASTIC_URL or not ELASTIC_API_KEY:
     logger.warning("Advertencia: Variables de ElasticSearch no configuradas, funcionará solo con MongoDB")
 
-# Instanciación de las clases de conexión
-mongo_db = Mongo_DB(MONGO_URI, MONGO_DB_NAME, MONGO_COLLECTION)
-elastic_search = ElasticSearch(ELASTIC_URL or '', ELASTIC_API_KEY or '')
+# Instanciación diferida de las clases de conexión: se conectan al primer uso
+# o en el hilo de calentamiento, no al importar el módulo (arranque de workers)
+def crear_elastic_search():
+    from helpers.elasticsearch import ElasticSearch
+    return ElasticSearch(ELASTIC_URL or '', ELASTIC_API_KEY or '')
+
+servicios = RegistroServicios()
+servicios.registrar('mongo_db', lambda: Mongo_DB(MONGO_URI, MONGO_DB_NAME, MONGO_COLLECTION),
+                    verificar=lambda mongo: mongo.probar_conexion())
+servicios.registrar('user_manager', lambda: UserManager(servicios.obtener('mongo_db').client, MONGO_DB_NAME,
+                                                       crear_indices=False))
+# Índices declarados en helpers/indices.py: se aseguran en el calentamiento, sin bloquear peticiones
+servicios.registrar('indices', lambda: asegurar_indices_proyecto(servicios.obtener('mongo_db').db, MONGO_COLLECTION),
+                    requerido=False)
+servicios.registrar('elastic_search', crear_elastic_search,
+                    verificar=lambda es: es.client is not None, requerido=False)  # Sin Elasticsearch la búsqueda usa MongoDB
+servicios.registrar('llm_service', llm_service.inicializar, requerido=False)
+
+# Motor de búsqueda de texto: 'elasticsearch' (defecto), 'sqlite' (FTS5 local, sin servicios externos) o 'mongodb'
+MOTOR_BUSQUEDA = os.getenv('MOTOR_BUSQUEDA', 'elasticsearch').lower()
+
+def crear_motor_busqueda():
+    if MOTOR_BUSQUEDA == 'sqlite':
+        from helpers.sqlite_search import SQLITE_SEARCH_PATH, SQLiteSearch
+        return SQLiteSearch(SQLITE_SEARCH_PATH)
+    return servicios.obtener('elastic_search')
+
+servicios.registrar('motor_busqueda', crear_motor_busqueda,
+                    verificar=lambda motor: motor.client is not None, requerido=False)
+
+# Similitud entre documentos (embeddings locales generados con scripts/construir_vectores.py)
+def crear_buscador_similares():
+    from helpers.vectores import BuscadorSimilares
+    return BuscadorSimilares()
+
+servicios.registrar('vectores', crear_buscador_similares,
+                    verificar=lambda buscador: buscador.disponible(), requerido=False)
+
+# Archivos originales: GridFS (compartido entre nodos) o disco local según ALMACEN_ARCHIVOS
+servicios.registrar('almacen_archivos', lambda: crear_almacen_archivos(servicios.obtener('mongo_db').db),
+                    requerido=False)
+
+mongo_db = servicios.proxy('mongo_db')
+elastic_search = servicios.proxy('elastic_search')
+motor_busqueda = servicios.proxy('motor_busqueda')
+user_manager = servicios.proxy('user_manager')
+buscador_similares = servicios.proxy('vectores')
+almacen_archivos = servicios.proxy('almacen_archivos')
 funciones = Funciones()
 
-# Instanciar gestor de usuarios
-user_manager = UserManager(mongo_db.client, MONGO_DB_NAME)
+# Con gunicorn --preload el hilo no sobreviviría al fork: en ese caso los servicios se crean al primer uso
+CALENTAR_SERVICIOS = os.getenv('CALENTAR_SERVICIOS', 'true').lower() == 'true'
+if CALENTAR_SERVICIOS:
+    servicios.calentar_en_segundo_plano()
+
+# Máximo de documentos por petición a /api/documentos/lote
+LOTE_MAXIMO_DOCUMENTOS = int(os.getenv('LOTE_MAXIMO_DOCUMENTOS', '100'))
+PATRON_CAMPO = re.compile(r'^[A-Za-zÀ-ÿ_][\wÀ-ÿ]*(\.[\wÀ-ÿ]+)*$')
+
+# Límite del conteo de resultados en modo aproximado (la paginación no necesita más)
+LIMITE_CONTEO_TOTAL = int(os.getenv('LIMITE_CONTEO_TOTAL', '10000'))
+
+# Coalescencia de peticiones idénticas concurrentes (entre workers si COALESCENCIA_DIR está definido)
+COALESCENCIA_DIR = os.getenv('COALESCENCIA_DIR')
+coalescedor_busquedas = Coalescedor('busquedas', COALESCENCIA_DIR, ttl_resultado=5.0, espera_maxima=30.0)
+coalescedor_resumenes = Coalescedor('resumenes', COALESCENCIA_DIR, ttl_resultado=60.0, espera_maxima=120.0)
+
+# Trabajador de la cola en hilos del proceso web: procesa las cargas del panel sin scripts/cola_tareas.py
+COLA_TRABAJADOR_EN_APP = os.getenv('COLA_TRABAJADOR_EN_APP', 'true').lower() == 'true'
+COLA_TRABAJADOR_HILOS = int(os.getenv('COLA_TRABAJADOR_HILOS', '2'))
+_trabajador_cola = None
+_trabajador_cola_lock = threading.Lock()
+
+# --- Instrumentación de Latencias ---
+
+@app.before_request
+def iniciar_medicion():
+    """Abre el acumulador de tiempos por componente de la petición."""
+    g.inicio_peticion = time.perf_counter()
+    g.token_tiempos = metricas.iniciar_peticion()
+
+@app.after_request
+def registrar_medicion(response):
+    """Agrega la cabecera Server-Timing y registra la duración por ruta."""
+    token = g.pop('token_tiempos', None)
+    if token is None:
+        return response
+
+    duracion = time.perf_counter() - g.inicio_peticion
+    tiempos = metricas.finalizar_peticion(token)
+    tiempos['total'] = duracion * 1000
+    response.headers['Server-Timing'] = metricas.server_timing(tiempos)
+
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    metricas.registro.observar('http_peticion_duracion_segundos', duracion, {
+        'ruta': ruta,
+        'metodo': request.method,
+        'estado': response.status_code
+    })
+    return response
+
+def desglose_tiempos() -> dict:
+    """Tiempos (ms) por componente hasta este punto de la petición, con el total."""
+    tiempos = metricas.tiempos_actuales()
+    tiempos['total'] = round((time.perf_counter() - g.inicio_peticion) * 1000, 2)
+    return tiempos
+
+def registrar_busqueda(motor: str, inicio: float):
+    """Observa la latencia de una búsqueda por motor y ruta."""
+    metricas.registro.observar('busqueda_duracion_segundos', time.perf_counter() - inicio, {
+        'motor': motor,
+        'ruta': request.url_rule.rule
+    })
+
+def registrar_fallback(error: Exception):
+    """Cuenta una búsqueda que cae a MongoDB por error del motor de texto."""
+    metricas.registro.incrementar('busqueda_fallback_total', {
+        'motor': MOTOR_BUSQUEDA,
+        'ruta': request.url_rule.rule,
+        'error': type(error).__name__
+    })
 
 # --- Decoradores de Autenticación y Autorización ---
 
@@ -175,14 +303,106 @@ def admin_elasticsearch():
                          version=version_app,
                          username=session.get('username', 'Admin'))
 
-# Ruta de Cargar Datos (En construcción)
+# Ruta de Cargar Datos
 @app.route('/admin/cargar-datos')
 @login_required
 def admin_cargar_datos():
-    """Página para cargar documentos (en construcción)"""
+    """Página para cargar documentos PDF, DOCX o ZIP con seguimiento del procesamiento"""
+    from helpers.carga_archivos import CARGA_MAX_MB, EXTENSIONES_CARGA, listar_cargas
+    try:
+        cargas = listar_cargas(mongo_db.db)
+    except Exception as e:
+        logger.error(f"Error al listar las cargas: {e}")
+        cargas = []
     return render_template('cargar_datos.html', 
                          version=version_app,
-                         username=session.get('username', 'Admin'))
+                         username=session.get('username', 'Admin'),
+                         extensiones=EXTENSIONES_CARGA,
+                         max_mb=CARGA_MAX_MB,
+                         cargas=cargas)
+
+def iniciar_trabajador_cola():
+    """Arranca una vez por proceso el trabajador de la cola en segundo plano."""
+    global _trabajador_cola
+    if not COLA_TRABAJADOR_EN_APP or _trabajador_cola is not None:
+        return
+    with _trabajador_cola_lock:
+        if _trabajador_cola is not None:
+            return
+        from helpers.cola_tareas import ColaTareas, TrabajadorCola
+        from helpers.tareas_ingesta import crear_manejadores
+
+        mongo = servicios.obtener('mongo_db')
+        elastic = None
+        try:
+            elastic = servicios.obtener('elastic_search')
+            elastic = elastic if elastic.client is not None else None
+        except Exception:
+            pass  # Sin ElasticSearch las tareas de indexación quedan en la cola
+        sqlite = servicios.obtener('motor_busqueda') if MOTOR_BUSQUEDA == 'sqlite' else None
+
+        cola = ColaTareas(mongo.db)
+        trabajador = TrabajadorCola(cola, crear_manejadores(mongo, cola, elastic, sqlite).manejadores(),
+                                    hilos=COLA_TRABAJADOR_HILOS)
+        threading.Thread(target=trabajador.ejecutar, name='trabajador-cola-app', daemon=True).start()
+        _trabajador_cola = trabajador
+        logger.info(f"Trabajador de la cola {trabajador.identificador} iniciado ({COLA_TRABAJADOR_HILOS} hilos)")
+
+def _iniciar_trabajador_al_arrancar():
+    try:
+        iniciar_trabajador_cola()
+    except Exception as e:
+        logger.warning(f"No se pudo iniciar el trabajador de la cola ({e}); se reintentará con la próxima carga")
+
+# Con el calentamiento, el trabajador arranca con el proceso: las tareas encoladas por otro worker,
+# por las cargas anteriores a un reinicio o por los scripts no esperan a que llegue una carga nueva.
+# Sin él (gunicorn --preload), arranca con la primera carga que reciba el proceso.
+if CALENTAR_SERVICIOS and COLA_TRABAJADOR_EN_APP:
+    threading.Thread(target=_iniciar_trabajador_al_arrancar, name='inicio-trabajador-cola', daemon=True).start()
+
+@app.route('/api/cargas', methods=['POST'])
+@login_required
+def api_crear_carga():
+    """
+    Recibe archivos multipart/form-data leyendo el cuerpo por bloques (sin
+    request.files): cada archivo va directo al almacén y su extracción e
+    indexación quedan en la cola de tareas.
+    """
+    from helpers.carga_archivos import ErrorCarga, ReceptorCarga
+    from helpers.cola_tareas import ColaTareas
+    try:
+        receptor = ReceptorCarga(mongo_db, almacen_archivos, ColaTareas(mongo_db.db), session.get('username', ''))
+        carga = receptor.recibir(request.stream, request.headers.get('Content-Type', ''))
+        logger.info(f"Carga {carga['id']} de '{session.get('username')}': {carga['documentos']} documentos, "
+                    f"{carga['zips']} ZIP, {carga['rechazados']} rechazados")
+        iniciar_trabajador_cola()
+        return jsonify(carga), 201
+    except ErrorCarga as e:
+        return jsonify({
+            'error': str(e),
+            'mensaje': 'Carga inválida'
+        }), 400
+    except Exception as e:
+        logger.error(f"Error al recibir la carga: {e}")
+        return jsonify({
+            'error': str(e),
+            'mensaje': 'Error al recibir los archivos'
+        }), 500
+
+@app.route('/api/cargas/<carga_id>', methods=['GET'])
+@login_required
+def api_estado_carga(carga_id):
+    """
+    Progreso de una carga (consulta periódica); ?detalle=1 incluye cada
+    archivo recibido. Sin streaming: una conexión abierta ocuparía un
+    worker síncrono de gunicorn mientras dura la carga.
+    """
+    from helpers.carga_archivos import estado_carga
+    carga = estado_carga(mongo_db.db, carga_id, detalle=request.args.get('detalle') == '1',
+                         coleccion=MONGO_COLLECTION)
+    if carga is None:
+        return jsonify({'error': 'Carga no encontrada', 'id': carga_id}), 404
+    return jsonify(carga)
 
 # --- Sistema de Búsqueda de Documentos ---
 
@@ -212,6 +432,58 @@ def documentos():
                          estadisticas=estadisticas,
                          documentos_recientes=docs_recientes)
 
+def orden_mongo(orden: str) -> list:
+    """Traduce la opción de ordenamiento de la API al sort de MongoDB"""
+    if orden == 'fecha_asc':
+        return [('fecha_descarga', 1)]
+    elif orden == 'titulo':
+        return [('titulo', 1)]
+    # fecha_desc y relevancia: fecha descendente
+    return [('fecha_descarga', -1)]
+
+def limite_conteo(conteo: str):
+    """Modo de conteo de la API: 'aproximado' (por defecto, total acotado) o 'exacto'"""
+    return None if conteo == 'exacto' else LIMITE_CONTEO_TOTAL
+
+def ejecutar_busqueda(query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str,
+                      conteo: str = 'aproximado') -> dict:
+    """Búsqueda con el motor configurado (ElasticSearch o SQLite) y MongoDB como fallback (cuerpo de /api/buscar)"""
+    # Intentar búsqueda con el motor de texto primero
+    usar_motor = query != '' and MOTOR_BUSQUEDA != 'mongodb'  # Solo si hay query de texto
+    
+    if usar_motor:
+        try:
+            inicio = time.perf_counter()
+            resultados = motor_busqueda.buscar_documentos(query, categoria, tipo, pagina, por_pagina, orden,
+                                                          limite_conteo(conteo))
+            registrar_busqueda(MOTOR_BUSQUEDA, inicio)
+            resultados['motor'] = MOTOR_BUSQUEDA
+            return resultados
+        except Exception as es_error:
+            logger.warning(f"Error en {MOTOR_BUSQUEDA} (fallback a Mongo): {es_error}")
+            registrar_fallback(es_error)
+    
+    # Búsqueda con MongoDB (fallback o cuando no hay query)
+    from_doc = (pagina - 1) * por_pagina
+    inicio = time.perf_counter()
+    documentos, total, relacion = mongo_db.buscar_documentos_con_snippets(
+        query, categoria, tipo, from_doc, por_pagina, orden_mongo(orden), limite_conteo(conteo)
+    )
+    registrar_busqueda('mongodb', inicio)
+    
+    return {
+        'exito': True,
+        'documentos': documentos,
+        'total': total,
+        'total_relacion': relacion,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'total_paginas': math.ceil(total / por_pagina),
+        'query': query,
+        'motor': 'mongodb',
+        'busqueda_parcial': mongo_db.busqueda_parcial(query)
+    }
+
 # API REST para búsqueda de documentos
 @app.route('/api/buscar', methods=['POST'])
 def api_buscar_documentos():
@@ -225,49 +497,19 @@ def api_buscar_documentos():
         pagina = int(data.get('pagina', 1))
         por_pagina = int(data.get('por_pagina', 10))
         orden = data.get('orden', 'relevancia')  # relevancia, fecha_desc, fecha_asc, titulo
+        conteo = data.get('conteo', 'aproximado')  # aproximado, exacto
         
         # Validaciones
         por_pagina = min(max(por_pagina, 1), 100)  # Límite entre 1 y 100
         pagina = max(pagina, 1)
         
-        # Intentar búsqueda con ElasticSearch primero
-        usar_elasticsearch = query != ''  # Solo usar ES si hay query de texto
-        
-        if usar_elasticsearch:
-            try:
-                resultados = elastic_search.buscar_documentos(query, categoria, tipo, pagina, por_pagina, orden)
-                resultados['motor'] = 'elasticsearch'
-                return jsonify(resultados)
-            except Exception as es_error:
-                logger.warning(f"Error en ElasticSearch (fallback a Mongo): {es_error}")
-                pass
-        
-        # Búsqueda con MongoDB (fallback o cuando no hay query)
-        # Configurar ordenamiento para Mongo
-        if orden == 'fecha_desc':
-            sort_config = [('fecha_descarga', -1)]
-        elif orden == 'fecha_asc':
-            sort_config = [('fecha_descarga', 1)]
-        elif orden == 'titulo':
-            sort_config = [('titulo', 1)]
-        else:  # Por defecto, fecha descendente
-            sort_config = [('fecha_descarga', -1)]
-
-        from_doc = (pagina - 1) * por_pagina
-        documentos, total = mongo_db.buscar_documentos_con_snippets(query, categoria, tipo, from_doc, por_pagina, sort_config)
-        
-        total_paginas = math.ceil(total / por_pagina)
-        
-        resultados = {
-            'exito': True,
-            'documentos': documentos,
-            'total': total,
-            'pagina': pagina,
-            'por_pagina': por_pagina,
-            'total_paginas': total_paginas,
-            'query': query,
-            'motor': 'mongodb'
-        }
+        # Búsquedas idénticas concurrentes comparten una sola ejecución
+        parametros = [query, categoria, tipo, pagina, por_pagina, orden, conteo]
+        resultados = dict(coalescedor_busquedas.ejecutar(
+            clave_peticion('buscar', parametros),
+            lambda: ejecutar_busqueda(*parametros)
+        ))
+        resultados['took_ms'] = desglose_tiempos()
         return jsonify(resultados)
         
     except Exception as e:
@@ -282,24 +524,206 @@ def api_buscar_documentos():
 def api_documento_detalle(numero):
     """Obtener detalles completos de un documento específico"""
     try:
-        documento = mongo_db.obtener_documento_por_numero(numero)
-        
-        if not documento:
+        # Validadores con una consulta proyectada: si el cliente tiene la versión vigente no se lee el texto
+        validador = mongo_db.obtener_validador_documento(numero)
+
+        if not validador:
             return jsonify({
                 'error': 'Documento no encontrado',
                 'numero': numero
             }), 404
+
+        def generar():
+            documento = mongo_db.obtener_documento_por_numero(numero)
+            if not documento:
+                return jsonify({'error': 'Documento no encontrado', 'numero': numero}), 404
+            return jsonify({
+                'exito': True,
+                'documento': documento
+            })
+
+        etag, ultima_modificacion = cache_http.validadores_documento(validador)
+        return cache_http.responder_condicional(etag, ultima_modificacion, cache_http.POLITICA_DOCUMENTO,
+                                                generar, 'http_documento')
         
+    except Exception as e:
+        logger.error(f"Error al obtener el documento: {e}")
+        return jsonify({
+            'error': str(e),
+            'mensaje': 'Error al obtener el documento'
+        }), 500
+
+@app.route('/api/documento/<int:numero>/archivo', methods=['GET'])
+def api_documento_archivo(numero):
+    """Descarga el archivo original en streaming, con soporte de Range (206) para visores y reanudación"""
+    try:
+        clave = clave_documento(numero)
+        info = almacen_archivos.info(clave)
+        if info is None:
+            return jsonify({
+                'error': 'Archivo no disponible',
+                'numero': numero
+            }), 404
+
+        tamano = info['tamano']
+        etag = info.get('sha256') or f"{tamano}-{info.get('modificado')}"
+        if request.if_none_match.contains(etag):
+            respuesta = Response(status=304)
+            respuesta.set_etag(etag)
+            return respuesta
+
+        # Un solo rango; con If-Range solo si el archivo no cambió. Varios rangos: archivo completo
+        rango = request.range
+        if rango is not None and (len(rango.ranges) != 1 or
+                                  (request.headers.get('If-Range') and request.if_range.etag != etag)):
+            rango = None
+        limites = rango.range_for_length(tamano) if rango is not None else None
+        if rango is not None and limites is None:
+            respuesta = Response(status=416)
+            respuesta.headers['Content-Range'] = f'bytes */{tamano}'
+            return respuesta
+
+        inicio, fin = limites or (0, tamano)
+        respuesta = Response(almacen_archivos.leer_rango(clave, inicio, fin), status=206 if limites else 200,
+                             mimetype=info.get('tipo_contenido') or 'application/octet-stream',
+                             direct_passthrough=True)
+        respuesta.content_length = fin - inicio
+        if limites:
+            respuesta.headers['Content-Range'] = f'bytes {inicio}-{fin - 1}/{tamano}'
+        respuesta.headers['Accept-Ranges'] = 'bytes'
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'public, max-age=3600'
+        nombre = info.get('nombre') or f'documento_{numero}'
+        respuesta.headers['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(nombre)}"
+        return respuesta
+
+    except Exception as e:
+        logger.error(f"Error al servir el archivo del documento {numero}: {e}")
+        return jsonify({
+            'error': str(e),
+            'mensaje': 'Error al obtener el archivo'
+        }), 500
+
+# Campos de cada documento en la respuesta de /similares
+CAMPOS_SIMILARES = ['numero', 'titulo', 'tipo', 'metadatos', 'fecha_descarga', 'url_original']
+
+@app.route('/api/documento/<int:numero>/similares', methods=['GET'])
+def api_documentos_similares(numero):
+    """Documentos más parecidos a uno dado (similitud coseno sobre los embeddings)"""
+    try:
+        k = min(max(request.args.get('k', 10, type=int), 1), 50)
+
+        if not buscador_similares.disponible():
+            return jsonify({
+                'error': 'Índice de similitud no disponible',
+                'mensaje': 'Ejecuta scripts/construir_vectores.py para generarlo'
+            }), 503
+
+        vecinos = buscador_similares.similares(numero, k)
+        if vecinos is None:
+            return jsonify({
+                'error': 'Documento no indexado',
+                'numero': numero
+            }), 404
+
+        similitudes = dict(vecinos)
+        documentos = mongo_db.obtener_documentos_por_numeros(list(similitudes), CAMPOS_SIMILARES)
+        for documento in documentos:
+            documento['similitud'] = round(similitudes[documento['numero']], 4)
+
         return jsonify({
             'exito': True,
-            'documento': documento
+            'numero': numero,
+            'documentos': documentos,
+            'total': len(documentos)
         })
-        
+
     except Exception as e:
-        logger.error(f"Error al obtener el documento: {e}")
+        logger.error(f"Error al buscar documentos similares: {e}")
         return jsonify({
             'error': str(e),
-            'mensaje': 'Error al obtener el documento'
+            'mensaje': 'Error al buscar documentos similares'
+        }), 500
+
+# API: exportación en streaming de los resultados de búsqueda (NDJSON, CSV o Parquet)
+@app.route('/api/exportar', methods=['GET'])
+@login_required
+def api_exportar():
+    """Exporta los documentos que cumplen los filtros de /api/buscar sin cargarlos en memoria"""
+    formato = request.args.get('formato', 'ndjson').lower()
+    if formato not in exportacion.FORMATOS:
+        return jsonify({'error': f"Formato no soportado. Opciones: {', '.join(exportacion.FORMATOS)}"}), 400
+    if formato == 'parquet' and exportacion.pa is None:
+        return jsonify({'error': 'La exportación a Parquet no está disponible (falta pyarrow)'}), 400
+
+    try:
+        campos = exportacion.parsear_campos(request.args.get('campos'))
+    except ValueError:
+        campos = None
+    if campos is None or not all(PATRON_CAMPO.match(campo) for campo in campos):
+        return jsonify({'error': '"campos" debe ser una lista de nombres de campo'}), 400
+    if not campos and formato != 'ndjson':
+        campos = exportacion.CAMPOS_EXPORTACION
+
+    filtro = mongo_db.construir_filtro(request.args.get('query', '').strip(),
+                                       request.args.get('categoria', ''),
+                                       request.args.get('tipo', ''))
+    documentos = mongo_db.iterar_documentos(filtro, campos or None,
+                                            orden_mongo(request.args.get('orden', 'fecha_desc')),
+                                            limite=max(request.args.get('limite', 0, type=int), 0))
+
+    mimetype, extension = exportacion.FORMATOS[formato]
+    nombre = f"documentos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    logger.info(f"Exportación {formato} iniciada por '{session.get('username')}' (filtro: {filtro})")
+    return Response(stream_with_context(exportacion.exportar(documentos, formato, campos)),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{nombre}"'})
+
+# API: varios documentos en una sola consulta (prefetch del frontend, exportaciones)
+@app.route('/api/documentos/lote', methods=['POST'])
+def api_documentos_lote():
+    """Obtiene los documentos indicados en `numeros`, en el mismo orden, con los `campos` pedidos"""
+    try:
+        data = request.get_json() or {}
+        numeros = data.get('numeros')
+        campos = data.get('campos')
+        longitud_texto = data.get('longitud_texto')
+
+        # Validaciones
+        if not isinstance(numeros, list) or not numeros:
+            return jsonify({'error': 'Se requiere una lista no vacía en "numeros"'}), 400
+        if len(numeros) > LOTE_MAXIMO_DOCUMENTOS:
+            return jsonify({'error': f'Máximo {LOTE_MAXIMO_DOCUMENTOS} documentos por lote'}), 400
+        try:
+            numeros = [int(numero) for numero in numeros]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Los valores de "numeros" deben ser enteros'}), 400
+        if campos is not None and (not isinstance(campos, list) or
+                                   not all(isinstance(campo, str) and PATRON_CAMPO.match(campo) for campo in campos)):
+            return jsonify({'error': '"campos" debe ser una lista de nombres de campo'}), 400
+        if longitud_texto is not None:
+            if isinstance(longitud_texto, bool):
+                return jsonify({'error': '"longitud_texto" debe ser un entero'}), 400
+            try:
+                longitud_texto = max(int(longitud_texto), 1)
+            except (TypeError, ValueError, OverflowError):
+                return jsonify({'error': '"longitud_texto" debe ser un entero'}), 400
+
+        documentos = mongo_db.obtener_documentos_por_numeros(numeros, campos, longitud_texto)
+        encontrados = {doc['numero'] for doc in documentos}
+
+        return jsonify({
+            'exito': True,
+            'documentos': documentos,
+            'faltantes': [numero for numero in dict.fromkeys(numeros) if numero not in encontrados],
+            'total': len(documentos)
+        })
+
+    except Exception as e:
+        logger.error(f"Error al obtener lote de documentos: {e}")
+        return jsonify({
+            'error': str(e),
+            'mensaje': 'Error al obtener el lote de documentos'
         }), 500
 
 # API para obtener estadísticas
@@ -307,19 +731,28 @@ def api_documento_detalle(numero):
 def api_estadisticas():
     """Obtener estadísticas generales del sistema"""
     try:
-        stats = mongo_db.obtener_estadisticas_avanzadas()
-        
-        # Obtener total y tamaño para completar
-        basic_stats = mongo_db.obtener_estadisticas()
-        
-        return jsonify({
-            'exito': True,
-            'total_documentos': basic_stats['total_documentos'],
-            'tamano_total_gb': round(basic_stats['tamano_total'] / 1024, 2),
-            'categorias': stats.get('categorias', []),
-            'tipos': stats.get('tipos', []),
-            'años': stats.get('años', [])
-        })
+        def generar():
+            stats = mongo_db.obtener_estadisticas_avanzadas()
+
+            # Obtener total y tamaño para completar
+            basic_stats = mongo_db.obtener_estadisticas()
+
+            return jsonify({
+                'exito': True,
+                'total_documentos': basic_stats['total_documentos'],
+                'tamano_total_gb': round(basic_stats['tamano_total'] / 1024, 2),
+                'categorias': stats.get('categorias', []),
+                'tipos': stats.get('tipos', []),
+                'años': stats.get('años', [])
+            })
+
+        version = mongo_db.obtener_version_corpus()
+        if not version:
+            return generar()
+
+        etag, ultima_modificacion = cache_http.validadores_corpus(version, 'estadisticas')
+        return cache_http.responder_condicional(etag, ultima_modificacion, cache_http.POLITICA_ESTADISTICAS,
+                                                generar, 'http_estadisticas')
         
     except Exception as e:
         logger.error(f"Error al obtener estadísticas: {e}")
@@ -328,6 +761,27 @@ def api_estadisticas():
             'mensaje': 'Error al obtener estadísticas'
         }), 500 
 
+# Métricas en formato Prometheus (agregadas entre workers de gunicorn)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Exposición de métricas de latencia, fallbacks, cachés y retraso de la sincronización con ElasticSearch"""
+    try:
+        from helpers.sincronizacion import gauges_sincronizacion
+        gauges_externos = gauges_sincronizacion(mongo_db.db)
+    except Exception as e:
+        logger.warning(f"No se pudo leer el estado de la sincronización: {e}")
+        gauges_externos = []
+    return Response(metricas.registro.exportar_prometheus(gauges_externos),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# Readiness: 200 cuando los servicios requeridos están inicializados y responden.
+# Inicializa los pendientes y reintenta los fallidos (con espera exponencial), aunque no haya calentamiento
+@app.route('/healthz/ready', methods=['GET'])
+def healthz_ready():
+    """Estado de inicialización de los servicios del worker"""
+    estado = servicios.estado()
+    return jsonify(estado), 200 if estado['listo'] else 503
+
 # --- API de Gestión de Usuarios ---
 
 # Página de gestión de usuarios
@@ -630,6 +1084,50 @@ def api_estadisticas_usuarios():
 
 # --- API de Búsqueda Avanzada ---
 
+def ejecutar_busqueda_avanzada(query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str,
+                               conteo: str = 'aproximado') -> dict:
+    """Búsqueda con agregaciones y fallback a MongoDB (cuerpo de /api/buscar-avanzada)"""
+    # Intentar con el motor de texto primero
+    if MOTOR_BUSQUEDA != 'mongodb' and motor_busqueda.client and query:
+        try:
+            inicio = time.perf_counter()
+            resultados = motor_busqueda.buscar_con_agregaciones(
+                query, categoria, tipo, pagina, por_pagina, orden, limite_conteo(conteo)
+            )
+            registrar_busqueda(MOTOR_BUSQUEDA, inicio)
+            resultados['motor'] = MOTOR_BUSQUEDA
+            return resultados
+        except Exception as es_error:
+            logger.warning(f"Error en {MOTOR_BUSQUEDA} avanzado: {es_error}")
+            registrar_fallback(es_error)
+    
+    # Fallback a MongoDB
+    from_doc = (pagina - 1) * por_pagina
+    
+    inicio = time.perf_counter()
+    documentos, total, relacion = mongo_db.buscar_documentos_con_snippets(
+        query, categoria, tipo, from_doc, por_pagina, orden_mongo(orden), limite_conteo(conteo)
+    )
+    registrar_busqueda('mongodb', inicio)
+    
+    return {
+        'exito': True,
+        'documentos': documentos,
+        'total': total,
+        'total_relacion': relacion,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'total_paginas': math.ceil(total / por_pagina),
+        'query': query,
+        'motor': 'mongodb',
+        'busqueda_parcial': mongo_db.busqueda_parcial(query),
+        'agregaciones': {
+            'categorias': [],
+            'tipos': [],
+            'años': []
+        }
+    }
+
 # API: Búsqueda con agregaciones
 @app.route('/api/buscar-avanzada', methods=['GET'])
 def api_buscar_avanzada():
@@ -641,52 +1139,15 @@ def api_buscar_avanzada():
         pagina = int(request.args.get('pagina', 1))
         por_pagina = int(request.args.get('por_pagina', 10))
         orden = request.args.get('orden', 'relevancia')
+        conteo = request.args.get('conteo', 'aproximado')
         
-        # Intentar con Elasticsearch primero
-        if elastic_search.client and query:
-            try:
-                resultados = elastic_search.buscar_con_agregaciones(
-                    query, categoria, tipo, pagina, por_pagina, orden
-                )
-                resultados['motor'] = 'elasticsearch'
-                return jsonify(resultados)
-            except Exception as es_error:
-                logger.warning(f"Error en ElasticSearch avanzado: {es_error}")
-                pass
-        
-        # Fallback a MongoDB
-        from_doc = (pagina - 1) * por_pagina
-        
-        if orden == 'fecha_desc':
-            sort_config = [('fecha_descarga', -1)]
-        elif orden == 'fecha_asc':
-            sort_config = [('fecha_descarga', 1)]
-        elif orden == 'titulo':
-            sort_config = [('titulo', 1)]
-        else:
-            sort_config = [('fecha_descarga', -1)]
-        
-        documentos, total = mongo_db.buscar_documentos_con_snippets(
-            query, categoria, tipo, from_doc, por_pagina, sort_config
-        )
-        
-        total_paginas = math.ceil(total / por_pagina)
-        
-        return jsonify({
-            'exito': True,
-            'documentos': documentos,
-            'total': total,
-            'pagina': pagina,
-            'por_pagina': por_pagina,
-            'total_paginas': total_paginas,
-            'query': query,
-            'motor': 'mongodb',
-            'agregaciones': {
-                'categorias': [],
-                'tipos': [],
-                'años': []
-            }
-        })
+        parametros = [query, categoria, tipo, pagina, por_pagina, orden, conteo]
+        resultados = dict(coalescedor_busquedas.ejecutar(
+            clave_peticion('buscar-avanzada', parametros),
+            lambda: ejecutar_busqueda_avanzada(*parametros)
+        ))
+        resultados['took_ms'] = desglose_tiempos()
+        return jsonify(resultados)
         
     except Exception as e:
         logger.error(f"Error en búsqueda avanzada: {e}")
@@ -695,8 +1156,6 @@ def api_buscar_avanzada():
             'mensaje': 'Error en búsqueda avanzada'
         }), 500
 
-from helpers.llm_service import llm_service
-
 # ... (existing imports)
 
 # API: Sugerencias de autocompletado
@@ -705,6 +1164,26 @@ def api_sugerencias():
     # ... (existing code)
     pass # Placeholder to match context, actual replacement below
 
+def generar_resumen_documento(numero: int) -> tuple:
+    """Obtiene el documento y genera su resumen con IA. Retorna (respuesta, código HTTP)"""
+    doc = mongo_db.obtener_documento_por_numero(numero)
+    
+    if not doc:
+        return {'exito': False, 'mensaje': 'Documento no encontrado'}, 404
+        
+    texto = doc.get('texto_contenido', '')
+    
+    if not texto:
+        return {'exito': False, 'mensaje': 'El documento no tiene contenido de texto extraído'}, 400
+        
+    # Generar resumen
+    resumen = llm_service.generar_resumen(texto)
+    
+    return {
+        'exito': True,
+        'resumen': resumen
+    }, 200
+
 # API: Analizar documento con IA
 @app.route('/api/analizar-documento', methods=['POST'])
 def api_analizar_documento():
@@ -715,25 +1194,18 @@ def api_analizar_documento():
         
         if not doc_id:
             return jsonify({'exito': False, 'mensaje': 'ID de documento requerido'}), 400
-            
-        # Obtener documento de la BD
-        doc = mongo_db.obtener_documento_por_numero(int(doc_id))
         
-        if not doc:
-            return jsonify({'exito': False, 'mensaje': 'Documento no encontrado'}), 404
-            
-        texto = doc.get('texto_contenido', '')
-        
-        if not texto:
-            return jsonify({'exito': False, 'mensaje': 'El documento no tiene contenido de texto extraído'}), 400
-            
-        # Generar resumen
-        resumen = llm_service.generar_resumen(texto)
-        
-        return jsonify({
-            'exito': True,
-            'resumen': resumen
-        })
+        # Varios usuarios pidiendo el mismo resumen esperan una sola llamada a Gemini;
+        # los duplicados se resumen con su documento canónico (una llamada por grupo)
+        numero = int(doc_id)
+        canonico = mongo_db.obtener_canonico(numero)
+        respuesta, codigo = coalescedor_resumenes.ejecutar(
+            clave_peticion('resumen', {'numero': canonico}),
+            lambda: generar_resumen_documento(canonico)
+        )
+        if canonico != numero:
+            respuesta = {**respuesta, 'canonico': canonico}
+        return jsonify(respuesta), codigo
         
     except Exception as e:
         logger.error(f"Error en análisis de documento: {e}")
@@ -764,8 +1236,8 @@ def api_analizar_documento():
                 logger.warning(f"Error en sugerencias ES: {es_error}")
         
         # Fallback: buscar en MongoDB
-        documentos, _ = mongo_db.buscar_documentos_con_snippets(
-            query, '', '', 0, limit, [('fecha_descarga', -1)]
+        documentos, _, _ = mongo_db.buscar_documentos_con_snippets(
+            query, '', '', 0, limit, [('fecha_descarga', -1)], LIMITE_CONTEO_TOTAL
         )
         
         sugerencias = [doc.get('titulo', '') for doc in documentos if doc.get('titulo')]
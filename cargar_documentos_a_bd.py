@@ -9,13 +9,33 @@ tanto en MongoDB como en ElasticSearch para análisis Big Data
 """
 
 import os
+import glob
 import json
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 from helpers import Mongo_DB, ElasticSearch, Funciones
+from helpers.almacen_archivos import clave_documento, crear_almacen_archivos
+from helpers.almacen_textos import TEXTOS_SEPARADOS, separar_texto
+from helpers.cola_tareas import ColaTareas
+from helpers.elasticsearch import documento_para_indice
+from helpers.indices import INDICES_DOCUMENTOS, INDICES_TEXTOS, asegurar_indices
+from helpers.tareas_ingesta import EXTRAER_TEXTO, INDEXAR
+from helpers.text_utils import determinar_categoria, extraer_año
 
 load_dotenv()
 
+# JSON de metadatos generado por scraper_documentos_procuraduria.py (defecto: el más reciente en uploads/)
+METADATOS_SCRAPING = os.getenv('METADATOS_SCRAPING', '')
+
+
+def ultimo_metadatos_scraping(carpeta="uploads"):
+    """
+    Ruta del JSON de scraping más reciente (el nombre lleva la fecha y hora)
+    """
+    candidatos = sorted(glob.glob(os.path.join(carpeta, "procuraduria_documentos_masivos_*.json")))
+    return candidatos[-1] if candidatos else None
+
 class CargadorDocumentos:
     """
     Clase para cargar documentos a MongoDB y ElasticSearch
@@ -34,11 +54,19 @@ class CargadorDocumentos:
             os.getenv('ELASTIC_API_KEY')
         )
         
+        # Archivos originales compartidos (GridFS) para que ningún nodo tenga que volver a descargarlos
+        self.archivos = crear_almacen_archivos(self.mongo.db)
+
+        # Los documentos que fallan se reintentan desde la cola (python scripts/cola_tareas.py trabajar)
+        self.cola = ColaTareas(self.mongo.db)
+        self.tareas_fallidas = []
+
         self.funciones = Funciones()
         self.estadisticas = {
             "inicio": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "docs_mongodb": 0,
             "docs_elasticsearch": 0,
+            "tareas_encoladas": 0,
             "errores": []
         }
     
@@ -70,15 +98,20 @@ class CargadorDocumentos:
         
         return True
     
-    def leer_metadatos_scraping(self):
+    def leer_metadatos_scraping(self, archivo_json=None):
         """
-        Lee el archivo JSON con los metadatos del scraping
+        Lee el archivo JSON con los metadatos del scraping (por defecto
+        METADATOS_SCRAPING o el más reciente en uploads/)
         """
         print("\n" + "="*70)
         print("LEYENDO METADATOS DE SCRAPING")
         print("="*70)
         
-        archivo_json = "uploads/procuraduria_documentos_masivos_20251119_115532.json"
+        archivo_json = archivo_json or METADATOS_SCRAPING or ultimo_metadatos_scraping()
+        
+        if not archivo_json:
+            print("✗ No hay archivos procuraduria_documentos_masivos_*.json en uploads/")
+            return None
         
         if not os.path.exists(archivo_json):
             print(f"✗ Archivo no encontrado: {archivo_json}")
@@ -87,7 +120,7 @@ class CargadorDocumentos:
         with open(archivo_json, 'r', encoding='utf-8') as f:
             datos = json.load(f)
         
-        print(f"✓ Archivo leído correctamente")
+        print(f"✓ Archivo leído correctamente: {archivo_json}")
         print(f"✓ Documentos encontrados en JSON: {len(datos['documentos_descargados'])}")
         
         return datos
@@ -109,7 +142,26 @@ class CargadorDocumentos:
                     print(f"  ✓ Texto extraído: {len(texto_contenido)} caracteres")
             except Exception as e:
                 print(f"  ✗ Error extrayendo texto: {e}")
+                self.tareas_fallidas.append((EXTRAER_TEXTO, indice, f"Extracción: {e}"))
+        elif doc.get('url_original'):
+            # Sin copia local: la cola lo descarga y extrae después
+            self.tareas_fallidas.append((EXTRAER_TEXTO, indice, f"Archivo no encontrado: {ruta_archivo}"))
 
+        archivo = None
+        if archivo_existe:
+            try:
+                archivo = self.archivos.guardar_archivo(clave_documento(indice), ruta_archivo)
+            except Exception as e:
+                print(f"  ✗ Error guardando el archivo en el almacén: {e}")
+
+        return self.construir_documento(doc, indice, texto_contenido, archivo_existe, archivo)
+
+    def construir_documento(self, doc, indice, texto_contenido, archivo_existe, archivo=None):
+        """
+        Arma el documento de la base de datos a partir de los metadatos del
+        scraping, el texto extraído y la información del almacén de archivos
+        """
+        ruta_archivo = doc.get('ruta', '')
         documento = {
             "numero": indice,
             "titulo": doc.get('titulo', 'Sin título'),
@@ -125,12 +177,16 @@ class CargadorDocumentos:
             "fuente": "Procuraduría General de la Nación",
             "proyecto": "Big Data - Universidad Central",
             "estado": "disponible" if archivo_existe else "error",
+            "actualizado_en": datetime.now(),
             "metadatos": {
                 "extension": doc.get('tipo', 'PDF').lower(),
                 "categoria": self._determinar_categoria(doc.get('titulo', '')),
                 "año": self._extraer_año(doc.get('titulo', ''))
             }
         }
+
+        if archivo:
+            documento["archivo"] = archivo
         
         return documento
     
@@ -138,31 +194,47 @@ class CargadorDocumentos:
         """
         Determina la categoría del documento según su título
         """
-        titulo_lower = titulo.lower()
-        
-        if any(palabra in titulo_lower for palabra in ['manual', 'funciones', 'procedimiento']):
-            return "Manuales y Procedimientos"
-        elif any(palabra in titulo_lower for palabra in ['resolución', 'resolucion']):
-            return "Resoluciones"
-        elif any(palabra in titulo_lower for palabra in ['código', 'codigo', 'disciplinario']):
-            return "Códigos y Normatividad"
-        elif any(palabra in titulo_lower for palabra in ['informe', 'vigilancia', 'gestión']):
-            return "Informes de Gestión"
-        elif any(palabra in titulo_lower for palabra in ['procurando', 'boletín', 'boletin']):
-            return "Boletines y Publicaciones"
-        elif any(palabra in titulo_lower for palabra in ['guía', 'guia', 'cartilla', 'protocolo']):
-            return "Guías y Protocolos"
-        else:
-            return "Otros Documentos"
+        return determinar_categoria(titulo)
     
     def _extraer_año(self, titulo):
         """
         Extrae el año del título si existe
         """
-        import re
-        años = re.findall(r'20\d{2}', titulo)
-        return int(años[0]) if años else None
+        return extraer_año(titulo)
     
+    def deduplicar(self, documentos):
+        """
+        Detecta casi duplicados (MinHash + LSH) y los enlaza a su documento
+        canónico con `duplicado_de`. Todos se guardan en MongoDB, pero solo los
+        canónicos se indexan y se resumen. Retorna la lista de canónicos.
+        """
+        from helpers.deduplicacion import COLECCION_FIRMAS, Deduplicador, es_canonico, guardar_firmas
+
+        print("\n" + "="*70)
+        print("DETECTANDO DOCUMENTOS DUPLICADOS")
+        print("="*70)
+
+        inicio = time.perf_counter()
+        deduplicador = Deduplicador()
+        reporte = deduplicador.procesar(documentos)
+        reporte['segundos'] = round(time.perf_counter() - inicio, 2)
+        self.estadisticas["deduplicacion"] = reporte
+
+        try:
+            # La carga completa reemplaza la colección: las firmas también se reemplazan
+            firmas = self.mongo.db[COLECCION_FIRMAS]
+            firmas.delete_many({})
+            guardar_firmas(firmas, deduplicador)
+        except Exception as e:
+            print(f"⚠ No se pudieron guardar las firmas: {str(e)}")
+
+        print(f"✓ Canónicos: {reporte['canonicos']} | Duplicados: {reporte['duplicados']} "
+              f"({reporte['exactos']} exactos) | Sin texto: {reporte['sin_texto']}")
+        print(f"✓ Texto duplicado evitado en índices: {reporte['bytes_texto'] / 1024 / 1024:.1f} MB")
+        print(f"✓ Tiempo de detección: {reporte['segundos']}s")
+
+        return [doc for doc in documentos if es_canonico(doc)]
+
     def cargar_a_mongodb(self, documentos):
         """
         Carga los documentos a MongoDB
@@ -174,31 +246,41 @@ class CargadorDocumentos:
         try:
             # Limpiar colección existente (opcional)
             print("\n¿Limpiar colección existente? (Eliminando documentos previos)")
-            coleccion = self.mongo.db[self.mongo.collection]
+            coleccion = self.mongo.coll
             count_anterior = coleccion.count_documents({})
             
             if count_anterior > 0:
                 print(f"Eliminando {count_anterior} documentos existentes...")
                 coleccion.delete_many({})
+                self.mongo.textos.eliminar_todo()
             
             # Insertar documentos
             print(f"\nInsertando {len(documentos)} documentos...")
             
             if documentos:
+                # El texto completo va comprimido a '<colección>_textos'; la colección principal guarda un preview
+                if TEXTOS_SEPARADOS:
+                    separados = [separar_texto(doc) for doc in documentos]
+                    resumen = self.mongo.textos.guardar_muchos(
+                        (doc['numero'], texto) for doc, texto in separados if texto
+                    )
+                    print(f"✓ Textos comprimidos ({self.mongo.textos.codec}): "
+                          f"{resumen['bytes_original'] / 1024 / 1024:.1f} MB → "
+                          f"{resumen['bytes_comprimido'] / 1024 / 1024:.1f} MB")
+                    documentos = [doc for doc, _ in separados]
                 resultado = coleccion.insert_many(documentos)
                 self.estadisticas["docs_mongodb"] = len(resultado.inserted_ids)
                 
                 print(f"✓ {len(resultado.inserted_ids)} documentos insertados en MongoDB")
-                print(f"✓ Colección: {self.mongo.collection}")
+                self.mongo.incrementar_version_corpus()
+                print(f"✓ Colección: {self.mongo.collection_name}")
                 print(f"✓ Base de datos: {self.mongo.db_name}")
                 
                 # Crear índices para búsquedas rápidas
                 print("\nCreando índices...")
-                coleccion.create_index("titulo")
-                coleccion.create_index("tipo")
-                coleccion.create_index("metadatos.categoria")
-                coleccion.create_index("fecha_descarga")
-                print("✓ Índices creados")
+                creados = asegurar_indices(coleccion, INDICES_DOCUMENTOS)
+                creados += asegurar_indices(self.mongo.textos.coll, INDICES_TEXTOS)
+                print(f"✓ Índices asegurados ({len(creados)} nuevos)")
                 
                 return True
             else:
@@ -210,123 +292,128 @@ class CargadorDocumentos:
             self.estadisticas["errores"].append(f"MongoDB: {str(e)}")
             return False
     
+    def _limpiar_documento_es(self, doc):
+        """
+        Crea una copia del documento sin problemas de serialización para ElasticSearch
+        """
+        return documento_para_indice(doc)
+
     def cargar_a_elasticsearch(self, documentos):
         """
-        Indexa los documentos en ElasticSearch
+        Indexa los documentos en ElasticSearch.
+
+        La carga se hace sobre un índice versionado nuevo (sin réplicas y sin
+        refresco durante la carga). Solo al terminar se calienta y se cambia el
+        alias de forma atómica, así las búsquedas en curso no se degradan.
         """
         print("\n" + "="*70)
         print("INDEXANDO DOCUMENTOS EN ELASTICSEARCH")
         print("="*70)
         
-        index_name = "procuraduria_documentos"
-        
         try:
-            # Verificar si el índice existe, si no, crearlo
-            if not self.elastic.client.indices.exists(index=index_name):
-                print(f"\nCreando índice '{index_name}'...")
-                
-                # Configuración del índice con mappings
-                mapping = {
-                    "mappings": {
-                        "properties": {
-                            "numero": {"type": "integer"},
-                            "titulo": {"type": "text", "analyzer": "spanish"},
-                            "texto_contenido": {"type": "text", "analyzer": "spanish"},  # Nuevo campo
-                            "tipo": {"type": "keyword"},
-                            "url_original": {"type": "keyword"},
-                            "archivo_local": {"type": "keyword"},
-                            "tamano_bytes": {"type": "long"},
-                            "tamano_mb": {"type": "float"},
-                            "fecha_descarga": {"type": "date", "format": "yyyy-MM-dd HH:mm:ss"},
-                            "fuente": {"type": "text"},
-                            "estado": {"type": "keyword"},
-                            "metadatos": {
-                                "properties": {
-                                    "categoria": {"type": "keyword"},
-                                    "año": {"type": "integer"},
-                                    "extension": {"type": "keyword"}
-                                }
-                            }
-                        }
-                    },
-                    "settings": {
-                        "number_of_shards": 1,
-                        "number_of_replicas": 1
-                    }
-                }
-                
-                self.elastic.client.indices.create(index=index_name, body=mapping)
-                print(f"✓ Índice '{index_name}' creado")
-            else:
-                print(f"✓ Índice '{index_name}' ya existe")
-            
-            # Indexar documentos
-            print(f"\nIndexando {len(documentos)} documentos...")
+            print(f"\nIndexando {len(documentos)} documentos en un índice nuevo...")
             
-            exitosos = 0
-            errores = 0
+            resultado = self.elastic.reindexar_completo(
+                self._limpiar_documento_es(doc) for doc in documentos
+            )
             
-            for i, doc in enumerate(documentos, 1):
-                try:
-                    # Agregar ID único
-                    doc_id = f"doc_{doc['numero']}"
-                    
-                    # Crear copia del documento sin problemas de serialización
-                    doc_limpio = {
-                        "numero": int(doc['numero']),
-                        "titulo": str(doc['titulo']),
-                        "texto_contenido": str(doc.get('texto_contenido', '')),  # Nuevo campo
-                        "tipo": str(doc['tipo']),
-                        "url_original": str(doc['url_original']),
-                        "archivo_local": str(doc['archivo_local']),
-                        "ruta_completa": str(doc['ruta_completa']),
-                        "tamano_bytes": int(doc['tamano_bytes']),
-                        "tamano_mb": float(doc['tamano_bytes']) / 1024.0 / 1024.0,
-                        "archivo_existe": bool(doc['archivo_existe']),
-                        "fecha_descarga": str(doc['fecha_descarga']),
-                        "fuente": str(doc['fuente']),
-                        "proyecto": str(doc['proyecto']),
-                        "estado": str(doc['estado']),
-                        "metadatos": {
-                            "extension": str(doc['metadatos']['extension']),
-                            "categoria": str(doc['metadatos']['categoria']),
-                            "año": int(doc['metadatos']['año']) if doc['metadatos']['año'] else None
-                        }
-                    }
-                    
-                    self.elastic.client.index(
-                        index=index_name,
-                        id=doc_id,
-                        document=doc_limpio
-                    )
-                    
-                    exitosos += 1
-                    
-                    if i % 10 == 0:
-                        print(f"  Progreso: {i}/{len(documentos)} documentos indexados")
-                    
-                except Exception as e:
-                    errores += 1
-                    print(f"  ✗ Error en documento {i}: {str(e)}")
-            
-            self.estadisticas["docs_elasticsearch"] = exitosos
+            self.estadisticas["docs_elasticsearch"] = resultado["exitosos"]
+            for numero in resultado["fallidos"]:
+                self.tareas_fallidas.append((INDEXAR, numero, "Rechazado en la indexación masiva"))
             
             print(f"\n✓ Indexación completada")
-            print(f"  - Exitosos: {exitosos}")
-            print(f"  - Errores: {errores}")
-            print(f"  - Índice: {index_name}")
-            
-            # Refrescar índice para que los documentos sean buscables inmediatamente
-            self.elastic.client.indices.refresh(index=index_name)
-            print("✓ Índice actualizado y listo para búsquedas")
+            print(f"  - Exitosos: {resultado['exitosos']}")
+            print(f"  - Errores: {resultado['errores']}")
+            print(f"  - Índice: {resultado['indice']}")
+            print(f"✓ Alias '{resultado['alias']}' actualizado y listo para búsquedas")
+            if resultado["eliminados"]:
+                print(f"✓ Versiones antiguas eliminadas: {', '.join(resultado['eliminados'])}")
             
             return True
             
         except Exception as e:
             print(f"✗ Error al indexar en ElasticSearch: {str(e)}")
             self.estadisticas["errores"].append(f"ElasticSearch: {str(e)}")
+            # El alias sigue en la versión anterior: la cola indexa estos documentos sobre ella
+            self.tareas_fallidas.extend((INDEXAR, doc['numero'], f"ElasticSearch: {e}") for doc in documentos)
             return False
     
+    def cargar_a_sqlite(self, documentos):
+        """
+        Actualiza el índice SQLite FTS5 (MOTOR_BUSQUEDA=sqlite). Es incremental:
+        solo reescribe los documentos cuyo contenido cambió.
+        """
+        from helpers.sqlite_search import SQLITE_SEARCH_PATH, SQLiteSearch
+
+        print("\n" + "="*70)
+        print("INDEXANDO EN SQLITE FTS5")
+        print("="*70)
+
+        try:
+            indice = SQLiteSearch(SQLITE_SEARCH_PATH)
+            resumen = indice.indexar_documentos(documentos)
+            indice.optimizar()
+            self.estadisticas["docs_sqlite"] = resumen['nuevos'] + resumen['actualizados']
+
+            print(f"✓ Índice: {SQLITE_SEARCH_PATH}")
+            print(f"✓ Nuevos: {resumen['nuevos']} | Actualizados: {resumen['actualizados']} | "
+                  f"Sin cambios: {resumen['sin_cambios']}")
+            return True
+
+        except Exception as e:
+            print(f"✗ Error al indexar en SQLite: {str(e)}")
+            self.estadisticas["errores"].append(f"SQLite: {str(e)}")
+            return False
+
+    def cargar_a_vectores(self, documentos):
+        """
+        Calcula los embeddings de los documentos cargados para la búsqueda de
+        similares. Reutiliza el codificador existente; si aún no hay almacén,
+        lo ajusta con una muestra de toda la colección.
+        """
+        from helpers.deduplicacion import FILTRO_CANONICOS
+        from helpers.vectores import VECTORES_DIR, AlmacenVectores, indexar_documentos
+
+        print("\n" + "="*70)
+        print("CALCULANDO EMBEDDINGS")
+        print("="*70)
+
+        try:
+            corpus = None
+            if not AlmacenVectores().existe():
+                corpus = self.mongo.muestra_documentos(5000, FILTRO_CANONICOS, ['titulo', 'texto_contenido'])
+            resumen = indexar_documentos(documentos, corpus=corpus)
+            self.estadisticas["docs_vectores"] = resumen['documentos']
+
+            print(f"✓ Almacén: {VECTORES_DIR}")
+            print(f"✓ Documentos: {resumen['documentos']} | Dimensiones: {resumen.get('dimensiones', 0)}"
+                  f"{' | Codificador ajustado (' + resumen['codificador'] + ')' if resumen['reajustado'] else ''}")
+            return True
+
+        except Exception as e:
+            print(f"✗ Error al calcular embeddings: {str(e)}")
+            self.estadisticas["errores"].append(f"Vectores: {str(e)}")
+            return False
+
+    def encolar_fallidos(self):
+        """
+        Pasa a la cola persistente los documentos cuya extracción o
+        indexación falló, con el error original como primer registro
+        """
+        if not self.tareas_fallidas:
+            return 0
+        try:
+            self.cola.asegurar_indices()
+            encoladas = sum(self.cola.encolar(tipo, numero, error=error)
+                            for tipo, numero, error in self.tareas_fallidas)
+        except Exception as e:
+            print(f"⚠ No se pudieron encolar los fallos: {str(e)}")
+            self.estadisticas["errores"].append(f"Cola de tareas: {str(e)}")
+            return 0
+        self.estadisticas["tareas_encoladas"] = encoladas
+        self.tareas_fallidas = []
+        return encoladas
+
     def generar_reporte_carga(self):
         """
         Genera un reporte del proceso de carga
@@ -346,7 +433,20 @@ class CargadorDocumentos:
         print(f"  Colección: documentos_procuraduria")
         print(f"\n🔍 ELASTICSEARCH:")
         print(f"  Documentos indexados: {self.estadisticas['docs_elasticsearch']}")
-        print(f"  Índice: procuraduria_documentos")
+        print(f"  Alias: {self.elastic.alias}")
+
+        dedup = self.estadisticas.get("deduplicacion")
+        if dedup:
+            print(f"\n🧬 DEDUPLICACIÓN:")
+            print(f"  Duplicados enlazados: {dedup['duplicados']} de {dedup['documentos']}")
+            print(f"  Texto no indexado: {dedup['bytes_texto'] / 1024 / 1024:.1f} MB")
+            print(f"  Archivos duplicados: {dedup['bytes_archivos'] / 1024 / 1024:.1f} MB")
+            print(f"  Indexación evitada (estimada): {dedup.get('segundos_indexacion_evitados', 0)}s")
+        
+        if self.estadisticas["tareas_encoladas"]:
+            print(f"\n🔁 COLA DE TAREAS:")
+            print(f"  Documentos encolados para reintento: {self.estadisticas['tareas_encoladas']}")
+            print(f"  Ejecutar: python scripts/cola_tareas.py trabajar --hasta-vaciar")
         
         if self.estadisticas["errores"]:
             print(f"\n⚠ ERRORES ({len(self.estadisticas['errores'])}):")
@@ -409,14 +509,38 @@ class CargadorDocumentos:
         for cat, cant in sorted(categorias.items(), key=lambda x: x[1], reverse=True):
             print(f"  {cat}: {cant}")
         
-        # 4. Cargar a MongoDB
-        if not self.cargar_a_mongodb(documentos):
+        # 3b. Detectar duplicados: solo los canónicos pasan a los índices
+        canonicos = self.deduplicar(documentos)
+
+        # 4. Cargar a MongoDB (todos, con el enlace duplicado_de)
+        cargado_mongodb = self.cargar_a_mongodb(documentos)
+        if not cargado_mongodb:
             print("\n⚠ Error al cargar a MongoDB, pero continuando...")
         
+        inicio_indexacion = time.perf_counter()
+
         # 5. Indexar en ElasticSearch
-        if not self.cargar_a_elasticsearch(documentos):
+        if not self.cargar_a_elasticsearch(canonicos):
             print("\n⚠ Error al indexar en ElasticSearch, pero continuando...")
         
+        # 5b. Índice local SQLite FTS5 si es el motor configurado
+        if os.getenv('MOTOR_BUSQUEDA', 'elasticsearch').lower() == 'sqlite':
+            if not self.cargar_a_sqlite(canonicos):
+                print("\n⚠ Error al indexar en SQLite, pero continuando...")
+
+        # 5c. Embeddings para documentos similares
+        if not self.cargar_a_vectores(canonicos):
+            print("\n⚠ Error al calcular embeddings, pero continuando...")
+
+        # Tiempo que habrían costado los duplicados al ritmo medido por documento
+        duracion = time.perf_counter() - inicio_indexacion
+        dedup = self.estadisticas["deduplicacion"]
+        dedup["segundos_indexacion_evitados"] = round(duracion / max(len(canonicos), 1) * dedup["duplicados"], 1)
+
+        # 5d. Documentos fallidos a la cola persistente (las tareas leen el documento de MongoDB)
+        if cargado_mongodb:
+            self.encolar_fallidos()
+        
         # 6. Generar reporte
         self.generar_reporte_carga()
         
@@ -1,10 +1,27 @@
 # Contenido de helpers/__init__.py
 
-# Importación de clases desde los archivos Python correspondientes en el mismo directorio (helpers)
-from .mongo_db import Mongo_DB 
-from .funciones import Funciones 
-from .elasticsearch import ElasticSearch
-from .web_scraper import WebScraper
+# Las clases se importan al primer acceso (PEP 562): `from helpers import Mongo_DB`
+# ya no arrastra elasticsearch, requests ni bs4 si no se usan.
+import importlib
+
+_MODULOS = {
+    'Mongo_DB': '.mongo_db',
+    'Funciones': '.funciones',
+    'ElasticSearch': '.elasticsearch',
+    'WebScraper': '.web_scraper',
+}
 
 # Definición de las clases que se deben instanciar al importar helpers
-__all__ = ['Mongo_DB', 'Funciones', 'ElasticSearch', 'WebScraper'] 
+__all__ = ['Mongo_DB', 'Funciones', 'ElasticSearch', 'WebScraper']
+
+
+def __getattr__(nombre):
+    if nombre in _MODULOS:
+        valor = getattr(importlib.import_module(_MODULOS[nombre], __name__), nombre)
+        globals()[nombre] = valor
+        return valor
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -0,0 +1,261 @@
+# helpers/almacen_archivos.py
+# Almacén de los archivos originales (PDF, DOCX): GridFS compartido o disco local, con escritura y lectura por bloques
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 'gridfs' (defecto: compartido por todos los workers y nodos) o 'local'
+ALMACEN_ARCHIVOS = os.getenv('ALMACEN_ARCHIVOS', 'gridfs').lower()
+ARCHIVOS_DIR = os.getenv('ARCHIVOS_DIR', os.path.join('uploads', 'documentos_procuraduria'))
+BUCKET_ARCHIVOS = 'archivos'
+
+TAMANO_BLOQUE = 256 * 1024
+
+TIPOS_CONTENIDO = {
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.doc': 'application/msword',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.zip': 'application/zip',
+    '.txt': 'text/plain; charset=utf-8',
+}
+
+
+def tipo_contenido(nombre: str) -> str:
+    return TIPOS_CONTENIDO.get(os.path.splitext(nombre or '')[1].lower(), 'application/octet-stream')
+
+
+def clave_documento(numero: int) -> str:
+    """Clave del archivo original de un documento."""
+    return f'documento-{numero}'
+
+
+class AlmacenArchivos:
+    """
+    Interfaz común de los backends. Un archivo se identifica por su `clave`
+    y tiene metadatos {clave, nombre, tamano, sha256, tipo_contenido} más
+    `origen` ({url, etag, last_modified}) si se descargó.
+    """
+    backend = 'base'
+
+    def guardar_stream(self, clave: str, fragmentos: Iterable[bytes], nombre: str = '',
+                       tipo: Optional[str] = None, origen: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def info(self, clave: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def abrir(self, clave: str) -> BinaryIO:
+        """Archivo de solo lectura con seek()."""
+        raise NotImplementedError
+
+    def eliminar(self, clave: str) -> bool:
+        raise NotImplementedError
+
+    def existe(self, clave: str) -> bool:
+        return self.info(clave) is not None
+
+    def guardar_archivo(self, clave: str, ruta: str, nombre: Optional[str] = None) -> Dict[str, Any]:
+        """Copia un archivo local al almacén por bloques."""
+        with open(ruta, 'rb') as f:
+            return self.guardar_stream(clave, iter(lambda: f.read(TAMANO_BLOQUE), b''),
+                                       nombre or os.path.basename(ruta))
+
+    def leer_rango(self, clave: str, inicio: int = 0, fin: Optional[int] = None,
+                   tamano_bloque: int = TAMANO_BLOQUE) -> Iterator[bytes]:
+        """Bytes [inicio, fin) en bloques, sin cargar el archivo completo."""
+        with self.abrir(clave) as f:
+            f.seek(inicio)
+            restante = None if fin is None else fin - inicio
+            while restante is None or restante > 0:
+                bloque = f.read(tamano_bloque if restante is None else min(tamano_bloque, restante))
+                if not bloque:
+                    break
+                if restante is not None:
+                    restante -= len(bloque)
+                yield bloque
+
+    @contextmanager
+    def copia_local(self, clave: str) -> Iterator[str]:
+        """
+        Ruta de un archivo local con el contenido (para extractores que
+        necesitan una ruta). En GridFS es un temporal que se borra al salir.
+        """
+        info = self.info(clave)
+        if info is None:
+            raise FileNotFoundError(clave)
+        sufijo = os.path.splitext(info.get('nombre') or '')[1]
+        descriptor, ruta = tempfile.mkstemp(suffix=sufijo)
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                for bloque in self.leer_rango(clave):
+                    destino.write(bloque)
+            yield ruta
+        finally:
+            os.remove(ruta)
+
+
+class _Escritura:
+    """Acumula tamaño y SHA-256 mientras los bloques pasan hacia el backend."""
+
+    def __init__(self, fragmentos: Iterable[bytes]):
+        self.fragmentos = fragmentos
+        self.tamano = 0
+        self.hash = hashlib.sha256()
+
+    def __iter__(self) -> Iterator[bytes]:
+        for bloque in self.fragmentos:
+            if bloque:
+                self.tamano += len(bloque)
+                self.hash.update(bloque)
+                yield bloque
+
+
+class AlmacenGridFS(AlmacenArchivos):
+    """Archivos en GridFS (bucket 'archivos'): compartidos por todos los nodos que usan la misma base."""
+    backend = 'gridfs'
+
+    def __init__(self, db, bucket: str = BUCKET_ARCHIVOS, tamano_chunk: int = 1024 * 1024):
+        import gridfs
+        self.db = db
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket, chunk_size_bytes=tamano_chunk)
+        self.archivos = db[f'{bucket}.files']
+
+    def _ultimo(self, clave: str) -> Optional[Dict[str, Any]]:
+        return self.archivos.find_one({'filename': clave}, sort=[('uploadDate', -1)])
+
+    def guardar_stream(self, clave: str, fragmentos: Iterable[bytes], nombre: str = '',
+                       tipo: Optional[str] = None, origen: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        escritura = _Escritura(fragmentos)
+        tipo = tipo or tipo_contenido(nombre)
+        metadatos = {'nombre': nombre, 'tipo_contenido': tipo}
+        if origen:
+            metadatos['origen'] = origen
+        with self.bucket.open_upload_stream(clave, metadata=metadatos) as destino:
+            # GridIn agrupa los bloques en chunks de `tamano_chunk`
+            try:
+                for bloque in escritura:
+                    destino.write(bloque)
+            except BaseException:
+                # Fuente cortada o rechazada (p. ej. límite de tamaño): sin chunks huérfanos
+                destino.abort()
+                raise
+            identificador = destino._id
+        self.archivos.update_one({'_id': identificador}, {'$set': {'metadata.sha256': escritura.hash.hexdigest()}})
+        # Solo queda la versión nueva; se escribe primero para no dejar la clave sin archivo
+        for anterior in self.archivos.find({'filename': clave, '_id': {'$ne': identificador}}, {'_id': 1}):
+            self.bucket.delete(anterior['_id'])
+        info = {'clave': clave, 'nombre': nombre, 'tamano': escritura.tamano,
+                'sha256': escritura.hash.hexdigest(), 'tipo_contenido': tipo, 'almacen': self.backend}
+        if origen:
+            info['origen'] = origen
+        return info
+
+    def info(self, clave: str) -> Optional[Dict[str, Any]]:
+        archivo = self._ultimo(clave)
+        if archivo is None:
+            return None
+        metadatos = archivo.get('metadata') or {}
+        info = {'clave': clave, 'nombre': metadatos.get('nombre', ''), 'tamano': archivo['length'],
+                'sha256': metadatos.get('sha256'), 'tipo_contenido': metadatos.get('tipo_contenido'),
+                'modificado': archivo.get('uploadDate'), 'almacen': self.backend}
+        if metadatos.get('origen'):
+            info['origen'] = metadatos['origen']
+        return info
+
+    def abrir(self, clave: str) -> BinaryIO:
+        archivo = self._ultimo(clave)
+        if archivo is None:
+            raise FileNotFoundError(clave)
+        return self.bucket.open_download_stream(archivo['_id'])
+
+    def eliminar(self, clave: str) -> bool:
+        ids = [archivo['_id'] for archivo in self.archivos.find({'filename': clave}, {'_id': 1})]
+        for identificador in ids:
+            self.bucket.delete(identificador)
+        return bool(ids)
+
+
+class AlmacenLocal(AlmacenArchivos):
+    """Archivos en disco (`ARCHIVOS_DIR`) con metadatos en un `.json` al lado. Solo sirve a un nodo."""
+    backend = 'local'
+
+    def __init__(self, directorio: str = ARCHIVOS_DIR):
+        self.directorio = directorio
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, re.sub(r'[^\w.-]', '_', clave))
+
+    def guardar_stream(self, clave: str, fragmentos: Iterable[bytes], nombre: str = '',
+                       tipo: Optional[str] = None, origen: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        os.makedirs(self.directorio, exist_ok=True)
+        escritura = _Escritura(fragmentos)
+        ruta = self._ruta(clave)
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, prefix='.parcial-')
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                for bloque in escritura:
+                    destino.write(bloque)
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.remove(temporal)
+            raise
+        info = {'clave': clave, 'nombre': nombre, 'tamano': escritura.tamano,
+                'sha256': escritura.hash.hexdigest(), 'tipo_contenido': tipo or tipo_contenido(nombre),
+                'almacen': self.backend}
+        if origen:
+            info['origen'] = origen
+        with open(f'{ruta}.json', 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False)
+        return info
+
+    def info(self, clave: str) -> Optional[Dict[str, Any]]:
+        ruta = self._ruta(clave)
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with open(f'{ruta}.json', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            info = {'clave': clave, 'nombre': os.path.basename(ruta), 'tipo_contenido': tipo_contenido(ruta),
+                    'almacen': self.backend}
+        info['tamano'] = os.path.getsize(ruta)
+        return info
+
+    def abrir(self, clave: str) -> BinaryIO:
+        return open(self._ruta(clave), 'rb')
+
+    def eliminar(self, clave: str) -> bool:
+        ruta = self._ruta(clave)
+        existia = os.path.exists(ruta)
+        for archivo in (ruta, f'{ruta}.json'):
+            if os.path.exists(archivo):
+                os.remove(archivo)
+        return existia
+
+    @contextmanager
+    def copia_local(self, clave: str) -> Iterator[str]:
+        ruta = self._ruta(clave)
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(clave)
+        yield ruta
+
+
+def crear_almacen_archivos(db=None, backend: str = ALMACEN_ARCHIVOS) -> AlmacenArchivos:
+    """Backend configurado en ALMACEN_ARCHIVOS ('gridfs' requiere la base de datos)."""
+    if backend == 'gridfs':
+        if db is None:
+            raise ValueError("El almacén GridFS requiere una conexión a MongoDB")
+        return AlmacenGridFS(db)
+    if backend == 'local':
+        return AlmacenLocal()
+    raise ValueError(f"Almacén de archivos no soportado: {backend}")
@@ -0,0 +1,159 @@
+# helpers/almacen_textos.py
+# Almacén del texto completo de los documentos: comprimido (zstd/zlib) y fuera de la colección principal
+import logging
+import os
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import Binary
+from pymongo import ReplaceOne
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Con true (defecto) las cargas guardan el texto en '<colección>_textos'; los documentos en línea se siguen leyendo
+TEXTOS_SEPARADOS = os.getenv('TEXTOS_SEPARADOS', 'true').lower() == 'true'
+TEXTO_PREVIEW_CARACTERES = int(os.getenv('TEXTO_PREVIEW_CARACTERES', '1000'))
+CODEC_TEXTOS = os.getenv('CODEC_TEXTOS', 'zstd' if zstandard else 'zlib')
+
+# Por encima de este tamaño comprimido el texto va a GridFS (límite de 16 MB por documento BSON)
+LIMITE_EN_LINEA = 15 * 1024 * 1024
+
+
+def comprimir(texto: str, codec: str = CODEC_TEXTOS) -> bytes:
+    datos = texto.encode('utf-8')
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("El codec zstd requiere el paquete zstandard (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=10).compress(datos)
+    if codec == 'zlib':
+        return zlib.compress(datos, 6)
+    raise ValueError(f"Codec no soportado: {codec}")
+
+
+def descomprimir(datos: bytes, codec: str) -> str:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("El texto está comprimido con zstd: instala zstandard (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(datos).decode('utf-8')
+    if codec == 'zlib':
+        return zlib.decompress(datos).decode('utf-8')
+    raise ValueError(f"Codec no soportado: {codec}")
+
+
+def campos_cuerpo(texto: str) -> Dict[str, Any]:
+    """Campos que quedan en la colección principal en lugar del texto completo."""
+    return {
+        'texto_preview': texto[:TEXTO_PREVIEW_CARACTERES],
+        'texto_longitud': len(texto),
+        'texto_externo': True
+    }
+
+
+class AlmacenTextos:
+    """
+    Un registro por documento en '<colección>_textos' con el texto
+    comprimido: {numero, codec, datos | gridfs_id, bytes_original, bytes_comprimido}.
+    """
+
+    def __init__(self, db, coleccion_documentos: str = 'documentos', codec: str = CODEC_TEXTOS):
+        self.db = db
+        self.coll = db[f'{coleccion_documentos}_textos']
+        self.codec = codec
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            import gridfs
+            self._bucket = gridfs.GridFSBucket(self.db, bucket_name=self.coll.name)
+        return self._bucket
+
+    def _registro(self, numero: int, texto: str) -> Dict[str, Any]:
+        datos = comprimir(texto, self.codec)
+        registro = {'numero': numero, 'codec': self.codec,
+                    'bytes_original': len(texto.encode('utf-8')), 'bytes_comprimido': len(datos)}
+        if len(datos) > LIMITE_EN_LINEA:
+            registro['gridfs_id'] = self.bucket.upload_from_stream(f'{numero}.{self.codec}', datos)
+        else:
+            registro['datos'] = Binary(datos)
+        return registro
+
+    def _texto(self, registro: Dict[str, Any]) -> str:
+        if 'gridfs_id' in registro:
+            datos = self.bucket.open_download_stream(registro['gridfs_id']).read()
+        else:
+            datos = bytes(registro['datos'])
+        return descomprimir(datos, registro['codec'])
+
+    def _escribir_lote(self, operaciones: List[ReplaceOne], numeros: List[int]):
+        """
+        Reemplaza los registros del lote y luego borra los archivos de GridFS
+        de las versiones anteriores, que ya no referencia ningún registro.
+        """
+        anteriores = [registro['gridfs_id'] for registro in
+                      self.coll.find({'numero': {'$in': numeros}, 'gridfs_id': {'$exists': True}}, {'gridfs_id': 1})]
+        self.coll.bulk_write(operaciones, ordered=False)
+        if not anteriores:
+            return
+        from gridfs.errors import NoFile
+        for gridfs_id in anteriores:
+            try:
+                self.bucket.delete(gridfs_id)
+            except NoFile:
+                pass
+
+    def guardar_muchos(self, pares: Iterable[Tuple[int, str]], tamano_lote: int = 200) -> Dict[str, int]:
+        """Guarda (numero, texto) reemplazando versiones anteriores. Retorna los bytes antes y después."""
+        resumen = {'documentos': 0, 'bytes_original': 0, 'bytes_comprimido': 0}
+        operaciones: List[ReplaceOne] = []
+        numeros: List[int] = []
+        for numero, texto in pares:
+            registro = self._registro(numero, texto)
+            operaciones.append(ReplaceOne({'numero': numero}, registro, upsert=True))
+            numeros.append(numero)
+            resumen['documentos'] += 1
+            resumen['bytes_original'] += registro['bytes_original']
+            resumen['bytes_comprimido'] += registro['bytes_comprimido']
+            if len(operaciones) >= tamano_lote:
+                self._escribir_lote(operaciones, numeros)
+                operaciones, numeros = [], []
+        if operaciones:
+            self._escribir_lote(operaciones, numeros)
+        return resumen
+
+    def guardar(self, numero: int, texto: str) -> Dict[str, int]:
+        return self.guardar_muchos([(numero, texto)])
+
+    def obtener(self, numero: int) -> Optional[str]:
+        registro = self.coll.find_one({'numero': numero}, {'_id': 0})
+        return self._texto(registro) if registro else None
+
+    def obtener_muchos(self, numeros: List[int]) -> Dict[int, str]:
+        """Textos de varios documentos con una consulta $in."""
+        return {registro['numero']: self._texto(registro)
+                for registro in self.coll.find({'numero': {'$in': list(numeros)}}, {'_id': 0})}
+
+    def eliminar_todo(self):
+        self.coll.delete_many({})
+        if self.bucket_existe():
+            self.bucket.drop()
+
+    def bucket_existe(self) -> bool:
+        return f'{self.coll.name}.files' in self.db.list_collection_names()
+
+
+def separar_texto(documento: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Copia del documento sin `texto_contenido` (con preview y longitud) y el texto separado."""
+    texto = documento.get('texto_contenido')
+    if not texto:
+        return documento, None
+    principal = {clave: valor for clave, valor in documento.items() if clave != 'texto_contenido'}
+    principal.update(campos_cuerpo(texto))
+    return principal, texto
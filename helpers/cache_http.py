@@ -0,0 +1,104 @@
+# helpers/cache_http.py
+# Caché HTTP condicional: ETag, Last-Modified, Cache-Control y respuestas 304
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app, request
+from werkzeug.http import parse_date
+
+from helpers.metricas import registro
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cambiar si cambia la forma del JSON de las respuestas cacheadas (invalida los ETag emitidos)
+VERSION_REPRESENTACION = '1'
+
+# max-age=0: el navegador revalida siempre (una ida y vuelta, 304 sin cuerpo);
+# s-maxage: un proxy inverso puede servir la respuesta sin consultar la app
+POLITICA_DOCUMENTO = os.getenv('CACHE_CONTROL_DOCUMENTO', 'public, max-age=0, must-revalidate, s-maxage=300')
+POLITICA_ESTADISTICAS = os.getenv('CACHE_CONTROL_ESTADISTICAS', 'public, max-age=0, must-revalidate, s-maxage=60')
+
+
+def _a_utc(fecha: Optional[datetime]) -> Optional[datetime]:
+    """
+    Fecha con zona UTC. Las fechas sin zona se toman como UTC, igual que
+    hacen PyMongo al leerlas y werkzeug al emitir Last-Modified.
+    """
+    if fecha is None:
+        return None
+    return fecha.replace(tzinfo=timezone.utc) if fecha.tzinfo is None else fecha.astimezone(timezone.utc)
+
+
+def _a_fecha(valor: Any) -> Optional[datetime]:
+    """Convierte las fechas guardadas (datetime o 'YYYY-mm-dd HH:MM:SS') a datetime en UTC."""
+    if isinstance(valor, datetime):
+        return _a_utc(valor)
+    if isinstance(valor, str) and valor:
+        for formato in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S'):
+            try:
+                return _a_utc(datetime.strptime(valor, formato))
+            except ValueError:
+                continue
+        return _a_utc(parse_date(valor))
+    return None
+
+
+def _etag(*partes: Any) -> str:
+    base = ':'.join(str(parte) for parte in (VERSION_REPRESENTACION,) + partes)
+    return hashlib.sha1(base.encode('utf-8')).hexdigest()[:20]
+
+
+def validadores_documento(validador: Dict[str, Any]) -> tuple:
+    """
+    ETag y Last-Modified de un documento a partir de su revisión y fechas
+    (resultado de Mongo_DB.obtener_validador_documento).
+    """
+    fechas = [_a_fecha(validador.get(campo)) for campo in ('actualizado_en', 'fecha_procesamiento', 'fecha_descarga')]
+    fechas = [fecha for fecha in fechas if fecha]
+    ultima_modificacion = max(fechas) if fechas else None
+    etag = _etag('documento', validador.get('numero'), validador.get('revision', 0), ultima_modificacion)
+    return etag, ultima_modificacion
+
+
+def validadores_corpus(version: Dict[str, Any], nombre: str) -> tuple:
+    """ETag y Last-Modified de una vista agregada a partir de la versión del corpus."""
+    ultima_modificacion = _a_fecha(version.get('actualizado_en'))
+    etag = _etag(nombre, version.get('version', 0), version.get('total_estimado'), ultima_modificacion)
+    return etag, ultima_modificacion
+
+
+def responder_condicional(etag: str, ultima_modificacion: Optional[datetime], politica: str,
+                          generar: Callable[[], Any], nombre: str = 'http_condicional'):
+    """
+    Responde 304 sin construir el cuerpo si el cliente ya tiene la versión
+    vigente (If-None-Match / If-Modified-Since); si no, llama a `generar`
+    y agrega los validadores a la respuesta 200.
+    """
+    if request.if_none_match:
+        vigente = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and ultima_modificacion:
+        vigente = _a_utc(ultima_modificacion).replace(microsecond=0) <= _a_utc(request.if_modified_since)
+    else:
+        vigente = False
+
+    if vigente:
+        registro.registrar_cache(nombre, True)
+        response = current_app.response_class(status=304)
+    else:
+        if request.if_none_match or request.if_modified_since:
+            registro.registrar_cache(nombre, False)
+        response = current_app.make_response(generar())
+        if response.status_code != 200:
+            return response
+
+    # Débil: el validador identifica el contenido JSON, no los bytes (que varían con br/gzip)
+    response.set_etag(etag, weak=True)
+    if ultima_modificacion:
+        response.last_modified = ultima_modificacion
+    response.headers['Cache-Control'] = politica
+    return response
@@ -0,0 +1,326 @@
+# helpers/carga_archivos.py
+# Cargas desde el panel: multipart leído por bloques hacia el almacén, ZIP ingeridos en segundo plano y progreso por carga
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from helpers.almacen_archivos import clave_documento
+from helpers.cola_tareas import COLECCION_COLA, EN_PROCESO, PENDIENTE
+from helpers.funciones import Funciones
+from helpers.ingesta_zip import EXTENSIONES_TEXTO, ZIP_HILOS, IngestorZip
+from helpers.mongo_db import guardar_texto_documento, reservar_numeros
+from helpers.tareas_ingesta import EXPANDIR_ZIP, EXTRAER_TEXTO, INDEXAR
+from helpers.text_utils import determinar_categoria, extraer_año
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Una entrada por carga: archivos recibidos, rechazados y fechas
+COLECCION_CARGAS = 'cargas'
+# Tamaño máximo de cada archivo (o miembro de un ZIP)
+CARGA_MAX_MB = int(os.getenv('CARGA_MAX_MB', '200'))
+
+EXTENSIONES_CARGA = EXTENSIONES_TEXTO + ['.zip']
+
+# Bloques leídos del cuerpo de la petición y de los miembros del ZIP
+TAMANO_BLOQUE = 64 * 1024
+# Miembros omitidos, duplicados o con error que se conservan por carga (los más recientes)
+MAX_AVISOS = 200
+# Los campos de texto del formulario se guardan en memoria: nunca deben ser grandes
+MAX_CAMPO_BYTES = 64 * 1024
+
+RECIBIENDO = 'recibiendo'
+PROCESANDO = 'procesando'
+TERMINADA = 'terminada'
+FALLIDA = 'fallida'
+
+
+class ErrorCarga(Exception):
+    """Carga inválida: cuerpo que no es multipart, cortado o con un archivo demasiado grande."""
+
+
+def clave_zip(numero: int) -> str:
+    """Clave temporal de un ZIP recibido mientras se expande."""
+    return f'carga-zip-{numero}'
+
+
+def documento_carga(numero: int, nombre: str, archivo: Dict[str, Any], carga_id: str,
+                    origen: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Documento de MongoDB de un archivo cargado desde el panel; el texto lo completa la tarea de extracción."""
+    titulo, extension = os.path.splitext(nombre)
+    ahora = datetime.now()
+    documento = {
+        "numero": numero,
+        "titulo": titulo or nombre,
+        "tipo": extension.lstrip('.').upper() or 'PDF',
+        "url_original": '',
+        "archivo_local": nombre,
+        "ruta_completa": '',
+        "tamano_bytes": archivo['tamano'],
+        "tamano_mb": round(archivo['tamano'] / 1024 / 1024, 2),
+        "archivo_existe": True,
+        "archivo": archivo,
+        "texto_contenido": '',
+        "fecha_descarga": ahora.strftime("%Y-%m-%d %H:%M:%S"),
+        "fuente": "Carga manual",
+        "proyecto": "Big Data - Universidad Central",
+        "estado": "procesando",
+        "carga": carga_id,
+        "actualizado_en": ahora,
+        "revision": 1,
+        "metadatos": {
+            "extension": extension.lstrip('.').lower(),
+            "categoria": determinar_categoria(titulo),
+            "año": extraer_año(titulo)
+        }
+    }
+    if origen:
+        documento["origen"] = origen
+    return documento
+
+
+def _limitar(fragmentos: Iterable[bytes], maximo: int) -> Iterator[bytes]:
+    total = 0
+    for bloque in fragmentos:
+        total += len(bloque)
+        if total > maximo:
+            raise ErrorCarga(f"Supera el máximo de {maximo // (1024 * 1024)} MB")
+        yield bloque
+
+
+class LectorMultipart:
+    """
+    Lee un cuerpo multipart/form-data por bloques de `bloque` bytes. Los
+    archivos se entregan como generadores de fragmentos, así se escriben en
+    el almacén a medida que llegan sin tenerlos completos en memoria ni en
+    un temporal de Werkzeug.
+    """
+
+    def __init__(self, flujo, tipo_contenido: str, bloque: int = TAMANO_BLOQUE):
+        tipo, opciones = parse_options_header(tipo_contenido or '')
+        if tipo != 'multipart/form-data' or not opciones.get('boundary'):
+            raise ErrorCarga("Se esperaba un cuerpo multipart/form-data con boundary")
+        self.flujo = flujo
+        self.bloque = bloque
+        self.decodificador = MultipartDecoder(opciones['boundary'].encode('latin-1'), MAX_CAMPO_BYTES)
+        self._terminado = False
+
+    def _evento(self):
+        while True:
+            try:
+                evento = self.decodificador.next_event()
+            except ValueError as e:
+                raise ErrorCarga(f"Cuerpo multipart inválido: {e}")
+            if not isinstance(evento, NeedData):
+                return evento
+            if self._terminado:
+                raise ErrorCarga("El cuerpo multipart terminó antes de tiempo")
+            datos = self.flujo.read(self.bloque)
+            if datos:
+                self.decodificador.receive_data(datos)
+            else:
+                self._terminado = True
+                self.decodificador.receive_data(None)
+
+    def _datos(self) -> Iterator[bytes]:
+        while True:
+            evento = self._evento()
+            if not isinstance(evento, Data):
+                raise ErrorCarga("Parte multipart sin datos")
+            if evento.data:
+                yield evento.data
+            if not evento.more_data:
+                return
+
+    def partes(self) -> Iterator[Dict[str, Any]]:
+        """
+        Partes en orden: {'campo', 'archivo': None, 'valor'} para los campos y
+        {'campo', 'archivo': nombre, 'fragmentos'} para los archivos. Lo que el
+        consumidor no lea de un archivo se descarta antes de la parte siguiente.
+        """
+        while True:
+            evento = self._evento()
+            if isinstance(evento, Epilogue):
+                return
+            if isinstance(evento, Field):
+                valor = b''.join(_limitar(self._datos(), MAX_CAMPO_BYTES))
+                yield {'campo': evento.name, 'archivo': None, 'valor': valor.decode('utf-8', 'replace')}
+            elif isinstance(evento, File):
+                fragmentos = self._datos()
+                yield {'campo': evento.name, 'archivo': evento.filename, 'fragmentos': fragmentos}
+                for _ in fragmentos:
+                    pass
+
+
+class ReceptorCarga:
+    """
+    Recibe una carga del panel: cada PDF/DOCX va directo al almacén como
+    documento nuevo (estado 'procesando') y se encola su extracción; cada ZIP
+    se guarda entero y se encola su expansión. La extracción y la indexación
+    corren en los trabajadores de la cola, no en la petición.
+    """
+
+    def __init__(self, mongo, almacen, cola, usuario: str = '', max_bytes: int = CARGA_MAX_MB * 1024 * 1024):
+        self.mongo = mongo
+        self.almacen = almacen
+        self.cola = cola
+        self.usuario = usuario
+        self.max_bytes = max_bytes
+        self.cargas = mongo.db[COLECCION_CARGAS]
+        self.funciones = Funciones()
+
+    def recibir(self, flujo, tipo_contenido: str) -> Dict[str, Any]:
+        lector = LectorMultipart(flujo, tipo_contenido)
+        carga_id = uuid.uuid4().hex
+        self.cargas.insert_one({'_id': carga_id, 'usuario': self.usuario, 'estado': RECIBIENDO,
+                                'creada_en': datetime.now(), 'archivos': [], 'documentos': 0, 'zips': 0,
+                                'rechazados': 0})
+        try:
+            for parte in lector.partes():
+                if not parte['archivo']:
+                    continue
+                resultado = self._recibir_archivo(carga_id, parte)
+                contador = {'documento': 'documentos', 'zip': 'zips'}.get(resultado['estado'], 'rechazados')
+                self.cargas.update_one({'_id': carga_id},
+                                       {'$push': {'archivos': resultado}, '$inc': {contador: 1}})
+        except Exception as e:
+            # Lo ya recibido sigue su curso en la cola; la carga queda marcada con el error
+            self.cargas.update_one({'_id': carga_id}, {'$set': {'estado': FALLIDA, 'error': str(e)[:500],
+                                                                'recibida_en': datetime.now()}})
+            logger.error(f"Carga {carga_id} interrumpida: {e}")
+            raise
+
+        self.cargas.update_one({'_id': carga_id}, {'$set': {'estado': PROCESANDO, 'recibida_en': datetime.now()}})
+        carga = self.cargas.find_one({'_id': carga_id}, {'documentos': 1})
+        if carga['documentos']:
+            self.mongo.incrementar_version_corpus()
+        return estado_carga(self.mongo.db, carga_id, detalle=True, coleccion=self.mongo.collection_name)
+
+    def _recibir_archivo(self, carga_id: str, parte: Dict[str, Any]) -> Dict[str, Any]:
+        # Algunos navegadores envían la ruta completa del cliente
+        nombre = os.path.basename(parte['archivo'].replace('\\', '/'))
+        if not self.funciones.verificar_extensiones_permitidas(nombre, EXTENSIONES_CARGA):
+            return {'nombre': nombre, 'estado': 'rechazado',
+                    'error': f"Extensión no permitida (se aceptan {', '.join(EXTENSIONES_CARGA)})"}
+
+        numero = reservar_numeros(self.mongo.db, self.mongo.collection_name)
+        es_zip = nombre.lower().endswith('.zip')
+        clave = clave_zip(numero) if es_zip else clave_documento(numero)
+        try:
+            archivo = self.almacen.guardar_stream(clave, _limitar(parte['fragmentos'], self.max_bytes), nombre)
+        except ErrorCarga as e:
+            self.almacen.eliminar(clave)
+            return {'nombre': nombre, 'estado': 'rechazado', 'error': str(e)}
+
+        if es_zip:
+            self.cola.encolar(EXPANDIR_ZIP, numero, {'carga': carga_id, 'clave': clave, 'nombre': nombre})
+            return {'nombre': nombre, 'estado': 'zip', 'tamano': archivo['tamano']}
+        self.mongo.coll.insert_one(documento_carga(numero, nombre, archivo, carga_id))
+        self.cola.encolar(EXTRAER_TEXTO, numero, {'carga': carga_id})
+        return {'nombre': nombre, 'estado': 'documento', 'numero': numero, 'tamano': archivo['tamano']}
+
+
+def expandir_zip(mongo, cola, almacen, clave: str, carga_id: Optional[str], indexar: bool = True,
+                 hilos: int = ZIP_HILOS) -> Dict[str, Any]:
+    """
+    Convierte cada PDF/DOCX de un ZIP del almacén en documento sin extraer
+    el ZIP a disco (IngestorZip): los miembros se leen como streams, el texto
+    se extrae en `hilos` hilos y solo los miembros nuevos (por SHA-256) se
+    guardan en el almacén. Con texto se encola la indexación; sin texto, la
+    extracción (que la reintenta o la descarta con el error). Al reintentar se
+    omiten los miembros que ya tienen documento. Al terminar elimina el ZIP.
+    """
+    existentes = {documento['origen']['miembro']: documento for documento in mongo.coll.find(
+        {'carga': carga_id, 'origen.zip': clave}, {'numero': 1, 'estado': 1, 'origen': 1})}
+    # Un fallo entre el insert y el encolado deja documentos sin tarea: se encolan ahora
+    sin_tarea = {documento['numero'] for documento in existentes.values() if documento.get('estado') == 'procesando'}
+    if sin_tarea:
+        sin_tarea -= {tarea['numero'] for tarea in cola.coll.find(
+            {'tipo': EXTRAER_TEXTO, 'numero': {'$in': list(sin_tarea)}}, {'numero': 1})}
+        for numero in sin_tarea:
+            cola.encolar(EXTRAER_TEXTO, numero, {'carga': carga_id})
+
+    def buscar_hash(sha256: str) -> Optional[int]:
+        documento = mongo.coll.find_one({'archivo.sha256': sha256}, {'numero': 1})
+        return documento['numero'] if documento else None
+
+    def conservar(miembro: Dict[str, Any], flujo) -> Dict[str, Any]:
+        numero = reservar_numeros(mongo.db, mongo.collection_name)
+        archivo = almacen.guardar_stream(clave_documento(numero), iter(lambda: flujo.read(TAMANO_BLOQUE), b''),
+                                         miembro['nombre'])
+        mongo.coll.insert_one(documento_carga(numero, miembro['nombre'], archivo, carga_id,
+                                              {'zip': clave, 'miembro': miembro['miembro']}))
+        if not miembro['texto']:
+            cola.encolar(EXTRAER_TEXTO, numero, {'carga': carga_id})
+            return {'numero': numero}
+        guardar_texto_documento(mongo.coll, numero, miembro['texto'], {
+            'estado': 'disponible',
+            'procesado_texto': True,
+            'fecha_procesamiento': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }, mongo.textos)
+        if indexar:
+            cola.encolar(INDEXAR, numero, {'carga': carga_id})
+        return {'numero': numero}
+
+    with almacen.copia_local(clave) as ruta:
+        resultado = IngestorZip(Funciones(), hilos, buscar_hash).procesar(ruta, conservar, omitir=existentes)
+
+    almacen.eliminar(clave)
+    avisos = [{'miembro': m['miembro'], 'motivo': m.get('motivo') or m.get('error') or
+               f"duplicado de {m['duplicado_de']}"}
+              for m in resultado['miembros'] if m.get('omitido') or 'error' in m or 'duplicado_de' in m]
+    if carga_id:
+        mongo.db[COLECCION_CARGAS].update_one({'_id': carga_id}, {
+            '$inc': {'documentos': resultado['conservados'], 'duplicados': resultado['duplicados'],
+                     'omitidos': resultado['omitidos'] + resultado['errores']},
+            '$push': {'avisos': {'$each': avisos, '$slice': -MAX_AVISOS}}
+        })
+    if resultado['conservados']:
+        mongo.incrementar_version_corpus()
+    logger.info(f"ZIP {clave}: {resultado['conservados']} documentos, {resultado['duplicados']} duplicados, "
+                f"{resultado['omitidos']} omitidos, {resultado['errores']} errores en {resultado['segundos']}s")
+    return {campo: valor for campo, valor in resultado.items() if campo != 'miembros'}
+
+
+def estado_carga(db, carga_id: str, detalle: bool = False, coleccion: str = 'documentos') -> Optional[Dict[str, Any]]:
+    """
+    Progreso de una carga: contadores de la recepción y tareas de la cola por
+    tipo y estado. Termina cuando se recibió todo y no quedan tareas activas.
+    """
+    carga = db[COLECCION_CARGAS].find_one({'_id': carga_id}, None if detalle else {'archivos': 0})
+    if carga is None:
+        return None
+
+    tareas: Dict[str, Dict[str, int]] = {}
+    for grupo in db[COLECCION_COLA].aggregate([
+        {'$match': {'datos.carga': carga_id}},
+        {'$group': {'_id': {'tipo': '$tipo', 'estado': '$estado'}, 'total': {'$sum': 1}}}
+    ]):
+        tareas.setdefault(grupo['_id']['tipo'], {})[grupo['_id']['estado']] = grupo['total']
+    activas = sum(total for estados in tareas.values() for estado, total in estados.items()
+                  if estado in (PENDIENTE, EN_PROCESO))
+
+    if carga['estado'] == PROCESANDO and activas == 0:
+        carga['estado'] = TERMINADA
+        carga['terminada_en'] = datetime.now()
+        db[COLECCION_CARGAS].update_one({'_id': carga_id, 'estado': PROCESANDO},
+                                        {'$set': {'estado': TERMINADA, 'terminada_en': carga['terminada_en']}})
+
+    carga['id'] = carga.pop('_id')
+    carga['tareas'] = tareas
+    carga['activas'] = activas
+    # Con texto: por la tarea de extracción o extraídos directamente del ZIP
+    carga['disponibles'] = db[coleccion].count_documents({'carga': carga_id, 'estado': 'disponible'})
+    carga['terminada'] = carga['estado'] in (TERMINADA, FALLIDA) and activas == 0
+    return carga
+
+
+def listar_cargas(db, limite: int = 10) -> list:
+    """Cargas más recientes, sin el detalle de archivos."""
+    return list(db[COLECCION_CARGAS].find({}, {'archivos': 0}).sort('creada_en', -1).limit(limite))
@@ -0,0 +1,182 @@
+# helpers/coalescencia.py
+# Coalescencia (single-flight) de peticiones idénticas concurrentes
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from helpers.metricas import registro
+from helpers.respuestas_http import serializar_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo coalescencia dentro del proceso
+    fcntl = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _Vuelo:
+    """Cálculo en curso compartido por las peticiones que esperan la misma clave."""
+    __slots__ = ('evento', 'resultado', 'error')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class Coalescedor:
+    """
+    Ejecuta una sola vez los cálculos idénticos que llegan a la vez.
+
+    Dentro de un worker, las peticiones con la misma clave esperan al hilo
+    que llegó primero y reciben su resultado. Si se configura `directorio`
+    (y el sistema tiene fcntl), los workers de gunicorn se coordinan con un
+    candado de archivo por clave: el primero calcula y deja el resultado en
+    disco, y quien esperaba el candado solo lo usa si terminó después de que
+    empezó a esperar (un resultado anterior podría no incluir una escritura
+    que ya vio). `ttl_resultado` fija cuánto quedan los resultados en disco.
+    Si la espera supera `espera_maxima`, se calcula localmente en lugar de
+    fallar. Los resultados compartidos entre workers se serializan como las
+    respuestas de la API (fechas ISO 8601, ObjectId como texto), así que una
+    respuesta coalescida es idéntica a una calculada.
+    """
+
+    def __init__(self, nombre: str, directorio: Optional[str] = None,
+                 ttl_resultado: float = 5.0, espera_maxima: float = 60.0):
+        self.nombre = nombre
+        self.directorio = directorio if directorio and fcntl else None
+        self.ttl_resultado = ttl_resultado
+        self.espera_maxima = espera_maxima
+        self._lock = threading.Lock()
+        self._vuelos: Dict[str, _Vuelo] = {}
+        self._escrituras = 0
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+
+    def ejecutar(self, clave: str, funcion: Callable[[], Any]) -> Any:
+        """Retorna el resultado de `funcion`, compartido con las llamadas concurrentes de igual clave."""
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = _Vuelo()
+                self._vuelos[clave] = vuelo
+
+        if not lider:
+            if not vuelo.evento.wait(self.espera_maxima):
+                logger.warning(f"'{self.nombre}': espera agotada para '{clave[:100]}', se calcula localmente")
+                registro.registrar_cache(self.nombre, False)
+                return funcion()
+            if vuelo.error is not None:
+                raise vuelo.error
+            registro.registrar_cache(self.nombre, True)
+            return vuelo.resultado
+
+        try:
+            vuelo.resultado = self._ejecutar_entre_workers(clave, funcion)
+            return vuelo.resultado
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                self._vuelos.pop(clave, None)
+            vuelo.evento.set()
+
+    # ---------- Coordinación entre workers ----------
+
+    def _ejecutar_entre_workers(self, clave: str, funcion: Callable[[], Any]) -> Any:
+        if not self.directorio:
+            registro.registrar_cache(self.nombre, False)
+            return funcion()
+
+        digest = hashlib.sha1(clave.encode('utf-8')).hexdigest()
+        ruta_resultado = os.path.join(self.directorio, f'{digest}.json')
+        ruta_candado = os.path.join(self.directorio, f'{digest}.lock')
+        inicio = time.time()
+
+        with open(ruta_candado, 'a') as candado:
+            if not self._bloquear(candado, esperar=False):
+                # Otro worker está calculando esta misma clave: esperar y reutilizar
+                if not self._bloquear(candado, esperar=True):
+                    registro.registrar_cache(self.nombre, False)
+                    return funcion()
+                compartido = self._leer_resultado(ruta_resultado, inicio)
+                if compartido is not None:
+                    fcntl.flock(candado, fcntl.LOCK_UN)
+                    registro.registrar_cache(self.nombre, True)
+                    return compartido['resultado']
+            try:
+                # La fecha del candado marca su último uso para la limpieza
+                os.utime(ruta_candado)
+                registro.registrar_cache(self.nombre, False)
+                resultado = funcion()
+                self._escribir_resultado(ruta_resultado, resultado)
+                return resultado
+            finally:
+                fcntl.flock(candado, fcntl.LOCK_UN)
+
+    def _bloquear(self, candado, esperar: bool) -> bool:
+        limite = time.monotonic() + (self.espera_maxima if esperar else 0)
+        while True:
+            try:
+                fcntl.flock(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= limite:
+                    return False
+                time.sleep(0.01)
+
+    def _leer_resultado(self, ruta: str, desde: float) -> Optional[Dict[str, Any]]:
+        """Lee el resultado dejado por otro worker si terminó después de `desde` (cuando empezamos a esperar)."""
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                compartido = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return compartido if compartido.get('terminado', 0) >= desde else None
+
+    def _escribir_resultado(self, ruta: str, resultado: Any):
+        try:
+            temporal = f'{ruta}.{os.getpid()}.tmp'
+            with open(temporal, 'wb') as f:
+                f.write(serializar_json({'resultado': resultado, 'terminado': time.time()}))
+            os.replace(temporal, ruta)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"No se pudo compartir el resultado de '{self.nombre}': {e}")
+            return
+
+        self._escrituras += 1
+        if self._escrituras % 100 == 0:
+            self._limpiar_resultados()
+
+    def _limpiar_resultados(self):
+        """
+        Elimina resultados vencidos y candados sin uso reciente. Borrar un
+        candado mientras otro worker lo abre solo puede duplicar un cálculo.
+        """
+        ahora = time.time()
+        limites = {'.json': ahora - max(self.ttl_resultado * 10, 60),
+                   '.lock': ahora - max(self.espera_maxima * 10, 600)}
+        for nombre in os.listdir(self.directorio):
+            limite = limites.get(os.path.splitext(nombre)[1])
+            if limite is None:
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                if os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)
+            except OSError:
+                continue
+
+
+def clave_peticion(prefijo: str, parametros: Dict[str, Any]) -> str:
+    """Clave canónica para una petición: prefijo + parámetros ordenados."""
+    return f"{prefijo}:{serializar_json(parametros, ordenar=True).decode('utf-8')}"
@@ -0,0 +1,301 @@
+# helpers/cola_tareas.py
+# Cola de tareas persistente en MongoDB: arriendos, reintentos con backoff exponencial y estado de descarte
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLECCION_COLA = 'cola_tareas'
+COLA_MAX_INTENTOS = int(os.getenv('COLA_MAX_INTENTOS', '5'))
+COLA_BACKOFF_SEGUNDOS = float(os.getenv('COLA_BACKOFF_SEGUNDOS', '30'))
+COLA_BACKOFF_MAXIMO = float(os.getenv('COLA_BACKOFF_MAXIMO', '3600'))
+# Un arriendo vencido (trabajador caído) devuelve la tarea a la cola
+COLA_ARRIENDO_SEGUNDOS = float(os.getenv('COLA_ARRIENDO_SEGUNDOS', '300'))
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+COMPLETADA = 'completada'
+DESCARTADA = 'descartada'  # agotó los reintentos (dead letter): solo vuelve con reencolar()
+ESTADOS = (PENDIENTE, EN_PROCESO, COMPLETADA, DESCARTADA)
+
+# Errores que se conservan por tarea
+MAX_ERRORES = 10
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def calcular_espera(intentos: int, base: float = COLA_BACKOFF_SEGUNDOS, maximo: float = COLA_BACKOFF_MAXIMO) -> float:
+    """Backoff exponencial con jitter: base * 2^(intentos-1), entre 50% y 100% del valor, hasta `maximo`."""
+    espera = min(base * (2 ** max(intentos - 1, 0)), maximo)
+    return espera * random.uniform(0.5, 1.0)
+
+
+class ColaTareas:
+    """
+    Una tarea por (tipo, numero) en la colección `cola_tareas`:
+    {tipo, numero, estado, intentos, max_intentos, disponible_en,
+    arrendada_hasta, trabajador, ultimo_error, errores, datos}.
+
+    arrendar() toma una tarea con find_one_and_update (atómico), así varios
+    hilos, procesos o nodos pueden trabajar sobre la misma cola.
+    """
+
+    def __init__(self, db, coleccion: str = COLECCION_COLA, max_intentos: int = COLA_MAX_INTENTOS,
+                 arriendo_segundos: float = COLA_ARRIENDO_SEGUNDOS):
+        self.coll = db[coleccion]
+        self.max_intentos = max_intentos
+        self.arriendo_segundos = arriendo_segundos
+
+    def asegurar_indices(self) -> List[str]:
+        from helpers.indices import INDICES_COLA, asegurar_indices
+        return asegurar_indices(self.coll, INDICES_COLA)
+
+    # ---------- Productores ----------
+
+    def encolar(self, tipo: str, numero: int, datos: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None, max_intentos: Optional[int] = None) -> bool:
+        """
+        Deja la tarea pendiente (la crea o reinicia sus intentos). Si ya está en
+        proceso no se toca. `error` registra por qué se encola (el fallo original).
+        Retorna False si la tarea estaba en proceso.
+        """
+        ahora = _ahora()
+        cambios: Dict[str, Any] = {
+            '$set': {'estado': PENDIENTE, 'intentos': 0, 'disponible_en': ahora, 'actualizada_en': ahora,
+                     'max_intentos': max_intentos or self.max_intentos, 'datos': datos or {},
+                     'arrendada_hasta': None, 'trabajador': None},
+            '$setOnInsert': {'creada_en': ahora},
+        }
+        if error:
+            cambios['$set']['ultimo_error'] = error
+            cambios['$push'] = {'errores': {'$each': [{'fecha': ahora, 'error': error}], '$slice': -MAX_ERRORES}}
+        try:
+            self.coll.update_one({'tipo': tipo, 'numero': numero, 'estado': {'$ne': EN_PROCESO}}, cambios, upsert=True)
+            return True
+        except DuplicateKeyError:
+            # Existe en proceso: el upsert choca con el índice único (tipo, numero)
+            return False
+
+    def encolar_muchos(self, tipo: str, numeros: List[int], error: Optional[str] = None) -> int:
+        return sum(self.encolar(tipo, numero, error=error) for numero in numeros)
+
+    # ---------- Trabajadores ----------
+
+    def _intentos_contra_maximo(self) -> List[Any]:
+        """Operandos de $expr para comparar intentos con max_intentos (las tareas antiguas usan el de la cola)."""
+        return ['$intentos', {'$ifNull': ['$max_intentos', self.max_intentos]}]
+
+    def descartar_vencidos(self, tipos: Optional[List[str]] = None) -> int:
+        """
+        Descarta las tareas cuyo arriendo venció en el último intento: el
+        trabajador cayó (o se colgó) sin llamar a fallar(), así que nadie
+        más registraría el agotamiento de los reintentos.
+        """
+        ahora = _ahora()
+        filtro: Dict[str, Any] = {'estado': EN_PROCESO, 'arrendada_hasta': {'$lt': ahora},
+                                  '$expr': {'$gte': self._intentos_contra_maximo()}}
+        if tipos:
+            filtro['tipo'] = {'$in': list(tipos)}
+        error = 'Arriendo vencido en el último intento (trabajador caído o colgado)'
+        return self.coll.update_many(filtro, {
+            '$set': {'estado': DESCARTADA, 'ultimo_error': error, 'actualizada_en': ahora, 'arrendada_hasta': None},
+            '$push': {'errores': {'$each': [{'fecha': ahora, 'error': error}], '$slice': -MAX_ERRORES}}
+        }).modified_count
+
+    def arrendar(self, trabajador: str, tipos: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Toma la siguiente tarea disponible (pendiente o con arriendo vencido)
+        por `arriendo_segundos`. Un arriendo vencido solo se retoma si a la
+        tarea le quedan intentos; si no, queda descartada.
+        """
+        self.descartar_vencidos(tipos)
+        ahora = _ahora()
+        filtro: Dict[str, Any] = {'$or': [
+            {'estado': PENDIENTE, 'disponible_en': {'$lte': ahora}},
+            {'estado': EN_PROCESO, 'arrendada_hasta': {'$lt': ahora}, '$expr': {'$lt': self._intentos_contra_maximo()}},
+        ]}
+        if tipos:
+            filtro['tipo'] = {'$in': list(tipos)}
+        return self.coll.find_one_and_update(
+            filtro,
+            {'$set': {'estado': EN_PROCESO, 'trabajador': trabajador, 'actualizada_en': ahora,
+                      'arrendada_hasta': ahora + timedelta(seconds=self.arriendo_segundos)},
+             '$inc': {'intentos': 1}},
+            sort=[('disponible_en', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def extender(self, tarea: Dict[str, Any]) -> bool:
+        """Renueva el arriendo de una tarea larga. False si otro trabajador ya la tomó."""
+        resultado = self.coll.update_one(
+            {'_id': tarea['_id'], 'trabajador': tarea['trabajador'], 'estado': EN_PROCESO},
+            {'$set': {'arrendada_hasta': _ahora() + timedelta(seconds=self.arriendo_segundos)}}
+        )
+        return resultado.matched_count > 0
+
+    def completar(self, tarea: Dict[str, Any], resultado: Optional[Dict[str, Any]] = None) -> bool:
+        ahora = _ahora()
+        cambios = {'estado': COMPLETADA, 'completada_en': ahora, 'actualizada_en': ahora, 'arrendada_hasta': None}
+        if resultado:
+            cambios['resultado'] = resultado
+        # Solo el dueño del arriendo: si venció y otro la tomó, este resultado se ignora
+        return self.coll.update_one({'_id': tarea['_id'], 'trabajador': tarea['trabajador'], 'estado': EN_PROCESO},
+                                    {'$set': cambios}).matched_count > 0
+
+    def fallar(self, tarea: Dict[str, Any], error: str, reintentar: bool = True) -> str:
+        """
+        Registra el error y programa el reintento con backoff; al agotar
+        `max_intentos` (o con reintentar=False) la tarea queda descartada.
+        Retorna el nuevo estado.
+        """
+        ahora = _ahora()
+        intentos = tarea.get('intentos', 1)
+        descartar = not reintentar or intentos >= tarea.get('max_intentos', self.max_intentos)
+        cambios: Dict[str, Any] = {'estado': DESCARTADA if descartar else PENDIENTE, 'ultimo_error': error,
+                                   'actualizada_en': ahora, 'arrendada_hasta': None}
+        if not descartar:
+            cambios['disponible_en'] = ahora + timedelta(seconds=calcular_espera(intentos))
+        self.coll.update_one(
+            {'_id': tarea['_id'], 'trabajador': tarea['trabajador'], 'estado': EN_PROCESO},
+            {'$set': cambios,
+             '$push': {'errores': {'$each': [{'fecha': ahora, 'intento': intentos, 'error': error}],
+                                   '$slice': -MAX_ERRORES}}}
+        )
+        return cambios['estado']
+
+    # ---------- Administración ----------
+
+    def reencolar(self, estado: str = DESCARTADA, tipo: Optional[str] = None,
+                  numeros: Optional[List[int]] = None) -> int:
+        """Vuelve a dejar pendientes las tareas de un estado (por defecto las descartadas) con intentos en cero."""
+        filtro: Dict[str, Any] = {'estado': estado}
+        if tipo:
+            filtro['tipo'] = tipo
+        if numeros:
+            filtro['numero'] = {'$in': list(numeros)}
+        ahora = _ahora()
+        return self.coll.update_many(filtro, {'$set': {'estado': PENDIENTE, 'intentos': 0, 'disponible_en': ahora,
+                                                       'actualizada_en': ahora, 'arrendada_hasta': None,
+                                                       'trabajador': None}}).modified_count
+
+    def purgar(self, estado: str = COMPLETADA, dias: float = 7) -> int:
+        """Elimina tareas de un estado sin cambios en los últimos `dias`."""
+        limite = _ahora() - timedelta(days=dias)
+        return self.coll.delete_many({'estado': estado, 'actualizada_en': {'$lt': limite}}).deleted_count
+
+    def resumen(self) -> Dict[str, Dict[str, int]]:
+        """Conteo por tipo y estado: {tipo: {estado: n}}."""
+        conteos: Dict[str, Dict[str, int]] = {}
+        for fila in self.coll.aggregate([{'$group': {'_id': {'tipo': '$tipo', 'estado': '$estado'}, 'n': {'$sum': 1}}}]):
+            conteos.setdefault(fila['_id']['tipo'], {estado: 0 for estado in ESTADOS})[fila['_id']['estado']] = fila['n']
+        return conteos
+
+    def listar(self, estado: Optional[str] = None, tipo: Optional[str] = None, limite: int = 20) -> List[Dict[str, Any]]:
+        filtro: Dict[str, Any] = {}
+        if estado:
+            filtro['estado'] = estado
+        if tipo:
+            filtro['tipo'] = tipo
+        return list(self.coll.find(filtro, {'_id': 0, 'errores': 0}).sort('actualizada_en', -1).limit(limite))
+
+    def pendientes(self, tipos: Optional[List[str]] = None) -> int:
+        """Tareas que aún pueden ejecutarse (pendientes o en proceso)."""
+        filtro: Dict[str, Any] = {'estado': {'$in': [PENDIENTE, EN_PROCESO]}}
+        if tipos:
+            filtro['tipo'] = {'$in': list(tipos)}
+        return self.coll.count_documents(filtro)
+
+
+class ErrorPermanente(Exception):
+    """Fallo que no se resuelve reintentando (p. ej. el documento ya no existe)."""
+
+
+class TrabajadorCola:
+    """
+    Ejecuta tareas con `hilos` hilos. `manejadores` asocia cada tipo con una
+    función `manejador(tarea) -> dict | None`; si lanza una excepción la tarea
+    se reintenta con backoff. `ErrorPermanente` la descarta sin reintentar.
+    Mientras un manejador corre, un latido renueva el arriendo cada tercio
+    de `arriendo_segundos`, así las tareas largas no vuelven a la cola.
+    """
+
+    def __init__(self, cola: ColaTareas, manejadores: Dict[str, Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]],
+                 hilos: int = 1, espera_vacia: float = 5.0):
+        self.cola = cola
+        self.manejadores = manejadores
+        self.hilos = hilos
+        self.espera_vacia = espera_vacia
+        self.identificador = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.estadisticas = {'completadas': 0, 'reintentos': 0, 'descartadas': 0}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+
+    def detener(self):
+        self._detener.set()
+
+    def ejecutar(self, hasta_vaciar: bool = False) -> Dict[str, int]:
+        """Procesa tareas hasta detener() o, con `hasta_vaciar`, hasta que no quede ninguna ejecutable."""
+        hilos = [threading.Thread(target=self._bucle, args=(f"{self.identificador}-{i}", hasta_vaciar),
+                                  name=f'cola-tareas-{i}', daemon=True) for i in range(self.hilos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            while hilo.is_alive():
+                hilo.join(0.5)
+        return dict(self.estadisticas)
+
+    def _bucle(self, trabajador: str, hasta_vaciar: bool):
+        tipos = list(self.manejadores)
+        while not self._detener.is_set():
+            tarea = self.cola.arrendar(trabajador, tipos)
+            if tarea is None:
+                # Con reintentos programados a futuro la cola no está vacía: se espera a que venzan
+                if hasta_vaciar and self.cola.pendientes(tipos) == 0:
+                    return
+                self._detener.wait(self.espera_vacia)
+                continue
+            self.procesar(tarea)
+
+    def _latido(self, tarea: Dict[str, Any], terminado: threading.Event):
+        intervalo = self.cola.arriendo_segundos / 3
+        while not terminado.wait(intervalo):
+            if not self.cola.extender(tarea):
+                logger.warning(f"Tarea {tarea['tipo']} #{tarea['numero']}: se perdió el arriendo")
+                return
+
+    def procesar(self, tarea: Dict[str, Any]):
+        terminado = threading.Event()
+        latido = threading.Thread(target=self._latido, args=(tarea, terminado),
+                                  name=f"latido-{tarea['tipo']}-{tarea['numero']}", daemon=True)
+        latido.start()
+        try:
+            resultado = self.manejadores[tarea['tipo']](tarea)
+        except Exception as e:
+            permanente = isinstance(e, ErrorPermanente)
+            error = str(e) if permanente else f"{type(e).__name__}: {e}"
+            estado = self.cola.fallar(tarea, error, reintentar=not permanente)
+            logger.warning(f"Tarea {tarea['tipo']} #{tarea['numero']} falló (intento {tarea['intentos']}): "
+                           f"{error}{'' if estado == PENDIENTE else ' → descartada'}")
+            self._contar('reintentos' if estado == PENDIENTE else 'descartadas')
+            return
+        finally:
+            terminado.set()
+        self.cola.completar(tarea, resultado)
+        self._contar('completadas')
+
+    def _contar(self, campo: str):
+        with self._lock:
+            self.estadisticas[campo] += 1
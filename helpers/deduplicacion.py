@@ -0,0 +1,231 @@
+# helpers/deduplicacion.py
+# Detección de documentos casi duplicados con firmas MinHash y LSH por bandas
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Similitud de Jaccard estimada a partir de la cual un documento es duplicado de otro
+DEDUP_UMBRAL = float(os.getenv('DEDUP_UMBRAL', '0.85'))
+
+# Firmas de los canónicos para deduplicar cargas posteriores contra el corpus
+COLECCION_FIRMAS = 'firmas_minhash'
+
+# Documentos que se indexan y resumen (los duplicados se enlazan a su canónico)
+FILTRO_CANONICOS = {'duplicado_de': {'$exists': False}}
+
+# Cambia cuando cambian los shingles: las firmas guardadas con otra versión no son comparables
+VERSION_FIRMAS = 2
+
+# Textos más cortos no se deduplican (portadas, PDFs escaneados sin texto)
+MIN_CARACTERES = 200
+
+# 16 bandas x 8 filas: probabilidad de ser candidatos ~50% en Jaccard 0.7 y >99% desde 0.85
+PERMUTACIONES = 128
+BANDAS = 16
+SHINGLE = 5
+
+# Primo mayor que 2^32: (a*x + b) cabe en uint64 para x, a, b < 2^32
+_PRIMO = np.uint64(4294967311)
+
+# A diferencia de helpers.vectores.tokenizar, se conservan números y palabras cortas: dos resoluciones
+# que solo difieren en número, año, expediente o cuantía son documentos distintos
+_PATRON_TOKEN = re.compile(r'[a-z0-9]+')
+_PATRON_NUMERO = re.compile(r'\d+')
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Palabras y números del texto en minúsculas y sin tildes."""
+    plano = unicodedata.normalize('NFKD', texto.lower()).encode('ascii', 'ignore').decode('ascii')
+    return _PATRON_TOKEN.findall(plano)
+
+
+def huella_texto(texto: str) -> str:
+    """SHA-1 del texto normalizado (duplicados exactos con distinto espaciado o mayúsculas)."""
+    return hashlib.sha1(' '.join(texto.lower().split()).encode('utf-8')).hexdigest()
+
+
+def huella_numeros(texto: str) -> str:
+    """
+    SHA-1 de los números distintos del texto. Unos pocos números cambian poco
+    la similitud de un texto largo; los duplicados deben tenerlos todos iguales.
+    """
+    numeros = sorted({numero.lstrip('0') or '0' for numero in _PATRON_NUMERO.findall(texto)})
+    return hashlib.sha1(' '.join(numeros).encode('ascii')).hexdigest()
+
+
+def shingles(texto: str, k: int = SHINGLE) -> np.ndarray:
+    """Hashes (crc32) de los k-shingles de palabras del texto normalizado."""
+    tokens = tokenizar(texto)
+    if len(tokens) < k:
+        tokens = tokens + [''] * (k - len(tokens))
+    valores = {zlib.crc32(' '.join(tokens[i:i + k]).encode('utf-8')) for i in range(len(tokens) - k + 1)}
+    return np.fromiter(valores, dtype=np.uint64, count=len(valores))
+
+
+class MinHash:
+    """Familia de `permutaciones` funciones hash universales (a*x + b) mod p, fija por semilla."""
+
+    def __init__(self, permutaciones: int = PERMUTACIONES, semilla: int = 1):
+        rng = np.random.default_rng(semilla)
+        self.a = rng.integers(1, 2 ** 32, permutaciones, dtype=np.uint64)
+        self.b = rng.integers(0, 2 ** 32, permutaciones, dtype=np.uint64)
+
+    def firma(self, texto: str, bloque: int = 4096) -> np.ndarray:
+        valores = shingles(texto)
+        firma = np.full(len(self.a), np.iinfo(np.uint64).max, dtype=np.uint64)
+        for i in range(0, len(valores), bloque):
+            x = valores[i:i + bloque, None]
+            np.minimum(firma, ((x * self.a + self.b) % _PRIMO).min(axis=0), out=firma)
+        return firma
+
+
+def similitud(firma_a: np.ndarray, firma_b: np.ndarray) -> float:
+    """Jaccard estimada: fracción de posiciones iguales en las firmas."""
+    return float(np.mean(firma_a == firma_b))
+
+
+class IndiceLSH:
+    """
+    Cubetas por banda: dos firmas son candidatas si coinciden en todas las
+    filas de al menos una banda. Cada consulta cuesta O(bandas), no O(n).
+    """
+
+    def __init__(self, bandas: int = BANDAS):
+        self.bandas = bandas
+        self._cubetas: List[Dict[bytes, List[Any]]] = [defaultdict(list) for _ in range(bandas)]
+
+    def _claves(self, firma: np.ndarray) -> List[bytes]:
+        return [banda.tobytes() for banda in np.array_split(firma, self.bandas)]
+
+    def agregar(self, clave: Any, firma: np.ndarray):
+        for cubetas, banda in zip(self._cubetas, self._claves(firma)):
+            cubetas[banda].append(clave)
+
+    def candidatos(self, firma: np.ndarray) -> List[Any]:
+        vistos: Dict[Any, None] = {}
+        for cubetas, banda in zip(self._cubetas, self._claves(firma)):
+            for clave in cubetas.get(banda, ()):
+                vistos.setdefault(clave)
+        return list(vistos)
+
+
+class Deduplicador:
+    """
+    Recorre los documentos en orden: el primero de cada grupo queda como
+    canónico y los siguientes se enlazan a él con `duplicado_de`. Un
+    candidato solo es duplicado si además contiene los mismos números.
+    """
+
+    def __init__(self, umbral: float = DEDUP_UMBRAL, permutaciones: int = PERMUTACIONES, bandas: int = BANDAS):
+        self.umbral = umbral
+        self.minhash = MinHash(permutaciones)
+        self.lsh = IndiceLSH(bandas)
+        self.firmas: Dict[int, np.ndarray] = {}
+        self.huellas: Dict[int, str] = {}
+        self.numeros: Dict[int, str] = {}
+        self._por_huella: Dict[str, int] = {}
+
+    def agregar_canonico(self, numero: int, firma: np.ndarray, huella: Optional[str] = None,
+                         numeros: Optional[str] = None):
+        """Registra un documento canónico ya conocido (p. ej. firmas guardadas de cargas anteriores)."""
+        self.firmas[numero] = firma
+        self.lsh.agregar(numero, firma)
+        if huella:
+            self.huellas[numero] = huella
+            self._por_huella.setdefault(huella, numero)
+        if numeros:
+            self.numeros[numero] = numeros
+
+    def buscar(self, texto: str) -> Tuple[Optional[int], float, np.ndarray, str, str]:
+        """(canónico o None, similitud, firma, huella, huella de números) de un texto."""
+        huella = huella_texto(texto)
+        numeros = huella_numeros(texto)
+        firma = self.minhash.firma(texto)
+        if huella in self._por_huella:
+            return self._por_huella[huella], 1.0, firma, huella, numeros
+        mejor, mejor_similitud = None, 0.0
+        for candidato in self.lsh.candidatos(firma):
+            if self.numeros.get(candidato) != numeros:
+                continue
+            valor = similitud(firma, self.firmas[candidato])
+            if valor > mejor_similitud:
+                mejor, mejor_similitud = candidato, valor
+        if mejor_similitud >= self.umbral:
+            return mejor, mejor_similitud, firma, huella, numeros
+        return None, mejor_similitud, firma, huella, numeros
+
+    def procesar(self, documentos: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Marca los duplicados en los propios documentos (`duplicado_de`,
+        `similitud_duplicado`) y retorna el reporte de lo que se evita
+        almacenar, indexar y resumir.
+        """
+        reporte = {'documentos': 0, 'canonicos': 0, 'duplicados': 0, 'exactos': 0,
+                   'sin_texto': 0, 'bytes_texto': 0, 'bytes_archivos': 0, 'grupos': {}}
+        for documento in documentos:
+            reporte['documentos'] += 1
+            documento.pop('duplicado_de', None)
+            documento.pop('similitud_duplicado', None)
+            texto = documento.get('texto_contenido') or ''
+            if len(texto) < MIN_CARACTERES:
+                reporte['sin_texto'] += 1
+                continue
+
+            canonico, valor, firma, huella, numeros = self.buscar(texto)
+            if canonico is None or canonico == documento['numero']:
+                self.agregar_canonico(documento['numero'], firma, huella, numeros)
+                reporte['canonicos'] += 1
+                continue
+
+            documento['duplicado_de'] = canonico
+            documento['similitud_duplicado'] = round(valor, 4)
+            reporte['duplicados'] += 1
+            reporte['exactos'] += huella == self.huellas.get(canonico)
+            reporte['bytes_texto'] += len(texto.encode('utf-8'))
+            reporte['bytes_archivos'] += int(documento.get('tamano_bytes') or 0)
+            reporte['grupos'].setdefault(canonico, []).append(documento['numero'])
+        return reporte
+
+
+def es_canonico(documento: Dict[str, Any]) -> bool:
+    return not documento.get('duplicado_de')
+
+
+def guardar_firmas(coleccion, deduplicador: Deduplicador):
+    """Guarda las firmas de los canónicos ({numero, firma binaria, huellas, versión}) para cargas incrementales."""
+    from pymongo import ReplaceOne
+    operaciones = [ReplaceOne({'numero': numero}, {'numero': numero, 'firma': firma.tobytes(),
+                                                   'huella': deduplicador.huellas.get(numero),
+                                                   'numeros': deduplicador.numeros.get(numero),
+                                                   'version': VERSION_FIRMAS}, upsert=True)
+                   for numero, firma in deduplicador.firmas.items()]
+    for i in range(0, len(operaciones), 1000):
+        coleccion.bulk_write(operaciones[i:i + 1000], ordered=False)
+
+
+def cargar_firmas(coleccion, deduplicador: Deduplicador) -> int:
+    """
+    Registra en el deduplicador las firmas guardadas. Retorna cuántas cargó;
+    las de otra versión se ignoran hasta regenerarlas con scripts/deduplicar.py --aplicar.
+    """
+    total = 0
+    for registro in coleccion.find({'version': VERSION_FIRMAS}, {'_id': 0}):
+        deduplicador.agregar_canonico(registro['numero'], np.frombuffer(registro['firma'], dtype=np.uint64),
+                                      registro.get('huella'), registro.get('numeros'))
+        total += 1
+    antiguas = coleccion.count_documents({'version': {'$ne': VERSION_FIRMAS}})
+    if antiguas:
+        logger.warning(f"{antiguas} firmas MinHash de una versión anterior se ignoran; "
+                       f"regenéralas con scripts/deduplicar.py --aplicar")
+    return total
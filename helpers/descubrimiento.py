@@ -0,0 +1,406 @@
+# helpers/descubrimiento.py
+# Descubrimiento de documentos: robots.txt, sitemaps (índices y lastmod), listas de SharePoint y estado incremental
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+from helpers.web_scraper import ConjuntoVistos, canonicalizar_url, resolver_url
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# lastmod, ETag y fecha de visita de cada sitemap, página, lista y documento ya vistos (por URL canónica)
+DESCUBRIMIENTO_ESTADO = os.getenv('DESCUBRIMIENTO_ESTADO', os.path.join('uploads', 'descubrimiento_estado.json'))
+# Las páginas sin lastmod se vuelven a visitar pasado este tiempo
+DESCUBRIMIENTO_REVISITA_DIAS = float(os.getenv('DESCUBRIMIENTO_REVISITA_DIAS', '30'))
+
+SHAREPOINT_LOTE = 500
+# Protección contra índices de sitemaps que se referencian en ciclo
+MAX_SITEMAPS = 1000
+# Bibliotecas de documentos de SharePoint (BaseTemplate 101)
+PLANTILLA_BIBLIOTECA = 101
+
+
+class ReglasRobots:
+    """
+    robots.txt interpretado según RFC 9309: si no existe (4xx) todo está
+    permitido; si el servidor falla (5xx) o no responde, nada lo está.
+    """
+
+    def __init__(self, url: str, texto: str = '', estado_http: int = 200, agente: str = '*'):
+        self.url = url
+        self.estado_http = estado_http
+        self.agente = agente
+        self.parser = RobotFileParser(url)
+        if estado_http == 0 or estado_http >= 500:
+            self.parser.disallow_all = True
+        elif estado_http >= 400:
+            self.parser.allow_all = True
+        else:
+            self.parser.parse(texto.splitlines())
+
+    def permitido(self, url: str) -> bool:
+        return self.parser.can_fetch(self.agente, url)
+
+    @property
+    def sitemaps(self) -> List[str]:
+        return list(self.parser.site_maps() or [])
+
+    @property
+    def crawl_delay(self) -> Optional[float]:
+        demora = self.parser.crawl_delay(self.agente)
+        return float(demora) if demora is not None else None
+
+
+class EstadoDescubrimiento:
+    """
+    Estado incremental en un archivo JSON: por cada URL (o lista) su lastmod,
+    ETag/Last-Modified y la fecha de la última visita. Los documentos
+    entregados quedan `pendiente` hasta que el consumidor los confirma.
+    guardar() reescribe el archivo de forma atómica; es seguro entre hilos.
+    """
+
+    def __init__(self, ruta: Optional[str] = DESCUBRIMIENTO_ESTADO):
+        self.ruta = ruta
+        self.registros: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if ruta and os.path.exists(ruta):
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    self.registros = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Estado de descubrimiento ilegible ({ruta}), se empieza de cero: {e}")
+
+    def obtener(self, clave: str) -> Dict[str, Any]:
+        return self.registros.get(clave) or {}
+
+    def cambio(self, clave: str, lastmod: Optional[str], revisita_dias: Optional[float] = None) -> bool:
+        """
+        True si nunca se vio, si su lastmod cambió o, sin lastmod, si la última
+        visita es más antigua que `revisita_dias` (None: no se revisita).
+        """
+        registro = self.registros.get(clave)
+        if registro is None:
+            return True
+        if lastmod:
+            return lastmod != registro.get('lastmod')
+        if revisita_dias is None:
+            return False
+        try:
+            visita = datetime.fromisoformat(registro['visitado'])
+        except (KeyError, TypeError, ValueError):
+            return True
+        return datetime.now() - visita > timedelta(days=revisita_dias)
+
+    def marcar(self, clave: str, lastmod: Optional[str] = None, **campos):
+        with self._lock:
+            registro = self.registros.setdefault(clave, {})
+            registro.update({campo: valor for campo, valor in campos.items() if valor is not None})
+            if lastmod:
+                registro['lastmod'] = lastmod
+            registro['visitado'] = datetime.now().isoformat(timespec='seconds')
+
+    def pendiente(self, clave: str, **datos):
+        """Documento entregado y aún sin confirmar: se vuelve a entregar en la próxima ejecución."""
+        with self._lock:
+            self.registros.setdefault(clave, {})['pendiente'] = {
+                campo: valor for campo, valor in datos.items() if valor is not None
+            }
+
+    def confirmar(self, clave: str, lastmod: Optional[str] = None, **campos):
+        """El consumidor procesó el documento: desde ahora solo vuelve si cambia su lastmod."""
+        self.marcar(clave, lastmod, tipo='documento', **campos)
+        with self._lock:
+            self.registros[clave].pop('pendiente', None)
+
+    def pendientes(self) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            return [(clave, dict(registro['pendiente'])) for clave, registro in self.registros.items()
+                    if registro.get('pendiente') is not None]
+
+    def guardar(self):
+        if not self.ruta:
+            return
+        directorio = os.path.dirname(self.ruta) or '.'
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix='.descubrimiento-')
+        with self._lock:
+            contenido = json.dumps(self.registros, ensure_ascii=False)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        os.replace(temporal, self.ruta)
+
+
+def parsear_sitemap(contenido: bytes) -> Tuple[Optional[str], List[Tuple[str, Optional[str]]]]:
+    """
+    Tipo de la raíz ('sitemapindex' o 'urlset') y las entradas (loc, lastmod).
+    Se recorre con iterparse liberando cada entrada: un sitemap de 50 MB no
+    queda completo como árbol en memoria.
+    """
+    if contenido[:2] == b'\x1f\x8b':
+        contenido = gzip.decompress(contenido)
+    raiz, entradas = None, []
+    loc = lastmod = None
+    try:
+        for evento, elemento in ET.iterparse(io.BytesIO(contenido), events=('start', 'end')):
+            nombre = elemento.tag.rsplit('}', 1)[-1]
+            if evento == 'start':
+                raiz = raiz or nombre
+                continue
+            if nombre == 'loc':
+                loc = (elemento.text or '').strip()
+            elif nombre == 'lastmod':
+                lastmod = (elemento.text or '').strip() or None
+            elif nombre in ('url', 'sitemap'):
+                if loc:
+                    entradas.append((loc, lastmod))
+                loc = lastmod = None
+                elemento.clear()
+    except ET.ParseError as e:
+        logger.warning(f"Sitemap con XML inválido: {e}")
+    return raiz, entradas
+
+
+def _resultados(datos: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Filas de una respuesta OData de SharePoint (odata=nometadata o verbose)."""
+    return datos.get('value') or (datos.get('d') or {}).get('results') or []
+
+
+def _siguiente(datos: Dict[str, Any]) -> Optional[str]:
+    return datos.get('odata.nextLink') or datos.get('@odata.nextLink') or (datos.get('d') or {}).get('__next')
+
+
+def titulo_desde_url(url: str) -> str:
+    nombre = unquote(urlparse(url).path.rsplit('/', 1)[-1])
+    return os.path.splitext(nombre)[0].replace('_', ' ').replace('-', ' ').strip() or "Sin título"
+
+
+class Descubridor:
+    """
+    Descubre documentos con las fuentes estructuradas del sitio en lugar de
+    rastrear a ciegas: los sitemaps declarados en robots.txt (o /sitemap.xml)
+    con sus índices y lastmod, y las bibliotecas de documentos de SharePoint
+    vía `_api`. En modo incremental solo se piden los sitemaps, páginas y
+    listas cuyo lastmod cambió (los sitemaps, además, con If-None-Match) y
+    solo se entregan los documentos nuevos o modificados.
+
+    Un documento entregado no cuenta como visto hasta que el consumidor llama
+    a confirmar() tras descargarlo o cargarlo: los que fallan, o quedan fuera
+    por el objetivo, se vuelven a entregar en la próxima ejecución aunque su
+    sitemap, página o lista no haya cambiado.
+    """
+
+    def __init__(self, scraper, base_url: str, es_documento: Callable[[str], bool],
+                 estado: Optional[EstadoDescubrimiento] = None, incremental: bool = True,
+                 sitios_sharepoint: Optional[List[str]] = None, revisita_dias: float = DESCUBRIMIENTO_REVISITA_DIAS):
+        self.scraper = scraper
+        self.base_url = base_url.rstrip('/')
+        self.es_documento = es_documento
+        self.estado = estado if estado is not None else EstadoDescubrimiento()
+        self.incremental = incremental
+        self.sitios_sharepoint = sitios_sharepoint if sitios_sharepoint is not None else [self.base_url]
+        self.revisita_dias = revisita_dias
+        self.robots: Optional[ReglasRobots] = None
+        self.estadisticas = {
+            'fuentes': 0, 'sitemaps': 0, 'sitemaps_sin_cambios': 0, 'paginas': 0, 'paginas_sin_cambios': 0,
+            'listas': 0, 'listas_sin_cambios': 0, 'documentos': 0, 'documentos_sin_cambios': 0,
+            'documentos_pendientes': 0, 'bloqueadas_robots': 0,
+        }
+
+    def descubrir(self) -> Iterator[Dict[str, Any]]:
+        """Documentos nuevos o modificados; el estado se guarda al terminar (o al abandonar el generador)."""
+        self.robots = self.scraper.robots(self.base_url)
+        entregados = ConjuntoVistos()
+        try:
+            for fuente in (self._pendientes(), self._desde_sitemaps(), self._desde_sharepoint()):
+                for documento in fuente:
+                    if entregados.agregar(documento['url']):
+                        yield documento
+        finally:
+            self.estado.guardar()
+            logger.info(f"Descubrimiento: {self.estadisticas}")
+
+    def confirmar(self, url: str, lastmod: Optional[str] = None, **campos):
+        """Llamar cuando el documento quedó descargado o cargado (o descartado a propósito)."""
+        self.estado.confirmar(canonicalizar_url(url), lastmod, **campos)
+
+    def _pendientes(self) -> Iterator[Dict[str, Any]]:
+        """Documentos entregados en ejecuciones anteriores que el consumidor nunca confirmó."""
+        for clave, datos in self.estado.pendientes():
+            url = datos.get('url') or clave
+            if self._permitido(url):
+                self.estadisticas['documentos_pendientes'] += 1
+                yield self._entrada(url, datos.get('titulo'), datos.get('lastmod'),
+                                    datos.get('pagina_origen') or '', datos.get('fuente') or 'pendiente')
+
+    def _permitido(self, url: str) -> bool:
+        if self.robots is None or self.robots.permitido(url):
+            return True
+        self.estadisticas['bloqueadas_robots'] += 1
+        return False
+
+    def _documento(self, url: str, titulo: Optional[str], lastmod: Optional[str], origen: str,
+                   fuente: str) -> Optional[Dict[str, Any]]:
+        clave = canonicalizar_url(url)
+        if not self._permitido(url):
+            return None
+        if self.incremental and not self.estado.cambio(clave, lastmod):
+            self.estadisticas['documentos_sin_cambios'] += 1
+            return None
+        self.estado.pendiente(clave, url=url, titulo=titulo, lastmod=lastmod, pagina_origen=origen, fuente=fuente)
+        self.estadisticas['documentos'] += 1
+        return self._entrada(url, titulo, lastmod, origen, fuente)
+
+    @staticmethod
+    def _entrada(url: str, titulo: Optional[str], lastmod: Optional[str], origen: str,
+                 fuente: str) -> Dict[str, Any]:
+        return {
+            "url": url,
+            "titulo": titulo or titulo_desde_url(url),
+            "tipo": urlparse(url).path.rsplit('.', 1)[-1].upper(),
+            "pagina_origen": origen,
+            "lastmod": lastmod,
+            "fuente": fuente,
+            "fecha_encontrado": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    # ---------- Sitemaps ----------
+
+    def _leer_sitemap(self, url: str):
+        """(raíz, entradas, cabeceras) o None si no cambió (304) o no se pudo leer."""
+        registro = self.estado.obtener(canonicalizar_url(url)) if self.incremental else {}
+        cabeceras = {'Accept': 'application/xml,text/xml;q=0.9,*/*;q=0.8'}
+        if registro.get('etag'):
+            cabeceras['If-None-Match'] = registro['etag']
+        if registro.get('last_modified'):
+            cabeceras['If-Modified-Since'] = registro['last_modified']
+        respuesta = self.scraper.obtener_respuesta(url, cabeceras, timeout=30)
+        if respuesta is None:
+            return None
+        self.estadisticas['fuentes'] += 1
+        if respuesta.status_code == 304:
+            self.estadisticas['sitemaps_sin_cambios'] += 1
+            return None
+        if respuesta.status_code != 200:
+            logger.info(f"Sitemap no disponible: {url} (Status: {respuesta.status_code})")
+            self.estadisticas['fuentes'] -= 1
+            return None
+        self.estadisticas['sitemaps'] += 1
+        raiz, entradas = parsear_sitemap(respuesta.content)
+        return raiz, entradas, respuesta.headers
+
+    def _desde_sitemaps(self) -> Iterator[Dict[str, Any]]:
+        pendientes = [(url, None) for url in (self.robots.sitemaps if self.robots else [])]
+        pendientes = pendientes or [(urljoin(self.base_url + '/', 'sitemap.xml'), None)]
+        leidos = set()
+        while pendientes and len(leidos) < MAX_SITEMAPS:
+            url, lastmod = pendientes.pop(0)
+            if canonicalizar_url(url) in leidos:
+                continue
+            leidos.add(canonicalizar_url(url))
+            lectura = self._leer_sitemap(url)
+            if lectura is None:
+                continue
+            raiz, entradas, cabeceras = lectura
+
+            for loc, lastmod_entrada in entradas:
+                loc = resolver_url(loc, url)
+                if raiz == 'sitemapindex':
+                    if not self.incremental or self.estado.cambio(canonicalizar_url(loc), lastmod_entrada):
+                        pendientes.append((loc, lastmod_entrada))
+                    else:
+                        self.estadisticas['sitemaps_sin_cambios'] += 1
+                elif self.es_documento(loc):
+                    documento = self._documento(loc, None, lastmod_entrada, url, 'sitemap')
+                    if documento:
+                        yield documento
+                else:
+                    yield from self._pagina(loc, lastmod_entrada)
+            # Se marca después de recorrerlo: si el consumidor se detiene antes, la próxima vez se relee
+            self.estado.marcar(canonicalizar_url(url), lastmod, tipo='sitemap', etag=cabeceras.get('ETag'),
+                               last_modified=cabeceras.get('Last-Modified'))
+
+    def _pagina(self, url: str, lastmod: Optional[str]) -> Iterator[Dict[str, Any]]:
+        """Documentos enlazados desde una página del sitemap, solo si la página cambió."""
+        clave = canonicalizar_url(url)
+        if urlparse(clave).netloc != urlparse(canonicalizar_url(self.base_url)).netloc or not self._permitido(url):
+            return
+        if self.incremental and not self.estado.cambio(clave, lastmod, self.revisita_dias):
+            self.estadisticas['paginas_sin_cambios'] += 1
+            return
+        soup = self.scraper.obtener_pagina(url)
+        self.estadisticas['paginas'] += 1
+        if soup is None:
+            return
+        for enlace in soup.find_all('a', href=True):
+            href = resolver_url(enlace['href'], url)
+            if self.es_documento(href):
+                documento = self._documento(href, enlace.get_text(strip=True) or None, None, url, 'pagina')
+                if documento:
+                    yield documento
+        self.estado.marcar(clave, lastmod, tipo='pagina')
+
+    # ---------- SharePoint ----------
+
+    def _json(self, url: str) -> Optional[Dict[str, Any]]:
+        respuesta = self.scraper.obtener_respuesta(url, {'Accept': 'application/json;odata=nometadata'})
+        if respuesta is None or respuesta.status_code != 200:
+            return None
+        try:
+            return respuesta.json()
+        except ValueError:
+            return None
+
+    def _desde_sharepoint(self) -> Iterator[Dict[str, Any]]:
+        for sitio in self.sitios_sharepoint:
+            sitio = sitio.rstrip('/')
+            api = (f"{sitio}/_api/web/lists?$select=Id,Title,LastItemModifiedDate,ItemCount"
+                   f"&$filter=BaseTemplate eq {PLANTILLA_BIBLIOTECA} and Hidden eq false")
+            if not self._permitido(api):
+                continue
+            datos = self._json(api)
+            if datos is None:
+                logger.info(f"Sin API de listas de SharePoint en {sitio}")
+                continue
+            self.estadisticas['fuentes'] += 1
+
+            for lista in _resultados(datos):
+                clave = f"{sitio}#lista:{lista.get('Id')}"
+                modificada = lista.get('LastItemModifiedDate')
+                if self.incremental and not self.estado.cambio(clave, modificada):
+                    self.estadisticas['listas_sin_cambios'] += 1
+                    continue
+                self.estadisticas['listas'] += 1
+                # Incremental: solo los elementos modificados desde la última lectura de la lista
+                desde = self.estado.obtener(clave).get('lastmod') if self.incremental else None
+                for elemento in self._elementos(sitio, lista.get('Id'), desde):
+                    ruta = elemento.get('FileRef') or ''
+                    url = urljoin(sitio + '/', quote(ruta))
+                    if ruta and self.es_documento(url):
+                        titulo = elemento.get('Title') or os.path.splitext(elemento.get('FileLeafRef') or '')[0]
+                        documento = self._documento(url, titulo or None, elemento.get('Modified'),
+                                                    f"{sitio} · {lista.get('Title')}", 'sharepoint')
+                        if documento:
+                            yield documento
+                self.estado.marcar(clave, modificada, tipo='lista', titulo=lista.get('Title'))
+
+    def _elementos(self, sitio: str, lista_id: str, desde: Optional[str]) -> Iterator[Dict[str, Any]]:
+        filtro = "FSObjType eq 0" + (f" and Modified gt datetime'{desde}'" if desde else '')
+        url = (f"{sitio}/_api/web/lists(guid'{lista_id}')/items?$select=FileRef,FileLeafRef,Title,Modified"
+               f"&$filter={filtro}&$top={SHAREPOINT_LOTE}")
+        while url:
+            datos = self._json(url)
+            if datos is None:
+                return
+            yield from _resultados(datos)
+            url = _siguiente(datos)
@@ -2,17 +2,88 @@
 # Operaciones con ElasticSearch
 import logging
 import math
+import os
+from datetime import datetime
 from elasticsearch import Elasticsearch
-from typing import Optional, Dict, Any, List
+from elasticsearch import helpers as es_helpers
+from typing import Optional, Dict, Any, List, Iterable
+
+from helpers.metricas import anotar, cronometrar
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Alias estable por el que consulta la aplicación. Cada recarga completa crea
+# un índice versionado nuevo (<alias>_vAAAAMMDDHHMMSS) y mueve el alias al final.
+# Los subcampos .keyword mantienen compatibles los filtros y ordenamientos
+# que usan las consultas (tipo.keyword, titulo.keyword, metadatos.categoria.keyword).
+INDICE_ALIAS = os.getenv('ELASTIC_INDEX_ALIAS', 'procuraduria_documentos')
+# Proporción máxima de documentos rechazados en una reindexación completa para exponer el índice nuevo
+ELASTIC_REINDEX_MAX_ERRORES = float(os.getenv('ELASTIC_REINDEX_MAX_ERRORES', '0.05'))
+
+MAPPING_DOCUMENTOS = {
+    "properties": {
+        "numero": {"type": "integer"},
+        "titulo": {"type": "text", "analyzer": "spanish",
+                   "fields": {"keyword": {"type": "keyword", "ignore_above": 512}}},
+        "texto_contenido": {"type": "text", "analyzer": "spanish"},
+        "tipo": {"type": "keyword", "fields": {"keyword": {"type": "keyword"}}},
+        "url_original": {"type": "keyword"},
+        "archivo_local": {"type": "keyword"},
+        "tamano_bytes": {"type": "long"},
+        "tamano_mb": {"type": "float"},
+        "fecha_descarga": {"type": "date", "format": "yyyy-MM-dd HH:mm:ss"},
+        "fuente": {"type": "text"},
+        "estado": {"type": "keyword"},
+        "metadatos": {
+            "properties": {
+                "categoria": {"type": "keyword", "fields": {"keyword": {"type": "keyword"}}},
+                "año": {"type": "integer"},
+                "extension": {"type": "keyword"}
+            }
+        }
+    }
+}
+
+
+def documento_para_indice(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copia del documento de MongoDB con los campos y tipos del mapping (sin _id
+    ni campos internos). Los documentos cargados por scripts antiguos
+    (add_missing_docs.py) no traen todos los campos: se completan con valores
+    vacíos y la categoría plana se lleva a `metadatos`.
+    """
+    metadatos = doc.get('metadatos') or {}
+    tamano_bytes = int(doc.get('tamano_bytes') or 0)
+    return {
+        "numero": int(doc['numero']),
+        "titulo": str(doc.get('titulo') or 'Sin título'),
+        "texto_contenido": str(doc.get('texto_contenido') or ''),
+        "tipo": str(doc.get('tipo') or ''),
+        "url_original": str(doc.get('url_original') or ''),
+        "archivo_local": str(doc.get('archivo_local') or ''),
+        "ruta_completa": str(doc.get('ruta_completa') or ''),
+        "tamano_bytes": tamano_bytes,
+        "tamano_mb": tamano_bytes / 1024.0 / 1024.0,
+        "archivo_existe": bool(doc.get('archivo_existe')),
+        "fecha_descarga": str(doc['fecha_descarga']) if doc.get('fecha_descarga') else None,
+        "fuente": str(doc.get('fuente') or ''),
+        "proyecto": str(doc.get('proyecto') or ''),
+        "estado": str(doc.get('estado') or 'disponible'),
+        "metadatos": {
+            "extension": str(metadatos.get('extension') or str(doc.get('tipo') or '').lower()),
+            "categoria": str(metadatos.get('categoria') or doc.get('categoria') or 'Otros Documentos'),
+            "año": int(metadatos['año']) if metadatos.get('año') else None
+        }
+    }
+
+
 class ElasticSearch:
-    def __init__(self, url: str = '', api_key: str = ''):
+    def __init__(self, url: str = '', api_key: str = '', alias: str = INDICE_ALIAS):
         self.url = url
         self.api_key = api_key
+        self.alias = alias
         self.client: Optional[Elasticsearch] = None
         if url and api_key:
             self._connect()
@@ -46,10 +117,13 @@ class ElasticSearch:
         except Exception:
             return False
 
-    def buscar_documentos(self, query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str) -> Dict[str, Any]:
+    @cronometrar('elasticsearch')
+    def buscar_documentos(self, query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str,
+                          limite_conteo: Optional[int] = None) -> Dict[str, Any]:
         """
         Búsqueda avanzada usando ElasticSearch.
         Retorna un diccionario con los resultados y metadatos.
+        Con `limite_conteo` el total se cuenta hasta ese valor (total_relacion='gte').
         """
         if not self.client:
             raise Exception("Cliente de ElasticSearch no inicializado")
@@ -98,11 +172,12 @@ class ElasticSearch:
         
         try:
             resultado = self.client.search(
-                index='procuraduria_documentos',
+                index=self.alias,
                 query=es_query,
                 from_=from_doc,
                 size=por_pagina,
                 sort=sort_config,
+                track_total_hits=limite_conteo or True,
                 highlight={
                     'fields': {
                         'titulo': {},
@@ -111,6 +186,8 @@ class ElasticSearch:
                 }
             )
             
+            anotar('elasticsearch_servidor', resultado.get('took', 0))
+
             # Procesar resultados
             documentos = []
             for hit in resultado['hits']['hits']:
@@ -125,12 +202,14 @@ class ElasticSearch:
                 documentos.append(doc)
             
             total = resultado['hits']['total']['value']
+            total_relacion = resultado['hits']['total']['relation']
             total_paginas = math.ceil(total / por_pagina)
             
             return {
                 'exito': True,
                 'documentos': documentos,
                 'total': total,
+                'total_relacion': total_relacion,
                 'pagina': pagina,
                 'por_pagina': por_pagina,
                 'total_paginas': total_paginas,
@@ -141,10 +220,13 @@ class ElasticSearch:
             logger.error(f"Error en búsqueda ElasticSearch: {e}")
             raise e
 
-    def buscar_con_agregaciones(self, query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str) -> Dict[str, Any]:
+    @cronometrar('elasticsearch')
+    def buscar_con_agregaciones(self, query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str,
+                                limite_conteo: Optional[int] = None) -> Dict[str, Any]:
         """
         Búsqueda avanzada con agregaciones para filtros dinámicos.
         Incluye conteos por categoría, tipo y año.
+        Con `limite_conteo` el total se cuenta hasta ese valor (total_relacion='gte').
         """
         if not self.client:
             raise Exception("Cliente de ElasticSearch no inicializado")
@@ -191,11 +273,12 @@ class ElasticSearch:
         
         try:
             resultado = self.client.search(
-                index='procuraduria_documentos',
+                index=self.alias,
                 query=es_query,
                 from_=from_doc,
                 size=por_pagina,
                 sort=sort_config,
+                track_total_hits=limite_conteo or True,
                 highlight={
                     'fields': {
                         'titulo': {
@@ -233,6 +316,8 @@ class ElasticSearch:
                 }
             )
             
+            anotar('elasticsearch_servidor', resultado.get('took', 0))
+
             # Procesar resultados
             documentos = []
             for hit in resultado['hits']['hits']:
@@ -261,6 +346,7 @@ class ElasticSearch:
                 documentos.append(doc)
             
             total = resultado['hits']['total']['value']
+            total_relacion = resultado['hits']['total']['relation']
             total_paginas = math.ceil(total / por_pagina)
             
             # Procesar agregaciones
@@ -287,6 +373,7 @@ class ElasticSearch:
                 'exito': True,
                 'documentos': documentos,
                 'total': total,
+                'total_relacion': total_relacion,
                 'pagina': pagina,
                 'por_pagina': por_pagina,
                 'total_paginas': total_paginas,
@@ -298,6 +385,7 @@ class ElasticSearch:
             logger.error(f"Error en búsqueda con agregaciones: {e}")
             raise e
 
+    @cronometrar('elasticsearch')
     def obtener_sugerencias(self, query: str, limit: int = 5) -> List[str]:
         """
         Obtiene sugerencias de autocompletado basadas en títulos.
@@ -307,7 +395,7 @@ class ElasticSearch:
         
         try:
             resultado = self.client.search(
-                index='procuraduria_documentos',
+                index=self.alias,
                 query={
                     'match': {
                         'titulo': {
@@ -331,3 +419,258 @@ class ElasticSearch:
         except Exception as e:
             logger.error(f"Error al obtener sugerencias: {e}")
             return []
+
+    # ========== REINDEXACIÓN BLUE/GREEN ==========
+
+    def crear_indice_versionado(self) -> str:
+        """
+        Crea un índice nuevo con configuración para carga masiva
+        (sin réplicas y sin refresco automático) y retorna su nombre.
+        """
+        if not self.client:
+            raise Exception("Cliente de ElasticSearch no inicializado")
+
+        nombre = f"{self.alias}_v{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        self.client.indices.create(
+            index=nombre,
+            mappings=MAPPING_DOCUMENTOS,
+            settings={
+                "number_of_shards": 1,
+                "number_of_replicas": 0,
+                "refresh_interval": "-1"
+            }
+        )
+        logger.info(f"Índice versionado '{nombre}' creado")
+        return nombre
+
+    def indexar_lote(self, indice: str, documentos: Iterable[Dict[str, Any]], tamano_lote: int = 500,
+                     fallidos: Optional[List[int]] = None) -> tuple[int, int]:
+        """
+        Indexa documentos con la API bulk. Cada documento debe traer 'numero'.
+        Retorna (exitosos, errores); en `fallidos` se agregan los números que no se indexaron.
+        """
+        if not self.client:
+            raise Exception("Cliente de ElasticSearch no inicializado")
+
+        acciones = (
+            {'_index': indice, '_id': f"doc_{doc['numero']}", '_source': doc}
+            for doc in documentos
+        )
+        exitosos = 0
+        errores = 0
+        for ok, item in es_helpers.streaming_bulk(self.client, acciones, chunk_size=tamano_lote,
+                                                  raise_on_error=False, max_retries=3):
+            if ok:
+                exitosos += 1
+            else:
+                errores += 1
+                logger.error(f"Error al indexar en '{indice}': {item}")
+                if fallidos is not None:
+                    identificador = next(iter(item.values()), {}).get('_id', '')
+                    if identificador.startswith('doc_'):
+                        fallidos.append(int(identificador[4:]))
+        return exitosos, errores
+
+    def activar_indice(self, indice: str, replicas: int = 1):
+        """
+        Restaura la configuración de servicio (réplicas y refresco), refresca
+        y calienta el índice antes de exponerlo por el alias.
+        """
+        self.client.indices.put_settings(
+            index=indice,
+            settings={"index": {"number_of_replicas": replicas, "refresh_interval": None}}
+        )
+        self.client.indices.refresh(index=indice)
+        self.client.indices.forcemerge(index=indice, max_num_segments=1)
+        self.client.cluster.health(index=indice, wait_for_status='yellow', timeout='60s')
+        self._calentar_indice(indice)
+
+    def _calentar_indice(self, indice: str):
+        """Ejecuta las consultas típicas de la aplicación para cargar cachés y ordinales."""
+        try:
+            self.client.search(
+                index=indice,
+                size=10,
+                query={'multi_match': {'query': 'procuraduria', 'fields': ['titulo^3', 'texto_contenido', 'tipo^2']}},
+                sort=['_score'],
+                aggs={
+                    'por_categoria': {'terms': {'field': 'metadatos.categoria', 'size': 20}},
+                    'por_tipo': {'terms': {'field': 'tipo', 'size': 10}},
+                    'por_año': {'terms': {'field': 'metadatos.año', 'size': 10}}
+                }
+            )
+            self.client.search(index=indice, size=10, sort=[{'fecha_descarga': {'order': 'desc'}}])
+        except Exception as e:
+            logger.warning(f"No se pudo calentar el índice '{indice}': {e}")
+
+    def indices_del_alias(self) -> List[str]:
+        """Índices a los que apunta actualmente el alias."""
+        if not self.client.indices.exists_alias(name=self.alias):
+            return []
+        return list(self.client.indices.get_alias(name=self.alias).keys())
+
+    def es_indice_legado(self) -> bool:
+        """True si el nombre del alias lo ocupa un índice concreto (esquema anterior a los alias)."""
+        return bool(self.client.indices.exists(index=self.alias)) and not self.client.indices.exists_alias(name=self.alias)
+
+    def cambiar_alias(self, indice: str, reemplazar_legado: bool = False):
+        """
+        Mueve el alias al índice indicado en una sola operación atómica.
+        Si existe un índice concreto con el nombre del alias (esquema anterior)
+        solo se elimina, en la misma operación, con `reemplazar_legado`: el
+        llamador garantiza que `indice` ya tiene sus documentos. Si no, se
+        rechaza el cambio sin tocar nada.
+        """
+        acciones = [{'remove': {'index': actual, 'alias': self.alias}}
+                    for actual in self.indices_del_alias() if actual != indice]
+        if self.es_indice_legado():
+            if not reemplazar_legado:
+                raise Exception(f"'{self.alias}' es un índice concreto con datos: se copia primero "
+                                f"(asegurar_alias) o se hace una reindexación completa (reindexar_completo)")
+            logger.warning(f"Reemplazando el índice concreto '{self.alias}' por un alias")
+            acciones.append({'remove_index': {'index': self.alias}})
+        acciones.append({'add': {'index': indice, 'alias': self.alias}})
+        self.client.indices.update_aliases(actions=acciones)
+        logger.info(f"Alias '{self.alias}' apunta ahora a '{indice}'")
+
+    def limpiar_versiones_antiguas(self, conservar: int = 1) -> List[str]:
+        """
+        Elimina índices versionados que ya no están detrás del alias,
+        conservando los `conservar` más recientes para poder hacer rollback.
+        """
+        activos = set(self.indices_del_alias())
+        versiones = sorted(
+            (nombre for nombre in self.client.indices.get(index=f"{self.alias}_v*").keys()
+             if nombre not in activos),
+            reverse=True
+        )
+        eliminados = versiones[conservar:]
+        for nombre in eliminados:
+            self.client.indices.delete(index=nombre)
+            logger.info(f"Índice antiguo '{nombre}' eliminado")
+        return eliminados
+
+    def reindexar_completo(self, documentos: Iterable[Dict[str, Any]], replicas: int = 1, conservar: int = 1,
+                           max_errores: float = ELASTIC_REINDEX_MAX_ERRORES) -> Dict[str, Any]:
+        """
+        Reconstrucción completa sin impacto en las consultas: indexa en un
+        índice versionado nuevo, lo activa y calienta, cambia el alias y
+        elimina las versiones antiguas. Si algo falla, o la proporción de
+        documentos rechazados supera `max_errores`, el índice nuevo se
+        elimina y el alias sigue en el actual.
+        """
+        indice = self.crear_indice_versionado()
+        fallidos: List[int] = []
+        try:
+            exitosos, errores = self.indexar_lote(indice, documentos, fallidos=fallidos)
+            if exitosos == 0:
+                raise Exception("No se indexó ningún documento")
+            if errores / (exitosos + errores) > max_errores:
+                raise Exception(f"{errores} de {exitosos + errores} documentos rechazados "
+                                f"(máximo {max_errores:.0%}): se conserva el índice actual")
+            self.activar_indice(indice, replicas)
+        except Exception:
+            logger.error(f"Reindexación fallida, eliminando '{indice}'")
+            self.client.indices.delete(index=indice, ignore_unavailable=True)
+            raise
+
+        # Una reindexación completa trae todos los documentos: puede reemplazar un índice concreto anterior
+        self.cambiar_alias(indice, reemplazar_legado=True)
+        eliminados = self.limpiar_versiones_antiguas(conservar)
+        return {
+            'indice': indice,
+            'alias': self.alias,
+            'exitosos': exitosos,
+            'errores': errores,
+            'fallidos': fallidos,
+            'eliminados': eliminados
+        }
+
+    # ========== CARGA INCREMENTAL ==========
+
+    def asegurar_alias(self, replicas: int = 1) -> str:
+        """
+        Retorna el índice detrás del alias. Si aún no existe, crea un índice
+        versionado ya activo (con refresco) y le apunta el alias, para que las
+        cargas incrementales nunca creen un índice con mapping dinámico. Si el
+        nombre lo ocupa un índice concreto (despliegues anteriores) sus
+        documentos se copian antes al índice nuevo con _reindex; si la copia
+        falla o queda incompleta no se elimina nada y se lanza una excepción
+        que pide una reindexación completa.
+        """
+        if not self.client:
+            raise Exception("Cliente de ElasticSearch no inicializado")
+
+        indices = self.indices_del_alias()
+        if indices:
+            return indices[0]
+        indice = self.crear_indice_versionado()
+        legado = self.es_indice_legado()
+        try:
+            if legado:
+                self._copiar_indice_legado(indice)
+            self.client.indices.put_settings(
+                index=indice,
+                settings={"index": {"number_of_replicas": replicas, "refresh_interval": None}}
+            )
+            self.cambiar_alias(indice, reemplazar_legado=legado)
+        except Exception:
+            self.client.indices.delete(index=indice, ignore_unavailable=True)
+            raise
+        return indice
+
+    def _copiar_indice_legado(self, indice: str):
+        """Copia el índice concreto con el nombre del alias a `indice` y verifica que no falte ninguno."""
+        logger.warning(f"'{self.alias}' es un índice concreto: copiando sus documentos a '{indice}'...")
+        esperados = self.client.count(index=self.alias)['count']
+        try:
+            resultado = self.client.options(request_timeout=3600).reindex(
+                source={'index': self.alias}, dest={'index': indice}, wait_for_completion=True, refresh=True)
+            copiados = self.client.count(index=indice)['count']
+        except Exception as e:
+            raise Exception(f"No se pudo copiar el índice '{self.alias}' ({e}); no se eliminó nada. "
+                            f"Haga una reindexación completa desde MongoDB (reindexar_completo)") from e
+        if resultado.get('failures') or copiados < esperados:
+            raise Exception(f"Copia incompleta de '{self.alias}' ({copiados} de {esperados} documentos); no se "
+                            f"eliminó nada. Haga una reindexación completa desde MongoDB (reindexar_completo)")
+        logger.info(f"{copiados} documentos copiados de '{self.alias}' a '{indice}'")
+
+    def indexar_incremental(self, documentos: Iterable[Dict[str, Any]], refrescar: bool = True,
+                            fallidos: Optional[List[int]] = None) -> tuple[int, int]:
+        """
+        Indexa un lote sobre el índice activo (a través del alias). Con
+        `refrescar` los documentos quedan buscables al retornar.
+        Retorna (exitosos, errores).
+        """
+        exitosos, errores = self.indexar_lote(self.alias, documentos, fallidos=fallidos)
+        if refrescar and exitosos:
+            self.client.indices.refresh(index=self.alias)
+        return exitosos, errores
+
+    def eliminar_documentos(self, numeros: Iterable[int]) -> tuple[int, int]:
+        """
+        Elimina documentos del índice activo por número con la API bulk.
+        Los que ya no estaban no cuentan como error. Retorna (eliminados, errores).
+        """
+        if not self.client:
+            raise Exception("Cliente de ElasticSearch no inicializado")
+
+        acciones = ({'_op_type': 'delete', '_index': self.alias, '_id': f"doc_{numero}"} for numero in numeros)
+        eliminados = 0
+        errores = 0
+        for ok, item in es_helpers.streaming_bulk(self.client, acciones, chunk_size=500,
+                                                  raise_on_error=False, max_retries=3):
+            if ok:
+                eliminados += 1
+            elif item.get('delete', {}).get('status') != 404:
+                errores += 1
+                logger.error(f"Error al eliminar de '{self.alias}': {item}")
+        return eliminados, errores
+
+    def numeros_indexados(self) -> set:
+        """Números de todos los documentos del índice activo (recorrido con scroll, sin _source)."""
+        if not self.client:
+            raise Exception("Cliente de ElasticSearch no inicializado")
+        return {int(hit['_id'][4:]) for hit in es_helpers.scan(self.client, index=self.alias, _source=False,
+                                                                 query={'query': {'match_all': {}}})
+                if hit['_id'].startswith('doc_')}
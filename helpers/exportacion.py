@@ -0,0 +1,193 @@
+# helpers/exportacion.py
+# Exportación de documentos en streaming (NDJSON, CSV, Parquet) con memoria constante
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List
+
+from bson import ObjectId
+
+from helpers.respuestas_http import serializar_json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORMATOS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Campos por defecto: metadatos livianos (el texto completo se pide explícitamente)
+CAMPOS_EXPORTACION = ['numero', 'titulo', 'tipo', 'metadatos.categoria', 'metadatos.año',
+                      'fecha_descarga', 'tamano_mb', 'url_original']
+
+# Tipos Parquet de los campos conocidos; el resto se exporta como texto
+TIPOS_PARQUET = {
+    'numero': 'int64',
+    'tamano_bytes': 'int64',
+    'tamano_mb': 'float64',
+    'metadatos.año': 'int64',
+    'revision': 'int64',
+    'texto_longitud': 'int64',
+}
+
+
+def obtener_campo(documento: Dict[str, Any], ruta: str) -> Any:
+    """Valor de un campo con notación de puntos ('metadatos.categoria')."""
+    valor: Any = documento
+    for parte in ruta.split('.'):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(parte)
+    return valor
+
+
+def _a_texto(valor: Any) -> Any:
+    """Representación plana para CSV/Parquet."""
+    if valor is None or isinstance(valor, (str, int, float, bool)):
+        return valor
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return serializar_json(valor).decode('utf-8')
+
+
+def generar_ndjson(documentos: Iterable[Dict[str, Any]], tamano_bloque: int = 500) -> Iterator[bytes]:
+    """Un documento JSON por línea, emitido en bloques de `tamano_bloque` documentos."""
+    bloque: List[bytes] = []
+    for documento in documentos:
+        bloque.append(serializar_json(documento))
+        if len(bloque) >= tamano_bloque:
+            yield b'\n'.join(bloque) + b'\n'
+            bloque = []
+    if bloque:
+        yield b'\n'.join(bloque) + b'\n'
+
+
+def generar_csv(documentos: Iterable[Dict[str, Any]], campos: List[str], tamano_bloque: int = 500) -> Iterator[bytes]:
+    """CSV con encabezado; los campos anidados se aplanan con notación de puntos."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para que Excel detecte UTF-8 (tildes y eñes)
+    buffer.write('\ufeff')
+    escritor.writerow(campos)
+
+    filas = 0
+    for documento in documentos:
+        escritor.writerow([_a_texto(obtener_campo(documento, campo)) for campo in campos])
+        filas += 1
+        if filas % tamano_bloque == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _SalidaIncremental(io.RawIOBase):
+    """Archivo de solo escritura cuyo contenido se drena tras cada grupo de filas."""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self._posicion = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self) -> int:
+        return self._posicion
+
+    def drenar(self) -> bytes:
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _coaccionar(valor: Any, tipo: str) -> Any:
+    if valor is None:
+        return None
+    try:
+        if tipo == 'int64':
+            return int(valor)
+        if tipo == 'float64':
+            return float(valor)
+    except (TypeError, ValueError):
+        return None
+    return _a_texto(valor) if not isinstance(valor, str) else valor
+
+
+def generar_parquet(documentos: Iterable[Dict[str, Any]], campos: List[str], tamano_bloque: int = 5000) -> Iterator[bytes]:
+    """
+    Parquet escrito grupo de filas por grupo de filas: cada bloque de
+    documentos se convierte en un row group y sus bytes se emiten de inmediato.
+    Requiere pyarrow.
+    """
+    if pa is None:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+
+    tipos = {campo: TIPOS_PARQUET.get(campo, 'string') for campo in campos}
+    esquema = pa.schema([(campo, pa.type_for_alias(tipo)) for campo, tipo in tipos.items()])
+    salida = _SalidaIncremental()
+    escritor = pq.ParquetWriter(salida, esquema, compression='zstd')
+
+    def escribir(filas: Dict[str, List[Any]]):
+        escritor.write_table(pa.table(filas, schema=esquema))
+
+    try:
+        columnas: Dict[str, List[Any]] = {campo: [] for campo in campos}
+        filas = 0
+        for documento in documentos:
+            for campo in campos:
+                columnas[campo].append(_coaccionar(obtener_campo(documento, campo), tipos[campo]))
+            filas += 1
+            if filas % tamano_bloque == 0:
+                escribir(columnas)
+                columnas = {campo: [] for campo in campos}
+                yield salida.drenar()
+        if filas % tamano_bloque:
+            escribir(columnas)
+    finally:
+        escritor.close()
+    yield salida.drenar()
+
+
+def exportar(documentos: Iterable[Dict[str, Any]], formato: str, campos: List[str]) -> Iterator[bytes]:
+    """Generador de bytes del formato pedido ('ndjson', 'csv' o 'parquet')."""
+    if formato == 'ndjson':
+        return generar_ndjson(documentos)
+    if formato == 'csv':
+        return generar_csv(documentos, campos)
+    if formato == 'parquet':
+        return generar_parquet(documentos, campos)
+    raise ValueError(f"Formato no soportado: {formato}")
+
+
+def parsear_campos(valor: Any) -> List[str]:
+    """
+    Lista de campos desde 'a,b,c' o una lista JSON; vacía si no se indicó.
+    ValueError si el JSON es inválido o la lista tiene elementos que no son texto.
+    """
+    if not valor:
+        return []
+    if isinstance(valor, str):
+        valor = json.loads(valor) if valor.startswith('[') else valor.split(',')
+    if not isinstance(valor, list) or not all(isinstance(campo, str) for campo in valor):
+        raise ValueError("Los campos deben ser una lista de textos")
+    return [campo.strip() for campo in valor if campo.strip()]
@@ -5,7 +5,7 @@ import zipfile
 import requests
 import logging
 from pathlib import Path
-from typing import Optional, List, Union
+from typing import BinaryIO, Optional, List, Union
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -65,6 +65,11 @@ class Funciones:
             
             archivos_extraidos = []
             with zipfile.ZipFile(archivo_zip, 'r') as zip_ref:
+                # Límites de tamaño y compresión antes de escribir nada (zip bombs)
+                from helpers.ingesta_zip import revisar_zip
+                _, omitidos = revisar_zip(zip_ref, extensiones=None)
+                if omitidos:
+                    raise ValueError(f"Miembros rechazados: {omitidos[:5]}")
                 zip_ref.extractall(destino)
                 archivos_extraidos = zip_ref.namelist()
             
@@ -102,7 +107,7 @@ class Funciones:
     
     # ========== FUNCIONES PARA PLN Y OCR ==========
     
-    def extraer_texto_pdf(self, ruta_pdf: str) -> Optional[str]:
+    def extraer_texto_pdf(self, ruta_pdf: Union[str, BinaryIO]) -> Optional[str]:
         """Extrae texto de un archivo PDF."""
         try:
             from pypdf import PdfReader
@@ -120,7 +125,7 @@ class Funciones:
             logger.error(f"Error al extraer texto de PDF {ruta_pdf}: {e}")
             return None
 
-    def extraer_texto_docx(self, ruta_docx: str) -> Optional[str]:
+    def extraer_texto_docx(self, ruta_docx: Union[str, BinaryIO]) -> Optional[str]:
         """Extrae texto de un archivo DOCX."""
         try:
             import docx
@@ -135,12 +140,15 @@ class Funciones:
             logger.error(f"Error al extraer texto de DOCX {ruta_docx}: {e}")
             return None
             
-    def extraer_texto_archivo(self, ruta_archivo: str) -> Optional[str]:
-        """Función wrapper para extraer texto según la extensión."""
+    def extraer_texto_archivo(self, ruta_archivo: str, extension: Optional[str] = None) -> Optional[str]:
+        """
+        Función wrapper para extraer texto según la extensión. `extension`
+        (p. ej. '.pdf') sirve para rutas sin sufijo, como las del almacén de archivos.
+        """
         if not os.path.exists(ruta_archivo):
             return None
             
-        ext = Path(ruta_archivo).suffix.lower()
+        ext = (extension or Path(ruta_archivo).suffix).lower()
         
         if ext == '.pdf':
             return self.extraer_texto_pdf(ruta_archivo)
@@ -153,3 +161,17 @@ class Funciones:
         else:
             logger.warning(f"Formato no soportado para extracción: {ext}")
             return None
+
+    def extraer_texto_stream(self, flujo: BinaryIO, extension: str) -> Optional[str]:
+        """
+        Extrae texto de un archivo ya abierto (con seek), como un miembro de
+        un ZIP copiado a un temporal, sin escribirlo a disco.
+        """
+        ext = (extension or '').lower()
+        if ext == '.pdf':
+            return self.extraer_texto_pdf(flujo)
+        elif ext == '.docx':
+            return self.extraer_texto_docx(flujo)
+        else:
+            logger.warning(f"Formato no soportado para extracción: {ext}")
+            return None
@@ -0,0 +1,281 @@
+# helpers/indices.py
+# Registro declarativo de índices de MongoDB: creación idempotente, reporte de uso y verificación con explain()
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import IndexModel
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Opciones que cambian la semántica de un índice y deben coincidir con las declaradas
+OPCIONES_COMPARADAS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
+
+
+class IndiceIncompatible(Exception):
+    """Un índice existente tiene el nombre o las claves de uno declarado pero otra especificación."""
+
+
+class IndiceDeclarado:
+    """Índice requerido por una colección y la consulta que lo justifica."""
+
+    def __init__(self, nombre: str, claves: List[Tuple[str, int]], motivo: str, **opciones: Any):
+        self.nombre = nombre
+        self.claves = claves
+        self.motivo = motivo
+        self.opciones = opciones
+
+    def modelo(self) -> IndexModel:
+        return IndexModel(self.claves, name=self.nombre, **self.opciones)
+
+    def diferencias(self, informacion: Dict[str, Any]) -> List[str]:
+        """Diferencias entre la declaración y un índice existente (index_information())."""
+        diferencias = []
+        if _claves(informacion) != tuple(self.claves):
+            diferencias.append(f"claves {list(_claves(informacion))} != {self.claves}")
+        for opcion in OPCIONES_COMPARADAS:
+            actual, declarada = informacion.get(opcion), self.opciones.get(opcion)
+            if opcion in ('unique', 'sparse'):
+                actual, declarada = bool(actual), bool(declarada)
+            elif isinstance(actual, dict):
+                actual = dict(actual)
+            if actual != declarada:
+                diferencias.append(f"{opcion} {actual!r} != {declarada!r}")
+        return diferencias
+
+
+class FormaConsulta:
+    """Forma de consulta de la aplicación que debe resolverse con un índice."""
+
+    def __init__(self, nombre: str, filtro: Dict[str, Any], orden: Optional[List[Tuple[str, int]]] = None):
+        self.nombre = nombre
+        self.filtro = filtro
+        self.orden = orden
+
+
+# Igualdad (categoría, tipo) antes del campo de orden: el sort por fecha sale del índice
+INDICES_DOCUMENTOS = [
+    IndiceDeclarado('numero_1', [('numero', 1)],
+                    'obtener_documento_por_numero, lotes $in y cargas incrementales'),
+    IndiceDeclarado('categoria_tipo_fecha', [('metadatos.categoria', 1), ('tipo', 1), ('fecha_descarga', -1)],
+                    'filtros por categoría (+ tipo) ordenados por fecha'),
+    IndiceDeclarado('tipo_fecha', [('tipo', 1), ('fecha_descarga', -1)],
+                    'filtro solo por tipo ordenado por fecha'),
+    IndiceDeclarado('fecha_descarga_1', [('fecha_descarga', 1)],
+                    'navegación sin filtros y documentos recientes (se recorre en ambos sentidos)'),
+    IndiceDeclarado('titulo_1', [('titulo', 1)],
+                    'orden por título'),
+    IndiceDeclarado('actualizado_id', [('actualizado_en', 1), ('_id', 1)],
+                    'sondeo de la sincronización con ElasticSearch (marca fecha + _id)'),
+    IndiceDeclarado('carga_origen', [('carga', 1), ('origen.zip', 1)],
+                    'miembros ya guardados al reintentar la expansión de un ZIP cargado',
+                    partialFilterExpression={'carga': {'$exists': True}}),
+    IndiceDeclarado('archivo_sha256', [('archivo.sha256', 1)],
+                    'deduplicación por contenido de los miembros de un ZIP', sparse=True),
+]
+
+INDICES_USUARIOS = [
+    IndiceDeclarado('username_1', [('username', 1)], 'login y unicidad de usuario', unique=True),
+    IndiceDeclarado('email_1', [('email', 1)], 'unicidad de correo', unique=True),
+    IndiceDeclarado('user_id_1', [('user_id', 1)], 'CRUD por identificador', unique=True),
+]
+
+INDICES_TEXTOS = [
+    IndiceDeclarado('numero_1', [('numero', 1)], 'texto completo del detalle y lotes $in', unique=True),
+]
+
+# Arriendo: igualdad por estado y rango por disponible_en (también el orden)
+INDICES_COLA = [
+    IndiceDeclarado('tipo_numero', [('tipo', 1), ('numero', 1)], 'una tarea por documento y tipo (encolar)',
+                    unique=True),
+    IndiceDeclarado('estado_disponible', [('estado', 1), ('disponible_en', 1)], 'arrendar la siguiente tarea'),
+    IndiceDeclarado('estado_arriendo', [('estado', 1), ('arrendada_hasta', 1)], 'recuperar arriendos vencidos'),
+    IndiceDeclarado('estado_actualizada', [('estado', 1), ('actualizada_en', -1)], 'listar y purgar por estado'),
+    IndiceDeclarado('carga_tipo_estado', [('datos.carga', 1), ('tipo', 1), ('estado', 1)],
+                    'progreso de una carga del panel', partialFilterExpression={'datos.carga': {'$exists': True}}),
+]
+
+FORMAS_DOCUMENTOS = [
+    FormaConsulta('documento_por_numero', {'numero': 1}),
+    FormaConsulta('lote_por_numeros', {'numero': {'$in': [1, 2, 3]}}),
+    FormaConsulta('navegar_por_fecha', {}, [('fecha_descarga', -1)]),
+    FormaConsulta('categoria_por_fecha', {'metadatos.categoria': 'Resoluciones'}, [('fecha_descarga', -1)]),
+    FormaConsulta('categoria_tipo_por_fecha', {'metadatos.categoria': 'Resoluciones', 'tipo': 'PDF'},
+                  [('fecha_descarga', -1)]),
+    FormaConsulta('tipo_por_fecha', {'tipo': 'PDF'}, [('fecha_descarga', -1)]),
+    FormaConsulta('orden_por_titulo', {}, [('titulo', 1)]),
+    FormaConsulta('sondeo_sincronizacion', {'actualizado_en': {'$gt': datetime(2025, 1, 1)}},
+                  [('actualizado_en', 1), ('_id', 1)]),
+    FormaConsulta('miembros_zip_carga', {'carga': 'c0ffee', 'origen.zip': 'carga-zip-1'}),
+    FormaConsulta('documento_por_sha256', {'archivo.sha256': 'e3b0c442'}),
+]
+
+FORMAS_TEXTOS = [
+    FormaConsulta('texto_por_numero', {'numero': 1}),
+    FormaConsulta('textos_por_numeros', {'numero': {'$in': [1, 2, 3]}}),
+]
+
+FORMAS_COLA = [
+    FormaConsulta('tareas_disponibles', {'estado': 'pendiente', 'disponible_en': {'$lte': 0}}, [('disponible_en', 1)]),
+    FormaConsulta('arriendos_vencidos', {'estado': 'en_proceso', 'arrendada_hasta': {'$lt': 0}}),
+    FormaConsulta('tareas_por_estado', {'estado': 'descartada'}, [('actualizada_en', -1)]),
+    FormaConsulta('progreso_carga', {'datos.carga': 'c0ffee'}),
+]
+
+FORMAS_USUARIOS = [
+    FormaConsulta('usuario_por_username', {'username': 'admin'}),
+    FormaConsulta('usuario_por_id', {'user_id': 1}),
+]
+
+
+def registro_proyecto(db, coleccion_documentos: str) -> Dict[str, Tuple[Collection, List[IndiceDeclarado], List[FormaConsulta]]]:
+    """Colecciones del proyecto con sus índices y formas de consulta declaradas."""
+    return {
+        coleccion_documentos: (db[coleccion_documentos], INDICES_DOCUMENTOS, FORMAS_DOCUMENTOS),
+        f'{coleccion_documentos}_textos': (db[f'{coleccion_documentos}_textos'], INDICES_TEXTOS, FORMAS_TEXTOS),
+        'usuarios': (db['usuarios'], INDICES_USUARIOS, FORMAS_USUARIOS),
+        'cola_tareas': (db['cola_tareas'], INDICES_COLA, FORMAS_COLA),
+    }
+
+
+def _claves(informacion: Dict[str, Any]) -> Tuple:
+    return tuple((campo, int(direccion)) for campo, direccion in informacion['key'])
+
+
+def _existente(informacion: Dict[str, Dict[str, Any]], indice: IndiceDeclarado) -> Optional[str]:
+    """Índice existente que corresponde al declarado: mismo nombre o, si no, mismas claves."""
+    if indice.nombre in informacion:
+        return indice.nombre
+    for nombre, info in informacion.items():
+        if _claves(info) == tuple(indice.claves):
+            return nombre
+    return None
+
+
+def incompatibles(informacion: Dict[str, Dict[str, Any]],
+                  indices: List[IndiceDeclarado]) -> List[Tuple[IndiceDeclarado, str, List[str]]]:
+    """Índices declarados cuyo existente difiere en claves u opciones: (declarado, existente, diferencias)."""
+    resultado = []
+    for indice in indices:
+        nombre = _existente(informacion, indice)
+        if nombre is not None:
+            diferencias = indice.diferencias(informacion[nombre])
+            if diferencias:
+                resultado.append((indice, nombre, diferencias))
+    return resultado
+
+
+def asegurar_indices(coleccion: Collection, indices: List[IndiceDeclarado], recrear: bool = False) -> List[str]:
+    """
+    Crea los índices declarados que falten. Un índice existente con las
+    mismas claves (aunque tenga otro nombre) cuenta como presente, así que
+    llamarla en cada arranque solo cuesta un listIndexes. Retorna los creados.
+
+    Si un índice existente comparte nombre o claves con uno declarado pero
+    difiere en claves, unique, sparse, partialFilterExpression o TTL, lanza
+    IndiceIncompatible; con recrear=True lo elimina y lo crea de nuevo
+    (en una colección grande, reconstruirlo puede tardar).
+    """
+    informacion = coleccion.index_information()
+    conflictos = incompatibles(informacion, indices)
+    if conflictos and not recrear:
+        detalle = '; '.join(f"{existente} ({', '.join(diferencias)})" for _, existente, diferencias in conflictos)
+        raise IndiceIncompatible(f"Índices incompatibles en '{coleccion.name}': {detalle}")
+    for indice, existente, diferencias in conflictos:
+        logger.warning(f"Recreando el índice '{existente}' de '{coleccion.name}': {', '.join(diferencias)}")
+        coleccion.drop_index(existente)
+        del informacion[existente]
+
+    faltantes = [indice for indice in indices if _existente(informacion, indice) is None]
+    if not faltantes:
+        return []
+    creados = coleccion.create_indexes([indice.modelo() for indice in faltantes])
+    logger.info(f"Índices creados en '{coleccion.name}': {', '.join(creados)}")
+    return creados
+
+
+def asegurar_indices_proyecto(db, coleccion_documentos: str) -> Dict[str, List[str]]:
+    """Asegura los índices de todas las colecciones del registro."""
+    creados = {}
+    for nombre, (coleccion, indices, _) in registro_proyecto(db, coleccion_documentos).items():
+        try:
+            creados[nombre] = asegurar_indices(coleccion, indices)
+        except IndiceIncompatible as e:
+            logger.error(f"{e}. Ejecuta scripts/verificar_indices.py --asegurar --recrear")
+        except PyMongoError as e:
+            logger.warning(f"No se pudieron asegurar los índices de '{nombre}': {e}")
+    return creados
+
+
+def reportar_indices(coleccion: Collection, indices: List[IndiceDeclarado]) -> Dict[str, Any]:
+    """
+    Compara los índices existentes con los declarados: faltantes, no
+    declarados, incompatibles (misma clave o nombre con otra especificación)
+    y sin uso desde el último reinicio del servidor ($indexStats).
+    """
+    informacion = coleccion.index_information()
+    existentes = {_claves(info): nombre for nombre, info in informacion.items()}
+    declarados = {tuple(indice.claves) for indice in indices}
+
+    uso: Dict[str, int] = {}
+    try:
+        for estadistica in coleccion.aggregate([{'$indexStats': {}}]):
+            uso[estadistica['name']] = int(estadistica['accesses']['ops'])
+    except OperationFailure as e:
+        logger.warning(f"$indexStats no disponible en '{coleccion.name}': {e}")
+
+    return {
+        'coleccion': coleccion.name,
+        'faltantes': [indice.nombre for indice in indices if tuple(indice.claves) not in existentes],
+        'no_declarados': [nombre for claves, nombre in existentes.items()
+                          if claves not in declarados and nombre != '_id_'],
+        'incompatibles': [f"{existente} ({', '.join(diferencias)})"
+                          for _, existente, diferencias in incompatibles(informacion, indices)],
+        'sin_uso': [nombre for nombre, operaciones in uso.items() if operaciones == 0 and nombre != '_id_'],
+        'uso': uso
+    }
+
+
+def _etapas(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Recorre el árbol del plan ganador (incluye el formato SBE con 'queryPlan')."""
+    etapas = [plan] if 'stage' in plan else []
+    for clave in ('queryPlan', 'inputStage'):
+        if isinstance(plan.get(clave), dict):
+            etapas.extend(_etapas(plan[clave]))
+    for subplan in plan.get('inputStages', []):
+        etapas.extend(_etapas(subplan))
+    return etapas
+
+
+def verificar_forma(coleccion: Collection, forma: FormaConsulta) -> Dict[str, Any]:
+    """
+    Ejecuta explain() sobre la forma de consulta y comprueba que use un
+    índice (IXSCAN/IDHACK/EXPRESS) y que el orden no requiera un SORT en memoria.
+    """
+    cursor = coleccion.find(forma.filtro)
+    if forma.orden:
+        cursor = cursor.sort(forma.orden)
+    plan = cursor.limit(1).explain()
+    etapas = _etapas(plan.get('queryPlanner', {}).get('winningPlan', {}))
+    nombres = [etapa.get('stage', '') for etapa in etapas]
+    indices = [etapa['indexName'] for etapa in etapas if etapa.get('indexName')]
+
+    problemas = []
+    if 'COLLSCAN' in nombres:
+        problemas.append('recorre la colección completa (COLLSCAN)')
+    elif not any(nombre in ('IXSCAN', 'IDHACK') or nombre.startswith('EXPRESS') for nombre in nombres):
+        problemas.append(f"no usa índice ({' > '.join(nombres)})")
+    if forma.orden and 'SORT' in nombres:
+        problemas.append('ordena en memoria (SORT)')
+
+    return {
+        'forma': forma.nombre,
+        'etapas': nombres,
+        'indices': indices,
+        'ok': not problemas,
+        'problemas': problemas
+    }
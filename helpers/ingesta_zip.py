@@ -0,0 +1,201 @@
+# helpers/ingesta_zip.py
+# Ingesta de ZIP sin extraer a disco: miembros leídos como streams, extracción en paralelo, límites anti zip bomb y deduplicación por SHA-256
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ZIP_HILOS = int(os.getenv('ZIP_HILOS', '4'))
+# Límites contra zip bombs: se revisan en el directorio central antes de leer y otra vez con los bytes reales
+ZIP_MAX_MIEMBROS = int(os.getenv('ZIP_MAX_MIEMBROS', '5000'))
+ZIP_MAX_TOTAL_MB = int(os.getenv('ZIP_MAX_TOTAL_MB', '4096'))
+ZIP_MAX_MIEMBRO_MB = int(os.getenv('ZIP_MAX_MIEMBRO_MB', os.getenv('CARGA_MAX_MB', '200')))
+ZIP_MAX_RATIO = int(os.getenv('ZIP_MAX_RATIO', '100'))
+# Cada miembro se copia a un temporal en memoria; los más grandes pasan a disco
+ZIP_MEMORIA_MB = int(os.getenv('ZIP_MEMORIA_MB', '16'))
+
+EXTENSIONES_TEXTO = ['.pdf', '.docx']
+TAMANO_BLOQUE = 64 * 1024
+
+
+class ErrorZip(ValueError):
+    """ZIP rechazado por los límites (posible zip bomb)."""
+
+
+def revisar_zip(archivo_zip: zipfile.ZipFile, extensiones: Optional[List[str]] = EXTENSIONES_TEXTO,
+                max_miembros: int = ZIP_MAX_MIEMBROS, max_total: int = ZIP_MAX_TOTAL_MB * 1024 * 1024,
+                max_miembro: int = ZIP_MAX_MIEMBRO_MB * 1024 * 1024,
+                max_ratio: int = ZIP_MAX_RATIO) -> Tuple[List[zipfile.ZipInfo], List[Dict[str, str]]]:
+    """
+    Revisa el directorio central sin descomprimir nada. Lanza ErrorZip si el
+    ZIP completo excede los límites; retorna los miembros a procesar y los
+    omitidos con su motivo (tipo no soportado, cifrado, tamaño o compresión
+    sospechosa). `extensiones=None` acepta cualquier tipo.
+    """
+    miembros = [miembro for miembro in archivo_zip.infolist() if not miembro.is_dir()]
+    if len(miembros) > max_miembros:
+        raise ErrorZip(f"El ZIP tiene {len(miembros)} archivos (máximo {max_miembros})")
+    total = sum(miembro.file_size for miembro in miembros)
+    if total > max_total:
+        raise ErrorZip(f"El ZIP declara {total // (1024 * 1024)} MB descomprimidos "
+                       f"(máximo {max_total // (1024 * 1024)} MB)")
+
+    candidatos, omitidos = [], []
+    for miembro in miembros:
+        nombre = os.path.basename(miembro.filename)
+        motivo = None
+        # Los '._archivo' de macOS (__MACOSX) no son documentos aunque terminen en .pdf
+        if extensiones is not None and (nombre.startswith('.') or
+                                        os.path.splitext(nombre)[1].lower() not in extensiones):
+            motivo = 'tipo no soportado'
+        elif miembro.flag_bits & 0x1:
+            motivo = 'cifrado'
+        elif miembro.file_size > max_miembro:
+            motivo = f"supera {max_miembro // (1024 * 1024)} MB"
+        elif miembro.compress_size and miembro.file_size / miembro.compress_size > max_ratio:
+            motivo = f"compresión sospechosa ({miembro.file_size // miembro.compress_size}:1)"
+        if motivo:
+            omitidos.append({'miembro': miembro.filename, 'motivo': motivo})
+        else:
+            candidatos.append(miembro)
+    return candidatos, omitidos
+
+
+def _extraer_texto_bytes(datos: bytes, extension: str) -> Optional[str]:
+    """Para ProcessPoolExecutor: el extractor se crea en el proceso hijo."""
+    import io
+    from helpers.funciones import Funciones
+    return Funciones().extraer_texto_stream(io.BytesIO(datos), extension)
+
+
+class IngestorZip:
+    """
+    Procesa un ZIP sin extraerlo a disco. Cada miembro PDF/DOCX se lee como
+    stream hacia un temporal (en memoria hasta ZIP_MEMORIA_MB) calculando su
+    SHA-256; un miembro cuyo hash ya apareció en el ZIP o que `buscar_hash`
+    encuentra en el corpus se descarta sin extraer ni guardar. El resto pasa
+    al extractor en `hilos` hilos (o a `procesos`, un ProcessPoolExecutor,
+    si cabe en memoria) y luego a `conservar(resultado, flujo)`, que decide
+    dónde guardarlo (`flujo` queda al inicio del miembro) y puede retornar
+    campos para el resultado, como el número de documento.
+    """
+
+    def __init__(self, funciones, hilos: int = ZIP_HILOS,
+                 buscar_hash: Optional[Callable[[str], Optional[int]]] = None, procesos=None,
+                 max_miembro: int = ZIP_MAX_MIEMBRO_MB * 1024 * 1024, max_total: int = ZIP_MAX_TOTAL_MB * 1024 * 1024,
+                 max_miembros: int = ZIP_MAX_MIEMBROS, max_ratio: int = ZIP_MAX_RATIO,
+                 memoria: int = ZIP_MEMORIA_MB * 1024 * 1024):
+        self.funciones = funciones
+        self.hilos = max(hilos, 1)
+        self.buscar_hash = buscar_hash
+        self.procesos = procesos
+        self.max_miembro = max_miembro
+        self.max_total = max_total
+        self.max_miembros = max_miembros
+        self.max_ratio = max_ratio
+        self.memoria = memoria
+        self._lock = threading.Lock()
+        self._hashes: Dict[str, str] = {}
+        self._leidos = 0
+        self._error: Optional[ErrorZip] = None
+
+    def procesar(self, fuente: Union[str, BinaryIO],
+                 conservar: Callable[[Dict[str, Any], BinaryIO], Optional[Dict[str, Any]]], omitir: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Recorre el ZIP (`fuente`: ruta o archivo con seek). Los miembros en
+        `omitir` (ya procesados en un intento anterior) no se leen. Retorna
+        contadores y el detalle de cada miembro; ErrorZip si excede los límites.
+        """
+        inicio = time.perf_counter()
+        self._hashes, self._leidos, self._error = {}, 0, None
+        omitir = set(omitir)
+        with zipfile.ZipFile(fuente) as archivo_zip:
+            candidatos, omitidos = revisar_zip(archivo_zip, EXTENSIONES_TEXTO, self.max_miembros, self.max_total,
+                                               self.max_miembro, self.max_ratio)
+            candidatos = [miembro for miembro in candidatos if miembro.filename not in omitir]
+            with ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='ingesta-zip') as pool:
+                resultados = list(pool.map(lambda miembro: self._procesar_miembro(archivo_zip, miembro, conservar),
+                                           candidatos))
+        if self._error is not None:
+            raise self._error
+
+        return {
+            'conservados': sum(1 for r in resultados if r.get('conservado')),
+            'duplicados': sum(1 for r in resultados if 'duplicado_de' in r),
+            'sin_texto': sum(1 for r in resultados if r.get('conservado') and not r.get('caracteres')),
+            'errores': sum(1 for r in resultados if 'error' in r),
+            'omitidos': len(omitidos),
+            'bytes_leidos': self._leidos,
+            'segundos': round(time.perf_counter() - inicio, 2),
+            'miembros': resultados + [dict(omitido, omitido=True) for omitido in omitidos],
+        }
+
+    def _contar(self, cantidad: int):
+        with self._lock:
+            self._leidos += cantidad
+            # Los tamaños declarados pueden mentir: el límite total también se aplica a lo realmente leído
+            if self._leidos > self.max_total and self._error is None:
+                self._error = ErrorZip(f"El ZIP supera {self.max_total // (1024 * 1024)} MB descomprimidos")
+            if self._error is not None:
+                raise self._error
+
+    def _duplicado(self, sha256: str, miembro: str) -> Optional[Union[int, str]]:
+        """Miembro del mismo ZIP o número de documento con el mismo contenido."""
+        with self._lock:
+            if sha256 in self._hashes:
+                return self._hashes[sha256]
+            self._hashes[sha256] = miembro
+        return self.buscar_hash(sha256) if self.buscar_hash else None
+
+    def _extraer(self, flujo, extension: str, tamano: int) -> Optional[str]:
+        if self.procesos is not None and tamano <= self.memoria:
+            return self.procesos.submit(_extraer_texto_bytes, flujo.read(), extension).result()
+        return self.funciones.extraer_texto_stream(flujo, extension)
+
+    def _procesar_miembro(self, archivo_zip: zipfile.ZipFile, miembro: zipfile.ZipInfo,
+                          conservar: Callable[[Dict[str, Any], BinaryIO], Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+        nombre = os.path.basename(miembro.filename)
+        resultado: Dict[str, Any] = {'miembro': miembro.filename, 'nombre': nombre, 'tamano': miembro.file_size}
+        if self._error is not None:
+            return resultado
+        try:
+            with tempfile.SpooledTemporaryFile(max_size=self.memoria) as copia:
+                sha256 = hashlib.sha256()
+                # zipfile comparte el archivo entre hilos con un lock: cada miembro se lee en su hilo
+                with archivo_zip.open(miembro) as origen:
+                    for bloque in iter(lambda: origen.read(TAMANO_BLOQUE), b''):
+                        self._contar(len(bloque))
+                        sha256.update(bloque)
+                        copia.write(bloque)
+                resultado['sha256'] = sha256.hexdigest()
+
+                duplicado = self._duplicado(resultado['sha256'], miembro.filename)
+                if duplicado is not None:
+                    resultado['duplicado_de'] = duplicado
+                    return resultado
+
+                copia.seek(0)
+                texto = self._extraer(copia, os.path.splitext(nombre)[1].lower(), miembro.file_size)
+                resultado['caracteres'] = len(texto or '')
+                copia.seek(0)
+                resultado.update(conservar(dict(resultado, texto=texto), copia) or {})
+                resultado['conservado'] = True
+        except ErrorZip:
+            resultado['error'] = str(self._error)
+        except Exception as e:
+            logger.warning(f"ZIP: error en {miembro.filename}: {e}")
+            resultado['error'] = f"{type(e).__name__}: {e}"
+            # Una copia idéntica más adelante en el ZIP no debe contarse como duplicado de un miembro fallido
+            with self._lock:
+                if self._hashes.get(resultado.get('sha256')) == miembro.filename:
+                    del self._hashes[resultado['sha256']]
+        return resultado
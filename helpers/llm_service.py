@@ -1,6 +1,6 @@
 import os
-import google.generativeai as genai
 import logging
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,17 +12,38 @@ logger = logging.getLogger(__name__)
 class LLMService:
     def __init__(self):
         self.api_key = os.getenv('GEMINI_API_KEY')
+        self._model = None
+        self._inicializado = False
+        self._lock = threading.Lock()
         if not self.api_key:
             logger.warning("GEMINI_API_KEY no encontrada en variables de entorno")
-            self.model = None
-        else:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel('models/gemini-2.0-flash')
-                logger.info("Servicio de LLM (Gemini) inicializado correctamente")
-            except Exception as e:
-                logger.error(f"Error al inicializar Gemini: {e}")
-                self.model = None
+
+    def inicializar(self) -> 'LLMService':
+        """
+        Importa el SDK de Gemini y crea el modelo. Se llama al primer uso
+        (o desde el calentamiento de servicios) para no pagar la importación
+        de google.generativeai al arrancar cada worker.
+        """
+        if self._inicializado:
+            return self
+        with self._lock:
+            if self._inicializado:
+                return self
+            if self.api_key:
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel('models/gemini-2.0-flash')
+                    logger.info("Servicio de LLM (Gemini) inicializado correctamente")
+                except Exception as e:
+                    logger.error(f"Error al inicializar Gemini: {e}")
+                    self._model = None
+            self._inicializado = True
+        return self
+
+    @property
+    def model(self):
+        return self.inicializar()._model
 
     def generar_resumen(self, texto: str) -> str:
         """
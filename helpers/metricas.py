@@ -0,0 +1,387 @@
+# helpers/metricas.py
+# Instrumentación de latencias: tiempos por petición y métricas en formato Prometheus
+import atexit
+import contextvars
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: los archivos de workers terminados se siguen sumando sin archivarse
+    fcntl = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Límites de los histogramas de latencia (segundos)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Descripción de las métricas conocidas: nombre -> (tipo, ayuda)
+DESCRIPCIONES = {
+    'http_peticion_duracion_segundos': ('histogram', 'Duración de las peticiones HTTP por ruta'),
+    'busqueda_duracion_segundos': ('histogram', 'Duración de las búsquedas por motor y ruta'),
+    'backend_duracion_segundos': ('histogram', 'Duración de las llamadas a MongoDB, ElasticSearch y snippets'),
+    'busqueda_fallback_total': ('counter', 'Búsquedas que cayeron a MongoDB por error de ElasticSearch'),
+    'cache_consultas_total': ('counter', 'Consultas a cachés por resultado (acierto/fallo)'),
+    'cache_ratio_aciertos': ('gauge', 'Proporción de aciertos por caché'),
+    'indice_sync_lag_segundos': ('gauge', 'Retraso de ElasticSearch respecto a MongoDB por sincronizador'),
+    'indice_sync_latido_segundos': ('gauge', 'Segundos desde el último latido del sincronizador'),
+}
+
+# Contadores e histogramas acumulados de los workers que ya terminaron
+ARCHIVO_HISTORICO = 'metricas_historico.json'
+_ARCHIVO_WORKER = re.compile(r'^metricas_(\d+)(?:_\w+)?\.json$')
+
+# Tiempos (ms) acumulados por componente durante la petición en curso
+_tiempos_peticion: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    'tiempos_peticion', default=None
+)
+
+Clave = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _clave(nombre: str, etiquetas: Optional[Dict[str, Any]]) -> Clave:
+    return nombre, tuple(sorted((k, str(v)) for k, v in (etiquetas or {}).items()))
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear_etiquetas(etiquetas: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pares = etiquetas + extra
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in pares) + '}'
+
+
+class RegistroMetricas:
+    """
+    Registro de contadores, gauges e histogramas en memoria del proceso.
+
+    Con gunicorn cada worker tiene su propio registro; para que /metrics
+    muestre el total, cada proceso vuelca su estado a un archivo JSON en
+    `directorio` (como mucho cada `intervalo_volcado` segundos, y una última
+    vez al salir) y la exportación suma los archivos de todos los workers.
+
+    El archivo de cada proceso lleva su PID y un identificador propio, así
+    que un worker nuevo que hereda el PID de uno reciclado no pisa sus
+    contadores. Los archivos de procesos terminados se suman a
+    ARCHIVO_HISTORICO (contadores e histogramas; sus gauges se descartan) y
+    se borran: los contadores no retroceden y el directorio no crece.
+    """
+
+    def __init__(self, directorio: Optional[str] = None, intervalo_volcado: float = 5.0):
+        self.directorio = directorio
+        self.intervalo_volcado = intervalo_volcado
+        self._lock = threading.Lock()
+        self._contadores: Dict[Clave, float] = {}
+        self._gauges: Dict[Clave, float] = {}
+        self._histogramas: Dict[Clave, List[float]] = {}
+        self._ultimo_volcado = 0.0
+        self._identidad: Optional[Tuple[int, str]] = None
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+            atexit.register(self.volcar)
+
+    # ---------- Registro ----------
+
+    def incrementar(self, nombre: str, etiquetas: Optional[Dict[str, Any]] = None, valor: float = 1):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+        self._volcar_si_corresponde()
+
+    def fijar(self, nombre: str, valor: float, etiquetas: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._gauges[_clave(nombre, etiquetas)] = valor
+        self._volcar_si_corresponde()
+
+    def observar(self, nombre: str, valor: float, etiquetas: Optional[Dict[str, Any]] = None):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            # [conteo por bucket..., +Inf, suma]
+            datos = self._histogramas.setdefault(clave, [0.0] * (len(BUCKETS) + 2))
+            for i, limite in enumerate(BUCKETS):
+                if valor <= limite:
+                    datos[i] += 1
+            datos[len(BUCKETS)] += 1
+            datos[len(BUCKETS) + 1] += valor
+        self._volcar_si_corresponde()
+
+    def registrar_cache(self, cache: str, acierto: bool):
+        self.incrementar('cache_consultas_total', {'cache': cache, 'resultado': 'acierto' if acierto else 'fallo'})
+
+    # ---------- Persistencia entre workers ----------
+
+    def _archivo_propio(self) -> str:
+        pid = os.getpid()
+        if self._identidad is None or self._identidad[0] != pid:
+            # También tras un fork: el hijo no escribe en el archivo del padre
+            self._identidad = (pid, uuid.uuid4().hex[:12])
+        return os.path.join(self.directorio, f'metricas_{pid}_{self._identidad[1]}.json')
+
+    def _estado(self) -> Dict[str, List]:
+        with self._lock:
+            return {
+                'contadores': [[n, list(e), v] for (n, e), v in self._contadores.items()],
+                'gauges': [[n, list(e), v] for (n, e), v in self._gauges.items()],
+                'histogramas': [[n, list(e), list(v)] for (n, e), v in self._histogramas.items()],
+            }
+
+    def _volcar_si_corresponde(self):
+        if not self.directorio:
+            return
+        ahora = time.monotonic()
+        if ahora - self._ultimo_volcado < self.intervalo_volcado:
+            return
+        self._ultimo_volcado = ahora
+        self.volcar()
+
+    def volcar(self):
+        """Escribe el estado del proceso de forma atómica (archivo temporal + rename)."""
+        if not self.directorio:
+            return
+        try:
+            destino = self._archivo_propio()
+            temporal = f'{destino}.tmp'
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(self._estado(), f)
+            os.replace(temporal, destino)
+        except OSError as e:
+            logger.warning(f"No se pudieron volcar las métricas: {e}")
+
+    @staticmethod
+    def _leer(ruta: str) -> Optional[Dict[str, List]]:
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _terminados(self) -> List[str]:
+        """Archivos de procesos que ya no existen (o de una encarnación anterior de este mismo PID)."""
+        propio = os.path.basename(self._archivo_propio())
+        terminados = []
+        for nombre in os.listdir(self.directorio):
+            coincidencia = _ARCHIVO_WORKER.match(nombre)
+            if not coincidencia or nombre == propio:
+                continue
+            pid = int(coincidencia.group(1))
+            if pid == os.getpid() or not _proceso_vivo(pid):
+                terminados.append(nombre)
+        return terminados
+
+    def archivar_terminados(self):
+        """
+        Suma al histórico los contadores e histogramas de los procesos
+        terminados y borra sus archivos. El histórico anota qué archivos ya
+        sumó: si el proceso muere antes de borrarlos, no se cuentan dos veces.
+        """
+        if not self.directorio or fcntl is None:
+            return
+        terminados = self._terminados()
+        if not terminados:
+            return
+        ruta_historico = os.path.join(self.directorio, ARCHIVO_HISTORICO)
+        with open(os.path.join(self.directorio, 'metricas_historico.lock'), 'a') as candado:
+            fcntl.flock(candado, fcntl.LOCK_EX)
+            try:
+                historico = self._leer(ruta_historico) or {}
+                archivados = set(historico.get('archivados', []))
+                contadores: Dict[Clave, float] = {}
+                histogramas: Dict[Clave, List[float]] = {}
+                _acumular(historico, contadores, histogramas)
+                for nombre in terminados:
+                    if nombre in archivados:
+                        continue
+                    estado = self._leer(os.path.join(self.directorio, nombre))
+                    if estado is not None:
+                        _acumular(estado, contadores, histogramas)
+                    archivados.add(nombre)
+                historico = {
+                    'contadores': [[n, list(e), v] for (n, e), v in contadores.items()],
+                    'histogramas': [[n, list(e), v] for (n, e), v in histogramas.items()],
+                    # Solo hace falta recordar los que aún no se pudieron borrar
+                    'archivados': sorted(nombre for nombre in archivados
+                                         if os.path.exists(os.path.join(self.directorio, nombre))),
+                }
+                temporal = f'{ruta_historico}.{os.getpid()}.tmp'
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    json.dump(historico, f)
+                os.replace(temporal, ruta_historico)
+                for nombre in terminados:
+                    try:
+                        os.remove(os.path.join(self.directorio, nombre))
+                    except OSError:
+                        continue
+            except OSError as e:
+                logger.warning(f"No se pudieron archivar las métricas de workers terminados: {e}")
+            finally:
+                fcntl.flock(candado, fcntl.LOCK_UN)
+
+    def _estados_workers(self) -> Iterator[Dict[str, List]]:
+        yield self._estado()
+        if not self.directorio:
+            return
+        self.archivar_terminados()
+        historico = self._leer(os.path.join(self.directorio, ARCHIVO_HISTORICO)) or {}
+        yield historico
+        # Los archivos ya sumados al histórico que aún no se borraron no cuentan dos veces
+        omitir = set(historico.get('archivados', [])) | {os.path.basename(self._archivo_propio()), ARCHIVO_HISTORICO}
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith('.json') or nombre in omitir:
+                continue
+            estado = self._leer(os.path.join(self.directorio, nombre))
+            if estado is not None:
+                yield estado
+
+    # ---------- Exportación ----------
+
+    def exportar_prometheus(self, gauges_externos: Optional[List[Tuple[str, Dict[str, Any], float]]] = None) -> str:
+        """
+        Genera el texto de exposición de Prometheus sumando todos los workers.
+        `gauges_externos` son valores leídos de otra fuente en esta petición
+        (p. ej. el estado de la sincronización en MongoDB): se exportan tal
+        cual, sin pasar por los archivos de los workers.
+        """
+        contadores: Dict[Clave, float] = {}
+        gauges: Dict[Clave, float] = {}
+        histogramas: Dict[Clave, List[float]] = {}
+
+        for estado in self._estados_workers():
+            _acumular(estado, contadores, histogramas)
+            for n, e, v in estado.get('gauges', []):
+                clave = (n, tuple(tuple(par) for par in e))
+                gauges[clave] = max(gauges.get(clave, v), v)
+
+        # Ratio de aciertos derivado de los contadores de caché
+        totales: Dict[str, List[float]] = {}
+        for (n, e), v in contadores.items():
+            if n == 'cache_consultas_total':
+                etiquetas = dict(e)
+                par = totales.setdefault(etiquetas.get('cache', ''), [0.0, 0.0])
+                par[0 if etiquetas.get('resultado') == 'acierto' else 1] += v
+        for cache, (aciertos, fallos) in totales.items():
+            if aciertos + fallos:
+                gauges[('cache_ratio_aciertos', (('cache', cache),))] = aciertos / (aciertos + fallos)
+        for nombre, etiquetas, valor in gauges_externos or []:
+            gauges[_clave(nombre, etiquetas)] = valor
+
+        lineas: List[str] = []
+        for nombre in sorted({n for n, _ in list(contadores) + list(gauges) + list(histogramas)}):
+            tipo, ayuda = DESCRIPCIONES.get(nombre, ('untyped', nombre))
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for (n, e), v in sorted(contadores.items()):
+                if n == nombre:
+                    lineas.append(f'{nombre}{_formatear_etiquetas(e)} {v:g}')
+            for (n, e), v in sorted(gauges.items()):
+                if n == nombre:
+                    lineas.append(f'{nombre}{_formatear_etiquetas(e)} {v:g}')
+            for (n, e), v in sorted(histogramas.items()):
+                if n != nombre:
+                    continue
+                for limite, conteo in zip(BUCKETS, v):
+                    lineas.append(f'{nombre}_bucket{_formatear_etiquetas(e, (("le", f"{limite:g}"),))} {conteo:g}')
+                lineas.append(f'{nombre}_bucket{_formatear_etiquetas(e, (("le", "+Inf"),))} {v[len(BUCKETS)]:g}')
+                lineas.append(f'{nombre}_sum{_formatear_etiquetas(e)} {v[len(BUCKETS) + 1]:.6f}')
+                lineas.append(f'{nombre}_count{_formatear_etiquetas(e)} {v[len(BUCKETS)]:g}')
+        return '\n'.join(lineas) + '\n'
+
+
+def _acumular(estado: Dict[str, List], contadores: Dict[Clave, float], histogramas: Dict[Clave, List[float]]):
+    """Suma los contadores e histogramas de un estado volcado."""
+    for n, e, v in estado.get('contadores', []):
+        clave = (n, tuple(tuple(par) for par in e))
+        contadores[clave] = contadores.get(clave, 0) + v
+    for n, e, v in estado.get('histogramas', []):
+        clave = (n, tuple(tuple(par) for par in e))
+        acumulado = histogramas.setdefault(clave, [0.0] * len(v))
+        for i, valor in enumerate(v):
+            acumulado[i] += valor
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Sin permiso para señalarlo: existe
+        return True
+    return True
+
+
+# Instancia global compartida por app.py y los helpers
+registro = RegistroMetricas(
+    os.getenv('METRICAS_DIR', os.path.join(tempfile.gettempdir(), 'proyecto_big_data_metricas'))
+)
+
+
+# ========== TIEMPOS POR PETICIÓN ==========
+
+def iniciar_peticion() -> contextvars.Token:
+    """Abre el acumulador de tiempos de la petición actual."""
+    return _tiempos_peticion.set({})
+
+
+def finalizar_peticion(token: contextvars.Token) -> Dict[str, float]:
+    """Cierra el acumulador y retorna los tiempos registrados (ms)."""
+    tiempos = _tiempos_peticion.get() or {}
+    _tiempos_peticion.reset(token)
+    return tiempos
+
+
+def tiempos_actuales() -> Dict[str, float]:
+    """Tiempos (ms, redondeados) acumulados hasta ahora en la petición."""
+    return {k: round(v, 2) for k, v in (_tiempos_peticion.get() or {}).items()}
+
+
+def anotar(componente: str, milisegundos: float):
+    """Suma un tiempo medido externamente (p. ej. el 'took' de ElasticSearch)."""
+    tiempos = _tiempos_peticion.get()
+    if tiempos is not None:
+        tiempos[componente] = tiempos.get(componente, 0.0) + milisegundos
+
+
+@contextmanager
+def medir(componente: str, operacion: str = ''):
+    """
+    Mide un bloque: lo suma al desglose de la petición y lo observa en
+    el histograma backend_duracion_segundos{componente, operacion}.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        anotar(componente, duracion * 1000)
+        registro.observar('backend_duracion_segundos', duracion,
+                          {'componente': componente, 'operacion': operacion})
+
+
+def cronometrar(componente: str):
+    """Decorador que mide un método con medir(componente, nombre_del_método)."""
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            with medir(componente, f.__name__):
+                return f(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def server_timing(tiempos: Dict[str, float]) -> str:
+    """Construye el valor de la cabecera Server-Timing."""
+    return ', '.join(f'{componente};dur={ms:.1f}' for componente, ms in tiempos.items())
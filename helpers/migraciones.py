@@ -0,0 +1,240 @@
+# helpers/migraciones.py
+# Migraciones de esquema por lotes: bulk_write en paralelo, punto de control por _id, simulación y registro de versiones
+import logging
+import os
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from helpers.mongo_db import incrementar_version_corpus
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Versiones aplicadas y progreso de cada migración
+COLECCION_MIGRACIONES = 'migraciones'
+MIGRACION_LOTE = int(os.getenv('MIGRACION_LOTE', '500'))
+MIGRACION_HILOS = int(os.getenv('MIGRACION_HILOS', '4'))
+
+APLICADA = 'aplicada'
+EN_CURSO = 'en_curso'
+FALLIDA = 'fallida'
+
+# Una migración en curso sin latido durante este tiempo quedó abandonada (proceso caído) y se puede retomar
+LATIDO_VENCIDO = timedelta(minutes=5)
+
+
+class Migracion:
+    """
+    Cambio de esquema sobre una colección. `filtro` elige los documentos que
+    faltan por migrar y `transformar(documento)` retorna la actualización de
+    cada uno ($set, $unset...) o None si no cambia. Debe ser idempotente: un
+    lote que falló se vuelve a aplicar desde el último punto de control.
+    Con `marcar` se agregan `actualizado_en` y `$inc revision` (ETags y
+    sincronización con ElasticSearch).
+    """
+
+    def __init__(self, version: str, descripcion: str, filtro: Dict[str, Any],
+                 transformar: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+                 proyeccion: Optional[Dict[str, Any]] = None, coleccion: Optional[str] = None, marcar: bool = True):
+        self.version = version
+        self.descripcion = descripcion
+        self.filtro = filtro
+        self.transformar = transformar
+        self.proyeccion = proyeccion
+        self.coleccion = coleccion  # None: la colección de documentos
+        self.marcar = marcar
+
+
+def _lotes(cursor, tamano: int) -> Iterator[List[Dict[str, Any]]]:
+    lote: List[Dict[str, Any]] = []
+    for documento in cursor:
+        lote.append(documento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class EjecutorMigraciones:
+    """
+    Aplica las migraciones pendientes en orden de versión. Cada una recorre
+    su filtro por `_id` en lotes de `lote` documentos; hasta `hilos` lotes se
+    escriben en paralelo con bulk_write y el punto de control avanza solo
+    hasta el último lote confirmado en orden, así una migración interrumpida
+    continúa donde quedó. La colección `migraciones` guarda el progreso y
+    las versiones aplicadas.
+    """
+
+    def __init__(self, db, coleccion_documentos: str = 'documentos', lote: int = MIGRACION_LOTE,
+                 hilos: int = MIGRACION_HILOS, migraciones: Optional[List[Migracion]] = None):
+        self.db = db
+        self.coleccion_documentos = coleccion_documentos
+        self.lote = lote
+        self.hilos = max(hilos, 1)
+        self.registro = db[COLECCION_MIGRACIONES]
+        self.migraciones = sorted(migraciones if migraciones is not None else MIGRACIONES, key=lambda m: m.version)
+        self.propietario = f"{socket.gethostname()}-{os.getpid()}"
+
+    def _coleccion(self, migracion: Migracion):
+        return self.db[migracion.coleccion or self.coleccion_documentos]
+
+    def obtener(self, version: str) -> Migracion:
+        for migracion in self.migraciones:
+            if migracion.version == version:
+                return migracion
+        raise KeyError(f"No existe la migración {version}")
+
+    # ---------- Estado ----------
+
+    def estado(self) -> List[Dict[str, Any]]:
+        """Cada migración declarada con su registro (estado, progreso, fechas)."""
+        registros = {registro['_id']: registro for registro in self.registro.find()}
+        return [dict(registros.get(m.version, {}), version=m.version, descripcion=m.descripcion,
+                     estado=registros.get(m.version, {}).get('estado', 'pendiente'))
+                for m in self.migraciones]
+
+    def pendientes(self, hasta: Optional[str] = None) -> List[Migracion]:
+        aplicadas = {registro['_id'] for registro in self.registro.find({'estado': APLICADA}, {'_id': 1})}
+        return [m for m in self.migraciones
+                if m.version not in aplicadas and (hasta is None or m.version <= hasta)]
+
+    def reiniciar(self, version: str) -> bool:
+        """Olvida el registro de una migración: se vuelve a aplicar desde el principio."""
+        return self.registro.delete_one({'_id': self.obtener(version).version}).deleted_count > 0
+
+    def _guardar(self, version: str, **campos):
+        self.registro.update_one({'_id': version}, {'$set': dict(campos, latido=datetime.now())})
+
+    def _reclamar(self, migracion: Migracion) -> Dict[str, Any]:
+        """Marca la migración en curso para este proceso; falla si otro la está aplicando."""
+        ahora = datetime.now()
+        try:
+            return self.registro.find_one_and_update(
+                {'_id': migracion.version,
+                 '$or': [{'estado': {'$ne': EN_CURSO}}, {'latido': {'$lt': ahora - LATIDO_VENCIDO}}]},
+                {'$set': {'estado': EN_CURSO, 'descripcion': migracion.descripcion, 'propietario': self.propietario,
+                          'latido': ahora, 'error': None},
+                 '$setOnInsert': {'iniciada_en': ahora, 'procesados': 0, 'modificados': 0}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            raise RuntimeError(f"La migración {migracion.version} está en curso en otro proceso")
+
+    # ---------- Ejecución ----------
+
+    def simular(self, migracion: Migracion, muestras: int = 3) -> Dict[str, Any]:
+        """Cuenta sin escribir: documentos del filtro, cuántos cambiarían y algunos ejemplos."""
+        coleccion = self._coleccion(migracion)
+        coincidentes = coleccion.count_documents(migracion.filtro)
+        cambiarian = 0
+        ejemplos = []
+        for documento in coleccion.find(migracion.filtro, migracion.proyeccion, batch_size=self.lote):
+            cambio = migracion.transformar(documento)
+            if cambio:
+                cambiarian += 1
+                if len(ejemplos) < muestras:
+                    ejemplos.append({'_id': str(documento['_id']), 'cambio': cambio})
+        return {'version': migracion.version, 'coleccion': coleccion.name, 'coincidentes': coincidentes,
+                'cambiarian': cambiarian, 'ejemplos': ejemplos}
+
+    def aplicar(self, migracion: Migracion) -> Dict[str, Any]:
+        previo = self.registro.find_one({'_id': migracion.version})
+        if previo and previo.get('estado') == APLICADA:
+            return dict(previo, version=migracion.version)
+        registro = self._reclamar(migracion)
+        coleccion = self._coleccion(migracion)
+        desde = registro.get('checkpoint_id')
+        filtro = migracion.filtro if desde is None else {'$and': [migracion.filtro, {'_id': {'$gt': desde}}]}
+        if desde is not None:
+            logger.info(f"Migración {migracion.version}: retomando después de {desde}")
+
+        progreso = {'procesados': registro.get('procesados', 0), 'modificados': registro.get('modificados', 0)}
+        inicio = time.perf_counter()
+        ultimo_log = inicio
+        en_vuelo: deque = deque()
+
+        def escribir(operaciones: List[UpdateOne]) -> int:
+            return coleccion.bulk_write(operaciones, ordered=False).modified_count if operaciones else 0
+
+        def confirmar():
+            futuro, ultimo_id, cantidad = en_vuelo.popleft()
+            progreso['modificados'] += futuro.result()
+            progreso['procesados'] += cantidad
+            self._guardar(migracion.version, checkpoint_id=ultimo_id, **progreso)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix=f'migracion-{migracion.version}') as pool:
+                try:
+                    cursor = coleccion.find(filtro, migracion.proyeccion, batch_size=self.lote).sort('_id', 1)
+                    for lote in _lotes(cursor, self.lote):
+                        operaciones = [UpdateOne({'_id': documento['_id']}, self._marcar(migracion, cambio))
+                                       for documento, cambio in ((d, migracion.transformar(d)) for d in lote) if cambio]
+                        en_vuelo.append((pool.submit(escribir, operaciones), lote[-1]['_id'], len(lote)))
+                        # Como mucho `hilos` lotes en vuelo; el punto de control avanza en orden de _id
+                        while len(en_vuelo) >= self.hilos or (en_vuelo and en_vuelo[0][0].done()):
+                            confirmar()
+                        if time.perf_counter() - ultimo_log >= 10:
+                            ultimo_log = time.perf_counter()
+                            logger.info(f"Migración {migracion.version}: {progreso['procesados']} procesados, "
+                                        f"{progreso['modificados']} modificados")
+                    while en_vuelo:
+                        confirmar()
+                finally:
+                    # Los lotes posteriores a un fallo no mueven el punto de control: se reaplican al retomar
+                    for futuro, _, _ in en_vuelo:
+                        futuro.cancel()
+        except Exception as e:
+            logger.error(f"Migración {migracion.version} fallida: {e}")
+            self._guardar(migracion.version, estado=FALLIDA, error=str(e)[:500])
+            raise
+
+        segundos = round(time.perf_counter() - inicio, 2)
+        self._guardar(migracion.version, estado=APLICADA, aplicada_en=datetime.now(), segundos=segundos, **progreso)
+        if progreso['modificados'] and migracion.marcar and coleccion.name == self.coleccion_documentos:
+            incrementar_version_corpus(self.db, self.coleccion_documentos)
+        logger.info(f"Migración {migracion.version} aplicada: {progreso['procesados']} procesados, "
+                    f"{progreso['modificados']} modificados en {segundos}s")
+        return dict(progreso, version=migracion.version, estado=APLICADA, segundos=segundos)
+
+    @staticmethod
+    def _marcar(migracion: Migracion, cambio: Dict[str, Any]) -> Dict[str, Any]:
+        if not migracion.marcar:
+            return cambio
+        actualizacion = dict(cambio)
+        actualizacion['$set'] = dict(cambio.get('$set') or {}, actualizado_en=datetime.now())
+        actualizacion['$inc'] = dict(cambio.get('$inc') or {}, revision=1)
+        return actualizacion
+
+    def aplicar_pendientes(self, hasta: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Aplica en orden las pendientes (hasta la versión `hasta`); se detiene en la primera que falle."""
+        return [self.aplicar(migracion) for migracion in self.pendientes(hasta)]
+
+
+# ========== MIGRACIONES DEL PROYECTO ==========
+
+def _metadatos_anidados(documento: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        '$set': {'metadatos': {'categoria': documento.get('categoria') or 'Otros Documentos',
+                               'año': None,
+                               'extension': str(documento.get('tipo') or '').lower()}},
+        '$unset': {'categoria': ''}
+    }
+
+
+MIGRACIONES = [
+    Migracion('001', "Categoría plana a 'metadatos' (antes scripts/fix_metadata_structure.py)",
+              {'metadatos': {'$exists': False}}, _metadatos_anidados, proyeccion={'categoria': 1, 'tipo': 1}),
+    # El sondeo de la sincronización con ElasticSearch solo ve documentos con actualizado_en
+    Migracion('002', "Fecha 'actualizado_en' en los documentos cargados sin ella",
+              {'actualizado_en': {'$exists': False}}, lambda documento: {'$set': {}}, proyeccion={'_id': 1}),
+]
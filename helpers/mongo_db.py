@@ -1,17 +1,76 @@
 # helpers/mongo_db.py
 # Operaciones CRUD en MongoDB
 import logging
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 from pymongo.errors import ConnectionFailure, PyMongoError
 
+from helpers.almacen_textos import TEXTOS_SEPARADOS, AlmacenTextos, campos_cuerpo
+from helpers.metricas import cronometrar, medir
 from helpers.text_utils import generar_snippet, resaltar_texto
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Colección con la versión del corpus (validador de estadísticas y listados)
+COLECCION_VERSIONES = 'control_versiones'
+
+# Contadores atómicos (números de documento reservados por las cargas del panel)
+COLECCION_CONTADORES = 'contadores'
+
+# Campos suficientes para calcular el ETag de un documento sin traer el texto
+CAMPOS_VALIDADOR = {'numero': 1, 'revision': 1, 'actualizado_en': 1,
+                    'fecha_procesamiento': 1, 'fecha_descarga': 1}
+
+
+def incrementar_version_corpus(db, coleccion: str = 'documentos') -> int:
+    """
+    Marca el corpus como modificado. Deben llamarlo los procesos que
+    insertan, actualizan o eliminan documentos (cargas, migraciones).
+    """
+    resultado = db[COLECCION_VERSIONES].find_one_and_update(
+        {'_id': coleccion},
+        {'$inc': {'version': 1}, '$set': {'actualizado_en': datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return resultado['version']
+
+def reservar_numeros(db, coleccion: str = 'documentos', cantidad: int = 1) -> int:
+    """
+    Reserva `cantidad` números de documento consecutivos y retorna el primero.
+    El contador parte del mayor `numero` existente, así no choca con los
+    documentos numerados por las cargas masivas.
+    """
+    mayor = db[coleccion].find_one({}, {'numero': 1}, sort=[('numero', -1)]) or {}
+    contadores = db[COLECCION_CONTADORES]
+    contadores.update_one({'_id': coleccion}, {'$max': {'valor': int(mayor.get('numero') or 0)}}, upsert=True)
+    contador = contadores.find_one_and_update({'_id': coleccion}, {'$inc': {'valor': cantidad}},
+                                              return_document=ReturnDocument.AFTER)
+    return contador['valor'] - cantidad + 1
+
+def guardar_texto_documento(coleccion, numero: int, texto: str, campos: Optional[Dict[str, Any]] = None,
+                            textos: Optional[AlmacenTextos] = None) -> bool:
+    """
+    Guarda el texto de un documento junto con `campos` e incrementa su
+    revisión. Con TEXTOS_SEPARADOS el texto va comprimido al almacén
+    '<colección>_textos' y el documento conserva preview y longitud.
+    """
+    actualizacion: Dict[str, Any] = {'$set': dict(campos or {}, actualizado_en=datetime.now()),
+                                     '$inc': {'revision': 1}}
+    if TEXTOS_SEPARADOS:
+        (textos or AlmacenTextos(coleccion.database, coleccion.name)).guardar(numero, texto)
+        actualizacion['$set'].update(campos_cuerpo(texto))
+        actualizacion['$unset'] = {'texto_contenido': ''}
+    else:
+        actualizacion['$set'].update(texto_contenido=texto, texto_longitud=len(texto))
+        actualizacion['$unset'] = {'texto_externo': '', 'texto_preview': ''}
+    return coleccion.update_one({'numero': numero}, actualizacion).matched_count > 0
+
+
 class Mongo_DB:
     def __init__(self, uri: str, db_name: str = 'proyecto_big_data', collection: str = 'documentos'):
         if not uri:
@@ -22,6 +81,7 @@ class Mongo_DB:
         self.client: Optional[MongoClient] = None
         self.db = None
         self.coll = None
+        self._textos: Optional[AlmacenTextos] = None
         self._connect()
 
     def _connect(self):
@@ -48,6 +108,7 @@ class Mongo_DB:
         except Exception:
             return False
 
+    @cronometrar('mongodb')
     def obtener_estadisticas(self) -> Dict[str, Any]:
         """Obtiene estadísticas generales de la colección."""
         try:
@@ -76,90 +137,270 @@ class Mongo_DB:
             logger.error(f"Error al obtener estadísticas: {e}")
             return {'total_documentos': 0, 'categorias': [], 'tipos': [], 'tamano_total': 0}
 
-    def buscar_documentos(self, query: str, categoria: str, tipo: str, skip: int, limit: int, sort_config: List[tuple]) -> tuple[List[Dict], int]:
-        """Busca documentos con filtros y paginación."""
+    def contar_documentos(self, filtro: Dict, limite_conteo: Optional[int] = None) -> tuple[int, str]:
+        """
+        Cuenta los documentos del filtro y retorna (total, relación).
+
+        Sin límite el conteo es exacto ('eq'). Con límite, la navegación sin
+        filtros usa estimated_document_count (metadatos de la colección, sin
+        recorrer documentos, 'aprox') y las búsquedas filtradas dejan de contar
+        al llegar al límite ('gte' si se alcanzó).
+        """
+        if not limite_conteo:
+            return self.coll.count_documents(filtro), 'eq'
+        if not filtro:
+            return self.coll.estimated_document_count(), 'aprox'
+        total = self.coll.count_documents(filtro, limit=limite_conteo)
+        return total, 'gte' if total >= limite_conteo else 'eq'
+
+    @property
+    def textos(self) -> AlmacenTextos:
+        """Almacén del texto completo comprimido ('<colección>_textos')."""
+        if getattr(self, '_textos', None) is None:
+            self._textos = AlmacenTextos(self.db, self.coll.name)
+        return self._textos
+
+    def hidratar_textos(self, documentos: List[Dict], longitud_texto: Optional[int] = None) -> List[Dict]:
+        """
+        Completa `texto_contenido` de los documentos cuyo texto está en el
+        almacén separado (`texto_externo`), con una sola consulta $in.
+        """
+        pendientes = [doc for doc in documentos if doc.get('texto_externo') and 'texto_contenido' not in doc]
+        if not pendientes:
+            return documentos
+        with medir('mongodb', 'hidratar_textos'):
+            textos = self.textos.obtener_muchos([doc['numero'] for doc in pendientes])
+        for doc in pendientes:
+            texto = textos.get(doc['numero'], doc.get('texto_preview', ''))
+            doc['texto_contenido'] = texto[:longitud_texto] if longitud_texto else texto
+        return documentos
+
+    def guardar_texto(self, numero: int, texto: str, campos: Optional[Dict[str, Any]] = None) -> bool:
+        """Guarda el texto extraído de un documento (ver guardar_texto_documento)."""
+        try:
+            return guardar_texto_documento(self.coll, numero, texto, campos, self.textos)
+        except PyMongoError as e:
+            logger.error(f"Error al guardar el texto del documento {numero}: {e}")
+            return False
+
+    @staticmethod
+    def construir_filtro(query: str, categoria: str, tipo: str) -> Dict[str, Any]:
+        """
+        Filtro de MongoDB equivalente a los parámetros de /api/buscar. El
+        texto de los documentos con `texto_externo` está comprimido en el
+        almacén separado y no admite $regex: de ellos solo se busca en
+        `texto_preview` (ver busqueda_parcial).
+        """
+        filtro = {}
+        if query:
+            filtro['$or'] = [
+                {'titulo': {'$regex': query, '$options': 'i'}},
+                {'texto_contenido': {'$regex': query, '$options': 'i'}},
+                {'texto_preview': {'$regex': query, '$options': 'i'}},
+                {'tipo': {'$regex': query, '$options': 'i'}},
+                {'metadatos.categoria': {'$regex': query, '$options': 'i'}}
+            ]
+        if categoria:
+            filtro['metadatos.categoria'] = categoria
+        if tipo:
+            filtro['tipo'] = tipo
+        return filtro
+
+    def busqueda_parcial(self, query: str) -> bool:
+        """
+        True si una búsqueda de texto con construir_filtro no cubre todo el
+        contenido: hay textos en el almacén separado y de ellos solo se
+        consulta la preview.
+        """
+        if not query:
+            return False
+        return TEXTOS_SEPARADOS or self.textos.coll.estimated_document_count() > 0
+
+    def iterar_documentos(self, filtro: Dict[str, Any], campos: Optional[List[str]] = None,
+                          sort_config: Optional[List[tuple]] = None, limite: int = 0,
+                          tamano_lote: int = 500) -> Iterator[Dict]:
+        """
+        Recorre los documentos del filtro en lotes del cursor (`batch_size`),
+        sin cargarlos en memoria. Pensado para exportaciones. Si se pide el
+        texto, se descomprime del almacén separado lote por lote.
+        """
+        proyeccion = {campo: 1 for campo in campos} if campos else None
+        con_texto = not campos or 'texto_contenido' in campos
+        if proyeccion and con_texto:
+            proyeccion.update(numero=1, texto_externo=1)
+        cursor = self.coll.find(filtro, proyeccion, batch_size=tamano_lote, limit=limite)
+        if sort_config:
+            cursor = cursor.sort(sort_config)
         try:
-            filtro = {}
-            if query:
-                filtro['$or'] = [
-                    {'titulo': {'$regex': query, '$options': 'i'}},
-                    {'texto_contenido': {'$regex': query, '$options': 'i'}},
-                    {'tipo': {'$regex': query, '$options': 'i'}},
-                    {'metadatos.categoria': {'$regex': query, '$options': 'i'}}
-                ]
-            if categoria:
-                filtro['metadatos.categoria'] = categoria
-            if tipo:
-                filtro['tipo'] = tipo
+            if not con_texto:
+                yield from cursor
+                return
+            lote: List[Dict] = []
+            for documento in cursor:
+                lote.append(documento)
+                if len(lote) >= tamano_lote:
+                    yield from self.hidratar_textos(lote)
+                    lote = []
+            yield from self.hidratar_textos(lote)
+        finally:
+            cursor.close()
+
+    def muestra_documentos(self, tamano: int, filtro: Optional[Dict[str, Any]] = None,
+                           campos: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Muestra aleatoria ($sample) de documentos con texto, esté en línea o
+        en el almacén separado (`texto_longitud`), con el texto ya hidratado.
+        """
+        con_texto = {'$or': [{'texto_longitud': {'$gt': 0}}, {'texto_contenido': {'$gt': ''}}]}
+        pipeline = [{'$match': {'$and': [filtro, con_texto]} if filtro else con_texto},
+                    {'$sample': {'size': tamano}}]
+        if campos:
+            pipeline.append({'$project': dict({campo: 1 for campo in campos}, numero=1, texto_externo=1,
+                                              texto_preview=1)})
+        with medir('mongodb', 'muestra_documentos'):
+            documentos = list(self.coll.aggregate(pipeline, allowDiskUse=True))
+        return self.hidratar_textos(documentos)
+
+    @cronometrar('mongodb')
+    def buscar_documentos(self, query: str, categoria: str, tipo: str, skip: int, limit: int, sort_config: List[tuple],
+                          limite_conteo: Optional[int] = None) -> tuple[List[Dict], int, str]:
+        """Busca documentos con filtros y paginación. Retorna (documentos, total, relación del total)."""
+        try:
+            filtro = self.construir_filtro(query, categoria, tipo)
 
             cursor = self.coll.find(filtro).sort(sort_config).skip(skip).limit(limit)
             documentos = list(cursor)
-            total = self.coll.count_documents(filtro)
+            total, relacion = self.contar_documentos(filtro, limite_conteo)
             
-            # Convertir ObjectId a string
-            for doc in documentos:
-                doc['_id'] = str(doc['_id'])
-                
-            return documentos, total
+            # Los ObjectId se serializan en el proveedor JSON de la app
+            return documentos, total, relacion
         except PyMongoError as e:
             logger.error(f"Error en búsqueda: {e}")
-            return [], 0
+            return [], 0, 'eq'
 
-    def buscar_documentos_con_snippets(self, query: str, categoria: str, tipo: str, skip: int, limit: int, sort_config: List[tuple]) -> tuple[List[Dict], int]:
+    def buscar_documentos_con_snippets(self, query: str, categoria: str, tipo: str, skip: int, limit: int, sort_config: List[tuple],
+                                       limite_conteo: Optional[int] = None) -> tuple[List[Dict], int, str]:
         """Busca documentos y genera snippets del contenido con la palabra resaltada."""
         try:
             # Realizar búsqueda normal
-            documentos, total = self.buscar_documentos(query, categoria, tipo, skip, limit, sort_config)
+            documentos, total, relacion = self.buscar_documentos(query, categoria, tipo, skip, limit, sort_config, limite_conteo)
             
-            # Agregar snippets si hay query de búsqueda
-            if query:
-                for doc in documentos:
-                    texto_contenido = doc.get('texto_contenido', '')
-                    if texto_contenido:
-                        # Generar snippet con contexto
-                        snippet = generar_snippet(texto_contenido, query, max_length=250)
-                        # Resaltar la palabra buscada
-                        snippet_resaltado = resaltar_texto(snippet, query)
-                        doc['snippet'] = snippet_resaltado
-                    else:
-                        doc['snippet'] = "No hay contenido de texto disponible."
-            else:
-                # Si no hay query, mostrar preview del contenido
-                for doc in documentos:
-                    texto_contenido = doc.get('texto_contenido', '')
-                    if texto_contenido:
-                        doc['snippet'] = texto_contenido[:200] + "..." if len(texto_contenido) > 200 else texto_contenido
-                    else:
-                        doc['snippet'] = "No hay contenido de texto disponible."
+            with medir('snippets', 'buscar_documentos_con_snippets'):
+                # Agregar snippets si hay query de búsqueda
+                if query:
+                    for doc in documentos:
+                        texto_contenido = doc.get('texto_contenido') or doc.get('texto_preview', '')
+                        if texto_contenido:
+                            # Generar snippet con contexto
+                            snippet = generar_snippet(texto_contenido, query, max_length=250)
+                            # Resaltar la palabra buscada
+                            snippet_resaltado = resaltar_texto(snippet, query)
+                            doc['snippet'] = snippet_resaltado
+                        else:
+                            doc['snippet'] = "No hay contenido de texto disponible."
+                else:
+                    # Si no hay query, mostrar preview del contenido
+                    for doc in documentos:
+                        texto_contenido = doc.get('texto_contenido') or doc.get('texto_preview', '')
+                        if texto_contenido:
+                            doc['snippet'] = texto_contenido[:200] + "..." if len(texto_contenido) > 200 else texto_contenido
+                        else:
+                            doc['snippet'] = "No hay contenido de texto disponible."
             
-            return documentos, total
+            return documentos, total, relacion
             
         except Exception as e:
             logger.error(f"Error al buscar con snippets: {e}")
-            return [], 0
+            return [], 0, 'eq'
 
+    @cronometrar('mongodb')
     def obtener_documento_por_numero(self, numero: int) -> Optional[Dict]:
         """Obtiene un documento por su número identificador."""
         try:
-            doc = self.coll.find_one({'numero': numero})
-            if doc:
-                doc['_id'] = str(doc['_id'])
-            return doc
+            documento = self.coll.find_one({'numero': numero})
+            return self.hidratar_textos([documento])[0] if documento else None
         except PyMongoError as e:
             logger.error(f"Error al obtener documento {numero}: {e}")
             return None
 
+    @cronometrar('mongodb')
+    def obtener_documentos_por_numeros(self, numeros: List[int], campos: Optional[List[str]] = None,
+                                       longitud_texto: Optional[int] = None) -> List[Dict]:
+        """
+        Obtiene varios documentos con una sola consulta `$in` sobre el índice de
+        `numero`, en el orden solicitado (los inexistentes se omiten).
+        Con `campos` se proyectan solo esos campos; si incluye `texto_contenido`,
+        `longitud_texto` lo recorta en el servidor.
+        """
+        unicos = list(dict.fromkeys(numeros))
+        proyeccion = None
+        if campos:
+            proyeccion = {campo: 1 for campo in campos}
+            proyeccion['numero'] = 1
+            if 'texto_contenido' in proyeccion:
+                proyeccion['texto_externo'] = 1
+                if longitud_texto:
+                    # Recorte en el servidor para los textos en línea (los externos se recortan al hidratarlos)
+                    proyeccion['texto_contenido'] = {'$substrCP': [{'$ifNull': ['$texto_contenido', '']}, 0, longitud_texto]}
+        try:
+            por_numero = {doc['numero']: doc for doc in self.coll.find({'numero': {'$in': unicos}}, proyeccion)}
+            if campos is None or 'texto_contenido' in campos:
+                for doc in por_numero.values():
+                    # Los externos tienen '' por la proyección: se completan desde el almacén
+                    if doc.get('texto_externo') and not doc.get('texto_contenido'):
+                        doc.pop('texto_contenido', None)
+                self.hidratar_textos(list(por_numero.values()), longitud_texto if campos else None)
+            return [por_numero[numero] for numero in unicos if numero in por_numero]
+        except PyMongoError as e:
+            logger.error(f"Error al obtener lote de documentos: {e}")
+            return []
+
+    @cronometrar('mongodb')
+    def obtener_validador_documento(self, numero: int) -> Optional[Dict]:
+        """Revisión y fechas de un documento (proyección mínima para ETag/Last-Modified)."""
+        try:
+            return self.coll.find_one({'numero': numero}, CAMPOS_VALIDADOR)
+        except PyMongoError as e:
+            logger.error(f"Error al obtener validador del documento {numero}: {e}")
+            return None
+
+    def obtener_canonico(self, numero: int) -> int:
+        """Número del documento canónico (`duplicado_de`) o el mismo número si no es un duplicado."""
+        try:
+            documento = self.coll.find_one({'numero': numero}, {'_id': 0, 'duplicado_de': 1})
+        except PyMongoError as e:
+            logger.error(f"Error al obtener el canónico del documento {numero}: {e}")
+            return numero
+        return (documento or {}).get('duplicado_de') or numero
+
+    @cronometrar('mongodb')
+    def obtener_version_corpus(self) -> Dict[str, Any]:
+        """Versión del corpus y número estimado de documentos (ambos de costo constante)."""
+        try:
+            control = self.db[COLECCION_VERSIONES].find_one({'_id': self.collection_name}) or {}
+            return {
+                'version': control.get('version', 0),
+                'actualizado_en': control.get('actualizado_en'),
+                'total_estimado': self.coll.estimated_document_count()
+            }
+        except PyMongoError as e:
+            logger.error(f"Error al obtener versión del corpus: {e}")
+            return {}
+
+    def incrementar_version_corpus(self) -> int:
+        """Marca la colección como modificada (invalida los ETag de estadísticas)."""
+        return incrementar_version_corpus(self.db, self.collection_name)
+
+    @cronometrar('mongodb')
     def obtener_documentos_recientes(self, limite: int = 10) -> List[Dict]:
         """Obtiene los documentos más recientes."""
         try:
-            docs = list(self.coll.find().sort('fecha_descarga', -1).limit(limite))
-            for doc in docs:
-                doc['_id'] = str(doc['_id'])
-            return docs
+            return list(self.coll.find().sort('fecha_descarga', -1).limit(limite))
         except PyMongoError as e:
             logger.error(f"Error al obtener recientes: {e}")
             return []
 
+    @cronometrar('mongodb')
     def obtener_estadisticas_avanzadas(self) -> Dict[str, Any]:
         """Obtiene estadísticas avanzadas para el dashboard."""
         try:
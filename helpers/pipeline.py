@@ -0,0 +1,320 @@
+# helpers/pipeline.py
+# Pipeline por etapas con colas acotadas: cada etapa tiene su propio pool de hilos y la cola llena frena a la anterior
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Marca de fin de la corriente (una por hilo de la etapa siguiente)
+_FIN = object()
+
+# Fallos que se conservan para el reporte (el resto solo se cuenta)
+MAX_FALLOS = 100
+
+
+class Etapa:
+    """
+    Una etapa del pipeline.
+
+    `funcion(elemento)` retorna el elemento para la etapa siguiente o None
+    para descartarlo. Con `lote` la función recibe una lista de hasta `lote`
+    elementos (o los que hayan llegado en `espera_lote` segundos) y retorna
+    la lista que sigue adelante. `capacidad` es el tamaño de la cola de
+    entrada: cuando se llena, la etapa anterior espera (backpressure).
+    """
+
+    def __init__(self, nombre: str, funcion: Callable, trabajadores: int = 1, capacidad: int = 100,
+                 lote: Optional[int] = None, espera_lote: float = 1.0):
+        if trabajadores < 1:
+            raise ValueError(f"La etapa '{nombre}' necesita al menos un trabajador")
+        self.nombre = nombre
+        self.funcion = funcion
+        self.trabajadores = trabajadores
+        self.capacidad = capacidad
+        self.lote = lote
+        self.espera_lote = espera_lote
+        self.cola: queue.Queue = queue.Queue(maxsize=capacidad)
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.entradas = 0
+        self.salidas = 0
+        self.descartados = 0
+        self.errores = 0
+        self.ocupados = 0
+        self.segundos = 0.0
+        self.activos = 0
+
+    def _contar(self, **incrementos):
+        with self._lock:
+            for campo, valor in incrementos.items():
+                setattr(self, campo, getattr(self, campo) + valor)
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            'etapa': self.nombre,
+            'trabajadores': self.trabajadores,
+            'ocupados': self.ocupados,
+            'cola': self.cola.qsize(),
+            'capacidad': self.capacidad,
+            'entradas': self.entradas,
+            'salidas': self.salidas,
+            'descartados': self.descartados,
+            'errores': self.errores,
+            'segundos_trabajo': round(self.segundos, 2)
+        }
+
+
+class Pipeline:
+    """
+    Ejecuta las etapas en paralelo: el productor recorre la fuente y cada
+    etapa consume de su cola y publica en la de la siguiente. Un error en un
+    elemento se registra y no detiene la corriente.
+    """
+
+    def __init__(self, etapas: List[Etapa]):
+        if not etapas:
+            raise ValueError("El pipeline necesita al menos una etapa")
+        self.etapas = etapas
+        self.fallos: List[Dict[str, Any]] = []
+        self.leidos = 0
+        self.inicio: Optional[float] = None
+        self.fin: Optional[float] = None
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self._hilos: List[threading.Thread] = []
+
+    # ---------- Ejecución ----------
+
+    def ejecutar(self, fuente: Iterable[Any]) -> Dict[str, Any]:
+        """Procesa la fuente completa y retorna el estado final."""
+        self.iniciar(fuente)
+        self.esperar()
+        return self.estado()
+
+    def iniciar(self, fuente: Iterable[Any]):
+        self.inicio = time.perf_counter()
+        self.fin = None
+        self.leidos = 0
+        self.fallos = []
+        self._detener.clear()
+        for etapa in self.etapas:
+            etapa.reiniciar()
+            etapa.activos = etapa.trabajadores
+
+        for posicion, etapa in enumerate(self.etapas):
+            siguiente = self.etapas[posicion + 1] if posicion + 1 < len(self.etapas) else None
+            for i in range(etapa.trabajadores):
+                hilo = threading.Thread(target=self._trabajador, args=(etapa, siguiente),
+                                        name=f'pipeline-{etapa.nombre}-{i}', daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+
+        productor = threading.Thread(target=self._producir, args=(fuente,), name='pipeline-fuente', daemon=True)
+        productor.start()
+        self._hilos.append(productor)
+
+    def esperar(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que terminen todas las etapas. Retorna False si vence el timeout."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        for hilo in self._hilos:
+            restante = None if limite is None else max(limite - time.monotonic(), 0)
+            # join con intervalos cortos para que Ctrl+C llegue al hilo principal
+            while hilo.is_alive() and (restante is None or restante > 0):
+                hilo.join(0.2 if restante is None else min(0.2, restante))
+                if restante is not None:
+                    restante = max(limite - time.monotonic(), 0)
+            if hilo.is_alive():
+                return False
+        self._hilos = []
+        if self.fin is None:
+            self.fin = time.perf_counter()
+        return True
+
+    def detener(self):
+        """Deja de leer la fuente; los elementos en las colas se descartan sin procesar."""
+        self._detener.set()
+
+    @property
+    def detenido(self) -> bool:
+        return self._detener.is_set()
+
+    def _producir(self, fuente: Iterable[Any]):
+        primera = self.etapas[0]
+        try:
+            for elemento in fuente:
+                if self._detener.is_set():
+                    break
+                primera.cola.put(elemento)
+                with self._lock:
+                    self.leidos += 1
+        except Exception as e:
+            logger.error(f"Error leyendo la fuente del pipeline: {e}")
+            self._registrar_fallo('fuente', None, e)
+        finally:
+            for _ in range(primera.trabajadores):
+                primera.cola.put(_FIN)
+
+    def _trabajador(self, etapa: Etapa, siguiente: Optional[Etapa]):
+        try:
+            if etapa.lote:
+                self._consumir_lotes(etapa, siguiente)
+            else:
+                self._consumir(etapa, siguiente)
+        finally:
+            with etapa._lock:
+                etapa.activos -= 1
+                ultimo = etapa.activos == 0
+            # El último hilo de la etapa cierra la cola de la siguiente
+            if ultimo and siguiente is not None:
+                for _ in range(siguiente.trabajadores):
+                    siguiente.cola.put(_FIN)
+
+    def _consumir(self, etapa: Etapa, siguiente: Optional[Etapa]):
+        while True:
+            elemento = etapa.cola.get()
+            if elemento is _FIN:
+                return
+            etapa._contar(entradas=1)
+            if self._detener.is_set():
+                etapa._contar(descartados=1)
+                continue
+            self._procesar(etapa, siguiente, elemento, [elemento])
+
+    def _consumir_lotes(self, etapa: Etapa, siguiente: Optional[Etapa]):
+        terminado = False
+        while not terminado:
+            pendientes: List[Any] = []
+            limite = None
+            while len(pendientes) < etapa.lote:
+                try:
+                    # El plazo del lote corre desde el primer elemento: una corriente lenta no retiene datos
+                    espera = None if limite is None else max(limite - time.monotonic(), 0)
+                    elemento = etapa.cola.get(timeout=espera) if espera is None or espera > 0 else etapa.cola.get_nowait()
+                except queue.Empty:
+                    break
+                if elemento is _FIN:
+                    terminado = True
+                    break
+                pendientes.append(elemento)
+                if limite is None:
+                    limite = time.monotonic() + etapa.espera_lote
+            if not pendientes:
+                continue
+            etapa._contar(entradas=len(pendientes))
+            if self._detener.is_set():
+                etapa._contar(descartados=len(pendientes))
+                continue
+            self._procesar(etapa, siguiente, pendientes, pendientes)
+
+    def _procesar(self, etapa: Etapa, siguiente: Optional[Etapa], entrada: Any, elementos: List[Any]):
+        etapa._contar(ocupados=1)
+        inicio = time.perf_counter()
+        try:
+            resultado = etapa.funcion(entrada)
+        except Exception as e:
+            logger.error(f"Error en la etapa '{etapa.nombre}': {e}")
+            etapa._contar(errores=len(elementos))
+            self._registrar_fallo(etapa.nombre, elementos[0], e)
+            return
+        finally:
+            etapa._contar(ocupados=-1, segundos=time.perf_counter() - inicio)
+
+        salidas = (resultado or []) if etapa.lote else ([] if resultado is None else [resultado])
+        etapa._contar(salidas=len(salidas), descartados=max(len(elementos) - len(salidas), 0))
+        if siguiente is not None:
+            for salida in salidas:
+                siguiente.cola.put(salida)
+
+    def _registrar_fallo(self, etapa: str, elemento: Any, error: Exception):
+        with self._lock:
+            if len(self.fallos) < MAX_FALLOS:
+                descripcion = (elemento.get('url_original') or elemento.get('numero')) if isinstance(elemento, dict) else elemento
+                self.fallos.append({'etapa': etapa, 'elemento': str(descripcion)[:200], 'error': str(error)})
+
+    # ---------- Estado ----------
+
+    def segundos(self) -> float:
+        if self.inicio is None:
+            return 0.0
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            'leidos': self.leidos,
+            'segundos': round(self.segundos(), 2),
+            'detenido': self.detenido,
+            'etapas': [etapa.estado() for etapa in self.etapas],
+            'fallos': list(self.fallos)
+        }
+
+
+class MonitorProgreso:
+    """
+    Muestra el avance de cada etapa mientras corre el pipeline. En una
+    terminal redibuja la tabla en su lugar; redirigido a un archivo imprime
+    una línea de resumen cada `intervalo_log` segundos.
+    """
+
+    def __init__(self, pipeline: Pipeline, intervalo: float = 0.5, intervalo_log: float = 10.0,
+                 salida=None, extras: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.pipeline = pipeline
+        self.salida = salida or sys.stderr
+        self.interactivo = hasattr(self.salida, 'isatty') and self.salida.isatty() and os.getenv('TERM') != 'dumb'
+        self.intervalo = intervalo if self.interactivo else intervalo_log
+        self.extras = extras
+        self._lineas = 0
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'MonitorProgreso':
+        self._hilo = threading.Thread(target=self._bucle, name='pipeline-progreso', daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *_):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join()
+        self.mostrar()
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            self.mostrar()
+
+    def lineas(self) -> List[str]:
+        estado = self.pipeline.estado()
+        segundos = max(estado['segundos'], 1e-9)
+        encabezado = f"⏱  {estado['segundos']:.1f}s | leídos: {estado['leidos']}"
+        if self.extras:
+            encabezado += ''.join(f" | {clave}: {valor}" for clave, valor in self.extras().items())
+        lineas = [encabezado,
+                  f"{'etapa':<14}{'hilos':>7}{'cola':>11}{'entrada':>9}{'salida':>8}{'error':>7}{'doc/s':>8}"]
+        for etapa in estado['etapas']:
+            lineas.append(
+                f"{etapa['etapa']:<14}{etapa['ocupados']:>3}/{etapa['trabajadores']:<3}"
+                f"{etapa['cola']:>5}/{etapa['capacidad']:<5}{etapa['entradas']:>9}{etapa['salidas']:>8}"
+                f"{etapa['errores']:>7}{etapa['salidas'] / segundos:>8.1f}"
+            )
+        return lineas
+
+    def mostrar(self):
+        lineas = self.lineas()
+        if self.interactivo:
+            # Sube el cursor al inicio de la tabla anterior y la reescribe
+            prefijo = f"\x1b[{self._lineas}F" if self._lineas else ''
+            self.salida.write(prefijo + ''.join(f"\x1b[2K{linea}\n" for linea in lineas))
+            self._lineas = len(lineas)
+        else:
+            resumen = ' | '.join(f"{e['etapa']} {e['salidas']}/{e['entradas']} (cola {e['cola']})"
+                                 for e in self.pipeline.estado()['etapas'])
+            self.salida.write(f"{lineas[0]} | {resumen}\n")
+        self.salida.flush()
@@ -0,0 +1,151 @@
+# helpers/respuestas_http.py
+# Serialización JSON rápida y compresión negociada de las respuestas de la API
+import gzip
+import json
+import logging
+import os
+from datetime import date, datetime
+from typing import Any
+
+from bson import ObjectId
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Respuestas más pequeñas que el umbral no compensan el costo de comprimir
+COMPRESION_UMBRAL = int(os.getenv('COMPRESION_UMBRAL', '1024'))
+
+TIPOS_COMPRIMIBLES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/x-ndjson',
+    'image/svg+xml',
+)
+
+
+def _serializar_extra(obj: Any) -> Any:
+    """
+    Tipos de MongoDB y fechas que el JSON estándar no conoce. Las fechas van
+    en ISO 8601 con isoformat(), que es exactamente lo que orjson emite para
+    datetime y date: la API responde igual con o sin orjson instalado.
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Objeto de tipo {type(obj).__name__} no serializable a JSON")
+
+
+def serializar_json(obj: Any, ordenar: bool = False) -> bytes:
+    """
+    Serializa a JSON (bytes UTF-8) con orjson si está disponible; usado fuera
+    de las respuestas de Flask. `ordenar` ordena las claves de los objetos.
+    """
+    if orjson is not None:
+        opciones = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if ordenar else 0)
+        return orjson.dumps(obj, default=_serializar_extra, option=opciones)
+    return json.dumps(obj, default=_serializar_extra, ensure_ascii=False, sort_keys=ordenar).encode('utf-8')
+
+
+class ProveedorJSONRapido(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask basado en orjson (si está instalado), con
+    soporte nativo de ObjectId y fechas. Sin orjson usa el módulo json
+    estándar con el mismo manejo de tipos, así que los documentos de
+    MongoDB se pueden devolver sin convertir `_id` a mano. En ambos casos
+    las fechas salen en ISO 8601, no en el formato RFC 822 del proveedor
+    por defecto de Flask.
+    """
+
+    @staticmethod
+    def default(obj: Any) -> Any:
+        try:
+            return _serializar_extra(obj)
+        except TypeError:
+            return DefaultJSONProvider.default(obj)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_serializar_extra, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        cuerpo = orjson.dumps(obj, default=_serializar_extra, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(cuerpo, mimetype=self.mimetype)
+
+
+def _es_comprimible(response: Response) -> bool:
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code >= 300 or response.status_code == 204:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in TIPOS_COMPRIMIBLES
+
+
+def elegir_codificacion() -> str:
+    """Negocia la codificación con Accept-Encoding: brotli si está disponible, si no gzip."""
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas['br'] > 0:
+        return 'br'
+    if aceptadas['gzip'] > 0:
+        return 'gzip'
+    return ''
+
+
+def comprimir_respuesta(response: Response) -> Response:
+    """
+    Función after_request: comprime el cuerpo con br/gzip cuando el cliente
+    lo acepta y el tamaño supera COMPRESION_UMBRAL.
+    """
+    if not _es_comprimible(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    datos = response.get_data()
+    if len(datos) < COMPRESION_UMBRAL:
+        return response
+
+    codificacion = elegir_codificacion()
+    if not codificacion:
+        return response
+
+    if codificacion == 'br':
+        comprimido = brotli.compress(datos, quality=5)
+    else:
+        comprimido = gzip.compress(datos, compresslevel=6)
+
+    response.set_data(comprimido)
+    response.headers['Content-Encoding'] = codificacion
+
+    # El cuerpo codificado ya no es idéntico byte a byte: el validador pasa a débil
+    etag, debil = response.get_etag()
+    if etag and not debil:
+        response.set_etag(etag, weak=True)
+    return response
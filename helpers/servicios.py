@@ -0,0 +1,200 @@
+# helpers/servicios.py
+# Registro de servicios con inicialización diferida (primer uso o calentamiento en segundo plano)
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Espera entre reintentos de un servicio que falló al inicializarse: se duplica hasta el máximo
+REINTENTO_BASE_SEGUNDOS = 1.0
+REINTENTO_MAXIMO_SEGUNDOS = 30.0
+
+
+class _Servicio:
+    __slots__ = ('fabrica', 'verificar', 'requerido', 'instancia', 'verificado', 'error', 'intentos',
+                 'reintentar_en', 'segundos_inicio', 'lock')
+
+    def __init__(self, fabrica: Callable[[], Any], verificar: Optional[Callable[[Any], bool]], requerido: bool):
+        self.fabrica = fabrica
+        self.verificar = verificar
+        self.requerido = requerido
+        self.instancia: Any = None
+        self.verificado = False
+        self.error: Optional[str] = None
+        self.intentos = 0
+        self.reintentar_en = 0.0
+        self.segundos_inicio: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def toca_reintentar(self) -> bool:
+        return time.monotonic() >= self.reintentar_en
+
+    def fallo(self, error: str):
+        self.error = error
+        self.intentos += 1
+        espera = min(REINTENTO_BASE_SEGUNDOS * 2 ** (self.intentos - 1), REINTENTO_MAXIMO_SEGUNDOS)
+        self.reintentar_en = time.monotonic() + espera
+
+
+class RegistroServicios:
+    """
+    Registro de servicios pesados (conexiones remotas, SDKs) que se crean
+    la primera vez que se usan en lugar de al importar la aplicación.
+
+    `calentar_en_segundo_plano` los inicializa en un hilo al arrancar el
+    worker, de modo que la primera petición normalmente los encuentra
+    listos; si llega antes, espera solo al servicio que necesita.
+
+    Un servicio cuya fábrica falla, o cuya instancia no pasa `verificar`
+    (fábricas que atrapan su propio error y dejan, p. ej., `client=None`),
+    se reintenta con espera exponencial: mientras tanto `obtener` lanza el
+    error sin reintentar o, si hay instancia, entrega la degradada para que
+    quien llama use su alternativa. `estado()` (la readiness) también
+    inicializa y reintenta los servicios requeridos.
+    """
+
+    def __init__(self):
+        self._servicios: Dict[str, _Servicio] = {}
+
+    def registrar(self, nombre: str, fabrica: Callable[[], Any],
+                  verificar: Optional[Callable[[Any], bool]] = None, requerido: bool = True):
+        """
+        Registra un servicio. `verificar` (opcional) recibe la instancia y
+        dice si está operativo; `requerido` indica si cuenta para la readiness.
+        """
+        self._servicios[nombre] = _Servicio(fabrica, verificar, requerido)
+
+    def obtener(self, nombre: str) -> Any:
+        """Retorna la instancia, creándola si aún no existe (un solo hilo la crea)."""
+        servicio = self._servicios[nombre]
+        if servicio.instancia is not None:
+            if servicio.verificado or not servicio.toca_reintentar():
+                return servicio.instancia
+            # Instancia degradada: un solo hilo la recrea, los demás siguen con la actual
+            if servicio.lock.acquire(blocking=False):
+                try:
+                    self._crear(nombre, servicio)
+                finally:
+                    servicio.lock.release()
+            return servicio.instancia
+        with servicio.lock:
+            if servicio.instancia is None:
+                if not servicio.toca_reintentar():
+                    espera = servicio.reintentar_en - time.monotonic()
+                    raise RuntimeError(f"Servicio '{nombre}' no disponible (reintento en {espera:.0f}s): "
+                                       f"{servicio.error}")
+                self._crear(nombre, servicio, lanzar=True)
+        return servicio.instancia
+
+    def _crear(self, nombre: str, servicio: _Servicio, lanzar: bool = False):
+        inicio = time.perf_counter()
+        try:
+            instancia = servicio.fabrica()
+            verificado = True
+            if servicio.verificar:
+                try:
+                    verificado = bool(servicio.verificar(instancia))
+                except Exception:
+                    verificado = False
+        except Exception as e:
+            servicio.fallo(str(e))
+            logger.error(f"Error al inicializar el servicio '{nombre}': {e}")
+            if lanzar:
+                raise
+            return
+        finally:
+            servicio.segundos_inicio = round(time.perf_counter() - inicio, 3)
+        servicio.instancia = instancia
+        servicio.verificado = verificado
+        if verificado:
+            servicio.error = None
+            servicio.intentos = 0
+            servicio.reintentar_en = 0.0
+            logger.info(f"Servicio '{nombre}' inicializado en {servicio.segundos_inicio}s")
+        else:
+            servicio.fallo('no quedó operativo al inicializarse')
+            logger.warning(f"Servicio '{nombre}' inicializado sin quedar operativo; se reintentará")
+
+    def proxy(self, nombre: str) -> 'ServicioPerezoso':
+        """Objeto que se comporta como el servicio y lo inicializa al primer acceso."""
+        return ServicioPerezoso(self, nombre)
+
+    def inicializado(self, nombre: str) -> bool:
+        return self._servicios[nombre].instancia is not None
+
+    def calentar_en_segundo_plano(self, nombres: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Inicializa los servicios indicados (todos por defecto) en un hilo daemon."""
+        pendientes = list(nombres or self._servicios.keys())
+
+        def calentar():
+            for nombre in pendientes:
+                try:
+                    self.obtener(nombre)
+                except Exception:
+                    continue
+
+        hilo = threading.Thread(target=calentar, name='calentamiento-servicios', daemon=True)
+        hilo.start()
+        return hilo
+
+    def estado(self, inicializar: bool = True) -> Dict[str, Any]:
+        """
+        Estado de cada servicio y readiness global (todos los requeridos
+        listos y operativos). Con `inicializar`, antes crea los requeridos
+        pendientes y reintenta los fallidos cuya espera ya pasó: la readiness
+        no depende de que alguna petición los haya usado.
+        """
+        if inicializar:
+            for nombre, servicio in self._servicios.items():
+                if servicio.requerido and not (servicio.instancia is not None and servicio.verificado) \
+                        and servicio.toca_reintentar():
+                    try:
+                        self.obtener(nombre)
+                    except Exception:
+                        continue
+
+        servicios = {}
+        listo = True
+        ahora = time.monotonic()
+        for nombre, servicio in self._servicios.items():
+            operativo = servicio.instancia is not None
+            if operativo and servicio.verificar:
+                try:
+                    operativo = bool(servicio.verificar(servicio.instancia))
+                except Exception:
+                    operativo = False
+            servicios[nombre] = {
+                'inicializado': servicio.instancia is not None,
+                'operativo': operativo,
+                'requerido': servicio.requerido,
+                'segundos_inicio': servicio.segundos_inicio,
+                'error': servicio.error,
+                'intentos_fallidos': servicio.intentos,
+                'reintento_en_segundos': round(max(servicio.reintentar_en - ahora, 0), 1) if servicio.error else None
+            }
+            if servicio.requerido and not operativo:
+                listo = False
+        return {'listo': listo, 'servicios': servicios}
+
+
+class ServicioPerezoso:
+    """Proxy que delega todos los atributos en la instancia del registro."""
+    __slots__ = ('_registro', '_nombre')
+
+    def __init__(self, registro: RegistroServicios, nombre: str):
+        object.__setattr__(self, '_registro', registro)
+        object.__setattr__(self, '_nombre', nombre)
+
+    def __getattr__(self, atributo: str) -> Any:
+        return getattr(self._registro.obtener(self._nombre), atributo)
+
+    def __setattr__(self, atributo: str, valor: Any):
+        setattr(self._registro.obtener(self._nombre), atributo, valor)
+
+    def __repr__(self) -> str:
+        return f"<ServicioPerezoso '{self._nombre}'>"
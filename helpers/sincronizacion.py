@@ -0,0 +1,414 @@
+# helpers/sincronizacion.py
+# Sincronización continua MongoDB → ElasticSearch: change streams (o sondeo por actualizado_en) aplicados en lotes bulk
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import OperationFailure
+
+from helpers.elasticsearch import documento_para_indice
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Estado persistente de cada sincronizador (resume token o marca del sondeo, latido y retraso)
+COLECCION_SYNC = 'sync_estado'
+
+CHANGE_STREAM = 'change_stream'
+SONDEO = 'sondeo'
+MODOS = ('auto', CHANGE_STREAM, SONDEO)
+
+SYNC_MODO = os.getenv('SYNC_MODO', 'auto').lower()
+SYNC_LOTE = int(os.getenv('SYNC_LOTE', '500'))
+# Espera máxima para juntar cambios en un lote (también el max_await del change stream)
+SYNC_ESPERA_LOTE = float(os.getenv('SYNC_ESPERA_LOTE', '1.0'))
+SYNC_INTERVALO_SONDEO = float(os.getenv('SYNC_INTERVALO_SONDEO', '5'))
+# El sondeo no lee cambios más recientes que este margen: cubre escrituras que confirman tarde y relojes desfasados
+SYNC_MARGEN_SEGUNDOS = float(os.getenv('SYNC_MARGEN_SEGUNDOS', '5'))
+# El sondeo no ve los borrados: cada tanto compara los números del índice con los de MongoDB
+SYNC_RECONCILIAR_SEGUNDOS = float(os.getenv('SYNC_RECONCILIAR_SEGUNDOS', '3600'))
+# Change stream: borrados sin pre-imagen (sin número) se resuelven con una reconciliación, como mucho una por intervalo
+SYNC_RECONCILIAR_BORRADOS_SEGUNDOS = float(os.getenv('SYNC_RECONCILIAR_BORRADOS_SEGUNDOS', '60'))
+
+# Cada cuánto se escribe el latido cuando no hay cambios, y cuándo se considera caído el sincronizador
+LATIDO_SEGUNDOS = 15
+LATIDO_VENCIDO = 3 * LATIDO_SEGUNDOS
+ESPERA_ERROR = 10
+
+# ChangeStreamFatalError y ChangeStreamHistoryLost: el resume token ya no está en el oplog
+ERRORES_HISTORIAL_PERDIDO = (280, 286)
+
+
+class SincronizadorIndice:
+    """
+    Mantiene el índice de ElasticSearch al día con la colección de documentos,
+    sin importar qué proceso escribió en MongoDB.
+
+    Con replica set lee el change stream de la colección y guarda el resume
+    token en `sync_estado` después de cada lote aplicado: al reiniciar sigue
+    donde quedó (al menos una vez; reaplicar un lote es idempotente). En un
+    servidor standalone sondea `actualizado_en` con una marca (fecha, _id);
+    como así no se ven los borrados, reconcilia los números del índice cada
+    `reconciliar_cada` segundos.
+
+    Cada cambio relee el documento actual: varios cambios del mismo documento
+    en un lote se aplican una sola vez y los duplicados (`duplicado_de`) se
+    quitan del índice. Las indexaciones rechazadas pasan a la cola de tareas.
+
+    Un borrado en el change stream solo trae el _id. En MongoDB 6.0+ con
+    pre-imágenes activas en la colección (`collMod` con
+    `changeStreamPreAndPostImages: {enabled: true}`) el evento trae el
+    documento anterior y su número se elimina del índice en el mismo lote;
+    sin pre-imagen queda pendiente una reconciliación, que se ejecuta como
+    mucho una vez cada `reconciliar_borrados_cada` segundos.
+    """
+
+    def __init__(self, mongo, elastic, cola=None, lote: int = SYNC_LOTE, espera_lote: float = SYNC_ESPERA_LOTE,
+                 intervalo_sondeo: float = SYNC_INTERVALO_SONDEO, margen: float = SYNC_MARGEN_SEGUNDOS,
+                 reconciliar_cada: float = SYNC_RECONCILIAR_SEGUNDOS,
+                 reconciliar_borrados_cada: float = SYNC_RECONCILIAR_BORRADOS_SEGUNDOS):
+        self.mongo = mongo
+        self.elastic = elastic
+        self.cola = cola
+        self.lote = lote
+        self.espera_lote = espera_lote
+        self.intervalo_sondeo = intervalo_sondeo
+        self.margen = margen
+        self.reconciliar_cada = reconciliar_cada
+        self.reconciliar_borrados_cada = reconciliar_borrados_cada
+        self.coleccion_estado = mongo.db[COLECCION_SYNC]
+        self.identificador = f"{mongo.collection_name}:{elastic.alias}"
+        self.modo: Optional[str] = None
+        self.estadisticas = {'lotes': 0, 'indexados': 0, 'eliminados': 0, 'errores': 0, 'reconciliaciones': 0}
+        self._ultimo_latido = 0.0
+        self._ultima_reconciliacion_borrados: Optional[float] = None
+        self._borrados_pendientes = False
+        self._detener = threading.Event()
+
+    # ---------- Estado persistente ----------
+
+    def estado(self) -> Dict[str, Any]:
+        return self.coleccion_estado.find_one({'_id': self.identificador}) or {}
+
+    def _guardar_estado(self, campos: Optional[Dict[str, Any]] = None, incrementos: Optional[Dict[str, int]] = None):
+        actualizacion: Dict[str, Any] = {'$set': dict(campos or {}, latido=datetime.now())}
+        if self.modo:
+            actualizacion['$set']['modo'] = self.modo
+        if incrementos:
+            actualizacion['$inc'] = incrementos
+        self.coleccion_estado.update_one({'_id': self.identificador}, actualizacion, upsert=True)
+        self._ultimo_latido = time.monotonic()
+
+    def _latir(self):
+        """Sin cambios pendientes el índice está al día: retraso 0 (escrito como mucho cada LATIDO_SEGUNDOS)."""
+        if time.monotonic() - self._ultimo_latido >= LATIDO_SEGUNDOS:
+            self._guardar_estado({'lag_segundos': 0.0})
+
+    def reiniciar(self):
+        """Olvida el resume token y la marca: la próxima ejecución empieza con una resincronización completa."""
+        self.coleccion_estado.delete_one({'_id': self.identificador})
+
+    def _registrar_error(self, error: Exception):
+        self.estadisticas['errores'] += 1
+        logger.error(f"Error en la sincronización {self.identificador}: {error}")
+        try:
+            self._guardar_estado({'ultimo_error': str(error)[:500], 'ultimo_error_en': datetime.now()},
+                                 {'errores': 1})
+        except Exception:
+            pass
+
+    # ---------- Aplicación de cambios ----------
+
+    def aplicar_documentos(self, documentos: List[Dict[str, Any]], eliminar: Iterable[int] = ()) -> Dict[str, int]:
+        """Indexa los canónicos de `documentos` y quita del índice los duplicados y los números de `eliminar`."""
+        eliminar = set(eliminar)
+        fuentes = []
+        for documento in self.mongo.hidratar_textos(documentos):
+            if documento.get('numero') is None:
+                continue
+            if documento.get('duplicado_de'):
+                eliminar.add(documento['numero'])
+                continue
+            try:
+                fuentes.append(documento_para_indice(documento))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Documento {documento['numero']} no indexable: {type(e).__name__}: {e}")
+
+        fallidos: List[int] = []
+        indexados, errores = self.elastic.indexar_incremental(fuentes, refrescar=False, fallidos=fallidos) \
+            if fuentes else (0, 0)
+        eliminados, errores_eliminar = self.elastic.eliminar_documentos(sorted(eliminar)) if eliminar else (0, 0)
+        if fallidos and self.cola is not None:
+            from helpers.tareas_ingesta import INDEXAR
+            self.cola.encolar_muchos(INDEXAR, fallidos, error="ElasticSearch rechazó el documento en la sincronización")
+
+        resultado = {'indexados': indexados, 'eliminados': eliminados, 'errores': errores + errores_eliminar}
+        for campo, valor in resultado.items():
+            self.estadisticas[campo] += valor
+        return resultado
+
+    def _aplicar_lote(self, documentos: List[Dict[str, Any]], origenes: List[float],
+                      campos_estado: Dict[str, Any], eliminar: Iterable[int] = ()) -> Dict[str, int]:
+        """Aplica un lote y guarda la posición con el retraso medido (desde el cambio más antiguo del lote)."""
+        # Un número borrado y vuelto a insertar en el mismo lote se queda en el índice
+        eliminar = set(eliminar) - {documento.get('numero') for documento in documentos}
+        resultado = self.aplicar_documentos(documentos, eliminar)
+        lag = max(time.time() - min(origenes), 0.0) if origenes else 0.0
+        self.estadisticas['lotes'] += 1
+        self._guardar_estado(dict(campos_estado, lag_segundos=round(lag, 3), ultimo_lote=datetime.now()), resultado)
+        logger.info(f"Lote sincronizado: {resultado['indexados']} indexados, {resultado['eliminados']} eliminados, "
+                    f"{resultado['errores']} errores, retraso {lag:.1f}s")
+        return resultado
+
+    def _leer_por_ids(self, ids: List[Any]) -> List[Dict[str, Any]]:
+        return list(self.mongo.coll.find({'_id': {'$in': ids}}))
+
+    # ---------- Copia completa y reconciliación ----------
+
+    def resincronizar(self) -> Dict[str, int]:
+        """Copia completa: reindexa todos los documentos y elimina del índice los que ya no existen."""
+        logger.info(f"Resincronización completa de {self.identificador}...")
+        en_indice = self.elastic.numeros_indexados()
+        vistos = set()
+        totales = {'indexados': 0, 'eliminados': 0, 'errores': 0}
+        lote: List[Dict[str, Any]] = []
+        for documento in self.mongo.coll.find({}, batch_size=self.lote):
+            vistos.add(documento.get('numero'))
+            lote.append(documento)
+            if len(lote) >= self.lote:
+                self._sumar(totales, self.aplicar_documentos(lote))
+                lote = []
+        sobrantes = en_indice - vistos
+        if lote or sobrantes:
+            self._sumar(totales, self.aplicar_documentos(lote, sobrantes))
+        self._guardar_estado({'ultima_resincronizacion': datetime.now()})
+        logger.info(f"Resincronización terminada: {totales}")
+        return totales
+
+    def reconciliar(self, indexar_faltantes: bool = True) -> Dict[str, int]:
+        """
+        Compara los números del índice con los canónicos de MongoDB: elimina
+        los sobrantes (borrados o ahora duplicados) y con `indexar_faltantes`
+        indexa los que falten. El índice se lee primero, así un documento que
+        se inserta mientras tanto a lo sumo se indexa de más.
+        """
+        en_indice = self.elastic.numeros_indexados()
+        canonicos = {doc['numero'] for doc in self.mongo.coll.find({'duplicado_de': None}, {'_id': 0, 'numero': 1})
+                     if doc.get('numero') is not None}
+        sobrantes = en_indice - canonicos
+        faltantes = sorted(canonicos - en_indice) if indexar_faltantes else []
+        totales = {'indexados': 0, 'eliminados': 0, 'errores': 0}
+        if sobrantes:
+            self._sumar(totales, self.aplicar_documentos([], sobrantes))
+        for inicio in range(0, len(faltantes), self.lote):
+            documentos = list(self.mongo.coll.find({'numero': {'$in': faltantes[inicio:inicio + self.lote]}}))
+            self._sumar(totales, self.aplicar_documentos(documentos))
+        self.estadisticas['reconciliaciones'] += 1
+        self._guardar_estado({'ultima_reconciliacion': datetime.now()})
+        if sobrantes or faltantes:
+            logger.info(f"Reconciliación: {len(sobrantes)} sobrantes, {len(faltantes)} faltantes")
+        return dict(totales, sobrantes=len(sobrantes), faltantes=len(faltantes))
+
+    @staticmethod
+    def _sumar(totales: Dict[str, int], resultado: Dict[str, int]):
+        for campo in totales:
+            totales[campo] += resultado.get(campo, 0)
+
+    # ---------- Ejecución ----------
+
+    def soporta_change_streams(self) -> bool:
+        """Los change streams necesitan un replica set o un clúster con mongos."""
+        try:
+            hola = self.mongo.client.admin.command('hello')
+        except Exception:
+            return False
+        return bool(hola.get('setName')) or hola.get('msg') == 'isdbgrid'
+
+    def detener(self):
+        self._detener.set()
+
+    def ejecutar(self, modo: str = SYNC_MODO, una_vez: bool = False) -> Dict[str, int]:
+        """
+        Sincroniza hasta que se llame a detener(). Con `una_vez` aplica los
+        cambios pendientes y termina (útil desde cron con el sondeo).
+        """
+        if modo not in MODOS:
+            raise ValueError(f"Modo de sincronización desconocido: {modo}")
+        if modo == 'auto':
+            modo = CHANGE_STREAM if self.soporta_change_streams() else SONDEO
+        self.modo = modo
+        logger.info(f"Sincronizando {self.identificador} por {modo}")
+        if modo == CHANGE_STREAM:
+            self._ejecutar_change_stream(una_vez)
+        else:
+            self._ejecutar_sondeo(una_vez)
+        return dict(self.estadisticas)
+
+    def _opciones_stream(self) -> Dict[str, Any]:
+        """Pide la pre-imagen de los borrados cuando el servidor la soporta (MongoDB 6.0+)."""
+        try:
+            version = self.mongo.client.server_info().get('versionArray') or [0]
+        except Exception:
+            return {}
+        return {'full_document_before_change': 'whenAvailable'} if version[0] >= 6 else {}
+
+    def _reconciliar_borrados(self, forzar: bool = False):
+        """Reconciliación de los borrados sin número, como mucho una vez cada `reconciliar_borrados_cada`."""
+        if not self._borrados_pendientes:
+            return
+        ahora = time.monotonic()
+        if (not forzar and self._ultima_reconciliacion_borrados is not None
+                and ahora - self._ultima_reconciliacion_borrados < self.reconciliar_borrados_cada):
+            return
+        self.reconciliar(indexar_faltantes=False)
+        self._ultima_reconciliacion_borrados = ahora
+        self._borrados_pendientes = False
+        self._guardar_estado({'borrados_pendientes': False})
+
+    def _ejecutar_change_stream(self, una_vez: bool):
+        estado = self.estado()
+        token = estado.get('resume_token')
+        # Borrados que quedaron sin reconciliar al detenerse: su posición en el stream ya se confirmó
+        self._borrados_pendientes = bool(estado.get('borrados_pendientes'))
+        opciones = self._opciones_stream()
+        while not self._detener.is_set():
+            try:
+                with self.mongo.coll.watch(resume_after=token, batch_size=self.lote,
+                                           max_await_time_ms=int(self.espera_lote * 1000), **opciones) as stream:
+                    if token is None:
+                        # El stream ya registra los cambios desde aquí: la copia completa no deja huecos
+                        token = stream.resume_token
+                        self.resincronizar()
+                        self._guardar_estado({'resume_token': token, 'lag_segundos': 0.0})
+                    token = self._consumir_stream(stream, token, una_vez)
+                if una_vez:
+                    self._reconciliar_borrados(forzar=True)
+                    return
+            except OperationFailure as e:
+                if e.code in ERRORES_HISTORIAL_PERDIDO:
+                    logger.warning("El resume token ya no está en el oplog: se hará una resincronización completa")
+                    token = None
+                    continue
+                self._registrar_error(e)
+                self._detener.wait(ESPERA_ERROR)
+            except Exception as e:
+                # ElasticSearch caído o red: se reintenta desde el último lote confirmado
+                self._registrar_error(e)
+                token = self.estado().get('resume_token')
+                self._detener.wait(ESPERA_ERROR)
+
+    def _consumir_stream(self, stream, token, una_vez: bool):
+        """Junta eventos hasta `lote` documentos o `espera_lote` segundos y los aplica. Retorna el último token."""
+        ids: Dict[Any, None] = {}
+        eliminar: set = set()
+        origenes: List[float] = []
+        hubo_borrados = False
+        limite = None
+        while not self._detener.is_set():
+            evento = stream.try_next()
+            if evento is not None:
+                operacion = evento['operationType']
+                if operacion in ('insert', 'update', 'replace'):
+                    ids[evento['documentKey']['_id']] = None
+                elif operacion == 'delete':
+                    ids.pop(evento['documentKey']['_id'], None)
+                    anterior = evento.get('fullDocumentBeforeChange') or {}
+                    if anterior.get('numero') is not None:
+                        eliminar.add(anterior['numero'])
+                    else:
+                        hubo_borrados = True
+                elif operacion in ('drop', 'rename', 'dropDatabase', 'invalidate'):
+                    # La colección ya no es la misma: se cierra el stream y se vuelve a copiar todo
+                    logger.warning(f"Evento '{operacion}' en el change stream: resincronización completa")
+                    return None
+                if evento.get('clusterTime') is not None:
+                    origenes.append(evento['clusterTime'].time)
+                if limite is None:
+                    limite = time.monotonic() + self.espera_lote
+
+            pendiente = bool(ids) or bool(eliminar) or hubo_borrados
+            if pendiente and (evento is None or len(ids) >= self.lote or time.monotonic() >= limite):
+                posicion = stream.resume_token
+                campos = {'resume_token': posicion}
+                if hubo_borrados:
+                    # Se guarda con la posición: si el proceso cae antes de reconciliar, el siguiente lo hace
+                    self._borrados_pendientes = True
+                    campos['borrados_pendientes'] = True
+                self._aplicar_lote(self._leer_por_ids(list(ids)), origenes, campos, eliminar)
+                token = posicion
+                ids, eliminar, origenes, hubo_borrados, limite = {}, set(), [], False, None
+                self._reconciliar_borrados()
+            elif evento is None:
+                if una_vez:
+                    return token
+                self._reconciliar_borrados()
+                self._latir()
+        return token
+
+    def _ejecutar_sondeo(self, una_vez: bool):
+        estado = self.estado()
+        marca: Tuple[Optional[datetime], Any] = (estado.get('marca_fecha'), estado.get('marca_id'))
+        if marca[0] is None:
+            desde = datetime.now() - timedelta(seconds=self.margen)
+            self.resincronizar()
+            marca = (desde, None)
+            self._guardar_estado({'marca_fecha': desde, 'marca_id': None, 'lag_segundos': 0.0,
+                                  'ultima_reconciliacion': datetime.now()})
+        ultima_reconciliacion = time.monotonic()
+
+        while not self._detener.is_set():
+            try:
+                documentos = self._siguientes(marca)
+                if documentos:
+                    ultimo = documentos[-1]
+                    marca = (ultimo['actualizado_en'], ultimo['_id'])
+                    self._aplicar_lote(documentos, [doc['actualizado_en'].timestamp() for doc in documentos],
+                                       {'marca_fecha': marca[0], 'marca_id': marca[1]})
+                    if len(documentos) >= self.lote:
+                        continue
+                else:
+                    self._latir()
+                if time.monotonic() - ultima_reconciliacion >= self.reconciliar_cada:
+                    self.reconciliar()
+                    ultima_reconciliacion = time.monotonic()
+                if una_vez:
+                    return
+                self._detener.wait(self.intervalo_sondeo)
+            except Exception as e:
+                # La marca solo avanza con lotes aplicados: el siguiente sondeo repite el lote fallido
+                self._registrar_error(e)
+                self._detener.wait(ESPERA_ERROR)
+
+    def _siguientes(self, marca: Tuple[datetime, Any]) -> List[Dict[str, Any]]:
+        """Documentos modificados después de la marca y antes del margen, en orden (actualizado_en, _id)."""
+        fecha, identificador = marca
+        filtro: Dict[str, Any] = {'actualizado_en': {'$gt': fecha,
+                                                     '$lte': datetime.now() - timedelta(seconds=self.margen)}}
+        if identificador is not None:
+            filtro = {'$or': [filtro, {'actualizado_en': fecha, '_id': {'$gt': identificador}}]}
+        cursor = self.mongo.coll.find(filtro).sort([('actualizado_en', 1), ('_id', 1)]).limit(self.lote)
+        return list(cursor)
+
+
+def gauges_sincronizacion(db) -> List[Tuple[str, Dict[str, Any], float]]:
+    """
+    Retraso y latido de cada sincronizador para /metrics. Si el proceso dejó
+    de latir, el retraso suma el tiempo sin latido: el índice se sigue
+    atrasando aunque nadie lo esté midiendo.
+    """
+    ahora = datetime.now()
+    gauges = []
+    for estado in db[COLECCION_SYNC].find({}, {'resume_token': 0}):
+        etiquetas = {'sincronizador': estado['_id'], 'modo': estado.get('modo') or ''}
+        lag = float(estado.get('lag_segundos') or 0.0)
+        if estado.get('latido'):
+            sin_latido = max((ahora - estado['latido']).total_seconds(), 0.0)
+            if sin_latido > LATIDO_VENCIDO:
+                lag += sin_latido
+            gauges.append(('indice_sync_latido_segundos', etiquetas, round(sin_latido, 3)))
+        gauges.append(('indice_sync_lag_segundos', etiquetas, round(lag, 3)))
+    return gauges
@@ -0,0 +1,279 @@
+# helpers/snapshot.py
+# Snapshot columnar (Parquet particionado por año) del corpus para los notebooks de análisis
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join('data', 'snapshot'))
+MANIFEST = 'manifest.json'
+PARTICION_SIN_ANIO = 'desconocido'
+
+# Año de la partición como entero: metadatos.año o, si falta, el año de fecha_descarga (fecha o texto ISO)
+_EXPR_ANIO = {'$convert': {
+    'input': {'$ifNull': [
+        '$metadatos.año',
+        {'$year': {'$convert': {'input': '$fecha_descarga', 'to': 'date', 'onError': None, 'onNull': None}}}
+    ]},
+    'to': 'int', 'onError': None, 'onNull': None
+}}
+
+# Esquema fijo: todas las particiones son compatibles entre sí
+COLUMNAS = [
+    ('numero', 'int64'),
+    ('titulo', 'string'),
+    ('tipo', 'string'),
+    ('categoria', 'string'),
+    ('anio', 'int64'),
+    ('fecha_descarga', 'string'),
+    ('tamano_bytes', 'int64'),
+    ('tamano_mb', 'float64'),
+    ('extension', 'string'),
+    ('url_original', 'string'),
+    ('texto_longitud', 'int64'),
+    ('tiene_texto', 'bool'),
+    ('procesado_texto', 'bool'),
+    ('revision', 'int64'),
+]
+
+# Proyección del lado del servidor: el texto completo nunca sale de MongoDB, solo su longitud
+_PROYECCION = {
+    '_id': 0,
+    'numero': 1,
+    'titulo': 1,
+    'tipo': 1,
+    'categoria': {'$ifNull': ['$metadatos.categoria', '$categoria']},
+    'anio': _EXPR_ANIO,
+    'fecha_descarga': 1,
+    'tamano_bytes': 1,
+    'tamano_mb': 1,
+    'extension': '$metadatos.extension',
+    'url_original': 1,
+    'texto_longitud': {'$ifNull': ['$texto_longitud', {'$strLenCP': {'$ifNull': ['$texto_contenido', '']}}]},
+    'procesado_texto': 1,
+    'revision': 1,
+}
+
+
+def _requerir_pyarrow():
+    if pa is None:
+        raise RuntimeError("El snapshot requiere pyarrow (pip install pyarrow)")
+
+
+def _nombre_particion(anio: Any) -> str:
+    return f"anio={anio if isinstance(anio, int) else PARTICION_SIN_ANIO}"
+
+
+def _convertir(valor: Any, tipo: str) -> Any:
+    if valor is None:
+        return None
+    try:
+        if tipo == 'int64':
+            return int(valor)
+        if tipo == 'float64':
+            return float(valor)
+        if tipo == 'bool':
+            return bool(valor)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def huellas_particiones(coleccion) -> Dict[str, Dict[str, Any]]:
+    """
+    Huella de cada partición calculada en el servidor (conteo, revisiones,
+    fechas de actualización y rango de _id). Si no cambia, la partición no
+    se vuelve a escribir.
+    """
+    pipeline = [
+        {'$group': {
+            '_id': _EXPR_ANIO,
+            'documentos': {'$sum': 1},
+            'revisiones': {'$sum': {'$ifNull': ['$revision', 0]}},
+            'actualizado': {'$max': '$actualizado_en'},
+            'procesado': {'$max': '$fecha_procesamiento'},
+            'id_min': {'$min': '$_id'},
+            'id_max': {'$max': '$_id'},
+        }}
+    ]
+    huellas = {}
+    for grupo in coleccion.aggregate(pipeline):
+        base = json.dumps({clave: str(valor) for clave, valor in grupo.items()}, sort_keys=True)
+        huellas[_nombre_particion(grupo['_id'])] = {
+            'huella': hashlib.sha1(base.encode('utf-8')).hexdigest(),
+            'documentos': grupo['documentos'],
+            'anio': grupo['_id'] if isinstance(grupo['_id'], int) else None
+        }
+    return huellas
+
+
+def leer_manifest(directorio: str = SNAPSHOT_DIR) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(directorio, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'particiones': {}}
+
+
+def _escribir_manifest(directorio: str, manifest: Dict[str, Any]):
+    temporal = os.path.join(directorio, f'{MANIFEST}.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, os.path.join(directorio, MANIFEST))
+
+
+def _reemplazar_directorio(temporal: str, destino: str):
+    """
+    Sustituye `destino` por `temporal`: la versión anterior se renombra a un
+    lado, el directorio nuevo ocupa su lugar con os.replace y solo entonces
+    se borra la anterior. Si el proceso se corta a mitad, `_recuperar_directorio`
+    devuelve la anterior a su sitio.
+    """
+    anterior = f'{destino}.old'
+    shutil.rmtree(anterior, ignore_errors=True)
+    if os.path.isdir(destino):
+        os.replace(destino, anterior)
+    try:
+        os.replace(temporal, destino)
+    except OSError:
+        if os.path.isdir(anterior) and not os.path.exists(destino):
+            os.replace(anterior, destino)
+        raise
+    shutil.rmtree(anterior, ignore_errors=True)
+
+
+def _recuperar_directorio(destino: str):
+    """Restaura la versión apartada de una partición si un reemplazo quedó a medias."""
+    anterior = f'{destino}.old'
+    if os.path.isdir(anterior):
+        if os.path.isdir(destino):
+            shutil.rmtree(anterior, ignore_errors=True)
+        else:
+            os.replace(anterior, destino)
+
+
+def _escribir_particion(coleccion, directorio: str, nombre: str, anio: Optional[int],
+                        tamano_lote: int = 5000) -> int:
+    """Escribe una partición en un directorio temporal y la reemplaza al terminar."""
+    esquema = pa.schema([(columna, pa.type_for_alias(tipo)) for columna, tipo in COLUMNAS])
+    destino = os.path.join(directorio, nombre)
+    temporal = f'{destino}.tmp'
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    pipeline = [
+        {'$match': {'$expr': {'$eq': [_EXPR_ANIO, anio]}}},
+        {'$project': _PROYECCION},
+        {'$sort': {'numero': 1}},
+    ]
+    filas = 0
+    with pq.ParquetWriter(os.path.join(temporal, 'parte-0.parquet'), esquema, compression='zstd') as escritor:
+        columnas: Dict[str, List[Any]] = {columna: [] for columna, _ in COLUMNAS}
+        for documento in coleccion.aggregate(pipeline, batchSize=tamano_lote, allowDiskUse=True):
+            documento['tiene_texto'] = bool(documento.get('texto_longitud'))
+            for columna, tipo in COLUMNAS:
+                columnas[columna].append(_convertir(documento.get(columna), tipo))
+            filas += 1
+            if filas % tamano_lote == 0:
+                escritor.write_table(pa.table(columnas, schema=esquema))
+                columnas = {columna: [] for columna, _ in COLUMNAS}
+        if filas % tamano_lote or filas == 0:
+            escritor.write_table(pa.table(columnas, schema=esquema))
+
+    _reemplazar_directorio(temporal, destino)
+    return filas
+
+
+def generar_snapshot(coleccion, directorio: str = SNAPSHOT_DIR, completo: bool = False) -> Dict[str, Any]:
+    """
+    Actualiza el snapshot: reescribe solo las particiones cuya huella
+    cambió (o todas con `completo`) y elimina las que ya no existen.
+    """
+    _requerir_pyarrow()
+    os.makedirs(directorio, exist_ok=True)
+    anterior = leer_manifest(directorio).get('particiones', {})
+    actuales = huellas_particiones(coleccion)
+
+    reescritas, sin_cambios = [], []
+    particiones = {}
+    for nombre, info in sorted(actuales.items()):
+        _recuperar_directorio(os.path.join(directorio, nombre))
+        previa = anterior.get(nombre)
+        existe = os.path.isdir(os.path.join(directorio, nombre))
+        if not completo and existe and previa and previa.get('huella') == info['huella']:
+            particiones[nombre] = previa
+            sin_cambios.append(nombre)
+            continue
+        filas = _escribir_particion(coleccion, directorio, nombre, info['anio'])
+        particiones[nombre] = {'huella': info['huella'], 'documentos': filas,
+                               'escrito_en': datetime.now().isoformat(timespec='seconds')}
+        reescritas.append(nombre)
+        logger.info(f"Partición {nombre} escrita ({filas} documentos)")
+
+    eliminadas = [nombre for nombre in anterior if nombre not in actuales]
+    for nombre in eliminadas:
+        shutil.rmtree(os.path.join(directorio, nombre), ignore_errors=True)
+
+    _escribir_manifest(directorio, {
+        'generado_en': datetime.now().isoformat(timespec='seconds'),
+        'coleccion': coleccion.name,
+        'columnas': [columna for columna, _ in COLUMNAS],
+        'particiones': particiones
+    })
+    return {'reescritas': reescritas, 'sin_cambios': sin_cambios, 'eliminadas': eliminadas,
+            'documentos': sum(info['documentos'] for info in particiones.values())}
+
+
+def _archivos(directorio: str, anios: Optional[Iterable[Any]]) -> List[str]:
+    particiones = leer_manifest(directorio).get('particiones', {})
+    if anios is not None:
+        buscadas = {_nombre_particion(anio) for anio in anios}
+        particiones = {nombre: info for nombre, info in particiones.items() if nombre in buscadas}
+    archivos = []
+    for nombre in sorted(particiones):
+        ruta = os.path.join(directorio, nombre)
+        if os.path.isdir(ruta):
+            archivos.extend(os.path.join(ruta, archivo) for archivo in sorted(os.listdir(ruta))
+                            if archivo.endswith('.parquet'))
+    return archivos
+
+
+def cargar_tabla(directorio: str = SNAPSHOT_DIR, columnas: Optional[List[str]] = None,
+                 anios: Optional[Iterable[Any]] = None):
+    """Tabla de pyarrow con las particiones pedidas, leída con memory-map (sin copiar a memoria)."""
+    _requerir_pyarrow()
+    archivos = _archivos(directorio, anios)
+    if not archivos:
+        raise FileNotFoundError(f"No hay snapshot en '{directorio}'. Ejecuta scripts/generar_snapshot.py")
+    tablas = [pq.read_table(archivo, columns=columnas, memory_map=True) for archivo in archivos]
+    return pa.concat_tables(tablas)
+
+
+def cargar_dataframe(directorio: str = SNAPSHOT_DIR, columnas: Optional[List[str]] = None,
+                     anios: Optional[Iterable[Any]] = None):
+    """
+    DataFrame de pandas desde el snapshot. Las columnas de texto se
+    convierten a `category` para que los conteos por tipo/categoría sean baratos.
+    """
+    tabla = cargar_tabla(directorio, columnas, anios)
+    df = tabla.to_pandas(split_blocks=True, self_destruct=True)
+    for columna in ('tipo', 'categoria', 'extension'):
+        if columna in df.columns:
+            df[columna] = df[columna].astype('category')
+    return df
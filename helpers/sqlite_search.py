@@ -0,0 +1,328 @@
+# helpers/sqlite_search.py
+# Motor de búsqueda local con SQLite FTS5 (misma interfaz que ElasticSearch para despliegues sin Elastic Cloud)
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from helpers.metricas import cronometrar
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SQLITE_SEARCH_PATH = os.getenv('SQLITE_SEARCH_PATH', os.path.join('data', 'busqueda.sqlite3'))
+
+# Pesos BM25 por columna del índice (mismos boosts que el multi_match de ElasticSearch)
+PESOS_BM25 = (3.0, 1.0, 2.0, 1.0)  # titulo, texto_contenido, tipo, categoria
+
+# Campos del documento que se devuelven en los resultados (el texto completo se queda en el índice)
+CAMPOS_RESULTADO = ('numero', 'titulo', 'tipo', 'url_original', 'archivo_local', 'tamano_bytes', 'tamano_mb',
+                    'fecha_descarga', 'metadatos', 'fuente')
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    numero INTEGER PRIMARY KEY,
+    titulo TEXT,
+    tipo TEXT,
+    categoria TEXT,
+    anio INTEGER,
+    fecha_descarga TEXT,
+    huella TEXT NOT NULL,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documentos_categoria ON documentos (categoria, tipo, fecha_descarga);
+CREATE INDEX IF NOT EXISTS idx_documentos_tipo ON documentos (tipo, fecha_descarga);
+CREATE INDEX IF NOT EXISTS idx_documentos_fecha ON documentos (fecha_descarga);
+-- unicode61 con remove_diacritics 2: 'resolución', 'RESOLUCION' y 'resolucion' son el mismo término
+CREATE VIRTUAL TABLE IF NOT EXISTS documentos_fts USING fts5(
+    titulo, texto_contenido, tipo, categoria,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+ORDENES = {
+    'fecha_desc': 'd.fecha_descarga DESC',
+    'fecha_asc': 'd.fecha_descarga ASC',
+    'titulo': 'd.titulo COLLATE NOCASE ASC',
+}
+
+_PATRON_TERMINO = re.compile(r'\w+', re.UNICODE)
+
+
+def _texto_fecha(valor: Any) -> Optional[str]:
+    if valor is None:
+        return None
+    return valor.isoformat(sep=' ') if hasattr(valor, 'isoformat') else str(valor)
+
+
+def _huella(doc: Dict[str, Any]) -> str:
+    base = json.dumps([doc.get('titulo'), doc.get('tipo'), (doc.get('metadatos') or {}).get('categoria'),
+                       doc.get('texto_contenido'), doc.get('revision')], default=str, ensure_ascii=False)
+    return hashlib.sha1(base.encode('utf-8')).hexdigest()
+
+
+def consulta_fts(query: str) -> str:
+    """
+    Traduce el texto del usuario a una expresión MATCH segura: cada término
+    entre comillas unido con OR (como el operator 'or' del multi_match).
+    El último término se busca también como prefijo.
+    """
+    terminos = _PATRON_TERMINO.findall(query)
+    if not terminos:
+        return ''
+    partes = [f'"{termino}"' for termino in terminos]
+    partes.append(f'"{terminos[-1]}"*')
+    return ' OR '.join(partes)
+
+
+class SQLiteSearch:
+    """
+    Índice de texto completo en un archivo SQLite (FTS5) con ranking BM25,
+    snippets resaltados y facetas. Expone los mismos métodos de búsqueda que
+    helpers.elasticsearch.ElasticSearch, así que la app puede usar uno u otro
+    según MOTOR_BUSQUEDA.
+    """
+
+    def __init__(self, ruta: str = SQLITE_SEARCH_PATH):
+        self.ruta = ruta
+        self._local = threading.local()
+        self.client: Optional[sqlite3.Connection] = None
+        self._connect()
+
+    def _connect(self):
+        """Abre (o crea) el índice. `client` queda en None si no se puede usar."""
+        try:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            self.client = self._conexion()
+            self.client.executescript(ESQUEMA)
+            logger.info(f"Índice SQLite FTS5 listo en {self.ruta}")
+        except sqlite3.Error as e:
+            logger.error(f"Error al abrir el índice SQLite ({self.ruta}): {e}")
+            self.client = None
+
+    def _conexion(self) -> sqlite3.Connection:
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)."""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30)
+            conexion.row_factory = sqlite3.Row
+            # WAL: los workers leen mientras el cargador escribe
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexion = conexion
+        return conexion
+
+    def probar_conexion(self) -> bool:
+        try:
+            return self.client is not None and self._conexion().execute('SELECT 1').fetchone() is not None
+        except sqlite3.Error:
+            return False
+
+    # ---------- Búsqueda ----------
+
+    def _filtros(self, query: str, categoria: str, tipo: str) -> tuple:
+        condiciones, parametros = [], []
+        match = consulta_fts(query) if query else ''
+        if match:
+            condiciones.append('documentos_fts MATCH ?')
+            parametros.append(match)
+        if categoria:
+            condiciones.append('d.categoria = ?')
+            parametros.append(categoria)
+        if tipo:
+            condiciones.append('d.tipo = ?')
+            parametros.append(tipo)
+        origen = ('documentos_fts JOIN documentos d ON d.numero = documentos_fts.rowid' if match
+                  else 'documentos d')
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        return origen, donde, parametros, bool(match)
+
+    def _contar(self, origen: str, donde: str, parametros: List[Any], limite_conteo: Optional[int]) -> tuple:
+        conexion = self._conexion()
+        if limite_conteo:
+            total = conexion.execute(f'SELECT count(*) FROM (SELECT 1 FROM {origen} {donde} LIMIT ?)',
+                                     parametros + [limite_conteo]).fetchone()[0]
+            return total, 'gte' if total >= limite_conteo else 'eq'
+        return conexion.execute(f'SELECT count(*) FROM {origen} {donde}', parametros).fetchone()[0], 'eq'
+
+    def _buscar(self, query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str,
+                limite_conteo: Optional[int]) -> tuple:
+        if not self.client:
+            raise Exception("Índice SQLite no inicializado")
+
+        origen, donde, parametros, con_texto = self._filtros(query, categoria, tipo)
+        columnas = ['d.datos']
+        if con_texto:
+            columnas += [
+                f'bm25(documentos_fts, {", ".join(str(peso) for peso in PESOS_BM25)}) AS rango',
+                "highlight(documentos_fts, 0, '<mark>', '</mark>') AS titulo_resaltado",
+                "snippet(documentos_fts, 1, '<mark>', '</mark>', '...', 32) AS snippet",
+            ]
+        else:
+            columnas += ['0 AS rango', 'NULL AS titulo_resaltado',
+                         "substr((SELECT texto_contenido FROM documentos_fts WHERE rowid = d.numero), 1, 200) AS snippet"]
+
+        orden_sql = ORDENES.get(orden, 'rango' if con_texto else ORDENES['fecha_desc'])
+        filas = self._conexion().execute(
+            f"SELECT {', '.join(columnas)} FROM {origen} {donde} ORDER BY {orden_sql} LIMIT ? OFFSET ?",
+            parametros + [por_pagina, (pagina - 1) * por_pagina]
+        ).fetchall()
+
+        documentos = []
+        for fila in filas:
+            doc = json.loads(fila['datos'])
+            doc['_score'] = round(-fila['rango'], 4) if con_texto else None
+            doc['snippet'] = fila['snippet'] or ''
+            if fila['titulo_resaltado'] and '<mark>' in fila['titulo_resaltado']:
+                doc['titulo_resaltado'] = fila['titulo_resaltado']
+            documentos.append(doc)
+
+        total, relacion = self._contar(origen, donde, parametros, limite_conteo)
+        return documentos, total, relacion, (origen, donde, parametros)
+
+    @cronometrar('sqlite')
+    def buscar_documentos(self, query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str,
+                          limite_conteo: Optional[int] = None) -> Dict[str, Any]:
+        """Búsqueda con ranking BM25. Mismo formato de respuesta que ElasticSearch.buscar_documentos."""
+        documentos, total, relacion, _ = self._buscar(query, categoria, tipo, pagina, por_pagina, orden, limite_conteo)
+        return {
+            'exito': True,
+            'documentos': documentos,
+            'total': total,
+            'total_relacion': relacion,
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total_paginas': math.ceil(total / por_pagina),
+            'query': query
+        }
+
+    @cronometrar('sqlite')
+    def buscar_con_agregaciones(self, query: str, categoria: str, tipo: str, pagina: int, por_pagina: int, orden: str,
+                                limite_conteo: Optional[int] = None) -> Dict[str, Any]:
+        """Búsqueda con facetas por categoría, tipo y año (formato de ElasticSearch.buscar_con_agregaciones)."""
+        documentos, total, relacion, (origen, donde, parametros) = self._buscar(
+            query, categoria, tipo, pagina, por_pagina, orden, limite_conteo
+        )
+        conexion = self._conexion()
+
+        def faceta(columna: str, limite: int, orden_sql: str):
+            return conexion.execute(
+                f"SELECT d.{columna} AS clave, count(*) AS cantidad FROM {origen} {donde} "
+                f"{'AND' if donde else 'WHERE'} d.{columna} IS NOT NULL "
+                f"GROUP BY d.{columna} ORDER BY {orden_sql} LIMIT ?",
+                parametros + [limite]
+            ).fetchall()
+
+        agregaciones = {
+            'categorias': [{'nombre': fila['clave'], 'count': fila['cantidad']}
+                           for fila in faceta('categoria', 20, 'cantidad DESC')],
+            'tipos': [{'nombre': fila['clave'], 'count': fila['cantidad']}
+                      for fila in faceta('tipo', 10, 'cantidad DESC')],
+            'años': [{'año': fila['clave'], 'count': fila['cantidad']}
+                     for fila in faceta('anio', 10, 'clave DESC')],
+        }
+        return {
+            'exito': True,
+            'documentos': documentos,
+            'total': total,
+            'total_relacion': relacion,
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total_paginas': math.ceil(total / por_pagina),
+            'query': query,
+            'agregaciones': agregaciones
+        }
+
+    @cronometrar('sqlite')
+    def obtener_sugerencias(self, query: str, limit: int = 5) -> List[str]:
+        """Títulos que empiezan por los términos escritos (índice de prefijos de FTS5)."""
+        terminos = _PATRON_TERMINO.findall(query)
+        if not self.client or not terminos:
+            return []
+        match = ' '.join(f'"{termino}"*' for termino in terminos)
+        filas = self._conexion().execute(
+            'SELECT d.titulo FROM documentos_fts JOIN documentos d ON d.numero = documentos_fts.rowid '
+            'WHERE documentos_fts MATCH ? ORDER BY rank LIMIT ?',
+            (f'titulo : ({match})', limit)
+        ).fetchall()
+        return [fila['titulo'] for fila in filas]
+
+    # ---------- Indexación incremental ----------
+
+    def indexar_documentos(self, documentos: Iterable[Dict[str, Any]], tamano_lote: int = 500) -> Dict[str, int]:
+        """
+        Inserta o actualiza documentos (clave `numero`). Los que no cambiaron
+        desde la última indexación (misma huella) se omiten.
+        """
+        conexion = self._conexion()
+        huellas = dict(conexion.execute('SELECT numero, huella FROM documentos').fetchall())
+        resumen = {'nuevos': 0, 'actualizados': 0, 'sin_cambios': 0}
+        lote = 0
+
+        conexion.execute('BEGIN')
+        try:
+            for doc in documentos:
+                numero = doc.get('numero')
+                if numero is None:
+                    continue
+                huella = _huella(doc)
+                anterior = huellas.get(numero)
+                if anterior == huella:
+                    resumen['sin_cambios'] += 1
+                    continue
+
+                metadatos = doc.get('metadatos') or {}
+                datos = {campo: doc.get(campo) for campo in CAMPOS_RESULTADO if doc.get(campo) is not None}
+                anio = metadatos.get('año')
+                conexion.execute(
+                    'INSERT OR REPLACE INTO documentos (numero, titulo, tipo, categoria, anio, fecha_descarga, huella, datos) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (numero, doc.get('titulo'), doc.get('tipo'), metadatos.get('categoria'),
+                     anio if isinstance(anio, int) else None, _texto_fecha(doc.get('fecha_descarga')), huella,
+                     json.dumps(datos, default=str, ensure_ascii=False))
+                )
+                conexion.execute('DELETE FROM documentos_fts WHERE rowid = ?', (numero,))
+                conexion.execute(
+                    'INSERT INTO documentos_fts (rowid, titulo, texto_contenido, tipo, categoria) VALUES (?, ?, ?, ?, ?)',
+                    (numero, doc.get('titulo') or '', doc.get('texto_contenido') or '', doc.get('tipo') or '',
+                     metadatos.get('categoria') or '')
+                )
+                resumen['actualizados' if anterior else 'nuevos'] += 1
+
+                lote += 1
+                if lote % tamano_lote == 0:
+                    conexion.execute('COMMIT')
+                    conexion.execute('BEGIN')
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        return resumen
+
+    def eliminar_documentos(self, numeros: Iterable[int]) -> int:
+        """Elimina documentos del índice por número."""
+        conexion = self._conexion()
+        eliminados = 0
+        with conexion:
+            for numero in numeros:
+                conexion.execute('DELETE FROM documentos_fts WHERE rowid = ?', (numero,))
+                eliminados += conexion.execute('DELETE FROM documentos WHERE numero = ?', (numero,)).rowcount
+        return eliminados
+
+    def numeros_indexados(self) -> set:
+        return {fila[0] for fila in self._conexion().execute('SELECT numero FROM documentos')}
+
+    def optimizar(self):
+        """Fusiona los segmentos del índice FTS5 (conviene tras cargas grandes)."""
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute("INSERT INTO documentos_fts (documentos_fts) VALUES ('optimize')")
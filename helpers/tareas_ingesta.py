@@ -0,0 +1,141 @@
+# helpers/tareas_ingesta.py
+# Tareas por documento de la ingesta (extracción de texto, indexación y ZIP cargados) para ejecutar desde la cola persistente
+import logging
+import os
+import threading
+import time
+import zipfile
+from typing import Any, Dict, Optional
+
+from helpers.almacen_archivos import clave_documento
+from helpers.cola_tareas import ColaTareas, ErrorPermanente
+from helpers.elasticsearch import documento_para_indice
+from helpers.mongo_db import guardar_texto_documento
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EXTRAER_TEXTO = 'extraer_texto'
+INDEXAR = 'indexar'
+# ZIP cargado desde el panel: cada PDF/DOCX nuevo pasa a ser un documento (helpers/ingesta_zip.py)
+EXPANDIR_ZIP = 'expandir_zip'
+TIPOS_TAREA = (EXTRAER_TEXTO, INDEXAR, EXPANDIR_ZIP)
+
+
+class ManejadoresIngesta:
+    """
+    Manejadores de las tareas de ingesta. Cada uno trabaja con un solo
+    documento y es idempotente, así un reintento o un arriendo recuperado
+    no deja el documento a medias. Una extracción exitosa encola su indexación.
+    """
+
+    def __init__(self, mongo, cola: ColaTareas, almacen, funciones, elastic=None, sqlite=None):
+        self.mongo = mongo
+        self.cola = cola
+        self.almacen = almacen
+        self.funciones = funciones
+        self.elastic = elastic
+        self.sqlite = sqlite
+        self._local = threading.local()
+
+    def manejadores(self) -> Dict[str, Any]:
+        manejadores = {EXTRAER_TEXTO: self.extraer_texto, EXPANDIR_ZIP: self.expandir_zip}
+        if self.elastic is not None or self.sqlite is not None:
+            manejadores[INDEXAR] = self.indexar
+        return manejadores
+
+    def _scraper(self):
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            from helpers.web_scraper import WebScraper
+            scraper = self._local.scraper = WebScraper(delay_between_requests=1.0)
+        return scraper
+
+    def _asegurar_archivo(self, documento: Dict[str, Any]) -> Dict[str, Any]:
+        """Archivo del documento en el almacén: ya guardado, copia local o descarga (en ese orden)."""
+        clave = clave_documento(documento['numero'])
+        archivo = self.almacen.info(clave)
+        ruta = documento.get('ruta_completa') or ''
+        if archivo is None and ruta and os.path.exists(ruta):
+            archivo = self.almacen.guardar_archivo(clave, ruta)
+        if archivo is None and documento.get('url_original'):
+            from helpers.web_scraper import DescargaOmitida
+            try:
+                archivo = self._scraper().descargar_a_almacen(documento['url_original'], self.almacen, clave,
+                                                              documento.get('archivo_local') or None)
+            except DescargaOmitida as e:
+                raise ErrorPermanente(f"Descarga descartada: {e}")
+        if archivo is None:
+            # Sin URL no hay forma de obtenerlo; con URL puede ser un fallo de red transitorio
+            if not documento.get('url_original'):
+                raise ErrorPermanente("El documento no tiene archivo local ni URL de descarga")
+            raise RuntimeError(f"No se pudo descargar {documento['url_original']}")
+        return archivo
+
+    def extraer_texto(self, tarea: Dict[str, Any]) -> Dict[str, Any]:
+        documento = self.mongo.coll.find_one({'numero': tarea['numero']}, {'texto_contenido': 0})
+        if documento is None:
+            raise ErrorPermanente(f"El documento {tarea['numero']} no existe")
+
+        archivo = self._asegurar_archivo(documento)
+        extension = os.path.splitext(archivo.get('nombre') or '')[1] or f".{str(documento.get('tipo', 'pdf')).lower()}"
+        with self.almacen.copia_local(archivo['clave']) as ruta:
+            texto = self.funciones.extraer_texto_archivo(ruta, extension)
+        if not texto:
+            raise ErrorPermanente("El archivo no tiene texto extraíble (¿PDF escaneado o formato no soportado?)")
+
+        guardar_texto_documento(self.mongo.coll, documento['numero'], texto, {
+            'archivo': archivo,
+            'archivo_existe': True,
+            'estado': 'disponible',
+            'procesado_texto': True,
+            'fecha_procesamiento': time.strftime("%Y-%m-%d %H:%M:%S")
+        }, self.mongo.textos)
+        self.mongo.incrementar_version_corpus()
+        if INDEXAR in self.manejadores():
+            # `datos` conserva la carga del panel de origen (progreso por carga)
+            self.cola.encolar(INDEXAR, documento['numero'], tarea.get('datos'))
+        return {'caracteres': len(texto)}
+
+    def expandir_zip(self, tarea: Dict[str, Any]) -> Dict[str, Any]:
+        from helpers.carga_archivos import expandir_zip
+        datos = tarea.get('datos') or {}
+        if not datos.get('clave') or not self.almacen.existe(datos['clave']):
+            raise ErrorPermanente(f"El ZIP {datos.get('nombre') or tarea['numero']} ya no está en el almacén")
+        from helpers.ingesta_zip import ErrorZip
+        try:
+            return expandir_zip(self.mongo, self.cola, self.almacen, datos['clave'], datos.get('carga'),
+                                indexar=INDEXAR in self.manejadores())
+        except (zipfile.BadZipFile, ErrorZip) as e:
+            # Reintentar no lo arregla: el ZIP no se conserva
+            self.almacen.eliminar(datos['clave'])
+            raise ErrorPermanente(f"ZIP rechazado: {e}")
+
+    def indexar(self, tarea: Dict[str, Any]) -> Dict[str, Any]:
+        documento = self.mongo.obtener_documento_por_numero(tarea['numero'])
+        if documento is None:
+            raise ErrorPermanente(f"El documento {tarea['numero']} no existe")
+        if documento.get('duplicado_de'):
+            # Los duplicados no se indexan: queda resuelta sin tocar los índices
+            return {'omitido': f"duplicado de {documento['duplicado_de']}"}
+
+        if self.elastic is not None:
+            try:
+                fuente = documento_para_indice(documento)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ErrorPermanente(f"Documento incompleto para el índice: {type(e).__name__}: {e}")
+            exitosos, errores = self.elastic.indexar_incremental([fuente])
+            if errores:
+                raise RuntimeError("ElasticSearch rechazó el documento (ver el log del trabajador)")
+        if self.sqlite is not None:
+            self.sqlite.indexar_documentos([documento])
+        return {'indexado': True}
+
+
+def crear_manejadores(mongo, cola: Optional[ColaTareas] = None, elastic=None, sqlite=None) -> ManejadoresIngesta:
+    """Manejadores con el almacén de archivos configurado y un extractor de texto."""
+    from helpers.almacen_archivos import crear_almacen_archivos
+    from helpers.funciones import Funciones
+    return ManejadoresIngesta(mongo, cola or ColaTareas(mongo.db), crear_almacen_archivos(mongo.db),
+                              Funciones(), elastic, sqlite)
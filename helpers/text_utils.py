@@ -155,3 +155,45 @@ def truncar_texto(texto: str, max_length: int = 500, sufijo: str = "...") -> str
         return texto
     
     return texto[:max_length].rsplit(' ', 1)[0] + sufijo
+
+
+def determinar_categoria(titulo: str) -> str:
+    """
+    Determina la categoría del documento según su título.
+    
+    Args:
+        titulo: Título del documento
+        
+    Returns:
+        Nombre de la categoría ('Otros Documentos' si ninguna coincide)
+    """
+    titulo_lower = (titulo or '').lower()
+    
+    if any(palabra in titulo_lower for palabra in ['manual', 'funciones', 'procedimiento']):
+        return "Manuales y Procedimientos"
+    elif any(palabra in titulo_lower for palabra in ['resolución', 'resolucion']):
+        return "Resoluciones"
+    elif any(palabra in titulo_lower for palabra in ['código', 'codigo', 'disciplinario']):
+        return "Códigos y Normatividad"
+    elif any(palabra in titulo_lower for palabra in ['informe', 'vigilancia', 'gestión']):
+        return "Informes de Gestión"
+    elif any(palabra in titulo_lower for palabra in ['procurando', 'boletín', 'boletin']):
+        return "Boletines y Publicaciones"
+    elif any(palabra in titulo_lower for palabra in ['guía', 'guia', 'cartilla', 'protocolo']):
+        return "Guías y Protocolos"
+    else:
+        return "Otros Documentos"
+
+
+def extraer_año(titulo: str) -> Optional[int]:
+    """
+    Extrae el año (20xx) del título si existe.
+    
+    Args:
+        titulo: Título del documento
+        
+    Returns:
+        Primer año encontrado o None
+    """
+    años = re.findall(r'20\d{2}', titulo or '')
+    return int(años[0]) if años else None
@@ -8,6 +8,7 @@ from datetime import datetime
 from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError, PyMongoError
 
+from helpers.indices import INDICES_USUARIOS, asegurar_indices
 from models.user import User
 
 logging.basicConfig(level=logging.INFO)
@@ -17,28 +18,28 @@ logger = logging.getLogger(__name__)
 class UserManager:
     """Gestor de usuarios con operaciones CRUD."""
     
-    def __init__(self, mongo_client: MongoClient, db_name: str = 'proyecto_big_data'):
+    def __init__(self, mongo_client: MongoClient, db_name: str = 'proyecto_big_data', crear_indices: bool = True):
         """
         Inicializa el gestor de usuarios.
         
         Args:
             mongo_client: Cliente de MongoDB
             db_name: Nombre de la base de datos
+            crear_indices: Asegurar los índices al crear el gestor (la app lo
+                delega en helpers.indices en segundo plano)
         """
         self.client = mongo_client
         self.db = self.client[db_name]
         self.collection = self.db['usuarios']
-        self._crear_indices()
+        if crear_indices:
+            self._crear_indices()
     
     def _crear_indices(self):
-        """Crea índices únicos para username y email."""
+        """Asegura los índices únicos declarados en helpers.indices (username, email, user_id)."""
         try:
-            self.collection.create_index('username', unique=True)
-            self.collection.create_index('email', unique=True)
-            self.collection.create_index('user_id', unique=True)
-            logger.info("Índices de usuarios creados exitosamente")
+            asegurar_indices(self.collection, INDICES_USUARIOS)
         except Exception as e:
-            logger.warning(f"Error al crear índices (pueden ya existir): {e}")
+            logger.warning(f"Error al crear índices de usuarios: {e}")
     
     def _get_next_user_id(self) -> int:
         """Obtiene el siguiente ID de usuario disponible."""
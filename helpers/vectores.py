@@ -0,0 +1,543 @@
+# helpers/vectores.py
+# Búsqueda por similitud: embeddings locales (TF-IDF + SVD), matriz float32 memory-mapped e índice ANN (IVF)
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import time
+import unicodedata
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from helpers.metricas import cronometrar
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VECTORES_DIR = os.getenv('VECTORES_DIR', os.path.join('data', 'vectores'))
+VECTORES_DIMENSIONES = int(os.getenv('VECTORES_DIMENSIONES', '256'))
+VECTORES_SONDAS = int(os.getenv('VECTORES_SONDAS', '8'))
+# Documentos mínimos para ajustar TF-IDF + SVD; con menos se usa el codificador por hashing
+VECTORES_MIN_AJUSTE = int(os.getenv('VECTORES_MIN_AJUSTE', '200'))
+
+# Caracteres de texto por documento usados para el embedding
+MAX_CARACTERES = 20000
+
+STOPWORDS = frozenset("""
+de la que el en y a los del se las por un para con no una su al lo como mas pero sus le ya o este si
+porque esta entre cuando muy sin sobre tambien me hasta hay donde quien desde todo nos durante todos
+uno les ni contra otros ese eso ante ellos e esto mi antes algunos unos yo otro otras otra tanto esa
+estos mucho quienes nada muchos cual poco ella estar estas algunas algo nosotros ser es son fue han
+ha sido cada dicho dicha segun articulo numero
+""".split())
+
+_PATRON_TOKEN = re.compile(r'[a-z]{3,}')
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Minúsculas, sin tildes (á→a, ñ→n), sin stopwords ni números."""
+    plano = unicodedata.normalize('NFKD', texto.lower()).encode('ascii', 'ignore').decode('ascii')
+    return [token for token in _PATRON_TOKEN.findall(plano) if token not in STOPWORDS]
+
+
+def normalizar_filas(matriz: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return (matriz / normas).astype(np.float32, copy=False)
+
+
+def texto_documento(documento: Dict[str, Any]) -> str:
+    """Texto que representa al documento: título (repetido como refuerzo) y contenido."""
+    titulo = documento.get('titulo') or ''
+    return f"{titulo} {titulo} {(documento.get('texto_contenido') or '')[:MAX_CARACTERES]}"
+
+
+# ---------- Codificadores ----------
+
+class Codificador(ABC):
+    """
+    Interfaz de los codificadores de texto. Cualquier modelo que convierta
+    textos en vectores (p. ej. sentence-transformers) puede registrarse en
+    CODIFICADORES implementando estos métodos.
+    """
+    nombre = 'base'
+    dimensiones = 0
+
+    def ajustar(self, textos: List[str]) -> 'Codificador':
+        return self
+
+    @abstractmethod
+    def codificar(self, textos: List[str]) -> np.ndarray:
+        """Matriz (len(textos) x dimensiones) float32 con filas normalizadas."""
+
+    @abstractmethod
+    def guardar(self, ruta: str):
+        """Escribe el estado del codificador en `ruta`."""
+
+    @classmethod
+    @abstractmethod
+    def cargar(cls, ruta: str) -> 'Codificador':
+        """Reconstruye el codificador guardado en `ruta`."""
+
+
+class CodificadorHashing(Codificador):
+    """
+    Tf sublineal de los términos proyectado con el truco del hashing (con
+    signo) a un número fijo de dimensiones. No necesita ajuste ni vocabulario,
+    así que sirve para corpus pequeños o para el primer lote; la calidad es
+    menor que la de TF-IDF + SVD (`scripts/construir_vectores.py --reajustar`).
+    """
+    nombre = 'hashing'
+
+    def __init__(self, dimensiones: int = VECTORES_DIMENSIONES):
+        self.dimensiones = dimensiones
+
+    def codificar(self, textos: List[str]) -> np.ndarray:
+        salida = np.zeros((len(textos), self.dimensiones), dtype=np.float32)
+        for i, texto in enumerate(textos):
+            for termino, conteo in Counter(tokenizar(texto)).items():
+                huella = zlib.crc32(termino.encode('ascii'))
+                signo = 1.0 if huella & 0x80000000 else -1.0
+                salida[i, huella % self.dimensiones] += signo * (1.0 + math.log(conteo))
+        return normalizar_filas(salida)
+
+    def guardar(self, ruta: str):
+        with open(ruta, 'wb') as f:
+            np.savez(f, dimensiones=np.array(self.dimensiones))
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'CodificadorHashing':
+        return cls(int(np.load(ruta)['dimensiones']))
+
+
+class CodificadorTfidfSvd(Codificador):
+    """
+    TF-IDF (tf sublineal, idf suavizado) proyectado con SVD aleatorizada
+    (análisis semántico latente) en NumPy puro. La matriz dispersa nunca se
+    materializa completa: se densifica por bloques de filas.
+    """
+    nombre = 'tfidf_svd'
+
+    def __init__(self, dimensiones: int = VECTORES_DIMENSIONES, max_terminos: int = 20000,
+                 min_df: int = 2, max_df: float = 0.5):
+        self.dimensiones = dimensiones
+        self.max_terminos = max_terminos
+        self.min_df = min_df
+        self.max_df = max_df
+        self.vocabulario: Dict[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.componentes = np.zeros((0, 0), dtype=np.float32)
+
+    def _disperso(self, tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        conteos = Counter(token for token in tokens if token in self.vocabulario)
+        if not conteos:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter((self.vocabulario[token] for token in conteos), dtype=np.int64, count=len(conteos))
+        valores = (1.0 + np.log(np.fromiter(conteos.values(), dtype=np.float32, count=len(conteos)))) * self.idf[indices]
+        return indices, valores / np.linalg.norm(valores)
+
+    def _densificar(self, filas: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+        matriz = np.zeros((len(filas), len(self.vocabulario)), dtype=np.float32)
+        for i, (indices, valores) in enumerate(filas):
+            matriz[i, indices] = valores
+        return matriz
+
+    def ajustar(self, textos: List[str], semilla: int = 42) -> 'CodificadorTfidfSvd':
+        tokens = [tokenizar(texto) for texto in textos]
+        frecuencias: Counter = Counter()
+        for lista in tokens:
+            frecuencias.update(set(lista))
+
+        n = len(textos)
+        candidatos = [(termino, df) for termino, df in frecuencias.items()
+                      if df >= self.min_df and df / n <= self.max_df]
+        candidatos.sort(key=lambda par: (-par[1], par[0]))
+        terminos = [termino for termino, _ in candidatos[:self.max_terminos]]
+        if not terminos:
+            raise ValueError("No hay términos suficientes para ajustar el codificador")
+
+        self.vocabulario = {termino: i for i, termino in enumerate(terminos)}
+        df = np.array([frecuencias[termino] for termino in terminos], dtype=np.float32)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+        filas = [self._disperso(lista) for lista in tokens]
+        self.componentes = self._svd_aleatorizada(filas, semilla)
+        self.dimensiones = self.componentes.shape[0]
+        return self
+
+    def _svd_aleatorizada(self, filas, semilla: int, sobremuestreo: int = 10, iteraciones: int = 2,
+                          bloque: int = 256) -> np.ndarray:
+        """Componentes principales (k x V) de la matriz TF-IDF (Halko et al., iteraciones de potencia)."""
+        rng = np.random.default_rng(semilla)
+        n, v = len(filas), len(self.vocabulario)
+        l = min(self.dimensiones + sobremuestreo, n, v)
+
+        def x_por(m):
+            return np.vstack([self._densificar(filas[i:i + bloque]) @ m for i in range(0, n, bloque)])
+
+        def xt_por(y):
+            acumulado = np.zeros((v, y.shape[1]), dtype=np.float32)
+            for i in range(0, n, bloque):
+                acumulado += self._densificar(filas[i:i + bloque]).T @ y[i:i + bloque]
+            return acumulado
+
+        y = x_por(rng.standard_normal((v, l)).astype(np.float32))
+        for _ in range(iteraciones):
+            q, _ = np.linalg.qr(y)
+            z, _ = np.linalg.qr(xt_por(q))
+            y = x_por(z)
+        q, _ = np.linalg.qr(y)
+        b = xt_por(q).T  # (l, V)
+        _, _, vt = np.linalg.svd(b, full_matrices=False)
+        return vt[:min(self.dimensiones, l)].astype(np.float32)
+
+    def codificar(self, textos: List[str], bloque: int = 256) -> np.ndarray:
+        salida = np.empty((len(textos), self.dimensiones), dtype=np.float32)
+        for i in range(0, len(textos), bloque):
+            filas = [self._disperso(tokenizar(texto)) for texto in textos[i:i + bloque]]
+            salida[i:i + bloque] = self._densificar(filas) @ self.componentes.T
+        return normalizar_filas(salida)
+
+    def guardar(self, ruta: str):
+        terminos = sorted(self.vocabulario, key=self.vocabulario.get)
+        with open(ruta, 'wb') as f:
+            np.savez(f, terminos=np.array(terminos), idf=self.idf, componentes=self.componentes)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'CodificadorTfidfSvd':
+        datos = np.load(ruta)
+        codificador = cls(dimensiones=datos['componentes'].shape[0])
+        codificador.vocabulario = {str(termino): i for i, termino in enumerate(datos['terminos'])}
+        codificador.idf = datos['idf']
+        codificador.componentes = datos['componentes']
+        return codificador
+
+
+CODIFICADORES = {CodificadorTfidfSvd.nombre: CodificadorTfidfSvd, CodificadorHashing.nombre: CodificadorHashing}
+
+
+# ---------- Índice ANN ----------
+
+def buscar_exacto(matriz: np.ndarray, consulta: np.ndarray, k: int, bloque: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k por producto punto (coseno con vectores normalizados) recorriendo toda la matriz."""
+    puntajes = np.concatenate([matriz[i:i + bloque] @ consulta for i in range(0, len(matriz), bloque)])
+    return _top_k(np.arange(len(matriz)), puntajes, k)
+
+
+def _top_k(filas: np.ndarray, puntajes: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(puntajes) > k:
+        seleccion = np.argpartition(-puntajes, k)[:k]
+        filas, puntajes = filas[seleccion], puntajes[seleccion]
+    orden = np.argsort(-puntajes)
+    return filas[orden], puntajes[orden]
+
+
+class IndiceIVF:
+    """
+    Índice de archivo invertido: k-means esférico agrupa los vectores en
+    listas; una consulta solo compara contra las `n_sondas` listas cuyos
+    centroides son más cercanos.
+    """
+
+    def __init__(self, centroides: np.ndarray, orden: np.ndarray, inicios: np.ndarray):
+        self.centroides = centroides
+        self.orden = orden
+        self.inicios = inicios
+
+    @classmethod
+    def construir(cls, matriz: np.ndarray, n_listas: Optional[int] = None, iteraciones: int = 10,
+                  muestra: int = 20000, semilla: int = 42) -> 'IndiceIVF':
+        n = len(matriz)
+        n_listas = max(1, min(n_listas or int(math.sqrt(n)), n))
+        rng = np.random.default_rng(semilla)
+        entrenamiento = np.asarray(matriz[np.sort(rng.choice(n, min(muestra, n), replace=False))])
+        centroides = entrenamiento[rng.choice(len(entrenamiento), n_listas, replace=False)].copy()
+
+        for _ in range(iteraciones):
+            asignacion = np.argmax(entrenamiento @ centroides.T, axis=1)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, asignacion, entrenamiento)
+            vacios = ~sumas.any(axis=1)
+            sumas[vacios] = centroides[vacios]  # Las listas vacías conservan su centroide
+            centroides = normalizar_filas(sumas)
+
+        asignacion = np.concatenate([np.argmax(np.asarray(matriz[i:i + 65536]) @ centroides.T, axis=1)
+                                     for i in range(0, n, 65536)])
+        orden = np.argsort(asignacion, kind='stable')
+        inicios = np.searchsorted(asignacion[orden], np.arange(n_listas + 1))
+        return cls(centroides, orden.astype(np.int64), inicios.astype(np.int64))
+
+    def buscar(self, matriz: np.ndarray, consulta: np.ndarray, k: int,
+               n_sondas: int = VECTORES_SONDAS) -> Tuple[np.ndarray, np.ndarray]:
+        n_sondas = min(n_sondas, len(self.centroides))
+        cercanos = np.argpartition(-(self.centroides @ consulta), n_sondas - 1)[:n_sondas]
+        candidatos = np.sort(np.concatenate([self.orden[self.inicios[j]:self.inicios[j + 1]] for j in cercanos]))
+        if len(candidatos) == 0:
+            return candidatos, np.zeros(0, dtype=np.float32)
+        return _top_k(candidatos, matriz[candidatos] @ consulta, k)
+
+    def guardar(self, ruta: str):
+        with open(ruta, 'wb') as f:
+            np.savez(f, centroides=self.centroides, orden=self.orden, inicios=self.inicios)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> 'IndiceIVF':
+        datos = np.load(ruta)
+        return cls(datos['centroides'], datos['orden'], datos['inicios'])
+
+
+# ---------- Almacén en disco ----------
+
+class AlmacenVectores:
+    """
+    Matriz de embeddings float32 en `vectores.f32` (memory-mapped, una fila
+    por documento), con `numeros.npy`, el codificador, el índice IVF y
+    `meta.json`. Cada escritura crea un directorio de versión nuevo y al
+    final cambia el puntero `actual` con os.replace, así que un lector
+    nunca mezcla archivos de dos versiones. Se conservan las últimas
+    `VERSIONES_CONSERVADAS` para los lectores que aún tengan abierta la anterior.
+    """
+    PUNTERO = 'actual'
+    VERSIONES_CONSERVADAS = 2
+
+    def __init__(self, directorio: str = VECTORES_DIR):
+        self.directorio = directorio
+
+    def version(self) -> Optional[str]:
+        """Versión vigente según el puntero; '' para un almacén anterior sin versiones, None si no hay."""
+        try:
+            with open(os.path.join(self.directorio, self.PUNTERO), encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError:
+            return '' if os.path.exists(os.path.join(self.directorio, 'meta.json')) else None
+
+    def ruta(self, nombre: str, version: Optional[str] = None) -> str:
+        """Ruta de un archivo de la versión indicada (por defecto, la vigente)."""
+        if version is None:
+            version = self.version() or ''
+        return os.path.join(self.directorio, version, nombre)
+
+    def existe(self) -> bool:
+        version = self.version()
+        return version is not None and os.path.exists(self.ruta('meta.json', version))
+
+    def meta(self, version: Optional[str] = None) -> Dict[str, Any]:
+        with open(self.ruta('meta.json', version), encoding='utf-8') as f:
+            return json.load(f)
+
+    def cargar(self, version: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+        """(numeros, matriz memory-mapped, meta) de una sola versión."""
+        if version is None:
+            version = self.version() or ''
+        meta = self.meta(version)
+        numeros = np.load(self.ruta('numeros.npy', version))
+        matriz = np.memmap(self.ruta('vectores.f32', version), dtype=np.float32, mode='r',
+                           shape=(meta['documentos'], meta['dimensiones']))
+        return numeros, matriz, meta
+
+    def codificador(self, version: Optional[str] = None) -> Codificador:
+        if version is None:
+            version = self.version() or ''
+        return CODIFICADORES[self.meta(version)['codificador']].cargar(self.ruta('codificador.npz', version))
+
+    def _cambiar_puntero(self, version: str):
+        temporal = os.path.join(self.directorio, f'{self.PUNTERO}.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(temporal, os.path.join(self.directorio, self.PUNTERO))
+
+    def _purgar_versiones(self):
+        versiones = sorted(nombre for nombre in os.listdir(self.directorio)
+                           if nombre.startswith('v') and os.path.isdir(os.path.join(self.directorio, nombre)))
+        for nombre in versiones[:-self.VERSIONES_CONSERVADAS]:
+            shutil.rmtree(os.path.join(self.directorio, nombre), ignore_errors=True)
+
+    def escribir(self, numeros: np.ndarray, matriz: np.ndarray, codificador: Codificador):
+        """Escribe el almacén completo en una versión nueva y reconstruye el índice IVF."""
+        version = f'v{time.time_ns()}'
+        destino = os.path.join(self.directorio, version)
+        os.makedirs(destino)
+        matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+        numeros = np.asarray(numeros, dtype=np.int64)
+        meta = {
+            'documentos': int(len(numeros)),
+            'dimensiones': int(matriz.shape[1]),
+            'codificador': codificador.nombre
+        }
+
+        def guardar_numeros(ruta):
+            with open(ruta, 'wb') as f:
+                np.save(f, numeros)
+
+        def guardar_meta(ruta):
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+
+        try:
+            matriz.tofile(os.path.join(destino, 'vectores.f32'))
+            guardar_numeros(os.path.join(destino, 'numeros.npy'))
+            codificador.guardar(os.path.join(destino, 'codificador.npz'))
+            IndiceIVF.construir(matriz).guardar(os.path.join(destino, 'ivf.npz'))
+            guardar_meta(os.path.join(destino, 'meta.json'))
+        except BaseException:
+            shutil.rmtree(destino, ignore_errors=True)
+            raise
+        # El puntero cambia al final: los lectores recargan cuando cambia
+        self._cambiar_puntero(version)
+        self._purgar_versiones()
+
+    def actualizar(self, numeros: List[int], vectores: np.ndarray, codificador: Codificador):
+        """Reemplaza las filas de documentos existentes y agrega los nuevos (en una versión nueva)."""
+        if not self.existe():
+            self.escribir(np.asarray(numeros), vectores, codificador)
+            return
+        actuales, matriz, _ = self.cargar()
+        fila = {int(numero): i for i, numero in enumerate(actuales)}
+        matriz = np.array(matriz)
+        nuevos_numeros, nuevos_vectores = [], []
+        for numero, vector in zip(numeros, vectores):
+            if int(numero) in fila:
+                matriz[fila[int(numero)]] = vector
+            else:
+                nuevos_numeros.append(numero)
+                nuevos_vectores.append(vector)
+        if nuevos_numeros:
+            actuales = np.concatenate([actuales, np.asarray(nuevos_numeros, dtype=np.int64)])
+            matriz = np.vstack([matriz, np.asarray(nuevos_vectores, dtype=np.float32)])
+        self.escribir(actuales, matriz, codificador)
+
+
+def ajustar_codificador(muestra: Iterable[Dict[str, Any]]) -> Codificador:
+    """
+    Ajusta el codificador por defecto con una muestra de documentos. Si la
+    muestra es menor que VECTORES_MIN_AJUSTE o no deja términos suficientes,
+    usa el codificador por hashing, que no necesita ajuste.
+    """
+    textos = [texto_documento(doc) for doc in muestra]
+    if len(textos) < VECTORES_MIN_AJUSTE:
+        logger.warning(f"Muestra de {len(textos)} documentos insuficiente: se usa el codificador por hashing")
+        return CodificadorHashing()
+    try:
+        return CodificadorTfidfSvd().ajustar(textos)
+    except ValueError as e:
+        logger.warning(f"No se pudo ajustar TF-IDF + SVD ({e}): se usa el codificador por hashing")
+        return CodificadorHashing()
+
+
+def codificar_documentos(codificador: Codificador, documentos: Iterable[Dict[str, Any]],
+                         tamano_lote: int = 500) -> Tuple[np.ndarray, np.ndarray]:
+    """(numeros, matriz) procesando los documentos por lotes: en memoria solo quedan los vectores."""
+    numeros: List[int] = []
+    bloques: List[np.ndarray] = []
+    lote: List[Dict[str, Any]] = []
+
+    def vaciar():
+        bloques.append(codificador.codificar([texto_documento(doc) for doc in lote]))
+        numeros.extend(doc['numero'] for doc in lote)
+        lote.clear()
+
+    for documento in documentos:
+        if documento.get('numero') is None:
+            continue
+        lote.append(documento)
+        if len(lote) >= tamano_lote:
+            vaciar()
+    if lote:
+        vaciar()
+    matriz = np.vstack(bloques) if bloques else np.zeros((0, codificador.dimensiones), dtype=np.float32)
+    return np.asarray(numeros, dtype=np.int64), matriz
+
+
+def indexar_documentos(documentos: List[Dict[str, Any]], directorio: str = VECTORES_DIR,
+                       muestra: int = 5000, corpus: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Agrega o actualiza los embeddings de los documentos recibidos (carga
+    incremental). Si el almacén aún no existe, el codificador se ajusta con
+    `corpus` (una muestra de la colección completa) o, sin ella, con una
+    muestra de estos mismos documentos; si no alcanza, se usa el de hashing.
+    El vocabulario queda fijo hasta `scripts/construir_vectores.py --reajustar`.
+    """
+    almacen = AlmacenVectores(directorio)
+    documentos = [doc for doc in documentos if doc.get('numero') is not None]
+    if not documentos:
+        return {'documentos': 0, 'reajustado': False}
+
+    reajustado = not almacen.existe()
+    if reajustado:
+        if corpus is None:
+            indices = np.random.default_rng(42).choice(len(documentos), min(muestra, len(documentos)), replace=False)
+            corpus = (documentos[i] for i in indices)
+        codificador = ajustar_codificador(corpus)
+    else:
+        codificador = almacen.codificador()
+    numeros, matriz = codificar_documentos(codificador, documentos)
+    almacen.actualizar(list(numeros), matriz, codificador)
+    return {'documentos': len(numeros), 'reajustado': reajustado, 'dimensiones': codificador.dimensiones,
+            'codificador': codificador.nombre}
+
+
+# ---------- Consulta ----------
+
+class BuscadorSimilares:
+    """Consulta top-k sobre el almacén; recarga los archivos si el almacén se regeneró."""
+
+    def __init__(self, directorio: str = VECTORES_DIR, n_sondas: int = VECTORES_SONDAS):
+        self.almacen = AlmacenVectores(directorio)
+        self.n_sondas = n_sondas
+        self._version = None
+        self._codificador: Optional[Codificador] = None
+        self.numeros = np.zeros(0, dtype=np.int64)
+        self.matriz = None
+        self.ivf: Optional[IndiceIVF] = None
+        self._fila: Dict[int, int] = {}
+        self._cargar_si_cambio()
+
+    def _cargar_si_cambio(self):
+        version = self.almacen.version()
+        if version is None or version == self._version:
+            return
+        try:
+            numeros, matriz, _ = self.almacen.cargar(version)
+            ivf = IndiceIVF.cargar(self.almacen.ruta('ivf.npz', version))
+        except OSError as e:
+            logger.warning(f"No se pudo cargar la versión '{version}' de los vectores: {e}")
+            return
+        self.numeros, self.matriz, self.ivf = numeros, matriz, ivf
+        self._fila = {int(numero): i for i, numero in enumerate(self.numeros)}
+        self._codificador = None
+        self._version = version
+        logger.info(f"Vectores cargados: {len(self.numeros)} documentos")
+
+    def disponible(self) -> bool:
+        self._cargar_si_cambio()
+        return self.matriz is not None and len(self.numeros) > 0
+
+    def _vecinos(self, consulta: np.ndarray, k: int, excluir: Optional[int] = None) -> List[Tuple[int, float]]:
+        filas, puntajes = self.ivf.buscar(self.matriz, consulta, k + 1, self.n_sondas)
+        vecinos = [(int(self.numeros[fila]), float(puntaje)) for fila, puntaje in zip(filas, puntajes)
+                   if int(self.numeros[fila]) != excluir]
+        return vecinos[:k]
+
+    @cronometrar('vectores')
+    def similares(self, numero: int, k: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """Documentos más parecidos a `numero` como [(numero, similitud coseno)]; None si no está indexado."""
+        self._cargar_si_cambio()
+        fila = self._fila.get(numero)
+        if fila is None:
+            return None
+        return self._vecinos(np.asarray(self.matriz[fila]), k, excluir=numero)
+
+    @cronometrar('vectores')
+    def buscar_texto(self, texto: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Documentos más parecidos a un texto libre."""
+        self._cargar_si_cambio()
+        if self._codificador is None:
+            self._codificador = self.almacen.codificador(self._version)
+        return self._vecinos(self._codificador.codificar([texto])[0], k)
@@ -4,8 +4,12 @@ import requests
 import time
 import logging
 import json
+import os
+import hashlib
+import math
+import re
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urldefrag, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode, quote
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from typing import Optional, List, Dict, Any, Union
@@ -14,6 +18,170 @@ from typing import Optional, List, Dict, Any, Union
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PUERTOS_POR_DEFECTO = {'http': 80, 'https': 443}
+# Parámetros de sesión y de campañas: no cambian el contenido, solo multiplican las URLs de una misma página
+PARAMETROS_IGNORADOS = {
+    'jsessionid', 'phpsessid', 'aspsessionid', 'sessionid', 'session_id', 'sid', 'cfid', 'cftoken',
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid', '_ga',
+}
+# Descargas: límite de tamaño y bytes iniciales que se revisan antes de aceptar el archivo
+DESCARGA_MAX_MB = int(os.getenv('DESCARGA_MAX_MB', os.getenv('CARGA_MAX_MB', '200')))
+MUESTRA_BYTES = 1024
+# Un "documento" servido con estos tipos es una página de error, de login o un recurso que no se procesa
+TIPOS_NO_DOCUMENTO = ('text/', 'application/xhtml', 'application/json', 'application/xml', 'image/', 'audio/',
+                      'video/')
+_SESION_EN_RUTA = re.compile(r';(jsessionid|phpsessid|sessionid)=[^/?#]*', re.IGNORECASE)
+_ESCAPE = re.compile(r'%([0-9A-Fa-f]{2})')
+_NO_RESERVADOS = set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+
+def _normalizar_escapes(texto: str, seguros: str) -> str:
+    """%xx en mayúsculas, decodificados si son caracteres no reservados, y el resto de caracteres escapado"""
+    texto = _ESCAPE.sub(lambda m: chr(int(m.group(1), 16)) if chr(int(m.group(1), 16)) in _NO_RESERVADOS
+                        else '%' + m.group(1).upper(), texto)
+    return quote(texto, safe=seguros + '%')
+
+
+def resolver_url(url: str, base: Optional[str] = None) -> str:
+    """
+    URL absoluta para pedir: resuelve relativas contra `base` y quita el
+    fragmento, sin tocar nada más (la sesión, la query y la barra final
+    pueden importarle al servidor). Para deduplicar, canonicalizar_url.
+    """
+    url = (url or '').strip()
+    if base:
+        url = urljoin(base, url)
+    return urldefrag(url)[0]
+
+
+def canonicalizar_url(url: str, base: Optional[str] = None, quitar_barra_final: bool = True) -> str:
+    """
+    Clave canónica de una URL para deduplicar (no para pedirla): resuelve relativas contra
+    `base`, quita el fragmento, los parámetros de sesión y de campañas
+    (también `;jsessionid=` en la ruta) y el puerto por defecto, pasa
+    esquema y host a minúsculas, normaliza los escapes %xx y los segmentos
+    `.`/`..`, ordena la query y quita la barra final. La ruta conserva sus
+    mayúsculas. Las URLs que no son http(s) (mailto:, javascript:) se
+    retornan sin cambios.
+    """
+    url = (url or '').strip()
+    if base:
+        url = urljoin(base, url)
+    partes = urlsplit(url)
+    esquema = partes.scheme.lower()
+    if esquema not in PUERTOS_POR_DEFECTO:
+        return url
+
+    host = (partes.hostname or '').rstrip('.')
+    if ':' in host:
+        # IPv6: hostname quita los corchetes, que el netloc necesita
+        host = f"[{host}]"
+    try:
+        puerto = partes.port
+    except ValueError:
+        puerto = None
+    netloc = host if puerto in (None, PUERTOS_POR_DEFECTO[esquema]) else f"{host}:{puerto}"
+    if partes.username:
+        netloc = f"{partes.username}{':' + partes.password if partes.password else ''}@{netloc}"
+
+    segmentos = []
+    for segmento in _SESION_EN_RUTA.sub('', partes.path).split('/'):
+        if segmento == '..':
+            if len(segmentos) > 1:
+                segmentos.pop()
+        elif segmento != '.':
+            segmentos.append(segmento)
+    ruta = _normalizar_escapes('/'.join(segmentos), "/:@!$&'()*+,;=")
+    if not ruta.startswith('/'):
+        ruta = '/' + ruta
+    if quitar_barra_final and len(ruta) > 1:
+        ruta = ruta.rstrip('/') or '/'
+
+    parametros = [(clave, valor) for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+                  if clave.lower() not in PARAMETROS_IGNORADOS]
+    query = urlencode(sorted(parametros), quote_via=quote)
+    return urlunsplit((esquema, netloc, ruta, query, ''))
+
+
+class DescargaOmitida(Exception):
+    """La descarga descartó el archivo por su tipo, tamaño o estado HTTP (no tiene sentido reintentar)."""
+
+
+def motivo_rechazo(tipo: Optional[str] = None, tamano: Optional[int] = None, muestra: bytes = b'',
+                   max_bytes: int = DESCARGA_MAX_MB * 1024 * 1024) -> Optional[str]:
+    """
+    Política de descarga: motivo para descartar un archivo por su tipo de
+    contenido, su tamaño o sus primeros bytes, o None si se acepta. PDF,
+    ZIP/DOCX y los formatos OLE nunca empiezan por '<': si la muestra sí,
+    es HTML o XML aunque el servidor diga application/pdf.
+    """
+    tipo = (tipo or '').split(';')[0].strip().lower()
+    if tipo.startswith(TIPOS_NO_DOCUMENTO):
+        return f"tipo {tipo}: no es un documento (¿página de error?)"
+    if muestra and muestra.lstrip(b'\xef\xbb\xbf \t\r\n')[:1] == b'<':
+        return "el contenido es HTML/XML: no es un documento (¿página de error?)"
+    if tamano is not None and tamano > max_bytes:
+        return f"{tamano // (1024 * 1024)} MB supera el máximo de {max_bytes // (1024 * 1024)} MB"
+    return None
+
+
+def _tamano_respuesta(response: requests.Response) -> Optional[int]:
+    """Tamaño total del archivo: de Content-Range en un 206, si no de Content-Length"""
+    rango = response.headers.get('Content-Range') or ''
+    if response.status_code == 206 and '/' in rango:
+        total = rango.rsplit('/', 1)[-1]
+        return int(total) if total.isdigit() else None
+    longitud = response.headers.get('Content-Length') or ''
+    return int(longitud) if longitud.isdigit() else None
+
+
+class ConjuntoVistos:
+    """
+    URLs ya vistas por un rastreo, comparadas en forma canónica. Un filtro de
+    Bloom responde con unas pocas lecturas de bits el caso común (URL nueva)
+    y un conjunto exacto de huellas de 64 bits confirma los positivos, así
+    que ninguna URL se pierde por un falso positivo y cada una ocupa un
+    entero en lugar de su texto. Pasada la `capacidad` el filtro da más
+    falsos positivos, pero el resultado sigue siendo exacto.
+    """
+
+    def __init__(self, capacidad: int = 100_000, tasa_error: float = 0.01, canonicalizar: bool = True):
+        self.bits = max(8, int(-capacidad * math.log(tasa_error) / math.log(2) ** 2))
+        self.funciones_hash = max(1, round(self.bits / capacidad * math.log(2)))
+        self.filtro = bytearray((self.bits + 7) // 8)
+        self.huellas = set()
+        self.canonicalizar = canonicalizar
+
+    def _resumen(self, url: str):
+        if self.canonicalizar:
+            url = canonicalizar_url(url)
+        resumen = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        huella = int.from_bytes(resumen[:8], 'big')
+        # Doble hashing: las k posiciones salen de dos valores de 64 bits
+        h1, h2 = huella, int.from_bytes(resumen[8:], 'big') | 1
+        posiciones = [(h1 + i * h2) % self.bits for i in range(self.funciones_hash)]
+        return huella, posiciones
+
+    def _en_filtro(self, posiciones) -> bool:
+        return all(self.filtro[p >> 3] & (1 << (p & 7)) for p in posiciones)
+
+    def __contains__(self, url: str) -> bool:
+        huella, posiciones = self._resumen(url)
+        return self._en_filtro(posiciones) and huella in self.huellas
+
+    def agregar(self, url: str) -> bool:
+        """Registra la URL; True si no se había visto"""
+        huella, posiciones = self._resumen(url)
+        if self._en_filtro(posiciones) and huella in self.huellas:
+            return False
+        for p in posiciones:
+            self.filtro[p >> 3] |= 1 << (p & 7)
+        self.huellas.add(huella)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.huellas)
+
 class WebScraper:
     """
     Clase para realizar web scraping ético siguiendo las mejores prácticas:
@@ -33,7 +201,9 @@ class WebScraper:
         """
         self.delay = delay_between_requests
         self.last_request_time = 0.0
+        self.peticiones = 0
         self.session = self._create_session(max_retries)
+        self._robots: Dict[str, 'ReglasRobots'] = {}
         
         # User-Agent identificable para el scraping ético
         self.headers = {
@@ -64,23 +234,63 @@ class WebScraper:
             time.sleep(self.delay - time_since_last_request)
         
         self.last_request_time = time.time()
+        self.peticiones += 1
+    
+    def robots(self, url: str) -> 'ReglasRobots':
+        """
+        Reglas de robots.txt del sitio de `url`, leídas una vez por sitio.
+        Un Crawl-delay mayor que el configurado pasa a ser la espera entre peticiones.
+        """
+        from helpers.descubrimiento import ReglasRobots
+
+        partes = urlsplit(canonicalizar_url(url))
+        sitio = f"{partes.scheme}://{partes.netloc}"
+        if sitio not in self._robots:
+            robots_url = urljoin(sitio, '/robots.txt')
+            try:
+                self._respect_rate_limit()
+                response = self.session.get(robots_url, headers=self.headers, timeout=10)
+                reglas = ReglasRobots(robots_url, response.text, response.status_code, self.headers['User-Agent'])
+                if response.status_code >= 500:
+                    logger.warning(f"robots.txt no disponible en {sitio} (Status: {response.status_code}): no se rastrea")
+                elif response.status_code != 200:
+                    logger.warning(f"robots.txt no encontrado en {sitio} (Status: {response.status_code})")
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error al acceder a robots.txt: {e}")
+                reglas = ReglasRobots(robots_url, estado_http=0, agente=self.headers['User-Agent'])
+            if reglas.crawl_delay and reglas.crawl_delay > self.delay:
+                logger.info(f"Crawl-delay de {sitio}: {reglas.crawl_delay}s")
+                self.delay = reglas.crawl_delay
+            self._robots[sitio] = reglas
+        return self._robots[sitio]
+    
+    def permitido(self, url: str) -> bool:
+        """Indica si robots.txt permite visitar `url` con este User-Agent"""
+        return self.robots(url).permitido(url)
     
-    def check_robots_txt(self, base_url: str) -> str:
+    def check_robots_txt(self, base_url: str) -> bool:
         """
-        Verificar el archivo robots.txt del sitio
+        Verificar el archivo robots.txt del sitio: True si permite rastrear
+        `base_url`. Sin robots.txt (4xx) todo está permitido; si el servidor
+        falla o no responde, no (RFC 9309).
+        """
+        permitido = self.permitido(base_url)
+        if not permitido:
+            logger.warning(f"robots.txt no permite rastrear {base_url}")
+        return permitido
+    
+    def obtener_respuesta(self, url: str, cabeceras: Optional[Dict[str, str]] = None,
+                          timeout: int = 10) -> Optional[requests.Response]:
+        """
+        Petición GET respetando rate limiting; retorna la respuesta con cualquier
+        código de estado (p. ej. 304 en peticiones condicionales) o None si falla la conexión
         """
         try:
-            robots_url = urljoin(base_url, '/robots.txt')
-            response = self.session.get(robots_url, headers=self.headers, timeout=10)
-            
-            if response.status_code == 200:
-                return response.text
-            else:
-                logger.warning(f"robots.txt no encontrado en {base_url} (Status: {response.status_code})")
-                return f"robots.txt no encontrado (Status: {response.status_code})"
-        except Exception as e:
-            logger.error(f"Error al acceder a robots.txt: {e}")
-            return f"Error al acceder a robots.txt: {e}"
+            self._respect_rate_limit()
+            return self.session.get(url, headers={**self.headers, **(cabeceras or {})}, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error en la petición: {e}")
+            return None
     
     def obtener_pagina(self, url: str, timeout: int = 10) -> Optional[BeautifulSoup]:
         """
@@ -127,25 +337,27 @@ class WebScraper:
     
     def extraer_enlaces(self, soup: BeautifulSoup, base_url: str, filtro_dominio: bool = True) -> List[str]:
         """
-        Extraer enlaces de una página
+        Extraer enlaces http(s) de una página, absolutos y sin duplicados por URL
+        canónica (en el orden en que aparecen, con la forma del primero)
         """
         if not soup:
             return []
         
         try:
-            enlaces = []
-            base_domain = urlparse(base_url).netloc
+            enlaces = {}
+            base_domain = urlsplit(canonicalizar_url(base_url)).netloc
             
             for link in soup.find_all('a', href=True):
-                url_absoluta = urljoin(base_url, link['href'])
+                url_absoluta = resolver_url(link['href'], base_url)
+                clave = canonicalizar_url(url_absoluta)
+                partes = urlsplit(clave)
+                if partes.scheme not in PUERTOS_POR_DEFECTO:
+                    continue
                 
-                if filtro_dominio:
-                    if urlparse(url_absoluta).netloc == base_domain:
-                        enlaces.append(url_absoluta)
-                else:
-                    enlaces.append(url_absoluta)
+                if not filtro_dominio or partes.netloc == base_domain:
+                    enlaces.setdefault(clave, url_absoluta)
             
-            return list(set(enlaces))  # Eliminar duplicados
+            return list(enlaces.values())
         
         except Exception as e:
             logger.error(f"Error al extraer enlaces: {e}")
@@ -181,28 +393,147 @@ class WebScraper:
             logger.error(f"Error al extraer tablas: {e}")
             return []
     
-    def descargar_archivo(self, url: str, ruta_destino: str) -> bool:
+    def _pedir_condicional(self, url: str, anterior: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """
+        GET en streaming, condicional (If-None-Match/If-Modified-Since) si
+        `anterior` trae el ETag o el Last-Modified de la descarga previa. El
+        cuerpo no se lee: quien llama decide con las cabeceras.
+        """
+        cabeceras = dict(self.headers)
+        if anterior and anterior.get('etag'):
+            cabeceras['If-None-Match'] = anterior['etag']
+        if anterior and anterior.get('last_modified'):
+            cabeceras['If-Modified-Since'] = anterior['last_modified']
+        self._respect_rate_limit()
+        return self.session.get(url, headers=cabeceras, stream=True, timeout=30)
+    
+    @staticmethod
+    def _sin_cambios(response: requests.Response, anterior: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Motivo por el que la respuesta es la misma versión que `anterior`, o None"""
+        if response.status_code == 304:
+            return '304 Not Modified'
+        if not anterior or response.status_code != 200:
+            return None
+        # Servidores que ignoran las cabeceras condicionales
+        etag = response.headers.get('ETag')
+        if etag:
+            return 'mismo ETag' if etag == anterior.get('etag') else None
+        last_modified = response.headers.get('Last-Modified')
+        if last_modified and last_modified == anterior.get('last_modified') and \
+                _tamano_respuesta(response) == anterior.get('tamano'):
+            return 'mismo Last-Modified y tamaño'
+        return None
+    
+    def _bloques_validados(self, response: requests.Response, tamano_bloque: int, max_bytes: int):
+        """
+        Bloques de la descarga validados mientras llegan: tipo y tamaño
+        declarados, los primeros bytes (una página HTML servida como PDF) y
+        el tamaño real (Content-Length puede faltar o mentir). Lanza
+        DescargaOmitida a mitad del stream.
+        """
+        motivo = motivo_rechazo(response.headers.get('Content-Type'), _tamano_respuesta(response), b'', max_bytes)
+        if motivo:
+            raise DescargaOmitida(motivo)
+        leidos = 0
+        for bloque in response.iter_content(chunk_size=tamano_bloque):
+            if not bloque:
+                continue
+            if leidos == 0:
+                motivo = motivo_rechazo(muestra=bloque[:MUESTRA_BYTES], max_bytes=max_bytes)
+                if motivo:
+                    raise DescargaOmitida(motivo)
+            leidos += len(bloque)
+            if leidos > max_bytes:
+                raise DescargaOmitida(f"supera el máximo de {max_bytes // (1024 * 1024)} MB")
+            yield bloque
+    
+    def descargar_condicional(self, url: str, ruta_destino: str, anterior: Optional[Dict[str, Any]] = None,
+                              max_bytes: int = DESCARGA_MAX_MB * 1024 * 1024) -> Dict[str, Any]:
         """
-        Descargar un archivo desde una URL
+        Descargar un archivo con una sola petición condicional: si `anterior`
+        ({etag, last_modified, tamano} de la descarga previa) sigue vigente no
+        se escribe nada. Las páginas HTML y los archivos de más de
+        `max_bytes` se descartan sin dejar un archivo parcial. Retorna
+        {accion, motivo, etag, last_modified, tamano}; `accion` es
+        'descargado', 'sin_cambios', 'omitir' (tipo, tamaño o 4xx) o 'error'
+        (red o 5xx: puede reintentarse).
         """
+        resultado = {'accion': 'descargado', 'motivo': None, 'etag': None, 'last_modified': None, 'tamano': None}
         try:
-            self._respect_rate_limit()
-            
             logger.info(f"Descargando archivo: {url}")
-            response = self.session.get(url, headers=self.headers, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            with open(ruta_destino, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            with self._pedir_condicional(url, anterior) as response:
+                resultado.update(etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+                motivo = self._sin_cambios(response, anterior)
+                if motivo:
+                    return dict(resultado, accion='sin_cambios', motivo=motivo)
+                if response.status_code >= 400:
+                    accion = 'error' if response.status_code >= 500 or response.status_code == 429 else 'omitir'
+                    return dict(resultado, accion=accion, motivo=f"HTTP {response.status_code}")
+                response.raise_for_status()
+                with open(ruta_destino, 'wb') as f:
+                    for chunk in self._bloques_validados(response, 8192, max_bytes):
+                        f.write(chunk)
             
             logger.info(f"Archivo descargado: {ruta_destino}")
-            return True
+            return dict(resultado, tamano=os.path.getsize(ruta_destino))
         
+        except DescargaOmitida as e:
+            logger.warning(f"Descarga omitida ({e}): {url}")
+            resultado.update(accion='omitir', motivo=str(e))
         except Exception as e:
             logger.error(f"Error al descargar archivo: {e}")
-            return False
+            resultado.update(accion='error', motivo=str(e))
+        if os.path.exists(ruta_destino):
+            os.remove(ruta_destino)
+        return resultado
+    
+    def descargar_archivo(self, url: str, ruta_destino: str, max_bytes: int = DESCARGA_MAX_MB * 1024 * 1024) -> bool:
+        """
+        Descargar un archivo desde una URL. Las páginas HTML y los archivos
+        de más de `max_bytes` se descartan sin dejar un archivo parcial
+        """
+        return self.descargar_condicional(url, ruta_destino, max_bytes=max_bytes)['accion'] == 'descargado'
     
+    def descargar_a_almacen(self, url: str, almacen, clave: str, nombre: Optional[str] = None,
+                            tamano_bloque: int = 256 * 1024, anterior: Optional[Dict[str, Any]] = None,
+                            max_bytes: int = DESCARGA_MAX_MB * 1024 * 1024) -> Optional[Dict[str, Any]]:
+        """
+        Descargar un archivo directo al almacén de archivos (GridFS o disco),
+        bloque por bloque, sin pasar por un archivo intermedio. La petición es
+        condicional con el ETag/Last-Modified de `anterior` (metadatos del
+        almacén): si no cambió se retorna `anterior` sin leer el cuerpo.
+        Retorna los metadatos guardados (tamaño, sha256, tipo, origen) o None
+        si falla; lanza DescargaOmitida si un 4xx o la política de tipo o
+        tamaño lo descarta.
+        """
+        previo = dict(anterior.get('origen') or {}, tamano=anterior.get('tamano')) if anterior else None
+        try:
+            logger.info(f"Descargando archivo: {url}")
+            with self._pedir_condicional(url, previo) as response:
+                motivo = self._sin_cambios(response, previo)
+                if motivo:
+                    logger.info(f"Sin cambios desde la última descarga ({motivo}): {url}")
+                    return anterior
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    raise DescargaOmitida(f"HTTP {response.status_code}")
+                response.raise_for_status()
+                nombre = nombre or urlparse(url).path.rsplit('/', 1)[-1] or clave
+                tipo = (response.headers.get('Content-Type') or '').split(';')[0].strip() or None
+                origen = {'url': url, 'etag': response.headers.get('ETag'),
+                          'last_modified': response.headers.get('Last-Modified')}
+                info = almacen.guardar_stream(clave, self._bloques_validados(response, tamano_bloque, max_bytes),
+                                              nombre, None if tipo in (None, 'application/octet-stream') else tipo,
+                                              origen={campo: valor for campo, valor in origen.items() if valor})
+
+            logger.info(f"Archivo guardado en el almacén: {clave} ({info['tamano']} bytes)")
+            return info
+
+        except DescargaOmitida:
+            raise
+        except Exception as e:
+            logger.error(f"Error al descargar archivo al almacén: {e}")
+            return None
+
     def scrapear_multiples_paginas(self, urls: List[str], extractor_func=None) -> List[Dict]:
         """
         Scrapear múltiples páginas respetando rate limiting
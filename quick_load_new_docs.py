@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 from helpers.mongo_db import MongoDB
 from helpers.funciones import Funciones
 from pathlib import Path
+from datetime import datetime
 
 load_dotenv()
 
@@ -49,7 +50,8 @@ def main():
                     "tipo": file_path.suffix[1:].upper(),
                     "archivo_local": str(file_path),
                     "texto_contenido": texto[:5000] if texto else "",  # Primeros 5000 caracteres
-                    "tamano_bytes": file_path.stat().st_size
+                    "tamano_bytes": file_path.stat().st_size,
+                    "actualizado_en": datetime.now()
                 }
                 
                 collection.insert_one(doc)
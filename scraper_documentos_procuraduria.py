@@ -15,7 +15,9 @@ import time
 from datetime import datetime
 from dotenv import load_dotenv
 from helpers import WebScraper, Funciones
-from urllib.parse import urljoin, urlparse
+from helpers.descubrimiento import Descubridor
+from helpers.web_scraper import ConjuntoVistos, canonicalizar_url, resolver_url
+from urllib.parse import urlparse, parse_qsl
 
 load_dotenv()
 
@@ -24,14 +26,18 @@ class ScraperDocumentosProcuraduria:
     Scraper especializado en buscar y descargar documentos oficiales
     """
     
-    def __init__(self, objetivo_documentos=100):
+    def __init__(self, objetivo_documentos=100, incremental=False):
         self.scraper = WebScraper(delay_between_requests=2.0, max_retries=3)
         self.funciones = Funciones()
         self.base_url = "https://www.procuraduria.gov.co"
         self.objetivo_documentos = objetivo_documentos
         self.documentos_encontrados = []
         self.documentos_descargados = []
-        self.urls_visitadas = set()
+        self.documentos_omitidos = []
+        self.documentos_sin_cambios = 0
+        # Páginas y documentos se deduplican por URL canónica (pero se piden con la URL del enlace)
+        self.urls_visitadas = ConjuntoVistos()
+        self.documentos_vistos = ConjuntoVistos()
         
         # URLs específicas de secciones con documentos
         self.secciones_documentos = [
@@ -54,6 +60,11 @@ class ScraperDocumentosProcuraduria:
             "/sitepages/normatividad.aspx"
         ]
         
+        # Sitemaps y bibliotecas de SharePoint; las secciones de arriba solo si el sitio no los publica.
+        # En modo incremental solo entrega documentos nuevos, modificados o sin confirmar: sirve a quien
+        # actualiza por URL (pipeline_ingesta.py), no a cargar_documentos_a_bd.py, que reemplaza la colección
+        self.descubridor = Descubridor(self.scraper, self.base_url, self.es_documento, incremental=incremental)
+        
         self.resultados = {
             "proyecto": "Big Data - Procuraduría General de la Nación",
             "objetivo": f"Mínimo {objetivo_documentos} documentos",
@@ -61,24 +72,54 @@ class ScraperDocumentosProcuraduria:
             "secciones_exploradas": [],
             "documentos_encontrados": [],
             "documentos_descargados": [],
+            "descubrimiento": {},
             "estadisticas": {}
         }
     
-    def es_documento(self, url):
+    def extension_documento(self, url):
         """
-        Verifica si una URL es un documento descargable
+        Extensión de documento de una URL, en la ruta o en un parámetro
+        (p. ej. download.aspx?SourceUrl=/Normativa/Decreto.pdf); None si no tiene
         """
         extensiones = ['.pdf', '.docx', '.doc', '.xlsx', '.xls', '.zip', '.rar']
-        return any(url.lower().endswith(ext) for ext in extensiones)
+        partes = urlparse(url)
+        for candidato in [partes.path] + [valor for _, valor in parse_qsl(partes.query)]:
+            extension = next((ext for ext in extensiones if candidato.lower().endswith(ext)), None)
+            if extension:
+                return extension
+        return None
+    
+    def es_documento(self, url):
+        """
+        Verifica si una URL parece un documento descargable. Es solo por la
+        URL: el tipo y el tamaño reales se validan al descargar
+        """
+        return self.extension_documento(url) is not None
+    
+    def es_interna(self, url):
+        """
+        Verifica si una URL pertenece al sitio
+        """
+        return urlparse(canonicalizar_url(url)).netloc == urlparse(canonicalizar_url(self.base_url)).netloc
     
     def extraer_documentos_pagina(self, url):
         """
         Extrae todos los documentos de una página específica
         """
-        if url in self.urls_visitadas:
-            return []
+        return list(self.explorar_pagina(url))
+    
+    def explorar_pagina(self, url):
+        """
+        Generador: entrega cada documento en cuanto se encuentra, incluidos los
+        de las páginas internas que se siguen desde esta
+        """
+        url = resolver_url(url)
+        if not self.urls_visitadas.agregar(url):
+            return
         
-        self.urls_visitadas.add(url)
+        if not self.scraper.permitido(url):
+            print(f"✗ robots.txt no permite: {url}")
+            return
         print(f"\n{'='*70}")
         print(f"Explorando: {url}")
         print(f"Documentos encontrados hasta ahora: {len(self.documentos_encontrados)}")
@@ -87,25 +128,20 @@ class ScraperDocumentosProcuraduria:
         try:
             soup = self.scraper.obtener_pagina(url)
             if not soup:
-                return []
-            
-            documentos_pagina = []
+                return
             
             # Buscar todos los enlaces
             for enlace in soup.find_all('a', href=True):
-                href = enlace['href']
-                
-                # Construir URL completa
-                if not href.startswith('http'):
-                    href = urljoin(url, href)
+                # URL completa (la forma canónica solo se usa para deduplicar)
+                href = resolver_url(enlace['href'], url)
                 
                 # Verificar si es un documento
                 if self.es_documento(href):
                     texto_enlace = enlace.get_text(strip=True) or "Sin título"
-                    extension = href.split('.')[-1].upper()
+                    extension = self.extension_documento(href)[1:].upper()
                     
                     # Evitar duplicados
-                    if href not in [d['url'] for d in self.documentos_encontrados]:
+                    if self.documentos_vistos.agregar(href):
                         doc_info = {
                             "url": href,
                             "titulo": texto_enlace,
@@ -115,20 +151,18 @@ class ScraperDocumentosProcuraduria:
                         }
                         
                         self.documentos_encontrados.append(doc_info)
-                        documentos_pagina.append(doc_info)
                         
                         print(f"✓ Documento encontrado: {texto_enlace[:60]}... [{extension}]")
+                        yield doc_info
             
             # Buscar enlaces a otras páginas que puedan contener documentos
             if len(self.documentos_encontrados) < self.objetivo_documentos:
                 enlaces_internos = []
                 for enlace in soup.find_all('a', href=True):
-                    href = enlace['href']
-                    if not href.startswith('http'):
-                        href = urljoin(url, href)
+                    href = resolver_url(enlace['href'], url)
                     
                     # Solo seguir enlaces internos del dominio
-                    if self.base_url in href and href not in self.urls_visitadas:
+                    if self.es_interna(href) and href not in self.urls_visitadas:
                         # Filtrar enlaces relevantes
                         keywords = ['normativ', 'manual', 'documento', 'resolucion', 
                                    'circular', 'concepto', 'decreto', 'informe', 
@@ -136,18 +170,60 @@ class ScraperDocumentosProcuraduria:
                         
                         if any(keyword in href.lower() for keyword in keywords):
                             enlaces_internos.append(href)
+                enlaces_internos = list(dict.fromkeys(enlaces_internos))
                 
                 # Explorar enlaces internos prometedores
                 for enlace_interno in enlaces_internos[:5]:  # Limitar a 5 por página
                     if len(self.documentos_encontrados) >= self.objetivo_documentos:
                         break
-                    documentos_pagina.extend(self.extraer_documentos_pagina(enlace_interno))
-            
-            return documentos_pagina
+                    yield from self.explorar_pagina(enlace_interno)
             
         except Exception as e:
             print(f"✗ Error al explorar {url}: {str(e)}")
-            return []
+    
+    def descubrir_documentos(self):
+        """
+        Generador: documentos de los sitemaps y las listas de SharePoint
+        """
+        for doc_info in self.descubridor.descubrir():
+            if len(self.documentos_encontrados) >= self.objetivo_documentos:
+                break
+            if not self.documentos_vistos.agregar(doc_info['url']):
+                continue
+            self.documentos_encontrados.append(doc_info)
+            print(f"✓ Documento encontrado: {doc_info['titulo'][:60]}... [{doc_info['tipo']}] ({doc_info['fuente']})")
+            yield doc_info
+        self.resultados["descubrimiento"] = dict(self.descubridor.estadisticas)
+    
+    def tiene_fuentes_estructuradas(self):
+        """True si el sitio publica sitemaps o listas (aunque no haya nada nuevo): no hace falta rastrear secciones"""
+        return self.descubridor.estadisticas['fuentes'] > 0
+    
+    def iterar_documentos(self):
+        """
+        Entrega los documentos a medida que aparecen, para que la descarga
+        empiece sin esperar al final de la exploración: primero sitemaps y
+        listas; si el sitio no los tiene, las secciones (y la búsqueda
+        profunda si hace falta)
+        """
+        yield from self.descubrir_documentos()
+        if self.tiene_fuentes_estructuradas():
+            return
+        
+        for seccion in self.secciones_documentos:
+            if len(self.documentos_encontrados) >= self.objetivo_documentos:
+                return
+            yield from self.explorar_pagina(self.base_url + seccion)
+        
+        soup = self.scraper.obtener_pagina(self.base_url)
+        if not soup:
+            return
+        for enlace in soup.find_all('a', href=True):
+            if len(self.documentos_encontrados) >= self.objetivo_documentos:
+                return
+            href = resolver_url(enlace['href'], self.base_url)
+            if self.es_interna(href) and href not in self.urls_visitadas:
+                yield from self.explorar_pagina(href)
     
     def explorar_todas_secciones(self):
         """
@@ -158,6 +234,14 @@ class ScraperDocumentosProcuraduria:
         print(f"Objetivo: {self.objetivo_documentos} documentos")
         print("="*70)
         
+        for _ in self.descubrir_documentos():
+            pass
+        if self.tiene_fuentes_estructuradas():
+            estadisticas = self.resultados["descubrimiento"]
+            print(f"\n✓ Descubrimiento por sitemaps/listas: {estadisticas['documentos']} documentos nuevos o modificados, "
+                  f"{estadisticas['documentos_sin_cambios']} sin cambios")
+            return
+        
         for seccion in self.secciones_documentos:
             if len(self.documentos_encontrados) >= self.objetivo_documentos:
                 print(f"\n✓ Objetivo alcanzado: {len(self.documentos_encontrados)} documentos")
@@ -201,11 +285,9 @@ class ScraperDocumentosProcuraduria:
             urls_por_explorar = []
             
             for enlace in enlaces:
-                href = enlace['href']
-                if not href.startswith('http'):
-                    href = urljoin(self.base_url, href)
+                href = resolver_url(enlace['href'], self.base_url)
                 
-                if self.base_url in href and href not in self.urls_visitadas:
+                if self.es_interna(href) and href not in self.urls_visitadas:
                     urls_por_explorar.append(href)
             
             # Explorar URLs hasta alcanzar objetivo
@@ -227,11 +309,18 @@ class ScraperDocumentosProcuraduria:
         
         self.funciones.crear_carpeta("uploads/documentos_procuraduria")
         
+        estado = self.descubridor.estado
         for i, doc in enumerate(self.documentos_encontrados[:max_descargas], 1):
             print(f"\n[{i}/{max_descargas}] Descargando:")
             print(f"Título: {doc['titulo'][:60]}...")
             print(f"Tipo: {doc['tipo']}")
             
+            # Una sola petición condicional: si el archivo sigue en disco y el servidor dice que no
+            # cambió (304 o el mismo ETag) no se descarga; las páginas de error y los archivos enormes
+            # se descartan al llegar las cabeceras o el primer bloque
+            registro = estado.obtener(canonicalizar_url(doc['url']))
+            anterior = registro if registro.get('ruta') and os.path.exists(registro['ruta']) else None
+            
             # Generar nombre de archivo único y seguro
             nombre_base = doc['titulo'][:50].replace('/', '_').replace('\\', '_')
             nombre_base = ''.join(c for c in nombre_base if c.isalnum() or c in (' ', '-', '_')).strip()
@@ -243,28 +332,37 @@ class ScraperDocumentosProcuraduria:
             nombre_archivo = f"{i:03d}_{nombre_base}_{timestamp}.{doc['tipo'].lower()}"
             ruta_destino = os.path.join("uploads", "documentos_procuraduria", nombre_archivo)
             
-            try:
-                if self.scraper.descargar_archivo(doc['url'], ruta_destino):
-                    if os.path.exists(ruta_destino):
-                        tamano = os.path.getsize(ruta_destino)
-                        print(f"✓ Descargado: {tamano:,} bytes")
-                        
-                        self.documentos_descargados.append({
-                            "numero": i,
-                            "archivo": nombre_archivo,
-                            "url_original": doc['url'],
-                            "titulo": doc['titulo'],
-                            "tipo": doc['tipo'],
-                            "tamano_bytes": tamano,
-                            "ruta": ruta_destino
-                        })
-                    else:
-                        print(f"✗ Error: archivo no se creó")
-                else:
-                    print(f"✗ Error al descargar")
-                    
-            except Exception as e:
-                print(f"✗ Error: {str(e)}")
+            resultado = self.scraper.descargar_condicional(doc['url'], ruta_destino, anterior)
+            if resultado['accion'] == 'sin_cambios':
+                print(f"= Sin cambios ({resultado['motivo']}): {anterior['ruta']}")
+                self.documentos_sin_cambios += 1
+                nombre_archivo, ruta_destino = os.path.basename(anterior['ruta']), anterior['ruta']
+            elif resultado['accion'] == 'omitir':
+                print(f"✗ Omitido: {resultado['motivo']}")
+                # Descartado por tipo, tamaño o 4xx: no se reintenta hasta que cambie su lastmod
+                self.descubridor.confirmar(doc['url'], doc.get('lastmod'))
+                self.documentos_omitidos.append({"url": doc['url'], "titulo": doc['titulo'], "motivo": resultado['motivo']})
+            elif resultado['accion'] == 'error':
+                print(f"✗ Error al descargar: {resultado['motivo']}")
+            else:
+                print(f"✓ Descargado: {resultado['tamano']:,} bytes")
+            
+            if resultado['accion'] in ('descargado', 'sin_cambios'):
+                # Los que no cambiaron también van al reporte, con su archivo de la descarga anterior
+                tamano = os.path.getsize(ruta_destino)
+                self.documentos_descargados.append({
+                    "numero": i,
+                    "archivo": nombre_archivo,
+                    "url_original": doc['url'],
+                    "titulo": doc['titulo'],
+                    "tipo": doc['tipo'],
+                    "tamano_bytes": tamano,
+                    "ruta": ruta_destino
+                })
+                self.descubridor.confirmar(doc['url'], doc.get('lastmod'),
+                                           etag=resultado['etag'] or (anterior or {}).get('etag'),
+                                           last_modified=resultado['last_modified'] or (anterior or {}).get('last_modified'),
+                                           tamano=tamano, ruta=ruta_destino)
             
             # Mostrar progreso
             if i % 10 == 0:
@@ -272,7 +370,10 @@ class ScraperDocumentosProcuraduria:
                 print(f"Progreso: {i}/{max_descargas} documentos descargados")
                 print(f"{'='*70}")
         
+        estado.guardar()
         print(f"\n✓ Descarga completada: {len(self.documentos_descargados)} documentos")
+        if self.documentos_sin_cambios or self.documentos_omitidos:
+            print(f"  Sin cambios: {self.documentos_sin_cambios} | Omitidos por tipo, tamaño o HTTP: {len(self.documentos_omitidos)}")
     
     def generar_reporte_final(self):
         """
@@ -290,10 +391,14 @@ class ScraperDocumentosProcuraduria:
         
         self.resultados["documentos_encontrados"] = self.documentos_encontrados
         self.resultados["documentos_descargados"] = self.documentos_descargados
+        self.resultados["documentos_omitidos"] = self.documentos_omitidos
         self.resultados["estadisticas"] = {
             "total_documentos_encontrados": len(self.documentos_encontrados),
             "total_documentos_descargados": len(self.documentos_descargados),
             "secciones_exploradas": len(self.resultados["secciones_exploradas"]),
+            "total_documentos_omitidos": len(self.documentos_omitidos),
+            "total_documentos_sin_cambios": self.documentos_sin_cambios,
+            "peticiones_http": self.scraper.peticiones,
             "tipos_documentos": tipos_docs,
             "objetivo_alcanzado": len(self.documentos_encontrados) >= self.objetivo_documentos,
             "fecha_finalizacion": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -315,6 +420,7 @@ class ScraperDocumentosProcuraduria:
         print(f"Documentos descargados: {len(self.documentos_descargados)}")
         print(f"Secciones exploradas: {len(self.resultados['secciones_exploradas'])}")
         print(f"Páginas visitadas: {len(self.urls_visitadas)}")
+        print(f"Peticiones HTTP: {self.scraper.peticiones}")
         print(f"\nTipos de documentos encontrados:")
         for tipo, cantidad in sorted(tipos_docs.items(), key=lambda x: x[1], reverse=True):
             print(f"  {tipo}: {cantidad}")
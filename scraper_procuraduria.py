@@ -13,6 +13,7 @@ import json
 from datetime import datetime
 from dotenv import load_dotenv
 from helpers import WebScraper, Funciones
+from helpers.web_scraper import canonicalizar_url, resolver_url
 
 # Cargar variables de entorno
 load_dotenv()
@@ -164,10 +165,13 @@ class ScraperProcuraduria:
                 
                 # Buscar enlaces a documentos (PDFs, etc.)
                 enlaces = soup.find_all('a', href=True)
-                enlaces_documentos = [
-                    enlace['href'] for enlace in enlaces 
-                    if enlace['href'].endswith(('.pdf', '.docx', '.xlsx'))
-                ]
+                # Sin duplicados por URL canónica, en el orden en que aparecen
+                documentos_por_clave = {}
+                for enlace in enlaces:
+                    href = resolver_url(enlace['href'], url_transparencia)
+                    if href.lower().split('?')[0].endswith(('.pdf', '.docx', '.xlsx')):
+                        documentos_por_clave.setdefault(canonicalizar_url(href), href)
+                enlaces_documentos = list(documentos_por_clave.values())
                 print(f"✓ Documentos encontrados: {len(enlaces_documentos)}")
                 
                 # Extraer tablas si existen
@@ -13,6 +13,8 @@ import json
 from datetime import datetime
 from dotenv import load_dotenv
 from helpers import WebScraper, Funciones
+from helpers.web_scraper import ConjuntoVistos, canonicalizar_url, resolver_url
+from urllib.parse import urlparse
 
 load_dotenv()
 
@@ -27,6 +29,8 @@ class ScraperProcuraduriaAvanzado:
         self.base_url = "https://www.procuraduria.gov.co"
         self.max_paginas = max_paginas
         self.paginas_visitadas = set()
+        # Frontera: URLs canónicas ya encoladas o visitadas
+        self.urls_vistas = ConjuntoVistos()
         self.resultados = {
             "fuente": "Procuraduría General de la Nación - Scraping Avanzado",
             "url_base": self.base_url,
@@ -45,7 +49,9 @@ class ScraperProcuraduriaAvanzado:
         """
         Analiza una página individual y extrae toda su información
         """
-        if url in self.paginas_visitadas or len(self.paginas_visitadas) >= self.max_paginas:
+        url = resolver_url(url)
+        clave = canonicalizar_url(url)
+        if clave in self.paginas_visitadas or len(self.paginas_visitadas) >= self.max_paginas:
             return None
         
         print(f"\n{'='*70}")
@@ -59,7 +65,7 @@ class ScraperProcuraduriaAvanzado:
             if not soup:
                 return None
             
-            self.paginas_visitadas.add(url)
+            self.paginas_visitadas.add(clave)
             
             # Extraer información
             titulo = soup.find('title')
@@ -73,17 +79,19 @@ class ScraperProcuraduriaAvanzado:
             
             # Buscar documentos descargables
             documentos = []
+            documentos_vistos = ConjuntoVistos(capacidad=1000)
             for enlace in soup.find_all('a', href=True):
-                href = enlace['href']
-                if any(href.lower().endswith(ext) for ext in ['.pdf', '.docx', '.xlsx', '.doc', '.xls', '.zip']):
-                    # Construir URL completa
-                    if not href.startswith('http'):
-                        href = self.base_url + href if href.startswith('/') else self.base_url + '/' + href
+                # URL completa (las relativas se resuelven contra la página, no contra la raíz)
+                href = resolver_url(enlace['href'], url)
+                ruta = urlparse(href).path.lower()
+                if any(ruta.endswith(ext) for ext in ['.pdf', '.docx', '.xlsx', '.doc', '.xls', '.zip']):
+                    if not documentos_vistos.agregar(href):
+                        continue
                     
                     documentos.append({
                         "url": href,
                         "texto_enlace": enlace.get_text(strip=True),
-                        "tipo": href.split('.')[-1].upper()
+                        "tipo": ruta.split('.')[-1].upper()
                     })
             
             # Tablas
@@ -130,7 +138,8 @@ class ScraperProcuraduriaAvanzado:
         print("="*70)
         
         # Comenzar con la página principal
-        cola_urls = [self.base_url]
+        cola_urls = [resolver_url(self.base_url)]
+        self.urls_vistas.agregar(cola_urls[0])
         
         while cola_urls and len(self.paginas_visitadas) < self.max_paginas:
             url_actual = cola_urls.pop(0)
@@ -138,11 +147,12 @@ class ScraperProcuraduriaAvanzado:
             nuevos_enlaces = self.analizar_pagina(url_actual)
             
             if nuevos_enlaces:
-                # Agregar nuevos enlaces a la cola (solo los que no hemos visitado)
+                # Agregar nuevos enlaces a la cola (solo los que no hemos encolado ni visitado)
                 for enlace in nuevos_enlaces:
-                    if enlace not in self.paginas_visitadas and enlace not in cola_urls:
-                        if len(self.paginas_visitadas) + len(cola_urls) < self.max_paginas:
-                            cola_urls.append(enlace)
+                    if len(self.paginas_visitadas) + len(cola_urls) >= self.max_paginas:
+                        break
+                    if self.urls_vistas.agregar(enlace):
+                        cola_urls.append(enlace)
         
         print(f"\n✓ Exploración completada: {len(self.paginas_visitadas)} páginas analizadas")
     
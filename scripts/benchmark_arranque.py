@@ -0,0 +1,89 @@
+"""
+Benchmark del tiempo de arranque de un worker: cuánto tarda `import app`.
+
+Ejecuta la importación en procesos nuevos (como hace gunicorn al crear o
+reciclar un worker) y reporta la mediana, además de los módulos más
+costosos según `python -X importtime`.
+
+Uso:
+    python scripts/benchmark_arranque.py [--repeticiones 5] [--top 15] [--sin-calentamiento]
+
+Con --sin-calentamiento se fija CALENTAR_SERVICIOS=false para medir solo la
+importación, sin el hilo que conecta con MongoDB/ES en segundo plano.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODIGO_MEDICION = (
+    "import time; inicio = time.perf_counter(); import app; "
+    "print(f'IMPORT_MS={(time.perf_counter() - inicio) * 1000:.1f}')"
+)
+
+
+def entorno(sin_calentamiento):
+    env = dict(os.environ)
+    # Valores mínimos para que app.py importe aunque no exista .env
+    env.setdefault('MONGO_URI', 'mongodb://127.0.0.1:27017')
+    env.setdefault('MONGO_DB', 'proyecto_big_data')
+    env.setdefault('MONGO_COLLECTION', 'documentos')
+    if sin_calentamiento:
+        env['CALENTAR_SERVICIOS'] = 'false'
+    return env
+
+
+def medir_importacion(env):
+    resultado = subprocess.run([sys.executable, '-c', CODIGO_MEDICION], cwd=RAIZ, env=env,
+                               capture_output=True, text=True)
+    coincidencia = re.search(r'IMPORT_MS=([\d.]+)', resultado.stdout)
+    if not coincidencia:
+        raise RuntimeError(f"No se pudo importar app:\n{resultado.stderr[-2000:]}")
+    return float(coincidencia.group(1))
+
+
+def modulos_costosos(env, top):
+    """Módulos con mayor tiempo acumulado según -X importtime (microsegundos)."""
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=RAIZ, env=env,
+                               capture_output=True, text=True)
+    modulos = []
+    for linea in resultado.stderr.splitlines():
+        partes = linea.split('|')
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        modulos.append((int(partes[1].strip()), partes[2].rstrip()))
+    # La sangría indica el anidamiento: se listan app y lo que importa directamente
+    directos = [(us, nombre.strip()) for us, nombre in modulos if len(nombre) - len(nombre.lstrip()) <= 3]
+    return sorted(directos, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--sin-calentamiento', action='store_true')
+    args = parser.parse_args()
+
+    env = entorno(args.sin_calentamiento)
+    inicio = time.perf_counter()
+    tiempos = [medir_importacion(env) for _ in range(args.repeticiones)]
+
+    print("=" * 70)
+    print(f"BENCHMARK DE ARRANQUE - import app ({args.repeticiones} procesos)")
+    print("=" * 70)
+    print(f"Mediana: {statistics.median(tiempos):.1f} ms | min: {min(tiempos):.1f} ms | max: {max(tiempos):.1f} ms")
+    print(f"Tiempo total del benchmark: {time.perf_counter() - inicio:.1f} s")
+    print("-" * 70)
+    print(f"{'Módulo':<50}{'ms acumulados':>18}")
+    for microsegundos, nombre in modulos_costosos(env, args.top):
+        print(f"{nombre:<50}{microsegundos / 1000:>18.1f}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Microbenchmark de serialización y compresión de páginas de búsqueda.
+
+Compara el proveedor JSON por defecto de Flask con ProveedorJSONRapido
+(orjson) y el tamaño/tiempo de gzip y brotli sobre páginas realistas de
+/api/buscar (documentos con ObjectId, fechas y texto completo).
+
+Uso:
+    python scripts/benchmark_json.py [--docs 100] [--chars 30000] [--repeticiones 20] [--mongo]
+
+Con --mongo se usan documentos reales de la colección configurada en .env.
+"""
+import argparse
+import gzip
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from helpers.respuestas_http import ProveedorJSONRapido, brotli, orjson
+
+load_dotenv()
+
+PALABRAS = ("procuraduría nación disciplinario resolución artículo función pública servidor "
+            "investigación proceso fallo sanción vigilancia control gestión informe manual "
+            "procedimiento código ética derechos humanos entidad territorial contratación").split()
+
+
+def documento_sintetico(numero, caracteres):
+    palabras = []
+    longitud = 0
+    while longitud < caracteres:
+        palabra = random.choice(PALABRAS)
+        palabras.append(palabra)
+        longitud += len(palabra) + 1
+    texto = ' '.join(palabras)
+    return {
+        '_id': ObjectId(),
+        'numero': numero,
+        'titulo': f"Resolución {numero} de {random.randint(2015, 2025)}",
+        'tipo': 'PDF',
+        'url_original': f"https://www.procuraduria.gov.co/documentos/{numero}.pdf",
+        'tamano_bytes': random.randint(50_000, 5_000_000),
+        'tamano_mb': round(random.random() * 5, 2),
+        'fecha_descarga': datetime.now(),
+        'texto_contenido': texto,
+        'snippet': texto[:250],
+        'metadatos': {'categoria': 'Resoluciones', 'año': 2024, 'extension': 'pdf'}
+    }
+
+
+def documentos_mongo(cantidad):
+    from helpers.mongo_db import Mongo_DB
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    return list(mongo.coll.find().limit(cantidad))
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=100)
+    parser.add_argument('--chars', type=int, default=30000, help='Caracteres de texto por documento sintético')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--mongo', action='store_true', help='Usar documentos reales de MongoDB')
+    args = parser.parse_args()
+
+    if args.mongo:
+        documentos = documentos_mongo(args.docs)
+    else:
+        documentos = [documento_sintetico(i, args.chars) for i in range(1, args.docs + 1)]
+
+    pagina = {'exito': True, 'documentos': documentos, 'total': len(documentos),
+              'pagina': 1, 'por_pagina': len(documentos), 'total_paginas': 1, 'motor': 'mongodb'}
+
+    app = Flask(__name__)
+    por_defecto = DefaultJSONProvider(app)
+    por_defecto.default = ProveedorJSONRapido.default  # El proveedor por defecto no conoce ObjectId
+    rapido = ProveedorJSONRapido(app)
+
+    print("=" * 70)
+    print(f"BENCHMARK JSON - {len(documentos)} documentos por página")
+    print(f"orjson: {'sí' if orjson else 'no instalado'} | brotli: {'sí' if brotli else 'no instalado'}")
+    print("=" * 70)
+
+    with app.app_context():
+        t_defecto, cuerpo_defecto = medir(lambda: por_defecto.response(pagina).get_data(), args.repeticiones)
+        t_rapido, cuerpo_rapido = medir(lambda: rapido.response(pagina).get_data(), args.repeticiones)
+
+    print(f"{'Serialización':<28}{'ms (mediana)':>14}{'bytes':>16}")
+    print(f"{'Flask por defecto':<28}{t_defecto:>14.2f}{len(cuerpo_defecto):>16,}")
+    print(f"{'ProveedorJSONRapido':<28}{t_rapido:>14.2f}{len(cuerpo_rapido):>16,}")
+    print(f"Aceleración: x{t_defecto / t_rapido:.1f}")
+
+    print("-" * 70)
+    print(f"{'Compresión':<28}{'ms (mediana)':>14}{'bytes':>16}")
+    t_gzip, gz = medir(lambda: gzip.compress(cuerpo_rapido, compresslevel=6), args.repeticiones)
+    print(f"{'gzip (nivel 6)':<28}{t_gzip:>14.2f}{len(gz):>16,}")
+    if brotli:
+        t_br, br = medir(lambda: brotli.compress(cuerpo_rapido, quality=5), args.repeticiones)
+        print(f"{'brotli (calidad 5)':<28}{t_br:>14.2f}{len(br):>16,}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark del almacén de textos comprimido frente al texto en línea.
+
+Copia una muestra del corpus a dos colecciones temporales, una con el texto
+en línea y otra con el texto separado y comprimido en '<colección>_textos',
+y compara:
+  - RAM: tamaño sin comprimir de los datos (lo que ocupa en la caché de
+    WiredTiger el recorrido de la colección principal)
+  - Disco: storageSize de las colecciones
+  - Tiempo: listado paginado, agregación por categoría y detalle con texto
+
+Las colecciones temporales se eliminan al terminar.
+
+Uso:
+    python scripts/benchmark_textos.py [--muestra 2000] [--repeticiones 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.almacen_textos import AlmacenTextos, separar_texto
+from helpers.indices import INDICES_DOCUMENTOS, INDICES_TEXTOS, asegurar_indices
+from helpers.mongo_db import Mongo_DB
+
+load_dotenv()
+
+PREFIJO = '_benchmark_textos'
+
+
+def estadisticas(db, nombre):
+    datos = db.command('collStats', nombre)
+    return datos.get('size', 0), datos.get('storageSize', 0)
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--muestra', type=int, default=2000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+
+    db = mongo.db
+    en_linea = db[f'{PREFIJO}_en_linea']
+    separada = db[f'{PREFIJO}_separada']
+    textos = AlmacenTextos(db, separada.name)
+
+    try:
+        print(f"📥 Copiando {args.muestra} documentos...")
+        numeros = [doc['numero'] for doc in mongo.coll.aggregate([{'$sample': {'size': args.muestra}},
+                                                                   {'$project': {'numero': 1}}])]
+        documentos = []
+        for i in range(0, len(numeros), 200):
+            documentos.extend(mongo.obtener_documentos_por_numeros(numeros[i:i + 200]))
+        for doc in documentos:
+            doc.pop('_id', None)
+            for campo in ('texto_externo', 'texto_preview'):
+                doc.pop(campo, None)
+
+        en_linea.insert_many([dict(doc) for doc in documentos])
+        separados = [separar_texto(doc) for doc in documentos]
+        compresion = textos.guardar_muchos((doc['numero'], texto) for doc, texto in separados if texto)
+        separada.insert_many([doc for doc, _ in separados])
+        for coleccion in (en_linea, separada):
+            asegurar_indices(coleccion, INDICES_DOCUMENTOS)
+        asegurar_indices(textos.coll, INDICES_TEXTOS)
+
+        ram_linea, disco_linea = estadisticas(db, en_linea.name)
+        ram_separada, disco_separada = estadisticas(db, separada.name)
+        ram_textos, disco_textos = estadisticas(db, textos.coll.name)
+
+        lector = Mongo_DB.__new__(Mongo_DB)
+        lector.client, lector.db, lector.coll = mongo.client, db, separada
+
+        pipeline = [{'$group': {'_id': '$metadatos.categoria', 'total': {'$sum': 1},
+                                'bytes': {'$sum': '$tamano_bytes'}}}]
+        muestra_detalle = numeros[:args.repeticiones] or [0]
+        consultas = {
+            'listado (20, por fecha)': (
+                lambda: list(en_linea.find().sort('fecha_descarga', -1).limit(20)),
+                lambda: list(separada.find().sort('fecha_descarga', -1).limit(20))),
+            'recorrido completo': (
+                lambda: sum(1 for _ in en_linea.find({}, batch_size=500)),
+                lambda: sum(1 for _ in separada.find({}, batch_size=500))),
+            'agregación por categoría': (
+                lambda: list(en_linea.aggregate(pipeline)),
+                lambda: list(separada.aggregate(pipeline))),
+            'detalle con texto': (
+                lambda: [en_linea.find_one({'numero': numero}) for numero in muestra_detalle],
+                lambda: [lector.obtener_documento_por_numero(numero) for numero in muestra_detalle]),
+        }
+
+        mb = 1024 * 1024
+        print("=" * 70)
+        print(f"BENCHMARK DE TEXTOS ({len(documentos)} documentos, codec {textos.codec})")
+        print("=" * 70)
+        print(f"Texto:                 {compresion['bytes_original'] / mb:.1f} MB → "
+              f"{compresion['bytes_comprimido'] / mb:.1f} MB "
+              f"({compresion['bytes_original'] / max(compresion['bytes_comprimido'], 1):.1f}x)")
+        print(f"RAM colección ppal.:   {ram_linea / mb:.1f} MB → {ram_separada / mb:.1f} MB "
+              f"(textos aparte: {ram_textos / mb:.1f} MB)")
+        print(f"Disco total:           {disco_linea / mb:.1f} MB → {(disco_separada + disco_textos) / mb:.1f} MB")
+        print(f"\n{'Consulta':<28} {'en línea ms':>12} {'separada ms':>12}")
+        for nombre, (linea, separado) in consultas.items():
+            print(f"{nombre:<28} {medir(linea, args.repeticiones):>12.2f} {medir(separado, args.repeticiones):>12.2f}")
+        print("=" * 70)
+    finally:
+        for coleccion in (en_linea, separada, textos.coll):
+            coleccion.drop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark del índice de similitud: recall@k del índice IVF frente a la
+búsqueda exacta (fuerza bruta) y latencia de ambas, para varios valores de
+n_sondas (listas revisadas por consulta).
+
+Uso:
+    python scripts/benchmark_vectores.py [--directorio data/vectores] [--consultas 200] [--k 10]
+    python scripts/benchmark_vectores.py --sinteticos 50000 [--dimensiones 256]
+
+Sin --sinteticos se usa el almacén generado con scripts/construir_vectores.py.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.vectores import (VECTORES_DIR, AlmacenVectores, IndiceIVF, buscar_exacto,
+                              normalizar_filas)
+
+
+def matriz_sintetica(documentos, dimensiones, temas=200, semilla=7):
+    """Vectores agrupados en temas, como los de un corpus real."""
+    rng = np.random.default_rng(semilla)
+    centros = normalizar_filas(rng.standard_normal((temas, dimensiones)))
+    asignacion = rng.integers(0, temas, documentos)
+    ruido = rng.standard_normal((documentos, dimensiones)).astype(np.float32) * 0.08
+    return normalizar_filas(centros[asignacion] + ruido)
+
+
+def milisegundos(tiempos):
+    tiempos = sorted(tiempos)
+    return statistics.mean(tiempos) * 1000, tiempos[int(len(tiempos) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directorio', default=VECTORES_DIR)
+    parser.add_argument('--sinteticos', type=int, default=0)
+    parser.add_argument('--dimensiones', type=int, default=256)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--sondas', default='1,2,4,8,16,32')
+    args = parser.parse_args()
+
+    if args.sinteticos:
+        matriz = matriz_sintetica(args.sinteticos, args.dimensiones)
+        inicio = time.perf_counter()
+        indice = IndiceIVF.construir(matriz)
+        construccion = time.perf_counter() - inicio
+        origen = f"sintéticos ({args.sinteticos} x {args.dimensiones})"
+    else:
+        almacen = AlmacenVectores(args.directorio)
+        if not almacen.existe():
+            print("❌ No hay almacén de vectores. Ejecuta scripts/construir_vectores.py o usa --sinteticos")
+            sys.exit(1)
+        version = almacen.version()
+        _, matriz, meta = almacen.cargar(version)
+        indice = IndiceIVF.cargar(almacen.ruta('ivf.npz', version))
+        construccion = None
+        origen = f"{os.path.abspath(args.directorio)} ({meta['documentos']} x {meta['dimensiones']})"
+
+    rng = np.random.default_rng(1)
+    filas = rng.choice(len(matriz), min(args.consultas, len(matriz)), replace=False)
+    consultas = np.asarray(matriz[filas])
+
+    exactos, tiempos_exactos = [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        resultado, _ = buscar_exacto(matriz, consulta, args.k)
+        tiempos_exactos.append(time.perf_counter() - inicio)
+        exactos.append(set(resultado.tolist()))
+
+    print("=" * 70)
+    print(f"BENCHMARK DE SIMILITUD: {origen}")
+    print("=" * 70)
+    print(f"Listas IVF:   {len(indice.centroides)}")
+    if construccion is not None:
+        print(f"Construcción: {construccion:.2f}s")
+    media, p95 = milisegundos(tiempos_exactos)
+    print(f"\n{'Método':<18} {'recall@' + str(args.k):>10} {'media ms':>10} {'p95 ms':>10}")
+    print(f"{'fuerza bruta':<18} {1.0:>10.3f} {media:>10.2f} {p95:>10.2f}")
+
+    for sondas in (int(valor) for valor in args.sondas.split(',')):
+        aciertos, tiempos = 0, []
+        for consulta, esperado in zip(consultas, exactos):
+            inicio = time.perf_counter()
+            resultado, _ = indice.buscar(matriz, consulta, args.k, sondas)
+            tiempos.append(time.perf_counter() - inicio)
+            aciertos += len(esperado & set(resultado.tolist()))
+        media, p95 = milisegundos(tiempos)
+        print(f"{'IVF sondas=' + str(sondas):<18} {aciertos / (len(consultas) * args.k):>10.3f} "
+              f"{media:>10.2f} {p95:>10.2f}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
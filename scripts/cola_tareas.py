@@ -0,0 +1,173 @@
+"""
+Administra y ejecuta la cola persistente de tareas de ingesta (colección
+`cola_tareas` en MongoDB).
+
+Las cargas (cargar_documentos_a_bd.py, scripts/procesar_textos.py) encolan
+aquí los documentos cuya extracción de texto o indexación falló. Los
+trabajadores arriendan tareas por COLA_ARRIENDO_SEGUNDOS y lo renuevan
+mientras la tarea corre; si un trabajador cae, la tarea vuelve a la cola al
+vencer el arriendo (o queda descartada si era su último intento). Cada fallo se
+reintenta con backoff exponencial y al agotar COLA_MAX_INTENTOS la tarea
+queda `descartada` hasta reencolarla. Se pueden correr varios trabajadores
+(hilos, procesos o máquinas) sobre la misma cola.
+
+Uso:
+    python scripts/cola_tareas.py estado
+    python scripts/cola_tareas.py listar [--estado descartada] [--tipo indexar] [--limite 20]
+    python scripts/cola_tareas.py trabajar [--hilos 4] [--tipos extraer_texto,indexar] [--hasta-vaciar]
+    python scripts/cola_tareas.py encolar --tipo extraer_texto (--numeros 1,2,3 | --sin-texto | --todos)
+    python scripts/cola_tareas.py reencolar [--estado descartada] [--tipo indexar] [--numeros 1,2]
+    python scripts/cola_tareas.py purgar [--estado completada] [--dias 7]
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.cola_tareas import COMPLETADA, DESCARTADA, ESTADOS, ColaTareas, TrabajadorCola
+from helpers.mongo_db import Mongo_DB
+from helpers.tareas_ingesta import EXTRAER_TEXTO, TIPOS_TAREA, crear_manejadores
+
+load_dotenv()
+
+
+def _numeros(valor):
+    return [int(numero) for numero in valor.split(',') if numero.strip()] if valor else None
+
+
+def mostrar_estado(cola):
+    resumen = cola.resumen()
+    print("=" * 70)
+    print("COLA DE TAREAS")
+    print("=" * 70)
+    if not resumen:
+        print("(vacía)")
+        return
+    print(f"{'tipo':<16}" + ''.join(f"{estado:>13}" for estado in ESTADOS))
+    for tipo, conteos in sorted(resumen.items()):
+        print(f"{tipo:<16}" + ''.join(f"{conteos.get(estado, 0):>13}" for estado in ESTADOS))
+
+
+def listar(cola, args):
+    tareas = cola.listar(args.estado, args.tipo, args.limite)
+    for tarea in tareas:
+        print(f"#{tarea['numero']:<7} {tarea['tipo']:<14} {tarea['estado']:<11} intentos {tarea.get('intentos', 0)}"
+              f"/{tarea.get('max_intentos', '-')}  {str(tarea.get('actualizada_en', ''))[:19]}")
+        if tarea.get('ultimo_error'):
+            print(f"         └ {tarea['ultimo_error'][:150]}")
+    print(f"\n{len(tareas)} tareas")
+
+
+def trabajar(mongo, cola, args):
+    elastic = None
+    if not args.sin_elastic:
+        from helpers.elasticsearch import ElasticSearch
+        elastic = ElasticSearch(os.getenv('ELASTIC_CLOUD_URL'), os.getenv('ELASTIC_API_KEY'))
+        if not elastic.probar_conexion():
+            print("⚠ ElasticSearch no disponible: las tareas de indexación quedan en la cola")
+            elastic = None
+    sqlite = None
+    if os.getenv('MOTOR_BUSQUEDA', 'elasticsearch').lower() == 'sqlite':
+        from helpers.sqlite_search import SQLITE_SEARCH_PATH, SQLiteSearch
+        sqlite = SQLiteSearch(SQLITE_SEARCH_PATH)
+
+    manejadores = crear_manejadores(mongo, cola, elastic, sqlite).manejadores()
+    if args.tipos:
+        manejadores = {tipo: manejador for tipo, manejador in manejadores.items() if tipo in args.tipos.split(',')}
+    if not manejadores:
+        print("❌ No hay tipos de tarea que este trabajador pueda ejecutar")
+        sys.exit(1)
+
+    trabajador = TrabajadorCola(cola, manejadores, hilos=args.hilos)
+    print(f"✓ Trabajador {trabajador.identificador} ({args.hilos} hilos): {', '.join(manejadores)}")
+    try:
+        estadisticas = trabajador.ejecutar(hasta_vaciar=args.hasta_vaciar)
+    except KeyboardInterrupt:
+        # Las tareas en curso quedan arrendadas y vuelven a la cola al vencer el arriendo
+        print("\n⚠ Interrumpido: deteniendo trabajador...")
+        trabajador.detener()
+        estadisticas = dict(trabajador.estadisticas)
+    print(f"✓ Completadas: {estadisticas['completadas']} | Reintentos programados: {estadisticas['reintentos']} | "
+          f"Descartadas: {estadisticas['descartadas']}")
+    mostrar_estado(cola)
+
+
+def encolar(mongo, cola, args):
+    if args.numeros:
+        numeros = _numeros(args.numeros)
+    elif args.sin_texto:
+        filtro = {'texto_externo': {'$ne': True}, '$or': [{'texto_contenido': {'$in': ['', None]}},
+                                                          {'texto_contenido': {'$exists': False}}]}
+        numeros = [doc['numero'] for doc in mongo.coll.find(filtro, {'_id': 0, 'numero': 1})]
+    elif args.todos:
+        numeros = [doc['numero'] for doc in mongo.coll.find({}, {'_id': 0, 'numero': 1})]
+    else:
+        print("❌ Indica --numeros, --sin-texto o --todos")
+        sys.exit(1)
+    encoladas = cola.encolar_muchos(args.tipo, numeros)
+    print(f"✓ {encoladas} tareas '{args.tipo}' encoladas ({len(numeros) - encoladas} ya estaban en proceso)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comandos.add_parser('estado', help='Conteo por tipo y estado')
+
+    p_listar = comandos.add_parser('listar', help='Tareas con su último error')
+    p_listar.add_argument('--estado', choices=ESTADOS)
+    p_listar.add_argument('--tipo', choices=TIPOS_TAREA)
+    p_listar.add_argument('--limite', type=int, default=20)
+
+    p_trabajar = comandos.add_parser('trabajar', help='Ejecutar tareas')
+    p_trabajar.add_argument('--hilos', type=int, default=4)
+    p_trabajar.add_argument('--tipos', help='Tipos separados por comas (defecto: todos)')
+    p_trabajar.add_argument('--hasta-vaciar', action='store_true', help='Terminar cuando no queden tareas')
+    p_trabajar.add_argument('--sin-elastic', action='store_true', help='No indexar en ElasticSearch')
+
+    p_encolar = comandos.add_parser('encolar', help='Encolar documentos')
+    p_encolar.add_argument('--tipo', choices=TIPOS_TAREA, default=EXTRAER_TEXTO)
+    p_encolar.add_argument('--numeros', help='Números separados por comas')
+    p_encolar.add_argument('--sin-texto', action='store_true', help='Documentos sin texto extraído')
+    p_encolar.add_argument('--todos', action='store_true')
+
+    p_reencolar = comandos.add_parser('reencolar', help='Devolver tareas a pendiente')
+    p_reencolar.add_argument('--estado', choices=ESTADOS, default=DESCARTADA)
+    p_reencolar.add_argument('--tipo', choices=TIPOS_TAREA)
+    p_reencolar.add_argument('--numeros', help='Números separados por comas')
+
+    p_purgar = comandos.add_parser('purgar', help='Eliminar tareas antiguas')
+    p_purgar.add_argument('--estado', choices=ESTADOS, default=COMPLETADA)
+    p_purgar.add_argument('--dias', type=float, default=7)
+
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+    cola = ColaTareas(mongo.db)
+    cola.asegurar_indices()
+
+    if args.comando == 'estado':
+        mostrar_estado(cola)
+    elif args.comando == 'listar':
+        listar(cola, args)
+    elif args.comando == 'trabajar':
+        trabajar(mongo, cola, args)
+    elif args.comando == 'encolar':
+        encolar(mongo, cola, args)
+    elif args.comando == 'reencolar':
+        total = cola.reencolar(args.estado, args.tipo, _numeros(args.numeros))
+        print(f"✓ {total} tareas devueltas a pendiente")
+    elif args.comando == 'purgar':
+        total = cola.purgar(args.estado, args.dias)
+        print(f"✓ {total} tareas eliminadas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Construye el almacén de embeddings para /api/documento/<numero>/similares.
+
+Ajusta el codificador TF-IDF + SVD con una muestra aleatoria de la colección
+(o reutiliza el existente) y recalcula los vectores de todos los documentos
+por lotes; al final reconstruye el índice IVF. Los documentos eliminados de
+MongoDB y los duplicados (`duplicado_de`) no quedan en el almacén.
+
+Uso:
+    python scripts/construir_vectores.py [--reajustar] [--muestra 5000] [--directorio data/vectores]
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.deduplicacion import FILTRO_CANONICOS
+from helpers.mongo_db import Mongo_DB
+from helpers.vectores import (VECTORES_DIR, AlmacenVectores, ajustar_codificador,
+                              codificar_documentos)
+
+load_dotenv()
+
+CAMPOS = ['numero', 'titulo', 'texto_contenido']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directorio', default=VECTORES_DIR)
+    parser.add_argument('--reajustar', action='store_true', help='Ajustar de nuevo el codificador')
+    parser.add_argument('--muestra', type=int, default=5000, help='Documentos para ajustar el codificador')
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+
+    almacen = AlmacenVectores(args.directorio)
+    inicio = time.perf_counter()
+
+    if args.reajustar or not almacen.existe():
+        print(f"📐 Ajustando codificador con {args.muestra} documentos...")
+        # Incluye los documentos cuyo texto está en el almacén separado (texto_longitud)
+        muestra = mongo.muestra_documentos(args.muestra, FILTRO_CANONICOS, CAMPOS)
+        codificador = ajustar_codificador(muestra)
+    else:
+        codificador = almacen.codificador()
+    ajuste = time.perf_counter() - inicio
+
+    print("🔢 Calculando embeddings...")
+    numeros, matriz = codificar_documentos(codificador, mongo.iterar_documentos(FILTRO_CANONICOS, CAMPOS))
+    almacen.escribir(numeros, matriz, codificador)
+
+    print("=" * 70)
+    print(f"ALMACÉN DE VECTORES: {os.path.abspath(args.directorio)}")
+    print("=" * 70)
+    print(f"Documentos:   {len(numeros)}")
+    print(f"Dimensiones:  {codificador.dimensiones}")
+    print(f"Tamaño:       {matriz.nbytes / 1024 / 1024:.1f} MB")
+    print(f"Ajuste:       {ajuste:.1f}s")
+    print(f"Total:        {time.perf_counter() - inicio:.1f}s")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
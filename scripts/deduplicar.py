@@ -0,0 +1,107 @@
+"""
+Detecta documentos casi duplicados en el corpus ya cargado en MongoDB.
+
+Calcula firmas MinHash de `texto_contenido` (shingles de 5 palabras), busca
+candidatos con LSH por bandas y enlaza cada duplicado a su documento
+canónico (el de menor número) con `duplicado_de`. Los índices de búsqueda y
+los resúmenes IA solo usan canónicos: después de marcar, ejecutar
+scripts/indexar_sqlite.py o scripts/construir_vectores.py los excluye.
+
+Uso:
+    python scripts/deduplicar.py [--umbral 0.85] [--aplicar] [--grupos 10]
+
+Sin --aplicar solo se muestra el reporte (no se modifica MongoDB).
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo import UpdateMany
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.deduplicacion import COLECCION_FIRMAS, DEDUP_UMBRAL, Deduplicador, guardar_firmas
+from helpers.mongo_db import Mongo_DB
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--umbral', type=float, default=DEDUP_UMBRAL, help='Jaccard estimada mínima')
+    parser.add_argument('--aplicar', action='store_true', help='Guardar duplicado_de en MongoDB')
+    parser.add_argument('--grupos', type=int, default=10, help='Grupos de duplicados a listar')
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    deduplicador = Deduplicador(umbral=args.umbral)
+    documentos = mongo.iterar_documentos({}, ['numero', 'titulo', 'texto_contenido', 'tamano_bytes', 'duplicado_de'],
+                                         sort_config=[('numero', 1)])
+
+    titulos = {}
+    anteriores = set()
+
+    def recorrer():
+        for documento in documentos:
+            titulos[documento['numero']] = documento.get('titulo', '')
+            if documento.get('duplicado_de'):
+                anteriores.add(documento['numero'])
+            yield documento
+
+    reporte = deduplicador.procesar(recorrer())
+    duracion = time.perf_counter() - inicio
+
+    print("=" * 70)
+    print(f"DEDUPLICACIÓN (umbral {args.umbral})")
+    print("=" * 70)
+    print(f"Documentos:        {reporte['documentos']}")
+    print(f"Canónicos:         {reporte['canonicos']}")
+    print(f"Duplicados:        {reporte['duplicados']} ({reporte['exactos']} exactos)")
+    print(f"Sin texto:         {reporte['sin_texto']}")
+    print(f"Texto duplicado:   {reporte['bytes_texto'] / 1024 / 1024:.1f} MB")
+    print(f"Archivos:          {reporte['bytes_archivos'] / 1024 / 1024:.1f} MB")
+    print(f"Tiempo:            {duracion:.1f}s")
+
+    grupos = sorted(reporte['grupos'].items(), key=lambda par: -len(par[1]))
+    if grupos:
+        print(f"\nGrupos más grandes:")
+        for canonico, duplicados in grupos[:args.grupos]:
+            print(f"  #{canonico} {titulos.get(canonico, '')[:50]} ← {len(duplicados)}: "
+                  f"{', '.join(str(numero) for numero in duplicados[:8])}")
+
+    if args.aplicar:
+        ahora = datetime.now()
+        operaciones = [UpdateMany({'numero': {'$in': duplicados}},
+                                  {'$set': {'duplicado_de': canonico, 'actualizado_en': ahora},
+                                   '$inc': {'revision': 1}})
+                       for canonico, duplicados in reporte['grupos'].items()]
+        # Los que dejaron de ser duplicados (p. ej. con otro umbral) vuelven a ser canónicos
+        duplicados_actuales = {numero for lista in reporte['grupos'].values() for numero in lista}
+        liberados = sorted(anteriores - duplicados_actuales)
+        if liberados:
+            operaciones.append(UpdateMany({'numero': {'$in': liberados}},
+                                          {'$unset': {'duplicado_de': '', 'similitud_duplicado': ''},
+                                           '$set': {'actualizado_en': ahora}, '$inc': {'revision': 1}}))
+        if operaciones:
+            mongo.coll.bulk_write(operaciones, ordered=False)
+            mongo.incrementar_version_corpus()
+        firmas = mongo.db[COLECCION_FIRMAS]
+        firmas.delete_many({})
+        guardar_firmas(firmas, deduplicador)
+        print(f"\n✓ Enlaces guardados ({len(duplicados_actuales)} duplicados, {len(liberados)} liberados)")
+    else:
+        print("\n(sin --aplicar no se modificó MongoDB)")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
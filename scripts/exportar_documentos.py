@@ -0,0 +1,86 @@
+"""
+Exporta documentos de MongoDB a NDJSON, CSV o Parquet en streaming.
+
+Usa los mismos filtros que /api/buscar y recorre el cursor por lotes, así
+que la memoria es constante aunque se exporte la colección completa
+(alternativa a `pd.DataFrame(list(cursor))` en los notebooks).
+
+Uso:
+    python scripts/exportar_documentos.py --formato parquet --salida documentos.parquet
+    python scripts/exportar_documentos.py --formato csv --categoria Resoluciones --campos numero,titulo,fecha_descarga
+    python scripts/exportar_documentos.py --query disciplinario --limite 1000 > resultados.ndjson
+
+Para leer el resultado en pandas sin materializar el cursor:
+    pd.read_parquet('documentos.parquet')  /  pd.read_json('resultados.ndjson', lines=True, chunksize=10000)
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.exportacion import CAMPOS_EXPORTACION, FORMATOS, exportar, parsear_campos
+from helpers.mongo_db import Mongo_DB
+
+load_dotenv()
+
+ORDENES = {
+    'fecha_desc': [('fecha_descarga', -1)],
+    'fecha_asc': [('fecha_descarga', 1)],
+    'titulo': [('titulo', 1)],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formato', choices=list(FORMATOS), default='ndjson')
+    parser.add_argument('--query', default='')
+    parser.add_argument('--categoria', default='')
+    parser.add_argument('--tipo', default='')
+    parser.add_argument('--orden', choices=list(ORDENES), default='fecha_desc')
+    parser.add_argument('--campos', default='', help='Lista separada por comas (notación de puntos para anidados)')
+    parser.add_argument('--limite', type=int, default=0, help='Máximo de documentos (0 = sin límite)')
+    parser.add_argument('--lote', type=int, default=500, help='Documentos por lote del cursor')
+    parser.add_argument('--salida', default='-', help='Archivo de salida (- para stdout)')
+    args = parser.parse_args()
+
+    try:
+        campos = parsear_campos(args.campos)
+    except ValueError as e:
+        parser.error(f"--campos inválido: {e}")
+    if not campos and args.formato != 'ndjson':
+        campos = CAMPOS_EXPORTACION
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    filtro = mongo.construir_filtro(args.query, args.categoria, args.tipo)
+    documentos = mongo.iterar_documentos(filtro, campos or None, ORDENES[args.orden], args.limite, args.lote)
+
+    # Contar los documentos al vuelo sin materializar el cursor
+    contador = {'documentos': 0}
+
+    def contar(iterable):
+        for documento in iterable:
+            contador['documentos'] += 1
+            yield documento
+
+    inicio = time.perf_counter()
+    escritos = 0
+    salida = sys.stdout.buffer if args.salida == '-' else open(args.salida, 'wb')
+    try:
+        for bloque in exportar(contar(documentos), args.formato, campos):
+            salida.write(bloque)
+            escritos += len(bloque)
+    finally:
+        if salida is not sys.stdout.buffer:
+            salida.close()
+
+    print(f"✓ {contador['documentos']} documentos exportados ({escritos / 1024 / 1024:.2f} MB) "
+          f"en {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
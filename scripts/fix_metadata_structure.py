@@ -1,6 +1,10 @@
-
 import os
+import sys
 from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.migraciones import EjecutorMigraciones
 from helpers.mongo_db import Mongo_DB
 
 load_dotenv()
@@ -9,54 +13,30 @@ MONGO_URI = os.getenv('MONGO_URI')
 MONGO_DB_NAME = os.getenv('MONGO_DB')
 MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 
+# Kept for compatibility: this is now migration 001 (see scripts/migrar.py)
 def fix_metadata():
     print("=" * 50)
     print("FIXING METADATA STRUCTURE")
     print("=" * 50)
 
     mongo = Mongo_DB(MONGO_URI, MONGO_DB_NAME, MONGO_COLLECTION)
-    collection = mongo.coll
-    
-    # Find documents without 'metadatos' field
-    query = {"metadatos": {"$exists": False}}
-    count = collection.count_documents(query)
-    
+    ejecutor = EjecutorMigraciones(mongo.db, mongo.collection_name)
+    migracion = ejecutor.obtener('001')
+
+    count = mongo.coll.count_documents(migracion.filtro)
     print(f"Documents missing 'metadatos': {count}")
-    
+
     if count == 0:
         print("All documents have 'metadatos'. Nothing to do.")
         return
 
-    cursor = collection.find(query)
-    updated = 0
-    
-    for doc in cursor:
-        doc_id = doc['_id']
-        titulo = doc.get('titulo', 'Unknown')
-        
-        # Extract fields to move to metadatos
-        categoria = doc.get('categoria', 'Otros Documentos')
-        # Some docs might have 'año' or other fields if they came from other sources, 
-        # but our flat script only added 'categoria'.
-        
-        metadatos = {
-            "categoria": categoria,
-            "año": None # Default
-        }
-        
-        # Update the document
-        # Set metadatos AND unset the flat 'categoria' field to clean up
-        collection.update_one(
-            {'_id': doc_id},
-            {
-                '$set': {'metadatos': metadatos},
-                '$unset': {'categoria': ""} 
-            }
-        )
-        updated += 1
-        print(f"Fixed: {titulo[:30]}...")
-
-    print(f"\nSuccessfully updated {updated} documents.")
+    # Batched bulk writes with a resumable checkpoint instead of one update_one per document.
+    # Documents loaded after a previous run need the migration again; a failed run resumes.
+    if any(registro['version'] == '001' and registro['estado'] == 'aplicada' for registro in ejecutor.estado()):
+        ejecutor.reiniciar('001')
+    resultado = ejecutor.aplicar(migracion)
+
+    print(f"\nSuccessfully updated {resultado['modificados']} documents.")
 
 if __name__ == "__main__":
     fix_metadata()
@@ -0,0 +1,58 @@
+"""
+Genera o actualiza el snapshot Parquet del corpus para los notebooks.
+
+El snapshot se particiona por año (SNAPSHOT_DIR/anio=AAAA/) y guarda un
+manifest con la huella de cada partición: en cada ejecución solo se
+reescriben las particiones cuyos documentos cambiaron. El texto completo
+no sale de MongoDB; se exporta su longitud.
+
+Uso:
+    python scripts/generar_snapshot.py [--directorio data/snapshot] [--completo]
+
+En el notebook:
+    from helpers.snapshot import cargar_dataframe
+    df = cargar_dataframe()
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.mongo_db import Mongo_DB
+from helpers.snapshot import SNAPSHOT_DIR, generar_snapshot
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directorio', default=SNAPSHOT_DIR)
+    parser.add_argument('--completo', action='store_true', help='Reescribir todas las particiones')
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    resultado = generar_snapshot(mongo.coll, args.directorio, args.completo)
+
+    print("=" * 70)
+    print(f"SNAPSHOT: {os.path.abspath(args.directorio)}")
+    print("=" * 70)
+    print(f"Documentos:            {resultado['documentos']}")
+    print(f"Particiones reescritas: {', '.join(resultado['reescritas']) or '-'}")
+    print(f"Sin cambios:           {', '.join(resultado['sin_cambios']) or '-'}")
+    print(f"Eliminadas:            {', '.join(resultado['eliminadas']) or '-'}")
+    print(f"Tiempo:                {time.perf_counter() - inicio:.1f}s")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
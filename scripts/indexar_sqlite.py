@@ -0,0 +1,63 @@
+"""
+Sincroniza el índice SQLite FTS5 (MOTOR_BUSQUEDA=sqlite) con MongoDB.
+
+Recorre la colección por lotes y reindexa solo los documentos cuyo contenido
+cambió desde la última ejecución; los documentos que ya no existen en
+MongoDB o que se marcaron como duplicados se eliminan del índice.
+
+Uso:
+    python scripts/indexar_sqlite.py [--ruta data/busqueda.sqlite3]
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.deduplicacion import FILTRO_CANONICOS
+from helpers.mongo_db import Mongo_DB
+from helpers.sqlite_search import SQLITE_SEARCH_PATH, SQLiteSearch
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ruta', default=SQLITE_SEARCH_PATH)
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+
+    indice = SQLiteSearch(args.ruta)
+    inicio = time.perf_counter()
+    vistos = set()
+
+    def documentos():
+        for doc in mongo.iterar_documentos(FILTRO_CANONICOS):
+            vistos.add(doc.get('numero'))
+            yield doc
+
+    resumen = indice.indexar_documentos(documentos())
+    eliminados = indice.eliminar_documentos(indice.numeros_indexados() - vistos)
+    indice.optimizar()
+
+    print("=" * 70)
+    print(f"ÍNDICE SQLITE: {os.path.abspath(args.ruta)}")
+    print("=" * 70)
+    print(f"Nuevos:       {resumen['nuevos']}")
+    print(f"Actualizados: {resumen['actualizados']}")
+    print(f"Sin cambios:  {resumen['sin_cambios']}")
+    print(f"Eliminados:   {eliminados}")
+    print(f"Tiempo:       {time.perf_counter() - inicio:.1f}s")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Aplica las migraciones de esquema declaradas en helpers/migraciones.py.
+
+Cada migración recorre su filtro por lotes con bulk_write (varios lotes en
+paralelo), guarda el último `_id` confirmado en la colección `migraciones`
+y al volver a ejecutarse continúa desde ahí. Las aplicadas quedan
+registradas y no se repiten.
+
+Uso:
+    python scripts/migrar.py estado
+    python scripts/migrar.py aplicar [--version 001 | --hasta 002] [--simular] [--lote 500] [--hilos 4]
+    python scripts/migrar.py reiniciar --version 001
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.migraciones import MIGRACION_HILOS, MIGRACION_LOTE, EjecutorMigraciones
+from helpers.mongo_db import Mongo_DB
+
+load_dotenv()
+
+
+def mostrar_estado(ejecutor):
+    print("=" * 70)
+    print("MIGRACIONES")
+    print("=" * 70)
+    for registro in ejecutor.estado():
+        detalle = ''
+        if registro.get('procesados'):
+            detalle = f" {registro['procesados']} procesados, {registro.get('modificados', 0)} modificados"
+        if registro.get('aplicada_en'):
+            detalle += f" ({str(registro['aplicada_en'])[:19]}, {registro.get('segundos', 0)}s)"
+        print(f"{registro['version']}  {registro['estado']:<10} {registro['descripcion']}")
+        if detalle:
+            print(f"     └{detalle}")
+        if registro.get('error'):
+            print(f"     └ error: {registro['error'][:150]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comandos.add_parser('estado', help='Migraciones declaradas y su estado')
+
+    p_aplicar = comandos.add_parser('aplicar', help='Aplicar migraciones pendientes')
+    p_aplicar.add_argument('--version', help='Solo esta migración')
+    p_aplicar.add_argument('--hasta', help='Pendientes hasta esta versión (inclusive)')
+    p_aplicar.add_argument('--simular', action='store_true', help='Contar los documentos afectados sin escribir')
+    p_aplicar.add_argument('--lote', type=int, default=MIGRACION_LOTE)
+    p_aplicar.add_argument('--hilos', type=int, default=MIGRACION_HILOS)
+
+    p_reiniciar = comandos.add_parser('reiniciar', help='Olvidar el registro de una migración')
+    p_reiniciar.add_argument('--version', required=True)
+
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+    ejecutor = EjecutorMigraciones(mongo.db, mongo.collection_name,
+                                   lote=getattr(args, 'lote', MIGRACION_LOTE), hilos=getattr(args, 'hilos', MIGRACION_HILOS))
+
+    if args.comando == 'estado':
+        mostrar_estado(ejecutor)
+        return
+    if args.comando == 'reiniciar':
+        ejecutor.reiniciar(args.version)
+        print(f"✓ Migración {args.version} marcada como pendiente")
+        return
+
+    try:
+        migraciones = [ejecutor.obtener(args.version)] if args.version else ejecutor.pendientes(args.hasta)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        sys.exit(1)
+    if not migraciones:
+        print("✓ No hay migraciones pendientes")
+        return
+
+    for migracion in migraciones:
+        print(f"\n→ {migracion.version}: {migracion.descripcion}")
+        if args.simular:
+            simulacion = ejecutor.simular(migracion)
+            print(f"  {simulacion['coincidentes']} documentos en el filtro, {simulacion['cambiarian']} cambiarían")
+            for ejemplo in simulacion['ejemplos']:
+                print(f"  ej. {ejemplo['_id']}: {ejemplo['cambio']}")
+            continue
+        try:
+            resultado = ejecutor.aplicar(migracion)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"❌ Falló: {e}\n  Al volver a ejecutar continúa desde el último lote confirmado")
+            sys.exit(1)
+        print(f"✓ {resultado.get('procesados', 0)} procesados, {resultado.get('modificados', 0)} modificados"
+              f" en {resultado.get('segundos', 0)}s")
+
+
+if __name__ == '__main__':
+    main()
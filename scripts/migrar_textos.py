@@ -0,0 +1,106 @@
+"""
+Mueve el texto completo de los documentos al almacén comprimido.
+
+Por lotes: guarda `texto_contenido` comprimido (zstd si está instalado
+zstandard, si no zlib) en '<colección>_textos' y lo reemplaza en la colección
+principal por `texto_preview`, `texto_longitud` y `texto_externo`. La
+lectura es transparente (Mongo_DB descomprime al pedir el detalle), así que
+la app puede seguir en línea durante la migración.
+
+Uso:
+    python scripts/migrar_textos.py [--lote 200] [--revertir]
+
+Con --revertir el texto vuelve a la colección principal.
+Tras migrar, `compact` en la colección principal devuelve el espacio al disco.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.almacen_textos import campos_cuerpo
+from helpers.indices import INDICES_TEXTOS, asegurar_indices
+from helpers.mongo_db import Mongo_DB
+
+load_dotenv()
+
+
+def separar(mongo, tamano_lote):
+    asegurar_indices(mongo.textos.coll, INDICES_TEXTOS)
+    filtro = {'texto_contenido': {'$type': 'string', '$ne': ''}}
+    resumen = {'documentos': 0, 'bytes_original': 0, 'bytes_comprimido': 0}
+    while True:
+        # Cada lote vuelve a consultar: los ya migrados dejan de cumplir el filtro
+        lote = list(mongo.coll.find(filtro, {'numero': 1, 'texto_contenido': 1}).limit(tamano_lote))
+        if not lote:
+            return resumen
+        parcial = mongo.textos.guardar_muchos((doc['numero'], doc['texto_contenido']) for doc in lote)
+        ahora = datetime.now()
+        mongo.coll.bulk_write([
+            UpdateOne({'_id': doc['_id']}, {'$set': dict(campos_cuerpo(doc['texto_contenido']), actualizado_en=ahora),
+                                           '$unset': {'texto_contenido': ''},
+                                           '$inc': {'revision': 1}})
+            for doc in lote
+        ], ordered=False)
+        for clave in resumen:
+            resumen[clave] += parcial[clave]
+        print(f"  {resumen['documentos']} documentos migrados...")
+
+
+def revertir(mongo, tamano_lote):
+    resumen = {'documentos': 0, 'bytes_original': 0, 'bytes_comprimido': 0}
+    while True:
+        lote = list(mongo.coll.find({'texto_externo': True}, {'numero': 1}).limit(tamano_lote))
+        if not lote:
+            return resumen
+        textos = mongo.textos.obtener_muchos([doc['numero'] for doc in lote])
+        ahora = datetime.now()
+        mongo.coll.bulk_write([
+            UpdateOne({'_id': doc['_id']}, {'$set': {'texto_contenido': textos.get(doc['numero'], ''),
+                                                     'actualizado_en': ahora},
+                                           '$unset': {'texto_externo': '', 'texto_preview': ''},
+                                           '$inc': {'revision': 1}})
+            for doc in lote
+        ], ordered=False)
+        mongo.textos.coll.delete_many({'numero': {'$in': list(textos)}})
+        resumen['documentos'] += len(lote)
+        print(f"  {resumen['documentos']} documentos restaurados...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lote', type=int, default=200)
+    parser.add_argument('--revertir', action='store_true', help='Devolver el texto a la colección principal')
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    resumen = (revertir if args.revertir else separar)(mongo, args.lote)
+    if resumen['documentos']:
+        mongo.incrementar_version_corpus()
+
+    print("=" * 70)
+    print(f"{'RESTAURACIÓN' if args.revertir else 'MIGRACIÓN'} DE TEXTOS: {mongo.coll.name} ↔ {mongo.textos.coll.name}")
+    print("=" * 70)
+    print(f"Documentos:   {resumen['documentos']}")
+    if not args.revertir and resumen['bytes_original']:
+        print(f"Texto:        {resumen['bytes_original'] / 1024 / 1024:.1f} MB → "
+              f"{resumen['bytes_comprimido'] / 1024 / 1024:.1f} MB "
+              f"({resumen['bytes_original'] / max(resumen['bytes_comprimido'], 1):.1f}x, {mongo.textos.codec})")
+    print(f"Tiempo:       {time.perf_counter() - inicio:.1f}s")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+"""
+Ingesta de punta a punta en una sola corriente: rastreo → descarga →
+extracción de texto → deduplicación → MongoDB → índices de búsqueda.
+
+Cada etapa corre con su propio pool de hilos y se comunica con la siguiente
+por una cola acotada: la descarga del documento 50 ocurre mientras se extrae
+el 40 y se indexa el 30, y si una etapa se atrasa su cola se llena y frena a
+las anteriores (backpressure) en lugar de acumular documentos en memoria.
+MongoDB y ElasticSearch reciben lotes; cada lote indexado queda buscable de
+inmediato.
+
+La carga es incremental: los documentos se actualizan por `numero` (los
+URLs ya cargados conservan su número) y el índice de ElasticSearch se
+actualiza sobre el alias activo. Al rastrear, un URL ya cargado vuelve a
+procesarse si el sitemap o la lista de SharePoint trae otro lastmod; el
+descubrimiento solo marca un documento como visto cuando llega a MongoDB. Para reconstruir todo desde cero sigue
+existiendo cargar_documentos_a_bd.py.
+
+Fuentes:
+    (por defecto)   rastrea el portal con ScraperDocumentosProcuraduria
+    --json RUTA     JSON de scraper_documentos_procuraduria.py (documentos_descargados
+                    o documentos_encontrados); --json ultimo usa el más reciente de uploads/
+
+Uso:
+    python scripts/pipeline_ingesta.py [--json RUTA|ultimo] [--objetivo 100]
+        [--descargas 4] [--extractores 4] [--procesos N] [--lote-mongo 100]
+        [--lote-indice 200] [--capacidad 64] [--reprocesar] [--sin-vectores]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cargar_documentos_a_bd import CargadorDocumentos, ultimo_metadatos_scraping
+from helpers.almacen_archivos import clave_documento
+from helpers.almacen_textos import TEXTOS_SEPARADOS, separar_texto
+from helpers.deduplicacion import (COLECCION_FIRMAS, FILTRO_CANONICOS, Deduplicador, cargar_firmas, es_canonico,
+                                   guardar_firmas)
+from helpers.indices import INDICES_DOCUMENTOS, INDICES_TEXTOS, asegurar_indices
+from helpers.mongo_db import reservar_numeros
+from helpers.pipeline import Etapa, MonitorProgreso, Pipeline
+from helpers.tareas_ingesta import EXTRAER_TEXTO
+from helpers.vectores import MAX_CARACTERES
+from helpers.web_scraper import ConjuntoVistos, DescargaOmitida, WebScraper, canonicalizar_url
+
+load_dotenv()
+
+
+class PipelineIngesta:
+    """
+    Etapas de la ingesta sobre las conexiones del cargador. Las funciones de
+    cada etapa son seguras entre hilos: los clientes de MongoDB y
+    ElasticSearch se comparten y cada hilo de descarga tiene su propia sesión HTTP.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.cargador = CargadorDocumentos()
+        self.mongo = self.cargador.mongo
+        self.almacen = self.cargador.archivos
+        self.funciones = self.cargador.funciones
+        self.elastic = None if args.sin_elastic else self.cargador.elastic
+        self.sqlite = None
+        self.deduplicador = Deduplicador()
+        self.procesos = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.para_vectores = []
+        self.rastreador = None
+        self.resumen = {
+            'nuevos': 0, 'actualizados': 0, 'omitidos': 0, 'sin_archivo': 0, 'descartados': 0, 'sin_texto': 0,
+            'duplicados': 0, 'docs_mongodb': 0, 'docs_elasticsearch': 0, 'errores_elasticsearch': 0,
+            'docs_sqlite': 0, 'docs_vectores': 0, 'error_vectores': None,
+            'segundos_primer_documento_mongodb': None, 'segundos_primer_documento_buscable': None
+        }
+        self.pipeline = None
+        self._reservados = iter(())
+
+    # ---------- Preparación ----------
+
+    def preparar(self) -> bool:
+        if not self.mongo.probar_conexion():
+            print("❌ No se pudo conectar a MongoDB")
+            return False
+        asegurar_indices(self.mongo.coll, INDICES_DOCUMENTOS)
+        asegurar_indices(self.mongo.textos.coll, INDICES_TEXTOS)
+        self.cargador.cola.asegurar_indices()
+
+        if self.elastic is not None:
+            try:
+                self.elastic.probar_conexion()
+                indice = self.elastic.asegurar_alias()
+                print(f"✓ ElasticSearch: alias '{self.elastic.alias}' → {indice}")
+            except Exception as e:
+                print(f"❌ ElasticSearch no disponible ({e}); usa --sin-elastic para cargar sin él")
+                return False
+
+        if os.getenv('MOTOR_BUSQUEDA', 'elasticsearch').lower() == 'sqlite':
+            from helpers.sqlite_search import SQLITE_SEARCH_PATH, SQLiteSearch
+            self.sqlite = SQLiteSearch(SQLITE_SEARCH_PATH)
+
+        firmas = cargar_firmas(self.mongo.db[COLECCION_FIRMAS], self.deduplicador)
+        print(f"✓ Firmas MinHash del corpus: {firmas}")
+
+        # Procesos para la extracción (PyPDF es CPU puro y el GIL limitaría a un núcleo)
+        if self.args.procesos > 0:
+            self.procesos = ProcessPoolExecutor(self.args.procesos, mp_context=multiprocessing.get_context('spawn'))
+        return True
+
+    def fuente(self):
+        """
+        Entrega {'numero', 'doc'} por cada documento de la fuente. Los URLs
+        ya cargados conservan su número y se omiten salvo que su lastmod haya
+        cambiado (o con --reprocesar); los nuevos reciben números del
+        contador atómico (reservar_numeros), compartido con las cargas del panel.
+        """
+        numeros = {}
+        # Los URLs se comparan en forma canónica: los cargados antes de canonicalizar conservan su número
+        for registro in self.mongo.coll.find({'url_original': {'$exists': True}},
+                                             {'_id': 0, 'numero': 1, 'url_original': 1, 'lastmod_origen': 1}):
+            if registro.get('url_original'):
+                numeros[canonicalizar_url(registro['url_original'])] = (registro['numero'],
+                                                                       registro.get('lastmod_origen'))
+
+        vistos = ConjuntoVistos()
+        for doc in self._documentos_fuente():
+            url = doc.get('url_original') or doc.get('url') or ''
+            if not url or not vistos.agregar(url):
+                continue
+            clave = canonicalizar_url(url)
+            lastmod = doc.get('lastmod')
+            if clave in numeros and not self.args.reprocesar and lastmod == numeros[clave][1]:
+                self.resumen['omitidos'] += 1
+                self._confirmar(url, lastmod)
+                continue
+            doc = {
+                'url_original': url,
+                'titulo': doc.get('titulo', 'Sin título'),
+                'tipo': doc.get('tipo', 'PDF'),
+                'archivo': doc.get('archivo', ''),
+                'ruta': doc.get('ruta', ''),
+                'tamano_bytes': doc.get('tamano_bytes', 0),
+                'lastmod': lastmod
+            }
+            if clave in numeros:
+                numero = numeros[clave][0]
+                self.resumen['actualizados'] += 1
+            else:
+                numero = self._reservar_numero()
+                self.resumen['nuevos'] += 1
+            yield {'numero': numero, 'doc': doc}
+
+    def _reservar_numero(self, bloque: int = 50) -> int:
+        """Siguiente número de un bloque reservado en el contador (una escritura cada `bloque` documentos)."""
+        numero = next(self._reservados, None)
+        if numero is None:
+            primero = reservar_numeros(self.mongo.db, self.mongo.collection_name, bloque)
+            self._reservados = iter(range(primero + 1, primero + bloque))
+            numero = primero
+        return numero
+
+    def _documentos_fuente(self):
+        if self.args.json:
+            ruta = ultimo_metadatos_scraping() if self.args.json == 'ultimo' else self.args.json
+            if not ruta or not os.path.exists(ruta):
+                raise FileNotFoundError(f"JSON de scraping no encontrado: {self.args.json}")
+            with open(ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            yield from datos.get('documentos_descargados') or datos.get('documentos_encontrados') or []
+            return
+
+        from scraper_documentos_procuraduria import ScraperDocumentosProcuraduria
+        self.rastreador = ScraperDocumentosProcuraduria(objetivo_documentos=self.args.objetivo,
+                                                        incremental=not self.args.reprocesar)
+        try:
+            yield from self.rastreador.iterar_documentos()
+        finally:
+            self.rastreador.scraper.cerrar_sesion()
+
+    def _confirmar(self, url: str, lastmod=None):
+        """El documento ya está en MongoDB: el descubrimiento deja de entregarlo mientras no cambie."""
+        if self.rastreador is not None:
+            self.rastreador.descubridor.confirmar(url, lastmod)
+
+    # ---------- Etapas ----------
+
+    def _scraper(self) -> WebScraper:
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = self._local.scraper = WebScraper(delay_between_requests=self.args.pausa)
+        return scraper
+
+    def descargar(self, elemento):
+        """El archivo va directo al almacén; si ya está (o hay copia local) no se descarga."""
+        numero, doc = elemento['numero'], elemento['doc']
+        clave = clave_documento(numero)
+        anterior = self.almacen.info(clave)
+        # Un URL con otro lastmod se vuelve a pedir (si el ETag no cambió, se reutiliza el archivo)
+        archivo = None if self.args.reprocesar or doc['lastmod'] else anterior
+        if archivo is None and doc['ruta'] and os.path.exists(doc['ruta']):
+            archivo = self.almacen.guardar_archivo(clave, doc['ruta'])
+        if archivo is None:
+            # Con --reprocesar, un archivo con el mismo ETag en el origen no se vuelve a bajar
+            nombre = doc['archivo'] or None
+            try:
+                archivo = self._scraper().descargar_a_almacen(doc['url_original'], self.almacen, clave, nombre,
+                                                              anterior=anterior)
+            except DescargaOmitida as e:
+                elemento['descartado'] = str(e)
+                with self._lock:
+                    self.resumen['descartados'] += 1
+        if archivo is None:
+            with self._lock:
+                self.resumen['sin_archivo'] += 1
+        elemento['archivo'] = archivo
+        return elemento
+
+    def extraer(self, elemento):
+        numero, doc, archivo = elemento['numero'], elemento['doc'], elemento['archivo']
+        texto = ''
+        if archivo:
+            extension = os.path.splitext(archivo.get('nombre') or '')[1] or f".{doc['tipo'].lower()}"
+            with self.almacen.copia_local(archivo['clave']) as ruta:
+                if self.procesos is not None:
+                    texto = self.procesos.submit(self.funciones.extraer_texto_archivo, ruta, extension).result()
+                else:
+                    texto = self.funciones.extraer_texto_archivo(ruta, extension)
+            doc['tamano_bytes'] = archivo['tamano']
+        if not texto:
+            with self._lock:
+                self.resumen['sin_texto'] += 1
+        documento = self.cargador.construir_documento(doc, numero, texto or '', archivo is not None, archivo)
+        if elemento.get('descartado'):
+            documento['descarga_descartada'] = elemento['descartado']
+        if doc['lastmod']:
+            documento['lastmod_origen'] = doc['lastmod']
+        return documento
+
+    def deduplicar(self, documento):
+        """Un solo hilo: el índice LSH no es seguro entre hilos."""
+        reporte = self.deduplicador.procesar([documento])
+        self.resumen['duplicados'] += reporte['duplicados']
+        return documento
+
+    def cargar_mongodb(self, documentos):
+        """Upsert por número; solo los canónicos siguen hacia los índices."""
+        operaciones = []
+        textos = []
+        ahora = datetime.now()
+        for documento in documentos:
+            principal, texto = separar_texto(documento) if TEXTOS_SEPARADOS else (documento, None)
+            if texto:
+                textos.append((documento['numero'], texto))
+            principal = dict(principal, actualizado_en=ahora)
+            principal.pop('revision', None)
+            actualizacion = {'$set': principal, '$inc': {'revision': 1}}
+            quitar = {campo: '' for campo in ('texto_contenido', 'duplicado_de', 'similitud_duplicado',
+                                              'descarga_descartada')
+                      if campo not in principal}
+            if quitar:
+                actualizacion['$unset'] = quitar
+            operaciones.append(UpdateOne({'numero': documento['numero']}, actualizacion, upsert=True))
+
+        if textos:
+            self.mongo.textos.guardar_muchos(textos)
+        self.mongo.coll.bulk_write(operaciones, ordered=False)
+        self.mongo.incrementar_version_corpus()
+        # Los que no se pudieron descargar quedan en la cola persistente para reintentarlos
+        # (no los descartados por tipo, tamaño o 4xx: una página de error no mejora reintentando)
+        for documento in documentos:
+            if not documento['archivo_existe'] and documento['url_original'] and 'descarga_descartada' not in documento:
+                self.cargador.cola.encolar(EXTRAER_TEXTO, documento['numero'], error="Descarga fallida en el pipeline")
+            else:
+                self._confirmar(documento['url_original'], documento.get('lastmod_origen'))
+        self._marcar('docs_mongodb', len(operaciones), 'segundos_primer_documento_mongodb')
+        return [documento for documento in documentos if es_canonico(documento)]
+
+    def indexar(self, documentos):
+        if self.elastic is not None:
+            exitosos, errores = self.elastic.indexar_incremental(
+                self.cargador._limpiar_documento_es(documento) for documento in documentos
+            )
+            with self._lock:
+                self.resumen['errores_elasticsearch'] += errores
+            self._marcar('docs_elasticsearch', exitosos, 'segundos_primer_documento_buscable')
+        if self.sqlite is not None:
+            resumen = self.sqlite.indexar_documentos(documentos)
+            self._marcar('docs_sqlite', resumen['nuevos'] + resumen['actualizados'],
+                         'segundos_primer_documento_buscable')
+        if not self.args.sin_vectores:
+            with self._lock:
+                self.para_vectores.extend(
+                    {'numero': documento['numero'], 'titulo': documento['titulo'],
+                     'texto_contenido': (documento.get('texto_contenido') or '')[:MAX_CARACTERES]}
+                    for documento in documentos
+                )
+        return documentos
+
+    def _marcar(self, contador: str, cantidad: int, primer: str):
+        with self._lock:
+            self.resumen[contador] += cantidad
+            if cantidad and self.resumen[primer] is None:
+                self.resumen[primer] = round(self.pipeline.segundos(), 2)
+
+    # ---------- Ejecución ----------
+
+    def construir(self) -> Pipeline:
+        a = self.args
+        self.pipeline = Pipeline([
+            Etapa('descarga', self.descargar, trabajadores=a.descargas, capacidad=a.capacidad),
+            Etapa('extraccion', self.extraer, trabajadores=a.extractores, capacidad=a.capacidad),
+            Etapa('duplicados', self.deduplicar, trabajadores=1, capacidad=a.capacidad),
+            Etapa('mongodb', self.cargar_mongodb, capacidad=a.lote_mongo * 2, lote=a.lote_mongo, espera_lote=1.0),
+            Etapa('indices', self.indexar, capacidad=a.lote_indice * 2, lote=a.lote_indice, espera_lote=2.0),
+        ])
+        return self.pipeline
+
+    def finalizar(self):
+        """Pasos que necesitan el lote completo: firmas, embeddings y optimización del índice local."""
+        guardar_firmas(self.mongo.db[COLECCION_FIRMAS], self.deduplicador)
+        if self.rastreador is not None:
+            self.rastreador.descubridor.estado.guardar()
+        if self.para_vectores:
+            from helpers.vectores import AlmacenVectores, indexar_documentos
+            # Como en CargadorDocumentos.cargar_a_vectores: un fallo no impide cerrar SQLite ni los procesos
+            try:
+                corpus = None
+                if not AlmacenVectores().existe():
+                    corpus = self.mongo.muestra_documentos(5000, FILTRO_CANONICOS, ['titulo', 'texto_contenido'])
+                self.resumen['docs_vectores'] = indexar_documentos(self.para_vectores, corpus=corpus)['documentos']
+            except Exception as e:
+                self.resumen['error_vectores'] = str(e)
+                print(f"✗ Error al calcular embeddings: {e}")
+        if self.sqlite is not None:
+            self.sqlite.optimizar()
+        if self.procesos is not None:
+            self.procesos.shutdown()
+
+    def extras_progreso(self):
+        extras = {'nuevos': self.resumen['nuevos']}
+        if self.resumen['segundos_primer_documento_buscable'] is not None:
+            extras['1er buscable'] = f"{self.resumen['segundos_primer_documento_buscable']}s"
+        return extras
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', help="JSON de scraping ('ultimo' = el más reciente de uploads/)")
+    parser.add_argument('--objetivo', type=int, default=100, help='Documentos a buscar al rastrear')
+    parser.add_argument('--descargas', type=int, default=4, help='Hilos de descarga')
+    parser.add_argument('--pausa', type=float, default=2.0, help='Segundos entre peticiones de cada hilo de descarga')
+    parser.add_argument('--extractores', type=int, default=4, help='Hilos de extracción de texto')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                        help='Procesos para extraer texto (0 = en los mismos hilos)')
+    parser.add_argument('--lote-mongo', type=int, default=100, help='Documentos por escritura en MongoDB')
+    parser.add_argument('--lote-indice', type=int, default=200, help='Documentos por lote de indexación')
+    parser.add_argument('--capacidad', type=int, default=64, help='Tamaño de las colas entre etapas')
+    parser.add_argument('--reprocesar', action='store_true', help='Procesar también los URLs ya cargados')
+    parser.add_argument('--sin-elastic', action='store_true', help='No indexar en ElasticSearch')
+    parser.add_argument('--sin-vectores', action='store_true', help='No calcular embeddings al final')
+    args = parser.parse_args()
+
+    ingesta = PipelineIngesta(args)
+    if not ingesta.preparar():
+        sys.exit(1)
+    pipeline = ingesta.construir()
+
+    print("=" * 70)
+    print("PIPELINE DE INGESTA")
+    print("=" * 70)
+    try:
+        with MonitorProgreso(pipeline, extras=ingesta.extras_progreso):
+            pipeline.iniciar(ingesta.fuente())
+            pipeline.esperar()
+    except KeyboardInterrupt:
+        print("\n⚠ Interrumpido: terminando los lotes en curso...")
+        pipeline.detener()
+        pipeline.esperar()
+
+    ingesta.finalizar()
+    estado = pipeline.estado()
+    resumen = ingesta.resumen
+
+    print("\n" + "=" * 70)
+    print("REPORTE DE INGESTA")
+    print("=" * 70)
+    print(f"Tiempo total:              {estado['segundos']:.1f}s")
+    primer = resumen['segundos_primer_documento_buscable']
+    print(f"Primer documento buscable: {'-' if primer is None else f'{primer}s'}")
+    print(f"Nuevos / actualizados:     {resumen['nuevos']} / {resumen['actualizados']} "
+          f"(omitidos ya cargados: {resumen['omitidos']})")
+    print(f"Sin archivo / sin texto:   {resumen['sin_archivo']} / {resumen['sin_texto']} "
+          f"(descartados por tipo o tamaño: {resumen['descartados']})")
+    print(f"Duplicados enlazados:      {resumen['duplicados']}")
+    print(f"MongoDB:                   {resumen['docs_mongodb']}")
+    print(f"ElasticSearch:             {resumen['docs_elasticsearch']} ({resumen['errores_elasticsearch']} errores)")
+    if ingesta.sqlite is not None:
+        print(f"SQLite FTS5:               {resumen['docs_sqlite']}")
+    print(f"Embeddings:                {resumen['docs_vectores']}"
+          f"{' (error: ' + resumen['error_vectores'] + ')' if resumen['error_vectores'] else ''}")
+    for etapa in estado['etapas']:
+        print(f"  {etapa['etapa']:<12} {etapa['salidas']:>6} salidas | {etapa['errores']:>4} errores | "
+              f"{etapa['segundos_trabajo']:>8.1f}s de trabajo")
+    if estado['fallos']:
+        print(f"\n⚠ FALLOS ({len(estado['fallos'])}):")
+        for fallo in estado['fallos'][:10]:
+            print(f"  - [{fallo['etapa']}] {fallo['elemento']}: {fallo['error']}")
+
+    os.makedirs('uploads', exist_ok=True)
+    archivo_reporte = f"uploads/reporte_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(archivo_reporte, 'w', encoding='utf-8') as f:
+        json.dump({'resumen': resumen, **estado}, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ Reporte guardado en: {archivo_reporte}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,12 +7,17 @@ import sys
 import PyPDF2
 from pymongo import MongoClient
 from dotenv import load_dotenv
-import requests
 import time
 
 # Agregar directorio padre al path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from helpers.almacen_archivos import clave_documento, crear_almacen_archivos
+from helpers.cola_tareas import ColaTareas
+from helpers.mongo_db import guardar_texto_documento, incrementar_version_corpus
+from helpers.tareas_ingesta import EXTRAER_TEXTO
+from helpers.web_scraper import DescargaOmitida, WebScraper
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -36,28 +41,6 @@ def extraer_texto_pdf(ruta_archivo):
         print(f"   ❌ Error al leer PDF: {e}")
         return None
 
-def descargar_archivo(url, ruta_destino):
-    """Descarga un archivo si no existe."""
-    try:
-        print(f"   - Descargando de: {url}")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, stream=True, timeout=30)
-        
-        if response.status_code == 200:
-            os.makedirs(os.path.dirname(ruta_destino), exist_ok=True)
-            with open(ruta_destino, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            return True
-        else:
-            print(f"   ❌ Error descarga: Status {response.status_code}")
-            return False
-    except Exception as e:
-        print(f"   ❌ Error descarga: {e}")
-        return False
-
 def procesar_documentos():
     # Configuración MongoDB
     MONGO_URI = os.getenv('MONGO_URI')
@@ -76,6 +59,10 @@ def procesar_documentos():
         client = MongoClient(MONGO_URI)
         db = client[MONGO_DB]
         collection = db[MONGO_COLLECTION]
+        almacen = crear_almacen_archivos(db)
+        scraper = WebScraper(delay_between_requests=0.5)
+        cola = ColaTareas(db)
+        cola.asegurar_indices()
         
         # Obtener documentos sin texto o todos
         total_docs = collection.count_documents({})
@@ -86,83 +73,80 @@ def procesar_documentos():
         procesados = 0
         actualizados = 0
         errores = 0
+        encoladas = 0
         
         for doc in cursor:
             procesados += 1
             titulo = doc.get('titulo', 'Sin título')
             print(f"\n[{procesados}/{total_docs}] Procesando: {titulo[:50]}...")
             
-            # Verificar si ya tiene texto
-            if doc.get('texto_contenido') and len(doc.get('texto_contenido')) > 100:
+            # Verificar si ya tiene texto (en línea o en el almacén de textos)
+            if doc.get('texto_longitud', len(doc.get('texto_contenido') or '')) > 100:
                 print("   ✓ Ya tiene contenido de texto. Saltando.")
                 continue
                 
-            # Obtener ruta del archivo
-            ruta_relativa = doc.get('ruta_completa')
-            if not ruta_relativa:
-                # Intentar construir ruta si no existe
-                nombre_archivo = doc.get('archivo_local')
-                if nombre_archivo:
-                    ruta_relativa = os.path.join("uploads", "documentos_procuraduria", nombre_archivo)
-                else:
-                    print("   ❌ No hay ruta de archivo ni nombre local")
-                    errores += 1
-                    continue
-            
-            # Corregir ruta si es necesario (eliminar prefijos extraños si los hay)
-            if ruta_relativa.startswith('/') or ruta_relativa.startswith('\\'):
-                ruta_relativa = ruta_relativa[1:]
-                
-            ruta_absoluta = os.path.abspath(ruta_relativa)
-            
-            # Verificar si existe el archivo
-            if not os.path.exists(ruta_absoluta):
-                print(f"   ⚠️ Archivo no encontrado localmente: {ruta_relativa}")
-                
-                # Intentar descargar si tiene URL
-                url = doc.get('url_original')
-                if url:
-                    print("   ⬇️ Intentando descargar...")
-                    if descargar_archivo(url, ruta_absoluta):
-                        print("   ✅ Descarga exitosa")
-                    else:
-                        print("   ❌ No se pudo descargar")
+            try:
+                # El archivo se busca primero en el almacén compartido: solo se descarga una vez
+                clave = clave_documento(doc['numero'])
+                if not almacen.existe(clave):
+                    info = None
+                    ruta_relativa = doc.get('ruta_completa') or (
+                        os.path.join("uploads", "documentos_procuraduria", doc['archivo_local'])
+                        if doc.get('archivo_local') else None)
+                    if ruta_relativa and os.path.exists(os.path.abspath(ruta_relativa.lstrip('/\\'))):
+                        info = almacen.guardar_archivo(clave, os.path.abspath(ruta_relativa.lstrip('/\\')))
+                        print("   ⬆️ Archivo local copiado al almacén")
+                    elif doc.get('url_original'):
+                        print("   ⬇️ Descargando al almacén...")
+                        try:
+                            info = scraper.descargar_a_almacen(doc['url_original'], almacen, clave)
+                        except DescargaOmitida as e:
+                            # Página de error o archivo fuera de política: reintentar no lo arregla
+                            print(f"   ⏭️ Descarga descartada: {e}")
+                            errores += 1
+                            continue
+                    if not info:
+                        print("   ❌ Archivo no disponible (sin copia local ni descarga)")
                         errores += 1
+                        encoladas += cola.encolar(EXTRAER_TEXTO, doc['numero'], error="Archivo no disponible")
                         continue
-                else:
-                    print("   ❌ No hay URL para descargar")
-                    errores += 1
-                    continue
-            
-            # Extraer texto
-            texto = extraer_texto_pdf(ruta_absoluta)
+                    collection.update_one({'_id': doc['_id']}, {'$set': {'archivo': info}})
+
+                # Extraer texto
+                with almacen.copia_local(clave) as ruta_archivo:
+                    texto = extraer_texto_pdf(ruta_archivo)
             
-            if texto:
-                longitud = len(texto)
-                print(f"   ✅ Texto extraído: {longitud} caracteres")
+                if texto:
+                    longitud = len(texto)
+                    print(f"   ✅ Texto extraído: {longitud} caracteres")
                 
-                # Actualizar MongoDB
-                collection.update_one(
-                    {'_id': doc['_id']},
-                    {
-                        '$set': {
-                            'texto_contenido': texto,
-                            'procesado_texto': True,
-                            'fecha_procesamiento': time.strftime("%Y-%m-%d %H:%M:%S")
-                        }
-                    }
-                )
-                actualizados += 1
-            else:
-                print("   ⚠️ No se pudo extraer texto (posible imagen o PDF protegido)")
+                    # Actualizar MongoDB (la revisión nueva invalida el ETag del documento)
+                    guardar_texto_documento(collection, doc['numero'], texto, {
+                        'procesado_texto': True,
+                        'fecha_procesamiento': time.strftime("%Y-%m-%d %H:%M:%S")
+                    })
+                    actualizados += 1
+                else:
+                    print("   ⚠️ No se pudo extraer texto (posible imagen o PDF protegido)")
+                    errores += 1
+                    encoladas += cola.encolar(EXTRAER_TEXTO, doc['numero'], error="Sin texto extraíble")
+            except Exception as e:
+                # Un documento con problemas no detiene el resto: queda en la cola para reintentarlo
+                print(f"   ❌ Error: {e}")
                 errores += 1
+                encoladas += cola.encolar(EXTRAER_TEXTO, doc['numero'], error=f"{type(e).__name__}: {e}")
                 
+        if actualizados:
+            incrementar_version_corpus(db, MONGO_COLLECTION)
+
         print("\n" + "="*50)
         print("RESUMEN DEL PROCESO")
         print("="*50)
         print(f"Total procesados: {procesados}")
         print(f"Actualizados con texto: {actualizados}")
         print(f"Errores/Sin texto: {errores}")
+        if encoladas:
+            print(f"Encolados para reintento: {encoladas} (python scripts/cola_tareas.py trabajar)")
         print("="*50)
         
     except Exception as e:
@@ -0,0 +1,118 @@
+"""
+Mantiene ElasticSearch sincronizado con MongoDB de forma continua.
+
+Cualquier proceso que escriba en la colección de documentos (cargas,
+scripts de corrección, procesar_textos.py, la cola de tareas) queda
+reflejado en el índice sin que tenga que conocer ElasticSearch:
+
+  - Con replica set (o Atlas) lee el change stream de la colección y guarda
+    el resume token en la colección `sync_estado` tras cada lote.
+  - En un servidor standalone sondea `actualizado_en` cada
+    SYNC_INTERVALO_SONDEO segundos y reconcilia los borrados cada
+    SYNC_RECONCILIAR_SEGUNDOS.
+
+La primera ejecución (o tras `reiniciar`) hace una copia completa. El
+retraso del índice se publica en /metrics (indice_sync_lag_segundos).
+
+Uso:
+    python scripts/sincronizar_indice.py ejecutar [--modo auto|change_stream|sondeo] [--una-vez]
+    python scripts/sincronizar_indice.py estado
+    python scripts/sincronizar_indice.py reconciliar
+    python scripts/sincronizar_indice.py resincronizar
+    python scripts/sincronizar_indice.py reiniciar
+"""
+import argparse
+import os
+import signal
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.cola_tareas import ColaTareas
+from helpers.elasticsearch import ElasticSearch
+from helpers.mongo_db import Mongo_DB
+from helpers.sincronizacion import MODOS, SYNC_MODO, SincronizadorIndice, gauges_sincronizacion
+
+load_dotenv()
+
+
+def mostrar_estado(sincronizador):
+    estado = sincronizador.estado()
+    print("=" * 70)
+    print(f"SINCRONIZACIÓN {sincronizador.identificador}")
+    print("=" * 70)
+    if not estado:
+        print("Sin ejecuciones: la próxima empieza con una copia completa")
+        return
+    gauges = {(nombre, etiquetas['sincronizador']): valor
+              for nombre, etiquetas, valor in gauges_sincronizacion(sincronizador.mongo.db)}
+    print(f"Modo:                {estado.get('modo', '-')}")
+    print(f"Posición:            {'resume token' if estado.get('resume_token') else estado.get('marca_fecha', '-')}")
+    print(f"Retraso:             {gauges.get(('indice_sync_lag_segundos', sincronizador.identificador), 0):.1f}s")
+    print(f"Último latido:       {estado.get('latido', '-')} "
+          f"(hace {gauges.get(('indice_sync_latido_segundos', sincronizador.identificador), 0):.0f}s)")
+    print(f"Último lote:         {estado.get('ultimo_lote', '-')}")
+    print(f"Indexados:           {estado.get('indexados', 0)}")
+    print(f"Eliminados:          {estado.get('eliminados', 0)}")
+    print(f"Errores:             {estado.get('errores', 0)}")
+    print(f"Última reconciliación: {estado.get('ultima_reconciliacion', '-')}")
+    if estado.get('ultimo_error'):
+        print(f"Último error ({estado.get('ultimo_error_en')}): {estado['ultimo_error'][:200]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_ejecutar = comandos.add_parser('ejecutar', help='Sincronizar de forma continua')
+    p_ejecutar.add_argument('--modo', choices=MODOS, default=SYNC_MODO)
+    p_ejecutar.add_argument('--una-vez', action='store_true', help='Aplicar lo pendiente y terminar')
+    comandos.add_parser('estado', help='Posición, retraso y contadores')
+    comandos.add_parser('reconciliar', help='Eliminar sobrantes e indexar faltantes del índice')
+    comandos.add_parser('resincronizar', help='Copia completa de MongoDB al índice')
+    comandos.add_parser('reiniciar', help='Olvidar la posición guardada')
+
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(1)
+    elastic = ElasticSearch(os.getenv('ELASTIC_CLOUD_URL'), os.getenv('ELASTIC_API_KEY'))
+    if args.comando != 'estado' and args.comando != 'reiniciar':
+        if not elastic.probar_conexion():
+            print("❌ No se pudo conectar a ElasticSearch")
+            sys.exit(1)
+        elastic.asegurar_alias()
+
+    sincronizador = SincronizadorIndice(mongo, elastic, ColaTareas(mongo.db))
+
+    if args.comando == 'estado':
+        mostrar_estado(sincronizador)
+    elif args.comando == 'reiniciar':
+        sincronizador.reiniciar()
+        print("✓ Posición olvidada: la próxima ejecución hará una copia completa")
+    elif args.comando == 'reconciliar':
+        print(f"✓ {sincronizador.reconciliar()}")
+    elif args.comando == 'resincronizar':
+        print(f"✓ {sincronizador.resincronizar()}")
+    elif args.comando == 'ejecutar':
+        # systemd/docker detienen con SIGTERM: se termina el lote en curso y se guarda la posición
+        signal.signal(signal.SIGTERM, lambda *_: sincronizador.detener())
+        inicio = datetime.now()
+        try:
+            estadisticas = sincronizador.ejecutar(args.modo, una_vez=args.una_vez)
+        except KeyboardInterrupt:
+            sincronizador.detener()
+            estadisticas = dict(sincronizador.estadisticas)
+        print(f"\n✓ Sincronización {sincronizador.modo} detenida tras {datetime.now() - inicio}: "
+              f"{estadisticas['lotes']} lotes, {estadisticas['indexados']} indexados, "
+              f"{estadisticas['eliminados']} eliminados, {estadisticas['errores']} errores")
+
+
+if __name__ == '__main__':
+    main()
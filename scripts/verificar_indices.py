@@ -0,0 +1,83 @@
+"""
+Verifica los índices de MongoDB contra el registro de helpers/indices.py.
+
+Para cada colección muestra los índices faltantes, los no declarados y los
+que no se han usado desde el último reinicio del servidor ($indexStats), y
+ejecuta explain() sobre las formas de consulta de la aplicación para
+comprobar que se resuelven con un índice y sin ordenar en memoria.
+
+Uso:
+    python scripts/verificar_indices.py [--asegurar [--recrear]]
+
+Con --asegurar crea antes los índices faltantes; si alguno existente difiere
+de su declaración (claves, unique, sparse, filtro parcial o TTL) la colección
+se reporta como incompatible, y con --recrear se elimina y se vuelve a crear.
+Termina con código 1 si alguna forma de consulta no usa índice o hay índices
+incompatibles (útil en CI o tras un despliegue).
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Agregar directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.indices import IndiceIncompatible, asegurar_indices, registro_proyecto, reportar_indices, verificar_forma
+from helpers.mongo_db import Mongo_DB
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--asegurar', action='store_true', help='Crear los índices faltantes antes de verificar')
+    parser.add_argument('--recrear', action='store_true',
+                        help='Con --asegurar, recrear los índices que difieren de su declaración')
+    args = parser.parse_args()
+
+    mongo = Mongo_DB(os.getenv('MONGO_URI'), os.getenv('MONGO_DB'), os.getenv('MONGO_COLLECTION'))
+    if not mongo.probar_conexion():
+        print("❌ No se pudo conectar a MongoDB")
+        sys.exit(2)
+
+    fallas = 0
+    for nombre, (coleccion, indices, formas) in registro_proyecto(mongo.db, mongo.collection_name).items():
+        print("=" * 70)
+        print(f"COLECCIÓN: {nombre}")
+        print("=" * 70)
+
+        if args.asegurar:
+            try:
+                creados = asegurar_indices(coleccion, indices, recrear=args.recrear)
+                print(f"Índices creados: {', '.join(creados) if creados else 'ninguno'}")
+            except IndiceIncompatible as e:
+                print(f"❌ {e}")
+
+        reporte = reportar_indices(coleccion, indices)
+        print(f"Faltantes:      {', '.join(reporte['faltantes']) or '-'}")
+        print(f"No declarados:  {', '.join(reporte['no_declarados']) or '-'}")
+        print(f"Incompatibles:  {', '.join(reporte['incompatibles']) or '-'}")
+        fallas += len(reporte['incompatibles'])
+        print(f"Sin uso:        {', '.join(reporte['sin_uso']) or '-'}")
+        for indice, operaciones in sorted(reporte['uso'].items()):
+            print(f"   {indice:<30}{operaciones:>10} ops")
+
+        print("-" * 70)
+        for forma in formas:
+            resultado = verificar_forma(coleccion, forma)
+            estado = '✅' if resultado['ok'] else '❌'
+            detalle = ', '.join(resultado['indices']) or ' > '.join(resultado['etapas'])
+            print(f"{estado} {resultado['forma']:<28}{detalle}")
+            for problema in resultado['problemas']:
+                print(f"      - {problema}")
+            fallas += 0 if resultado['ok'] else 1
+
+    print("=" * 70)
+    print(f"Formas de consulta sin índice o índices incompatibles: {fallas}")
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
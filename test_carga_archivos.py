@@ -0,0 +1,74 @@
+# test_carga_archivos.py
+# Pruebas del lector multipart por bloques de las cargas del panel (python -m pytest test_carga_archivos.py)
+import io
+
+import pytest
+from urllib3.filepost import encode_multipart_formdata
+
+from helpers.carga_archivos import MAX_CAMPO_BYTES, ErrorCarga, LectorMultipart
+
+PDF = b'%PDF-1.7\n' + bytes(range(256)) * 50
+DOCX = b'PK\x03\x04' + b'\r\n--no-es-el-boundary\r\n' * 100
+
+
+def cuerpo(campos):
+    return encode_multipart_formdata(campos, boundary='limite-de-prueba')
+
+
+def leer(datos: bytes, tipo: str, bloque: int = 7):
+    """Partes del cuerpo con los archivos ya consumidos (bloques pequeños para cruzar los límites de cada parte)."""
+    partes = []
+    for parte in LectorMultipart(io.BytesIO(datos), tipo, bloque=bloque).partes():
+        if parte['archivo']:
+            parte = {'campo': parte['campo'], 'archivo': parte['archivo'], 'datos': b''.join(parte['fragmentos'])}
+        partes.append(parte)
+    return partes
+
+
+def test_campos_y_archivos_en_orden():
+    datos, tipo = cuerpo([('descripcion', 'Resoluciones 2024'),
+                          ('archivos', ('resolución.pdf', PDF, 'application/pdf')),
+                          ('archivos', ('acta.docx', DOCX, 'application/octet-stream'))])
+    partes = leer(datos, tipo)
+    assert partes == [
+        {'campo': 'descripcion', 'archivo': None, 'valor': 'Resoluciones 2024'},
+        {'campo': 'archivos', 'archivo': 'resolución.pdf', 'datos': PDF},
+        {'campo': 'archivos', 'archivo': 'acta.docx', 'datos': DOCX},
+    ]
+
+
+@pytest.mark.parametrize('bloque', [1, 64, 64 * 1024])
+def test_el_tamano_del_bloque_no_cambia_el_resultado(bloque):
+    datos, tipo = cuerpo([('archivos', ('a.pdf', PDF, 'application/pdf'))])
+    assert leer(datos, tipo, bloque) == [{'campo': 'archivos', 'archivo': 'a.pdf', 'datos': PDF}]
+
+
+def test_archivo_no_leido_se_descarta_antes_de_la_parte_siguiente():
+    datos, tipo = cuerpo([('archivos', ('a.pdf', PDF, 'application/pdf')), ('nota', 'fin')])
+    partes = list(LectorMultipart(io.BytesIO(datos), tipo, bloque=100).partes())
+    assert partes[0]['archivo'] == 'a.pdf'
+    assert partes[1] == {'campo': 'nota', 'archivo': None, 'valor': 'fin'}
+
+
+def test_archivos_vacios():
+    datos, tipo = cuerpo([('archivos', ('vacio.pdf', b'', 'application/pdf'))])
+    assert leer(datos, tipo) == [{'campo': 'archivos', 'archivo': 'vacio.pdf', 'datos': b''}]
+
+
+def test_tipo_de_contenido_invalido():
+    with pytest.raises(ErrorCarga):
+        LectorMultipart(io.BytesIO(b''), 'application/json')
+    with pytest.raises(ErrorCarga):
+        LectorMultipart(io.BytesIO(b''), 'multipart/form-data')
+
+
+def test_cuerpo_cortado():
+    datos, tipo = cuerpo([('archivos', ('a.pdf', PDF, 'application/pdf'))])
+    with pytest.raises(ErrorCarga):
+        leer(datos[:len(datos) // 2], tipo)
+
+
+def test_campo_demasiado_grande():
+    datos, tipo = cuerpo([('descripcion', 'x' * (MAX_CAMPO_BYTES + 1))])
+    with pytest.raises(ErrorCarga):
+        leer(datos, tipo, bloque=4096)
@@ -0,0 +1,51 @@
+# test_coalescencia.py
+# Pruebas de la coalescencia de peticiones y del resultado compartido entre workers (python -m pytest test_coalescencia.py)
+import json
+import threading
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from helpers.coalescencia import Coalescedor, clave_peticion
+from helpers.respuestas_http import serializar_json
+
+DOCUMENTO = {'_id': ObjectId('65a1b2c3d4e5f60718293a4b'), 'numero': 7,
+             'actualizado_en': datetime(2025, 11, 19, 10, 30), 'titulo': 'Resolución 7'}
+
+
+def test_llamadas_concurrentes_calculan_una_vez():
+    coalescedor = Coalescedor('pruebas')
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        time.sleep(0.2)
+        return {'total': 1}
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(coalescedor.ejecutar('clave', calcular)))
+             for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert len(llamadas) == 1
+    assert resultados == [{'total': 1}] * 5
+
+
+def test_resultado_compartido_se_serializa_como_la_api(tmp_path):
+    coalescedor = Coalescedor('pruebas', str(tmp_path))
+    ruta = str(tmp_path / 'resultado.json')
+    inicio = time.time()
+    coalescedor._escribir_resultado(ruta, {'resultados': [DOCUMENTO]})
+    compartido = coalescedor._leer_resultado(ruta, inicio)['resultado']
+    assert compartido == json.loads(serializar_json({'resultados': [DOCUMENTO]}))
+    assert compartido['resultados'][0]['actualizado_en'] == '2025-11-19T10:30:00'
+    assert compartido['resultados'][0]['_id'] == '65a1b2c3d4e5f60718293a4b'
+
+
+def test_clave_peticion_ordena_los_parametros_y_usa_fechas_iso():
+    assert clave_peticion('buscar', {'q': 'sanción', 'pagina': 1}) == \
+        clave_peticion('buscar', {'pagina': 1, 'q': 'sanción'})
+    assert '2025-11-19T10:30:00' in clave_peticion('buscar', {'desde': datetime(2025, 11, 19, 10, 30)})
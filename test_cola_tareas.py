@@ -0,0 +1,132 @@
+# test_cola_tareas.py
+# Pruebas de la cola persistente: arriendos, reintentos y descarte (python -m pytest test_cola_tareas.py)
+import time
+from datetime import timedelta
+
+import mongomock
+import pytest
+
+from helpers.cola_tareas import (COMPLETADA, DESCARTADA, EN_PROCESO, PENDIENTE, ColaTareas, ErrorPermanente,
+                                 TrabajadorCola, _ahora, calcular_espera)
+
+
+@pytest.fixture
+def cola():
+    cola = ColaTareas(mongomock.MongoClient().db, max_intentos=2, arriendo_segundos=60)
+    cola.asegurar_indices()  # el índice único (tipo, numero) protege las tareas en proceso
+    return cola
+
+
+def tarea(cola, numero):
+    return cola.coll.find_one({'numero': numero})
+
+
+def vencer_arriendo(cola, numero):
+    cola.coll.update_one({'numero': numero}, {'$set': {'arrendada_hasta': _ahora() - timedelta(seconds=1)}})
+
+
+def test_arrendar_toma_cada_tarea_una_sola_vez(cola):
+    cola.encolar('indexar', 1)
+    primera = cola.arrendar('a')
+    assert primera['numero'] == 1 and primera['estado'] == EN_PROCESO and primera['intentos'] == 1
+    assert cola.arrendar('b') is None
+
+
+def test_encolar_no_toca_una_tarea_en_proceso(cola):
+    cola.encolar('indexar', 1)
+    cola.arrendar('a')
+    assert cola.encolar('indexar', 1) is False
+    assert tarea(cola, 1)['trabajador'] == 'a'
+
+
+def test_arriendo_vencido_vuelve_a_arrendarse(cola):
+    cola.encolar('indexar', 1)
+    cola.arrendar('a')
+    vencer_arriendo(cola, 1)
+    retomada = cola.arrendar('b')
+    assert retomada['trabajador'] == 'b' and retomada['intentos'] == 2
+
+
+def test_arriendo_vencido_en_el_ultimo_intento_se_descarta(cola):
+    cola.encolar('indexar', 1)
+    cola.arrendar('a')
+    vencer_arriendo(cola, 1)
+    cola.arrendar('b')
+    vencer_arriendo(cola, 1)
+    assert cola.arrendar('c') is None
+    registro = tarea(cola, 1)
+    assert registro['estado'] == DESCARTADA
+    assert 'Arriendo vencido' in registro['ultimo_error']
+
+
+def test_solo_el_duenio_del_arriendo_completa(cola):
+    cola.encolar('indexar', 1)
+    original = cola.arrendar('a')
+    vencer_arriendo(cola, 1)
+    cola.arrendar('b')
+    assert cola.completar(original) is False
+    assert cola.extender(original) is False
+    assert tarea(cola, 1)['estado'] == EN_PROCESO
+
+
+def test_fallar_programa_reintento_y_luego_descarta(cola):
+    cola.encolar('indexar', 1)
+    assert cola.fallar(cola.arrendar('a'), 'sin conexión') == PENDIENTE
+    registro = tarea(cola, 1)
+    assert registro['disponible_en'].replace(tzinfo=None) > _ahora().replace(tzinfo=None)
+    assert cola.arrendar('a') is None  # el backoff aún no vence
+
+    cola.coll.update_one({'numero': 1}, {'$set': {'disponible_en': _ahora()}})
+    assert cola.fallar(cola.arrendar('a'), 'sin conexión') == DESCARTADA
+    assert [error['intento'] for error in tarea(cola, 1)['errores']] == [1, 2]
+
+
+def test_reencolar_descartadas(cola):
+    cola.encolar('indexar', 1)
+    cola.fallar(cola.arrendar('a'), 'no existe', reintentar=False)
+    assert tarea(cola, 1)['estado'] == DESCARTADA
+    assert cola.reencolar() == 1
+    registro = tarea(cola, 1)
+    assert registro['estado'] == PENDIENTE and registro['intentos'] == 0
+
+
+def test_calcular_espera_crece_hasta_el_maximo():
+    for intentos in range(1, 6):
+        espera = calcular_espera(intentos, base=10, maximo=1000)
+        assert 5 * 2 ** (intentos - 1) <= espera <= 10 * 2 ** (intentos - 1)
+    assert calcular_espera(30, base=10, maximo=1000) <= 1000
+
+
+def test_trabajador_completa_reintenta_y_descarta(cola):
+    for numero in (1, 2, 3):
+        cola.encolar('indexar', numero)
+
+    def manejador(tarea):
+        if tarea['numero'] == 2:
+            raise ErrorPermanente('el documento ya no existe')
+        if tarea['numero'] == 3:
+            raise ValueError('texto inválido')
+        return {'ok': True}
+
+    trabajador = TrabajadorCola(cola, {'indexar': manejador}, espera_vacia=0.01)
+    for _ in range(3):
+        trabajador.procesar(cola.arrendar('a'))
+    assert trabajador.estadisticas == {'completadas': 1, 'reintentos': 1, 'descartadas': 1}
+    assert tarea(cola, 1)['estado'] == COMPLETADA and tarea(cola, 1)['resultado'] == {'ok': True}
+    assert tarea(cola, 2)['estado'] == DESCARTADA
+    assert tarea(cola, 3)['estado'] == PENDIENTE
+
+
+def test_latido_renueva_el_arriendo_de_una_tarea_larga():
+    cola = ColaTareas(mongomock.MongoClient().db, arriendo_segundos=0.3)
+    cola.encolar('indexar', 1)
+    vencimientos = []
+
+    def lento(tarea):
+        vencimientos.append(cola.coll.find_one({'numero': 1})['arrendada_hasta'])
+        time.sleep(0.5)
+        vencimientos.append(cola.coll.find_one({'numero': 1})['arrendada_hasta'])
+
+    TrabajadorCola(cola, {'indexar': lento}).procesar(cola.arrendar('a'))
+    assert vencimientos[1] > vencimientos[0]
+    assert cola.coll.find_one({'numero': 1})['estado'] == COMPLETADA
@@ -0,0 +1,132 @@
+# test_deduplicacion.py
+# Pruebas de MinHash/LSH y del deduplicador de ingesta (python -m pytest test_deduplicacion.py)
+import random
+
+import numpy as np
+
+import mongomock
+
+from helpers.deduplicacion import (MIN_CARACTERES, VERSION_FIRMAS, Deduplicador, IndiceLSH, MinHash, cargar_firmas,
+                                   es_canonico, guardar_firmas, huella_texto, similitud)
+
+PALABRAS = ['resolucion', 'contrato', 'entidad', 'funcionario', 'sancion', 'proceso', 'disciplinario',
+            'investigacion', 'despacho', 'procurador', 'auto', 'fallo', 'recurso', 'apelacion', 'notificacion',
+            'termino', 'prueba', 'testimonio', 'expediente', 'decision', 'municipio', 'alcalde', 'gobernacion']
+
+
+def texto_aleatorio(semilla: int, palabras: int = 300) -> str:
+    rng = random.Random(semilla)
+    return ' '.join(rng.choice(PALABRAS) for _ in range(palabras))
+
+
+def variar(texto: str, cambios: int, semilla: int = 0) -> str:
+    """Reemplaza `cambios` palabras del texto por otras del vocabulario."""
+    rng = random.Random(semilla)
+    tokens = texto.split()
+    for i in rng.sample(range(len(tokens)), cambios):
+        tokens[i] = rng.choice(PALABRAS)
+    return ' '.join(tokens)
+
+
+def test_firma_determinista_y_de_tamano_fijo():
+    texto = texto_aleatorio(1)
+    firma = MinHash(64).firma(texto)
+    assert firma.shape == (64,) and firma.dtype == np.uint64
+    assert np.array_equal(firma, MinHash(64).firma(texto))
+
+
+def test_similitud_estima_jaccard():
+    original = texto_aleatorio(1)
+    minhash = MinHash()
+    assert similitud(minhash.firma(original), minhash.firma(original)) == 1.0
+    casi_igual = similitud(minhash.firma(original), minhash.firma(variar(original, 3)))
+    distinto = similitud(minhash.firma(original), minhash.firma(texto_aleatorio(2)))
+    assert casi_igual > 0.8
+    assert distinto < 0.3
+
+
+def test_lsh_propone_solo_firmas_parecidas():
+    minhash = MinHash()
+    indice = IndiceLSH()
+    original = texto_aleatorio(1)
+    indice.agregar('original', minhash.firma(original))
+    indice.agregar('otro', minhash.firma(texto_aleatorio(2)))
+    candidatos = indice.candidatos(minhash.firma(variar(original, 2)))
+    assert candidatos == ['original']
+
+
+def test_huella_ignora_espaciado_y_mayusculas():
+    assert huella_texto('Resolución  No. 12\n de 2024') == huella_texto('resolución no. 12 de 2024')
+
+
+def test_procesar_enlaza_duplicados_al_primer_canonico():
+    original = texto_aleatorio(1)
+    documentos = [
+        {'numero': 1, 'texto_contenido': original, 'tamano_bytes': 1000},
+        {'numero': 2, 'texto_contenido': original.upper(), 'tamano_bytes': 1000},
+        {'numero': 3, 'texto_contenido': variar(original, 2), 'tamano_bytes': 500},
+        {'numero': 4, 'texto_contenido': texto_aleatorio(2)},
+        {'numero': 5, 'texto_contenido': 'corto'},
+    ]
+    reporte = Deduplicador().procesar(documentos)
+
+    assert documentos[1]['duplicado_de'] == 1 and documentos[1]['similitud_duplicado'] == 1.0
+    assert documentos[2]['duplicado_de'] == 1
+    assert es_canonico(documentos[0]) and es_canonico(documentos[3]) and es_canonico(documentos[4])
+    assert reporte['canonicos'] == 2
+    assert reporte['duplicados'] == 2 and reporte['exactos'] == 1
+    assert reporte['sin_texto'] == 1
+    assert reporte['bytes_archivos'] == 1500
+    assert reporte['grupos'] == {1: [2, 3]}
+
+
+def test_documentos_que_solo_difieren_en_sus_numeros_no_son_duplicados():
+    plantilla = ('Resolución No. {numero} de {anio}, expediente IUS-{expediente}, por la cual se impone una sanción '
+                 'de {cuantia} pesos. ' + texto_aleatorio(4))
+    primera = plantilla.format(numero=1234, anio=2023, expediente='2021-554321', cuantia='5.000.000')
+    segunda = plantilla.format(numero=1235, anio=2024, expediente='2022-100200', cuantia='7.500.000')
+    documentos = [{'numero': 1, 'texto_contenido': primera}, {'numero': 2, 'texto_contenido': segunda},
+                  {'numero': 3, 'texto_contenido': primera.replace('se impone', 'se  impone')}]
+    reporte = Deduplicador().procesar(documentos)
+    assert es_canonico(documentos[0]) and es_canonico(documentos[1])
+    assert documentos[2]['duplicado_de'] == 1
+    assert reporte['canonicos'] == 2 and reporte['duplicados'] == 1 and reporte['exactos'] == 1
+
+
+def test_solo_cuenta_como_exacto_el_mismo_texto_normalizado():
+    original = texto_aleatorio(1)
+    documentos = [{'numero': 1, 'texto_contenido': original},
+                  {'numero': 2, 'texto_contenido': original.replace(' ', ', ', 1)}]
+    reporte = Deduplicador().procesar(documentos)
+    assert documentos[1]['duplicado_de'] == 1 and documentos[1]['similitud_duplicado'] == 1.0
+    assert reporte['duplicados'] == 1 and reporte['exactos'] == 0
+
+
+def test_firmas_guardadas_de_otra_version_se_ignoran():
+    coleccion = mongomock.MongoClient().db.firmas
+    deduplicador = Deduplicador()
+    deduplicador.procesar([{'numero': 1, 'texto_contenido': texto_aleatorio(1)}])
+    guardar_firmas(coleccion, deduplicador)
+    coleccion.insert_one({'numero': 2, 'firma': deduplicador.firmas[1].tobytes(), 'version': VERSION_FIRMAS - 1})
+
+    recargado = Deduplicador()
+    assert cargar_firmas(coleccion, recargado) == 1
+    documento = {'numero': 3, 'texto_contenido': variar(texto_aleatorio(1), 2)}
+    recargado.procesar([documento])
+    assert documento['duplicado_de'] == 1
+
+
+def test_reprocesar_un_canonico_no_lo_marca_como_duplicado_de_si_mismo():
+    deduplicador = Deduplicador()
+    documento = {'numero': 7, 'texto_contenido': texto_aleatorio(3)}
+    deduplicador.procesar([documento])
+    reporte = deduplicador.procesar([dict(documento)])
+    assert reporte['canonicos'] == 1 and reporte['duplicados'] == 0
+
+
+def test_textos_cortos_no_se_deduplican():
+    texto = 'x' * (MIN_CARACTERES - 1)
+    documentos = [{'numero': 1, 'texto_contenido': texto}, {'numero': 2, 'texto_contenido': texto}]
+    reporte = Deduplicador().procesar(documentos)
+    assert reporte['sin_texto'] == 2
+    assert all(es_canonico(documento) for documento in documentos)
@@ -0,0 +1,87 @@
+# test_descarga_archivo.py
+# Pruebas de GET /api/documento/<numero>/archivo: Range, If-Range y revalidación (python -m pytest test_descarga_archivo.py)
+import os
+
+import pytest
+
+# app.py exige la configuración de MongoDB al importarse; la conexión no se abre hasta el primer uso
+os.environ.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1')
+os.environ.setdefault('MONGO_DB', 'pruebas')
+os.environ.setdefault('MONGO_COLLECTION', 'documentos')
+os.environ['CALENTAR_SERVICIOS'] = 'false'
+
+import app as aplicacion  # noqa: E402
+from helpers.almacen_archivos import AlmacenLocal, clave_documento  # noqa: E402
+
+CONTENIDO = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def cliente(tmp_path):
+    almacen = AlmacenLocal(str(tmp_path))
+    almacen.guardar_stream(clave_documento(1), [CONTENIDO], nombre='Resolución 1.pdf')
+    aplicacion.servicios.registrar('almacen_archivos', lambda: almacen)
+    aplicacion.app.config['TESTING'] = True
+    with aplicacion.app.test_client() as cliente:
+        yield cliente
+
+
+def etag(cliente) -> str:
+    return cliente.get('/api/documento/1/archivo').headers['ETag']
+
+
+def test_archivo_completo(cliente):
+    respuesta = cliente.get('/api/documento/1/archivo')
+    assert respuesta.status_code == 200
+    assert respuesta.data == CONTENIDO
+    assert respuesta.headers['Accept-Ranges'] == 'bytes'
+    assert respuesta.headers['Content-Length'] == str(len(CONTENIDO))
+    assert respuesta.mimetype == 'application/pdf'
+    assert "filename*=UTF-8''Resoluci%C3%B3n%201.pdf" in respuesta.headers['Content-Disposition']
+
+
+def test_archivo_inexistente(cliente):
+    assert cliente.get('/api/documento/2/archivo').status_code == 404
+
+
+def test_rango_parcial(cliente):
+    respuesta = cliente.get('/api/documento/1/archivo', headers={'Range': 'bytes=100-199'})
+    assert respuesta.status_code == 206
+    assert respuesta.data == CONTENIDO[100:200]
+    assert respuesta.headers['Content-Range'] == f'bytes 100-199/{len(CONTENIDO)}'
+    assert respuesta.headers['Content-Length'] == '100'
+
+
+def test_rango_sufijo_y_abierto(cliente):
+    respuesta = cliente.get('/api/documento/1/archivo', headers={'Range': 'bytes=-10'})
+    assert respuesta.status_code == 206 and respuesta.data == CONTENIDO[-10:]
+    respuesta = cliente.get('/api/documento/1/archivo', headers={'Range': 'bytes=10000-'})
+    assert respuesta.status_code == 206 and respuesta.data == CONTENIDO[10000:]
+
+
+def test_rango_fuera_del_archivo(cliente):
+    respuesta = cliente.get('/api/documento/1/archivo', headers={'Range': f'bytes={len(CONTENIDO)}-'})
+    assert respuesta.status_code == 416
+    assert respuesta.headers['Content-Range'] == f'bytes */{len(CONTENIDO)}'
+
+
+def test_varios_rangos_entregan_el_archivo_completo(cliente):
+    respuesta = cliente.get('/api/documento/1/archivo', headers={'Range': 'bytes=0-9,20-29'})
+    assert respuesta.status_code == 200 and respuesta.data == CONTENIDO
+
+
+def test_if_range_con_etag_vigente(cliente):
+    respuesta = cliente.get('/api/documento/1/archivo',
+                            headers={'Range': 'bytes=0-9', 'If-Range': etag(cliente)})
+    assert respuesta.status_code == 206 and respuesta.data == CONTENIDO[:10]
+
+
+def test_if_range_con_etag_viejo_entrega_el_archivo_completo(cliente):
+    respuesta = cliente.get('/api/documento/1/archivo', headers={'Range': 'bytes=0-9', 'If-Range': '"otro"'})
+    assert respuesta.status_code == 200 and respuesta.data == CONTENIDO
+
+
+def test_if_none_match(cliente):
+    respuesta = cliente.get('/api/documento/1/archivo', headers={'If-None-Match': etag(cliente)})
+    assert respuesta.status_code == 304
+    assert respuesta.data == b''
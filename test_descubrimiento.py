@@ -0,0 +1,109 @@
+# test_descubrimiento.py
+# Pruebas de robots.txt, sitemaps y el estado incremental del descubrimiento (python -m pytest test_descubrimiento.py)
+import gzip
+from datetime import datetime, timedelta
+
+from helpers.descubrimiento import EstadoDescubrimiento, ReglasRobots, parsear_sitemap
+
+ROBOTS = """\
+User-agent: *
+Disallow: /privado/
+Crawl-delay: 2
+
+User-agent: otro-bot
+Disallow: /
+
+Sitemap: https://www.ejemplo.gov.co/sitemap.xml
+Sitemap: https://www.ejemplo.gov.co/sitemap-docs.xml.gz
+"""
+
+SITEMAP_INDICE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc> https://www.ejemplo.gov.co/sitemap-1.xml </loc><lastmod>2024-05-01</lastmod></sitemap>
+  <sitemap><loc>https://www.ejemplo.gov.co/sitemap-2.xml</loc></sitemap>
+</sitemapindex>"""
+
+SITEMAP_URLS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://www.ejemplo.gov.co/docs/a.pdf</loc><lastmod>2024-01-02T10:00:00Z</lastmod></url>
+  <url><lastmod>2024-01-03</lastmod></url>
+  <url><loc>https://www.ejemplo.gov.co/docs/b.pdf</loc><lastmod> </lastmod></url>
+</urlset>"""
+
+
+def test_robots_reglas_sitemaps_y_demora():
+    reglas = ReglasRobots('https://www.ejemplo.gov.co/robots.txt', ROBOTS)
+    assert reglas.permitido('https://www.ejemplo.gov.co/docs/a.pdf')
+    assert not reglas.permitido('https://www.ejemplo.gov.co/privado/b.pdf')
+    assert reglas.sitemaps == ['https://www.ejemplo.gov.co/sitemap.xml',
+                               'https://www.ejemplo.gov.co/sitemap-docs.xml.gz']
+    assert reglas.crawl_delay == 2.0
+
+
+def test_robots_por_agente():
+    reglas = ReglasRobots('https://www.ejemplo.gov.co/robots.txt', ROBOTS, agente='otro-bot')
+    assert not reglas.permitido('https://www.ejemplo.gov.co/docs/a.pdf')
+    assert reglas.crawl_delay is None
+
+
+def test_robots_inexistente_permite_todo():
+    reglas = ReglasRobots('https://www.ejemplo.gov.co/robots.txt', estado_http=404)
+    assert reglas.permitido('https://www.ejemplo.gov.co/privado/b.pdf')
+    assert reglas.sitemaps == []
+
+
+def test_robots_con_error_del_servidor_o_sin_respuesta_bloquea_todo():
+    for estado in (500, 503, 0):
+        reglas = ReglasRobots('https://www.ejemplo.gov.co/robots.txt', estado_http=estado)
+        assert not reglas.permitido('https://www.ejemplo.gov.co/docs/a.pdf')
+
+
+def test_sitemap_indice():
+    raiz, entradas = parsear_sitemap(SITEMAP_INDICE)
+    assert raiz == 'sitemapindex'
+    assert entradas == [('https://www.ejemplo.gov.co/sitemap-1.xml', '2024-05-01'),
+                        ('https://www.ejemplo.gov.co/sitemap-2.xml', None)]
+
+
+def test_sitemap_de_urls_descarta_entradas_sin_loc():
+    raiz, entradas = parsear_sitemap(SITEMAP_URLS)
+    assert raiz == 'urlset'
+    assert entradas == [('https://www.ejemplo.gov.co/docs/a.pdf', '2024-01-02T10:00:00Z'),
+                        ('https://www.ejemplo.gov.co/docs/b.pdf', None)]
+
+
+def test_sitemap_comprimido():
+    assert parsear_sitemap(gzip.compress(SITEMAP_URLS)) == parsear_sitemap(SITEMAP_URLS)
+
+
+def test_sitemap_invalido_conserva_lo_leido():
+    raiz, entradas = parsear_sitemap(SITEMAP_URLS[:SITEMAP_URLS.index(b'<url><lastmod>')] + b'<url><loc>')
+    assert raiz == 'urlset'
+    assert entradas == [('https://www.ejemplo.gov.co/docs/a.pdf', '2024-01-02T10:00:00Z')]
+
+
+def test_estado_cambio_por_lastmod_y_revisita(tmp_path):
+    ruta = str(tmp_path / 'estado.json')
+    estado = EstadoDescubrimiento(ruta)
+    assert estado.cambio('https://www.ejemplo.gov.co/a', '2024-01-01')
+    estado.marcar('https://www.ejemplo.gov.co/a', '2024-01-01')
+    estado.marcar('https://www.ejemplo.gov.co/pagina')
+    estado.guardar()
+
+    estado = EstadoDescubrimiento(ruta)
+    assert not estado.cambio('https://www.ejemplo.gov.co/a', '2024-01-01')
+    assert estado.cambio('https://www.ejemplo.gov.co/a', '2024-02-01')
+    assert not estado.cambio('https://www.ejemplo.gov.co/pagina', None)
+    assert not estado.cambio('https://www.ejemplo.gov.co/pagina', None, revisita_dias=30)
+    estado.registros['https://www.ejemplo.gov.co/pagina']['visitado'] = \
+        (datetime.now() - timedelta(days=31)).isoformat(timespec='seconds')
+    assert estado.cambio('https://www.ejemplo.gov.co/pagina', None, revisita_dias=30)
+
+
+def test_estado_pendientes_hasta_confirmar():
+    estado = EstadoDescubrimiento(None)
+    estado.pendiente('https://www.ejemplo.gov.co/a.pdf', titulo='A', lastmod=None)
+    assert estado.pendientes() == [('https://www.ejemplo.gov.co/a.pdf', {'titulo': 'A'})]
+    estado.confirmar('https://www.ejemplo.gov.co/a.pdf', '2024-01-01')
+    assert estado.pendientes() == []
+    assert estado.obtener('https://www.ejemplo.gov.co/a.pdf')['tipo'] == 'documento'
@@ -0,0 +1,42 @@
+# test_exportacion.py
+# Pruebas de la selección de campos de la exportación (python -m pytest test_exportacion.py)
+import os
+
+import pytest
+
+# app.py exige la configuración de MongoDB al importarse; la conexión no se abre hasta el primer uso
+os.environ.setdefault('MONGO_URI', 'mongodb://127.0.0.1:1')
+os.environ.setdefault('MONGO_DB', 'pruebas')
+os.environ.setdefault('MONGO_COLLECTION', 'documentos')
+os.environ['CALENTAR_SERVICIOS'] = 'false'
+
+import app as aplicacion  # noqa: E402
+from helpers.exportacion import parsear_campos  # noqa: E402
+
+
+@pytest.mark.parametrize('valor, campos', [
+    (None, []),
+    ('', []),
+    ('titulo, fecha,,', ['titulo', 'fecha']),
+    ('["titulo", " metadata.autor "]', ['titulo', 'metadata.autor']),
+    (['titulo'], ['titulo']),
+])
+def test_parsear_campos(valor, campos):
+    assert parsear_campos(valor) == campos
+
+
+@pytest.mark.parametrize('valor', ['[titulo', '["titulo", 3]', '[["titulo"]]', {'titulo': 1}])
+def test_parsear_campos_invalidos(valor):
+    with pytest.raises(ValueError):
+        parsear_campos(valor)
+
+
+@pytest.mark.parametrize('campos', ['[titulo', '["titulo", 3]', '["$where"]'])
+def test_exportar_con_campos_invalidos_responde_400(campos):
+    aplicacion.app.config['TESTING'] = True
+    with aplicacion.app.test_client() as cliente:
+        with cliente.session_transaction() as sesion:
+            sesion['logged_in'] = True
+        respuesta = cliente.get('/api/exportar', query_string={'campos': campos})
+    assert respuesta.status_code == 400
+    assert respuesta.get_json() == {'error': '"campos" debe ser una lista de nombres de campo'}
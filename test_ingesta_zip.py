@@ -0,0 +1,102 @@
+# test_ingesta_zip.py
+# Pruebas de los límites anti zip bomb y la deduplicación de la ingesta de ZIP (python -m pytest test_ingesta_zip.py)
+import hashlib
+import io
+import zipfile
+
+import pytest
+
+from helpers.ingesta_zip import ErrorZip, IngestorZip, revisar_zip
+
+MB = 1024 * 1024
+
+
+class FuncionesTexto:
+    """Extractor mínimo: el texto es el contenido decodificado del miembro."""
+
+    def extraer_texto_stream(self, flujo, extension):
+        return flujo.read().decode('latin-1')
+
+
+def crear_zip(miembros, compresion=zipfile.ZIP_STORED) -> io.BytesIO:
+    datos = io.BytesIO()
+    with zipfile.ZipFile(datos, 'w', compression=compresion) as archivo_zip:
+        for nombre, contenido in miembros:
+            archivo_zip.writestr(nombre, contenido)
+    datos.seek(0)
+    return datos
+
+
+def revisar(datos, **limites):
+    with zipfile.ZipFile(datos) as archivo_zip:
+        return revisar_zip(archivo_zip, **limites)
+
+
+def test_omite_tipos_no_soportados_y_archivos_de_macos():
+    datos = crear_zip([('a.pdf', b'%PDF'), ('b.DOCX', b'PK'), ('notas.txt', b'x'), ('__MACOSX/._a.pdf', b'x')])
+    candidatos, omitidos = revisar(datos)
+    assert [miembro.filename for miembro in candidatos] == ['a.pdf', 'b.DOCX']
+    assert {omitido['miembro']: omitido['motivo'] for omitido in omitidos} == {
+        'notas.txt': 'tipo no soportado', '__MACOSX/._a.pdf': 'tipo no soportado'}
+
+
+def test_demasiados_miembros():
+    datos = crear_zip([(f'{i}.pdf', b'%PDF') for i in range(4)])
+    with pytest.raises(ErrorZip):
+        revisar(datos, max_miembros=3)
+
+
+def test_total_declarado_excesivo():
+    datos = crear_zip([('a.pdf', b'x' * 600), ('b.pdf', b'y' * 600)])
+    with pytest.raises(ErrorZip):
+        revisar(datos, max_total=1000)
+
+
+def test_miembro_grande_se_omite():
+    datos = crear_zip([('grande.pdf', b'x' * (2 * MB)), ('chico.pdf', b'%PDF')])
+    candidatos, omitidos = revisar(datos, max_miembro=MB)
+    assert [miembro.filename for miembro in candidatos] == ['chico.pdf']
+    assert omitidos == [{'miembro': 'grande.pdf', 'motivo': 'supera 1 MB'}]
+
+
+def test_compresion_sospechosa_se_omite():
+    datos = crear_zip([('bomba.pdf', b'\0' * MB)], compresion=zipfile.ZIP_DEFLATED)
+    candidatos, omitidos = revisar(datos, max_ratio=100)
+    assert candidatos == []
+    assert omitidos[0]['motivo'].startswith('compresión sospechosa')
+
+
+def test_ingesta_deduplica_dentro_del_zip_y_contra_el_corpus():
+    conocido = b'%PDF ya en el corpus'
+    datos = crear_zip([('a.pdf', b'%PDF uno'), ('copia/a.pdf', b'%PDF uno'), ('b.pdf', conocido),
+                       ('leame.txt', b'x')])
+    corpus = {hashlib.sha256(conocido).hexdigest(): 42}
+    conservados = []
+
+    def conservar(resultado, flujo):
+        conservados.append((resultado['miembro'], flujo.read()))
+        return {'numero': len(conservados)}
+
+    reporte = IngestorZip(FuncionesTexto(), hilos=1, buscar_hash=corpus.get).procesar(datos, conservar)
+    assert conservados == [('a.pdf', b'%PDF uno')]
+    assert reporte['conservados'] == 1 and reporte['duplicados'] == 2 and reporte['omitidos'] == 1
+    miembros = {miembro['miembro']: miembro for miembro in reporte['miembros']}
+    assert miembros['a.pdf']['numero'] == 1 and miembros['a.pdf']['caracteres'] == 8
+    assert miembros['copia/a.pdf']['duplicado_de'] == 'a.pdf'
+    assert miembros['b.pdf']['duplicado_de'] == 42
+
+
+def test_ingesta_omite_los_miembros_ya_procesados():
+    datos = crear_zip([('a.pdf', b'%PDF uno'), ('b.pdf', b'%PDF dos')])
+    reporte = IngestorZip(FuncionesTexto(), hilos=2).procesar(datos, lambda resultado, flujo: None, omitir=['a.pdf'])
+    assert [miembro['miembro'] for miembro in reporte['miembros']] == ['b.pdf']
+
+
+def test_limite_total_sobre_los_bytes_leidos():
+    # Los tamaños declarados pueden mentir: el conteo de bytes reales corta la ingesta
+    ingestor = IngestorZip(FuncionesTexto(), max_total=100)
+    ingestor._contar(60)
+    with pytest.raises(ErrorZip):
+        ingestor._contar(60)
+    with pytest.raises(ErrorZip):
+        ingestor._contar(1)